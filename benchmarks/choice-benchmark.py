@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Benchmark measuring the cost of enumerating the leaf alternates of deeply
+#         nested CHOICE OF types that are referenced from many fields.
+#
+#         Usage: choice-benchmark.py [-d depth] [-w width] [-r references] [-n passes]
+#
+#         A chain of depth CHOICE OF types is generated, each containing width - 1
+#         leaf alternates and an alternate referring to the next type in the chain.
+#         The outermost type is then referenced by a field in each of a number of
+#         STRUCTURE types.
+#
+
+import sys
+import os
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from openweave.tlv.schema import WeaveTLVSchema
+from openweave.tlv.schema.node import StructureField
+
+def makeSchemaText(depth, width, refCount):
+    lines = []
+    tag = 0
+    for level in range(depth):
+        alts = []
+        for i in range(width - 1):
+            alts.append('a%d-%d [%d] : INTEGER' % (level, i, tag))
+            tag += 1
+        if level > 0:
+            alts.append('n%d : c%d' % (level, level - 1))
+        lines.append('c%d => CHOICE OF { %s }' % (level, ', '.join(alts)))
+    for i in range(refCount):
+        lines.append('s%d => STRUCTURE { f : c%d, g [%d] : STRING }' % (i, depth - 1, tag))
+    return '\n'.join(lines) + '\n'
+
+def main():
+    argParser = argparse.ArgumentParser(description='Measure CHOICE OF leaf alternate enumeration')
+    argParser.add_argument('-d', '--depth', type=int, default=40, help='nesting depth of the CHOICE OF types')
+    argParser.add_argument('-w', '--width', type=int, default=6, help='number of alternates in each CHOICE OF type')
+    argParser.add_argument('-r', '--references', type=int, default=2000, help='number of fields referring to the outermost type')
+    argParser.add_argument('-n', '--passes', type=int, default=5, help='number of timed enumeration passes')
+    args = argParser.parse_args()
+
+    if args.depth * (args.width - 1) >= 256:
+        argParser.error('depth * (width - 1) must be less than 256')
+
+    schemaText = makeSchemaText(args.depth, args.width, args.references)
+    tlvSchema = WeaveTLVSchema()
+    tlvSchema.loadSchemaFromString(schemaText)
+
+    startTime = time.perf_counter()
+    errs = tlvSchema.validate()
+    print('validate: %.1f ms (%d errors)' % ((time.perf_counter() - startTime) * 1000, len(errs)))
+
+    fields = [ field for field in tlvSchema.allNodes(StructureField) if field.name == 'f' ]
+    leafCount = 0
+    startTime = time.perf_counter()
+    for _ in range(args.passes):
+        for field in fields:
+            leafCount += sum(1 for _ in field.targetType.allLeafAlternatesWithNamesAndTags())
+    elapsed = time.perf_counter() - startTime
+    print('enumerate: %.2f ms per pass (%d fields, %d leaf alternates each)' %
+          (elapsed * 1000 / args.passes, len(fields), leafCount // (args.passes * len(fields))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Benchmark measuring the latency of incremental edits to a large schema file.
+#
+#         Usage: edit-benchmark.py [-n edits] [-l lines] [schema-file]
+#
+#         If no schema file is given, the example schemas are replicated to form
+#         a synthetic file of the requested number of lines.  Each edit inserts a
+#         character immediately before a randomly chosen definition arrow (=>).
+#
+
+import sys
+import os
+import glob
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from openweave.tlv.schema import WeaveTLVSchema
+
+def makeSchemaText(lineCount):
+    examplesDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'examples')
+    examples = []
+    for fileName in sorted(glob.glob(os.path.join(examplesDir, '*.txt'))):
+        with open(fileName, 'r') as f:
+            text = f.read()
+        try:
+            WeaveTLVSchema().loadSchemaFromString(text)
+        except Exception:
+            continue
+        examples.append(text)
+    chunks = []
+    lines = 0
+    while lines < lineCount:
+        for text in examples:
+            chunk = 'namespace copy%d\n{\n%s\n}\n' % (len(chunks), text)
+            chunks.append(chunk)
+            lines += chunk.count('\n')
+    return ''.join(chunks)
+
+def main():
+    argParser = argparse.ArgumentParser(description='Measure incremental edit latency')
+    argParser.add_argument('-n', '--edits', type=int, default=200, help='number of timed edits')
+    argParser.add_argument('-l', '--lines', type=int, default=20000, help='size of the synthetic schema file')
+    argParser.add_argument('file', nargs='?', help='schema file to edit')
+    args = argParser.parse_args()
+
+    if args.file is not None:
+        with open(args.file, 'r') as f:
+            schemaText = f.read()
+    else:
+        schemaText = makeSchemaText(args.lines)
+    print('file: %d lines, %d bytes' % (schemaText.count('\n'), len(schemaText)))
+
+    tlvSchema = WeaveTLVSchema()
+    startTime = time.perf_counter()
+    schemaFile = tlvSchema.loadSchemaFromString(schemaText)
+    print('full parse: %.1f ms' % ((time.perf_counter() - startTime) * 1000))
+
+    # The first edit builds the index used to shift positions.
+    startTime = time.perf_counter()
+    schemaFile.applyEdit(0, 0, '\n')
+    print('first edit: %.1f ms' % ((time.perf_counter() - startTime) * 1000))
+
+    rand = random.Random(1)
+    times = []
+    while len(times) < args.edits:
+        pos = schemaFile.schemaText.find('=>', rand.randrange(len(schemaFile.schemaText)))
+        if pos < 0:
+            continue
+        startTime = time.perf_counter()
+        schemaFile.applyEdit(pos, pos, ' ')
+        times.append(time.perf_counter() - startTime)
+    times.sort()
+    print('edits: median %.2f ms, 90th percentile %.2f ms, max %.2f ms' %
+          (times[len(times) // 2] * 1000, times[len(times) * 9 // 10] * 1000, times[-1] * 1000))
+
+if __name__ == '__main__':
+    main()
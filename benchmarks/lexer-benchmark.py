@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Benchmark measuring the tokenization throughput of the schema lexers.
+#
+#         Usage: lexer-benchmark.py [-n repeat] [schema-files...]
+#
+#         If no schema files are given, the example schemas are replicated to form
+#         a synthetic corpus.
+#
+
+import sys
+import os
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from openweave.tlv.schema import WeaveTLVSchema
+from openweave.tlv.schema.lexer import _FastLexer
+
+def loadCorpus(fileNames, copies=20):
+    if len(fileNames) > 0:
+        texts = []
+        for fileName in fileNames:
+            with open(fileName, 'r') as f:
+                texts.append(f.read())
+        return texts
+    examplesDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'examples')
+    texts = []
+    for fileName in sorted(glob.glob(os.path.join(examplesDir, '*.txt'))):
+        with open(fileName, 'r') as f:
+            texts.append(f.read() * copies)
+    return texts
+
+def timeLexer(lex, texts, repeat):
+    bestTime = None
+    tokenCount = 0
+    for i in range(repeat):
+        tokenCount = 0
+        startTime = time.perf_counter()
+        for text in texts:
+            try:
+                for token in lex(text):
+                    tokenCount += 1
+            except Exception:
+                pass
+        elapsed = time.perf_counter() - startTime
+        bestTime = elapsed if bestTime is None else min(bestTime, elapsed)
+    return (bestTime, tokenCount)
+
+def main():
+    argParser = argparse.ArgumentParser(description='Measure schema tokenization throughput')
+    argParser.add_argument('-n', '--repeat', type=int, default=5, help='number of timed runs (best is reported)')
+    argParser.add_argument('files', nargs='*', help='schema files to tokenize')
+    args = argParser.parse_args()
+
+    texts = loadCorpus(args.files)
+    totalBytes = sum(len(text) for text in texts)
+    print('corpus: %d files, %d bytes' % (len(texts), totalBytes))
+
+    standardParser = WeaveTLVSchema._getSchemaParser(WeaveTLVSchema.LEXER_STANDARD)
+    lexers = [
+        (WeaveTLVSchema.LEXER_STANDARD, standardParser.lex),
+        (WeaveTLVSchema.LEXER_FAST, _FastLexer(standardParser.lexer_conf).lex),
+    ]
+
+    baseTime = None
+    for (lexerName, lex) in lexers:
+        (elapsed, tokenCount) = timeLexer(lex, texts, args.repeat)
+        baseTime = elapsed if baseTime is None else baseTime
+        print('%-10s %8.3f s  %10.0f tokens/s  (%.2fx)' % (lexerName, elapsed, tokenCount / elapsed, baseTime / elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Benchmark measuring the parse throughput of the schema parser front ends
+#         and lexers.
+#
+#         Usage: parse-benchmark.py [-n repeat] [schema-files...]
+#
+#         If no schema files are given, the example schemas are replicated to form
+#         a synthetic corpus.
+#
+
+import sys
+import os
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from openweave.tlv.schema import WeaveTLVSchema
+
+def loadCorpus(fileNames, copies=20):
+    if len(fileNames) > 0:
+        texts = []
+        for fileName in fileNames:
+            with open(fileName, 'r') as f:
+                texts.append(f.read())
+        return texts
+    # Build a synthetic corpus from the valid example schemas, placing each copy
+    # within a distinct namespace.
+    examplesDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'examples')
+    examples = []
+    for fileName in sorted(glob.glob(os.path.join(examplesDir, '*.txt'))):
+        with open(fileName, 'r') as f:
+            text = f.read()
+        try:
+            WeaveTLVSchema().loadSchemaFromString(text)
+        except Exception:
+            continue
+        examples.append(text)
+    return [ '\n'.join('namespace copy%d\n{\n%s\n}\n' % (i, text) for i in range(copies)) for text in examples ]
+
+def timeFrontEnd(frontEnd, lexer, texts, repeat):
+    tlvSchema = WeaveTLVSchema(frontEnd=frontEnd, lexer=lexer)
+    bestTime = None
+    for i in range(repeat):
+        startTime = time.perf_counter()
+        for text in texts:
+            tlvSchema.loadSchemaFromString(text)
+        elapsed = time.perf_counter() - startTime
+        bestTime = elapsed if bestTime is None else min(bestTime, elapsed)
+    return bestTime
+
+def main():
+    argParser = argparse.ArgumentParser(description='Measure schema parse throughput')
+    argParser.add_argument('-n', '--repeat', type=int, default=5, help='number of timed runs (best is reported)')
+    argParser.add_argument('files', nargs='*', help='schema files to parse')
+    args = argParser.parse_args()
+
+    texts = loadCorpus(args.files)
+    totalBytes = sum(len(text) for text in texts)
+    print('corpus: %d files, %d bytes' % (len(texts), totalBytes))
+
+    baseTime = None
+    for frontEnd in WeaveTLVSchema.frontEnds:
+        for lexer in WeaveTLVSchema.lexers:
+            elapsed = timeFrontEnd(frontEnd, lexer, texts, args.repeat)
+            baseTime = elapsed if baseTime is None else baseTime
+            print('%-12s %-9s %8.3f s  %8.1f KB/s  (%.2fx)' % (frontEnd, lexer, elapsed, totalBytes / elapsed / 1024, baseTime / elapsed))
+
+if __name__ == '__main__':
+    main()
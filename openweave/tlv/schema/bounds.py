@@ -0,0 +1,221 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Bulk checking of values against the bounds of schema types.
+#
+#      The bounds checked are those of INTEGER types (their range, or width), FLOAT
+#      types (their range, if any) and the length qualifiers of STRING and BYTE STRING
+#      types.  For STRING and BYTE STRING types, values may be given either as strings
+#      or as their lengths.
+#
+#      Values may be given as any sequence, including array.array objects or other
+#      buffers.  If NumPy is installed, values are checked as NumPy arrays, and the
+#      results returned as such.  Comparisons are exact: bounds outside the range of
+#      an array's integer type, and non-integral bounds compared with floating point
+#      values, are adjusted to the nearest representable values, rather than converted.
+#
+
+import math
+import struct
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .node import *
+
+
+def typeBounds(typeNode):
+    '''Return a tuple containing the lowest and highest values (or, for STRING and BYTE
+       STRING types, lengths) allowed by a type.  Either bound may be None if the type
+       does not limit it.  typeNode may be a TypeDef or ReferencedType, in which case
+       the bounds of its target type are returned.'''
+    return _getChecker(typeNode).bounds
+
+def boundsMask(typeNode, values):
+    '''Return a mask indicating which of the given values are within the bounds of a type.
+       The mask is a boolean NumPy array of the same shape as values if NumPy is installed,
+       or otherwise a list of bools.'''
+    checker = _getChecker(typeNode)
+    if numpy is not None:
+        return checker.arrayMask(_asArray(values))
+    return list(checker.iterMask(values))
+
+def firstOutOfBounds(typeNode, values):
+    '''Return the index of the first of the given values that is outside the bounds of a
+       type, or None if all values are within bounds.  For a multi-dimensional NumPy
+       array, the index is that within the flattened array.'''
+    checker = _getChecker(typeNode)
+    if numpy is not None:
+        mask = checker.arrayMask(_asArray(values)).ravel()
+        outOfBounds = numpy.flatnonzero(~mask)
+        return int(outOfBounds[0]) if len(outOfBounds) > 0 else None
+    for (i, inBounds) in enumerate(checker.iterMask(values)):
+        if not inBounds:
+            return i
+    return None
+
+
+# ----- Private Members
+
+def _asArray(values):
+    # numpy.asarray() converts bytes and bytearray objects to a 0-d array of a single
+    # bytes value, rather than an array of their elements, as with other buffers.
+    if isinstance(values, (bytes, bytearray)):
+        values = memoryview(values)
+    return numpy.asarray(values)
+
+# The _BoundsChecker for each type node, created when the type is first checked.
+_checkers = weakref.WeakKeyDictionary()
+
+def _getChecker(typeNode):
+    typeNode = resolveTypeNode(typeNode)
+    checker = _checkers.get(typeNode, None)
+    if checker is None:
+        if isinstance(typeNode, IntegerTypeNode):
+            checker = _BoundsChecker(typeNode.bounds)
+        elif isinstance(typeNode, FloatType):
+            checker = _BoundsChecker(typeNode.bounds, floats=True)
+        elif isinstance(typeNode, (StringType, ByteStringType)):
+            lengthQual = typeNode.getQualifier(Length)
+            bounds = (lengthQual.lowerBound, lengthQual.upperBound) if lengthQual is not None else (None, None)
+            checker = _BoundsChecker(bounds, lengths=True)
+        else:
+            raise ValueError('Bounds cannot be checked for %s' % typeNode.schemaConstruct)
+        _checkers[typeNode] = checker
+    return checker
+
+
+class _BoundsChecker(object):
+    '''Checks values against a pair of precomputed bounds.'''
+
+    def __init__(self, bounds, lengths=False, floats=False):
+        (lowerBound, upperBound) = bounds
+        self.bounds = bounds
+        self.lengths = lengths
+        self.floats = floats
+        self.lowerBound = lowerBound
+        self.upperBound = upperBound
+        # Bounds for comparison with floating point values: the nearest float values that
+        # do not widen the bounds.
+        self.floatLowerBound = _floatAtLeast(lowerBound) if lowerBound is not None else None
+        self.floatUpperBound = _floatAtMost(upperBound) if upperBound is not None else None
+
+    def iterMask(self, values):
+        '''Iterate over a sequence of values, yielding whether each is within bounds.'''
+        (lowerBound, upperBound) = (self.lowerBound, self.upperBound)
+        if self.lengths:
+            values = (len(v) if isinstance(v, (str, bytes, bytearray)) else v for v in values)
+        elif self.floats:
+            # Values of FLOAT types are compared as the floating point values they encode to.
+            (lowerBound, upperBound) = (self.floatLowerBound, self.floatUpperBound)
+            values = (_toFloat(v) for v in values)
+        if lowerBound is None and upperBound is None:
+            # All values (including NaNs) are within bounds.
+            return (True for v in values)
+        if lowerBound is None:
+            return (v <= upperBound for v in values)
+        if upperBound is None:
+            return (v >= lowerBound for v in values)
+        return (lowerBound <= v <= upperBound for v in values)
+
+    def arrayMask(self, arr):
+        '''Return a boolean NumPy array indicating which values of an array are within bounds.'''
+        kind = arr.dtype.kind
+        if self.lengths:
+            if kind in 'US':
+                arr = numpy.char.str_len(arr)
+            elif kind == 'O':
+                arr = numpy.array([ len(v) if isinstance(v, (str, bytes, bytearray)) else v
+                                    for v in arr.ravel().tolist() ], dtype=object).reshape(arr.shape)
+            kind = arr.dtype.kind
+        elif self.floats and kind in 'iu':
+            arr = arr.astype(numpy.float64)
+            kind = 'f'
+        if kind in 'iu':
+            return self._intArrayMask(arr)
+        if kind == 'f':
+            mask = numpy.ones(arr.shape, dtype=bool)
+            if self.floatLowerBound is not None:
+                mask &= arr >= numpy.float64(self.floatLowerBound)
+            if self.floatUpperBound is not None:
+                mask &= arr <= numpy.float64(self.floatUpperBound)
+            return mask
+        return _mapElements(arr, self.iterMask, bool)
+
+    def _intArrayMask(self, arr):
+        # Bounds outside the range of the array's type are either always or never satisfied,
+        # and bounds within it are compared as values of that type.
+        info = numpy.iinfo(arr.dtype)
+        (lowerBound, upperBound) = (self.lowerBound, self.upperBound)
+        if lowerBound is not None and not isinstance(lowerBound, int):
+            lowerBound = math.ceil(lowerBound)
+        if upperBound is not None and not isinstance(upperBound, int):
+            upperBound = math.floor(upperBound)
+        if (lowerBound is not None and lowerBound > info.max) or (upperBound is not None and upperBound < info.min):
+            return numpy.zeros(arr.shape, dtype=bool)
+        mask = numpy.ones(arr.shape, dtype=bool)
+        if lowerBound is not None and lowerBound > info.min:
+            mask &= arr >= arr.dtype.type(lowerBound)
+        if upperBound is not None and upperBound < info.max:
+            mask &= arr <= arr.dtype.type(upperBound)
+        return mask
+
+
+def _mapElements(arr, mapValues, dtype):
+    '''Map the elements of a NumPy array that cannot be processed as a whole (e.g. Python
+       integers beyond 64 bits) one at a time, returning an array of the results.
+       mapValues is called with a list of the elements, and returns an iterable of the
+       corresponding results.'''
+    results = numpy.fromiter(mapValues(arr.ravel().tolist()), dtype=dtype, count=arr.size)
+    return results.reshape(arr.shape)
+
+
+_doubleStruct = struct.Struct('<d')
+_int64Struct = struct.Struct('<q')
+
+def _nextFloat(f, up):
+    '''Return the float value adjacent to a finite float value, in the given direction.'''
+    if f == 0.0:
+        return 5e-324 if up else -5e-324
+    bits = _int64Struct.unpack(_doubleStruct.pack(f))[0]
+    bits += 1 if (f > 0) == up else -1
+    return _doubleStruct.unpack(_int64Struct.pack(bits))[0]
+
+def _toFloat(val):
+    try:
+        return float(val)
+    except OverflowError:
+        return math.inf if val > 0 else -math.inf
+
+def _floatAtLeast(val):
+    '''Return the smallest float value >= a given int or Decimal value.'''
+    f = _toFloat(val)
+    if math.isfinite(f) and f < val:
+        f = _nextFloat(f, up=True)
+    return f
+
+def _floatAtMost(val):
+    '''Return the largest float value <= a given int or Decimal value.'''
+    f = _toFloat(val)
+    if math.isfinite(f) and f > val:
+        f = _nextFloat(f, up=False)
+    return f
@@ -0,0 +1,185 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Single-pass front end for building Weave TLV Schema ASTs.
+#
+#      The single-pass front end constructs SchemaNodes directly from within the LALR
+#      parser, as each grammar rule is reduced, rather than first building a complete
+#      Lark parse tree and then transforming it.  The rule handlers of _SchemaTransformer
+#      are used to construct the nodes, and the source positions passed to the handlers
+#      are computed in the same manner as Lark's propagate_positions option, such that
+#      the resultant ASTs are identical to those produced by the tree-based front end.
+#
+
+import threading
+import functools
+
+from lark import Lark, Tree, Token
+from lark.tree import Meta
+
+from .error import WeaveTLVSchemaError
+
+
+class _Built(object):
+    '''Wraps a value produced by a rule handler, along with the source positions
+       of the associated grammar rule.'''
+
+    __slots__ = ('value', 'meta')
+
+    def __init__(self, value, meta):
+        self.value = value
+        self.meta = meta
+
+
+def _propagatePositions(meta, children):
+    # Compute the source positions for a rule from those of its children, exactly
+    # as done by lark.parse_tree_builder.PropagatePositions.  Note that the children
+    # include any anonymous tokens (e.g. keywords and punctuation) that are filtered
+    # from the children passed to the rule handler.
+    #
+    # The children are either Tokens, or Trees or _Built objects whose meta has been
+    # computed by this function.  Thus any non-empty meta is known to contain container
+    # positions.  (As in Lark, the container_start_pos and container_end_pos attributes
+    # are never set.)
+    for child in children:
+        if isinstance(child, Token):
+            (line, column, startPos) = (child.line, child.column, child.start_pos)
+            break
+        childMeta = child.meta
+        if not childMeta.empty:
+            (line, column, startPos) = (childMeta.container_line, childMeta.container_column, childMeta.start_pos)
+            break
+    else:
+        return
+    for child in reversed(children):
+        if isinstance(child, Token):
+            (endLine, endColumn, endPos) = (child.end_line, child.end_column, child.end_pos)
+            break
+        childMeta = child.meta
+        if not childMeta.empty:
+            (endLine, endColumn, endPos) = (childMeta.container_end_line, childMeta.container_end_column, childMeta.end_pos)
+            break
+    if not hasattr(meta, 'line'):
+        meta.line = line
+        meta.column = column
+        meta.start_pos = startPos
+    if not hasattr(meta, 'end_line'):
+        meta.end_line = endLine
+        meta.end_column = endColumn
+        meta.end_pos = endPos
+    meta.empty = False
+    meta.container_line = line
+    meta.container_column = column
+    meta.container_end_line = endLine
+    meta.container_end_column = endColumn
+
+
+class _RuleCallbacks(object):
+    '''Supplies the per-rule callbacks to the embedded Lark parser.'''
+
+    def __init__(self, builder):
+        self._builder = builder
+
+    def __getattr__(self, name):
+        # Only supply callbacks for grammar rules.  Terminal names (which Lark queries
+        # for lexer callbacks) are upper case, and the names of internal rules created
+        # by Lark begin with an underbar.
+        if not name[:1].islower():
+            raise AttributeError(name)
+        return functools.partial(self._builder._reduce, name)
+
+
+class _SchemaBuilder(object):
+    '''Parses schema text and builds the corresponding AST in a single pass.'''
+
+    def __init__(self, schemaSyntax, treeParser, lexer='standard'):
+        # Token types that are passed to the rule handlers.  All other tokens are
+        # anonymous keywords and punctuation.  These are determined from the rules of
+        # the tree-based parser, as the single-pass parser is configured to retain all
+        # tokens (such that their positions can be used in computing rule positions).
+        self._keptTokenTypes = frozenset(sym.name for rule in treeParser.rules
+                                                  for sym in rule.expansion
+                                                  if sym.is_term and not sym.filter_out)
+        self._state = threading.local()
+        self._parser = Lark(schemaSyntax, parser='lalr', lexer=lexer, start='file',
+                            keep_all_tokens=True, transformer=_RuleCallbacks(self))
+        # Names of the rules for which callbacks are invoked, and the subset of rules that
+        # are inlined into their parent when they have a single child.
+        self._ruleNames = frozenset(rule.alias or rule.origin.name for rule in self._parser.rules
+                                                                   if not rule.origin.name.startswith('_'))
+        self._expand1Rules = frozenset(rule.origin.name for rule in self._parser.rules
+                                                        if rule.options.expand1 and not rule.alias)
+
+    def parse(self, schemaText, transformer):
+        '''Parse the given schema text, invoking the rule handlers of the given
+           _SchemaTransformer object to build the AST.
+           Returns the value produced by the transformer's file() handler. Raises a
+           LarkError if a syntax error is encountered, or a WeaveTLVSchemaError if
+           a rule handler raises an error.'''
+        state = self._state
+        state.handlers = { ruleName : getattr(transformer, ruleName, None) for ruleName in self._ruleNames }
+        state.error = None
+        try:
+            result = self._parser.parse(schemaText)
+            if state.error is not None:
+                raise state.error
+            return result.value
+        finally:
+            state.handlers = None
+            state.error = None
+
+    def _reduce(self, ruleName, children):
+        state = self._state
+
+        # Once a rule handler has failed, continue parsing solely for the purpose of
+        # detecting syntax errors, which take precedence over errors raised by the
+        # handlers (as they would when transforming a complete parse tree).
+        if state.error is not None:
+            return None
+
+        # Form the list of values to be passed to the rule handler, omitting anonymous
+        # tokens and unwrapping the values produced by other rule handlers.
+        keptTokenTypes = self._keptTokenTypes
+        values = []
+        for child in children:
+            if isinstance(child, _Built):
+                values.append(child.value)
+            elif not isinstance(child, Token) or child.type in keptTokenTypes:
+                values.append(child)
+
+        # Inline rules of the form '?rule' that have a single child, after extending
+        # the child's positions to encompass the rule's anonymous tokens.
+        if len(values) == 1 and ruleName in self._expand1Rules:
+            child = next(child for child in children
+                         if not isinstance(child, Token) or child.type in keptTokenTypes)
+            if not isinstance(child, Token):
+                _propagatePositions(child.meta, children)
+            return child
+
+        meta = Meta()
+        _propagatePositions(meta, children)
+
+        handler = state.handlers[ruleName]
+        if handler is None:
+            return Tree(ruleName, values, meta)
+        try:
+            return _Built(handler(values, meta), meta)
+        except WeaveTLVSchemaError as err:
+            state.error = err
+            return None
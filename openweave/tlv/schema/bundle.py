@@ -0,0 +1,213 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Schema bundles: zip archives containing a set of schema files, along with a
+#      precomputed index of the definitions within them.
+#
+#      A bundle contains the following members, all stored uncompressed so that they
+#      can be read directly from a memory-mapped archive:
+#
+#        manifest.json   : the bundle manifest (see below)
+#        sources/N       : the UTF-8 text of the Nth schema file
+#        asts/N          : optionally, the serialized AST of the Nth schema file
+#                          (see serialization.py), without its text
+#
+#      The manifest is a JSON object with the following members:
+#
+#        format          : "weave-tlv-schema-bundle"
+#        version         : bundle format version (1)
+#        astVersion      : serialization format version of the ASTs
+#        files           : a list of objects, one per schema file, with members:
+#          name          : the name of the schema file
+#          source        : name of the member containing the text of the file
+#          sha256        : SHA-256 hash of the text of the file
+#          ast           : name of the member containing the AST (absent if none)
+#          statements    : the top-level statements in the file, as produced by
+#                          lazy.scanStatements(), each a list of the form
+#                          [ startPos, endPos, startLine, [ [ kind, name ]... ] ]
+#
+#      Bundled schema files are loaded lazily: definitions are looked up via the
+#      precomputed index, and the statements containing them parsed on demand.  The
+#      text of each file is read from the archive when first needed.  When
+#      all the statements of a file are needed (e.g. by validate()) the AST is
+#      deserialized, if present, rather than the text parsed.
+#
+
+import hashlib
+import json
+import mmap
+import struct
+import zipfile
+
+from .node import *
+from .error import WeaveTLVSchemaError
+from .lazy import LazySchemaFile, LazyStatement, scanStatements
+from . import serialization
+
+BUNDLE_FORMAT = 'weave-tlv-schema-bundle'
+BUNDLE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+_localHeaderStruct = struct.Struct('<4s22xHH')
+
+
+def writeBundle(schemaFiles, output, withASTs=True):
+    '''Write a bundle containing the given SchemaFiles to a binary output stream (or file
+       name).  The SchemaFiles must have been loaded from text.
+       If withASTs is True, the serialized ASTs of the files are included in the bundle,
+       except for files containing syntax errors.'''
+    manifestFiles = []
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for (index, schemaFile) in enumerate(schemaFiles):
+            if schemaFile.schemaText is None:
+                raise ValueError('Schema file has no text: %s' % schemaFile.fileName)
+            sourceBytes = schemaFile.schemaText.encode('utf-8')
+            entry = {
+                'name' : schemaFile.fileName,
+                'source' : 'sources/%d' % index,
+                'sha256' : hashlib.sha256(sourceBytes).hexdigest(),
+            }
+            zf.writestr(entry['source'], sourceBytes)
+            if withASTs and not schemaFile.syntaxErrors:
+                entry['ast'] = 'asts/%d' % index
+                zf.writestr(entry['ast'], serialization.dumps(schemaFile, withText=False))
+            entry['statements'] = [ [ stmt.startPos, stmt.endPos, stmt.startLine, stmt.names ]
+                                    for stmt in scanStatements(schemaFile.schemaText) ]
+            manifestFiles.append(entry)
+        manifest = {
+            'format' : BUNDLE_FORMAT,
+            'version' : BUNDLE_VERSION,
+            'astVersion' : serialization.VERSION,
+            'files' : manifestFiles,
+        }
+        zf.writestr(MANIFEST_NAME, json.dumps(manifest, separators=(',', ':')))
+
+
+def readBundle(fileName, parseRegion, verify=False):
+    '''Read a bundle from a named file, returning a list of BundledSchemaFile objects,
+       which parse their statements with the given parseRegion function.
+       The bundle is memory-mapped, and remains so while any of the returned files have
+       unread text or unmaterialized ASTs.  If verify is True, the text of each file is
+       checked against the hash in the manifest.'''
+    try:
+        with open(fileName, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        members = {}
+        with zipfile.ZipFile(data) as zf:
+            for info in zf.infolist():
+                members[info.filename] = info
+        manifest = json.loads(_readMember(data, members, MANIFEST_NAME).decode('utf-8'))
+        if not isinstance(manifest, dict) or manifest.get('format') != BUNDLE_FORMAT:
+            raise ValueError('the bundle manifest is missing or malformed')
+        manifestFiles = manifest['files']
+    except (KeyError, ValueError, zipfile.BadZipFile) as err:
+        raise WeaveTLVSchemaError('invalid schema bundle: %s' % fileName, detail=str(err)) from None
+    if manifest.get('version') != BUNDLE_VERSION:
+        raise WeaveTLVSchemaError('unsupported schema bundle version: %s' % manifest.get('version'),
+                                  detail='the bundle %s was built by an incompatible version of this tool' % fileName)
+
+    # ASTs serialized in a different format version are ignored, and the text parsed instead.
+    useASTs = manifest.get('astVersion') == serialization.VERSION
+
+    schemaFiles = []
+    for entry in manifestFiles:
+        try:
+            sourceData = _memberView(data, members, entry['source'])
+            if verify and hashlib.sha256(sourceData).hexdigest() != entry['sha256']:
+                raise WeaveTLVSchemaError('schema bundle hash mismatch: %s' % entry['name'],
+                                          detail='the text of the file in the bundle %s does not match its manifest entry' % fileName)
+            stmts = []
+            for (startPos, endPos, startLine, names) in entry['statements']:
+                stmt = LazyStatement(startPos, endPos, startLine)
+                stmt.names = [ tuple(name) for name in names ]
+                stmts.append(stmt)
+            astData = None
+            if useASTs and 'ast' in entry:
+                astData = _memberView(data, members, entry['ast'])
+        except (KeyError, TypeError, ValueError) as err:
+            raise WeaveTLVSchemaError('invalid schema bundle: %s' % fileName, detail=str(err)) from None
+        schemaFiles.append(BundledSchemaFile(entry['name'], sourceData, stmts, parseRegion, astData, fileName))
+    return schemaFiles
+
+
+class BundledSchemaFile(LazySchemaFile):
+    '''A lazily loaded SchemaFile read from a bundle.  The text of the file is decoded
+       from sourceData (the UTF-8 encoded text) when first needed.'''
+
+    def __init__(self, fileName, sourceData, lazyStatements, parseRegion, astData=None, bundleName=None):
+        self._schemaText = None
+        super(BundledSchemaFile, self).__init__(fileName, None, lazyStatements, parseRegion)
+        self._sourceData = sourceData
+        self._astData = astData
+        self._bundleName = bundleName
+
+    @property
+    def schemaText(self):
+        if self._schemaText is None and self._sourceData is not None:
+            try:
+                self._schemaText = str(self._sourceData, 'utf-8')
+            except UnicodeDecodeError as err:
+                raise WeaveTLVSchemaError('invalid schema bundle: %s' % self._bundleName, detail=str(err)) from None
+            self._sourceData = None
+        return self._schemaText
+
+    @schemaText.setter
+    def schemaText(self, value):
+        self._schemaText = value
+        self._sourceData = None
+
+    def materializeAll(self, errs=None):
+        '''Materialize all remaining statements in the file, by deserializing the AST
+           of the file if available, or otherwise by parsing them.'''
+        if self._astData is None:
+            return super(BundledSchemaFile, self).materializeAll(errs)
+        astData = self._astData
+        self._astData = None
+        serialization.loads(astData, schemaFile=self)
+        # Assign the deserialized nodes to the lazy statements that contain them.  Nodes
+        # for statements that have already been parsed are discarded in favor of the
+        # parsed ones, which may have been indexed.
+        nodes = self._statements
+        statements = []
+        i = 0
+        for stmt in self.lazyStatements:
+            stmtNodes = []
+            while i < len(nodes) and nodes[i].sourceRef.startPos < stmt.endPos:
+                stmtNodes.append(nodes[i])
+                i += 1
+            if stmt.nodes is None:
+                stmt.nodes = stmtNodes
+            statements += stmt.nodes
+        self._statements = statements
+        return statements
+
+
+def _readMember(data, members, name):
+    return bytes(_memberView(data, members, name))
+
+def _memberView(data, members, name):
+    # Return a view of the data of an uncompressed member, directly from the archive.
+    info = members[name]
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError('compressed member: %s' % name)
+    (sig, nameLen, extraLen) = _localHeaderStruct.unpack_from(data, info.header_offset)
+    if sig != b'PK\x03\x04':
+        raise ValueError('bad local header: %s' % name)
+    start = info.header_offset + _localHeaderStruct.size + nameLen + extraLen
+    return memoryview(data)[start:start + info.file_size]
@@ -0,0 +1,237 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Canonical hashing of schema subtrees.
+#
+#      The canonical hash of a node is a digest of the node's class, its semantically
+#      significant attributes and the canonical hashes of its children.  Documentation,
+#      source positions and the order of qualifiers do not contribute to the hash, so
+#      two subtrees have the same hash if and only if they define the same schema
+#      constructs (with overwhelming probability).  Type references contribute the
+#      fully-qualified name of the TypeDef they resolve to.
+#
+#      The structural hash of a type is a Merkle-style hash of the type's structure,
+#      as seen on the wire and by the names of its components.  The names of type
+#      definitions do not contribute, and type references contribute the structural
+#      hash of the type they ultimately refer to, so structurally identical types
+#      defined under different names have the same structural hash.  Structural
+#      hashes are computed bottom-up, hashing each non-recursive type once, and can
+#      be used to share a single derived artifact (e.g. a validator or codec) between
+#      identical types.
+#
+
+import hashlib
+
+from .node import *
+
+# The attributes of each class of node that contribute to its canonical hash, in
+# addition to its name (for named nodes) and its children.
+_hashedAttributes = {
+    Range : ('width', 'lowerBound', 'upperBound'),
+    Length : ('lowerBound', 'upperBound'),
+    Tag : ('profileId', 'tagNum'),
+    Id : ('vendorId', 'idNum'),
+    IntegerEnumValue : ('value',),
+    LinearTypePatternElement : ('lowerBound', 'upperBound'),
+    Message : ('emptyPayload',),
+}
+
+
+def referenceName(refNode):
+    '''Return the name identifying the target of a type reference: the fully-qualified
+       name of the TypeDef it resolves to, or the name as written if it is unresolved.'''
+    if refNode.targetTypeDef is not None:
+        return refNode.targetTypeDef.fullyQualifiedName
+    return refNode.targetName
+
+
+class CanonicalHasher(object):
+    '''Computes canonical hashes of schema nodes, memoizing the hash of every node
+       visited, such that each subtree is hashed once.'''
+
+    def __init__(self):
+        self._hashes = {}
+
+    def hash(self, node):
+        '''Return the canonical hash of a node, as a bytes object.'''
+        digest = self._hashes.get(node, None)
+        if digest is None:
+            digest = self._computeHash(node)
+            self._hashes[node] = digest
+        return digest
+
+    def _computeHash(self, node):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(type(node).__name__.encode('utf-8'))
+        self._hashAttributes(node, h)
+        quals = node.quals if isinstance(node, HasQualifiers) else ()
+        # Qualifiers are unordered.
+        for qualDigest in sorted(self.hash(qual) for qual in quals):
+            h.update(b'q')
+            h.update(qualDigest)
+        for child in node.allChildNodes():
+            if child not in quals:
+                h.update(b'c')
+                h.update(self.hash(child))
+        return h.digest()
+
+    @staticmethod
+    def _hashAttributes(node, h):
+        values = []
+        if isinstance(node, HasName):
+            values.append(node.name)
+        if isinstance(node, (ReferencedType, StructureIncludes)):
+            values.append(referenceName(node))
+        for attrName in _hashedAttributes.get(type(node), ()):
+            values.append(getattr(node, attrName))
+        for value in values:
+            h.update(b'a')
+            h.update(repr(value).encode('utf-8'))
+
+
+class StructuralHasher(object):
+    '''Computes structural hashes of TypeNode and TypeDef nodes, memoizing the hash of
+       every type visited.
+       References must have been resolved (by WeaveTLVSchema.validate()) prior to
+       computing structural hashes.'''
+
+    def __init__(self):
+        self._hashes = {}
+        self._rootHashes = {}
+        self._stack = {}
+
+    def hash(self, node):
+        '''Return the structural hash of a TypeNode or TypeDef node, as a bytes object.
+           The hash of a ReferencedType is that of the type to which it ultimately refers.'''
+        digest = self._rootHashes.get(node, None)
+        if digest is None:
+            digest = self._hashChild(node)[0]
+            self._rootHashes[node] = digest
+        return digest
+
+    def _hash(self, node):
+        # Returns the hash of a node, along with a flag indicating whether the node contains
+        # a recursive reference to a type that encloses it.  A recursive reference is hashed
+        # as its distance from the referenced type, so the hash of a recursive node depends
+        # on the point at which the cycle is entered, and is memoized only as a root hash.
+        digest = self._hashes.get(node, None)
+        if digest is not None:
+            return (digest, False)
+        if not isinstance(node, TypeNode):
+            return self._computeHash(node)
+        depth = self._stack.get(node, None)
+        if depth is not None:
+            return (hashlib.blake2b(b'recursive:%d' % (len(self._stack) - depth), digest_size=16).digest(), True)
+        self._stack[node] = len(self._stack)
+        try:
+            return self._computeHash(node)
+        finally:
+            del self._stack[node]
+
+    def _computeHash(self, node):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(type(node).__name__.encode('utf-8'))
+        recursive = False
+        for value in self._values(node):
+            if isinstance(value, SchemaNode):
+                (childDigest, childRecursive) = self._hashChild(value)
+                recursive = recursive or childRecursive
+                h.update(b'c')
+                h.update(childDigest)
+            else:
+                h.update(b'a')
+                h.update(repr(value).encode('utf-8'))
+        digest = h.digest()
+        if not recursive:
+            self._hashes[node] = digest
+        return (digest, recursive)
+
+    def _hashChild(self, node):
+        if not isinstance(node, (ReferencedType, StructureIncludes)):
+            return self._hash(node)
+        # Replace references with the types they refer to.
+        targetType = node.targetType
+        if targetType is None:
+            return (hashlib.blake2b(b'unresolved:' + node.targetName.encode('utf-8'), digest_size=16).digest(), False)
+        return self._hash(targetType)
+
+    @staticmethod
+    def _values(node):
+        # Return the values and child nodes that contribute to the structural hash of a node.
+        values = []
+        if isinstance(node, TypeDef):
+            values.append(_tagTuples([ node.defaultTag ]))
+            values.append(node.type)
+            return values
+        if isinstance(node, (StructureField, ChoiceAlternate, LinearTypePatternElement)):
+            values.append(node.name)
+        if isinstance(node, (StructureField, LinearTypePatternElement)):
+            values.append(_tagTuples(node.possibleTags))
+        if isinstance(node, ChoiceAlternate):
+            values.append(_tagTuples([ node.defaultTag ]))
+        if isinstance(node, HasQualifiers):
+            values.append(sorted((_qualifierValue(qual) for qual in node.quals if not isinstance(qual, Tag)), key=repr))
+        if isinstance(node, LinearTypePatternElement):
+            values += [ node.lowerBound, node.upperBound ]
+        if isinstance(node, IntegerTypeNode):
+            values.append(sorted((v.value, v.name) for v in node.values))
+        elif isinstance(node, StructuredTypeNode):
+            values += list(node.allFields())
+        elif isinstance(node, ChoiceType):
+            values += node.alternates
+        elif isinstance(node, SequencedTypeNode):
+            if node.elemType is not None:
+                values.append(node.elemType)
+            else:
+                values.append(len(node.elemTypePattern))
+                values += node.elemTypePattern
+        elif isinstance(node, (StructureField, ChoiceAlternate, LinearTypePatternElement)):
+            values.append(node.type)
+        return values
+
+
+def _tagTuples(tags):
+    return sorted((tag.asTuple() for tag in tags if tag is not None), key=repr)
+
+
+def _qualifierValue(qual):
+    return (type(qual).__name__,) + tuple(getattr(qual, attrName) for attrName in _hashedAttributes.get(type(qual), ()))
+
+
+class ArtifactCache(object):
+    '''A cache of artifacts derived from types (e.g. validators or codecs), in which
+       structurally identical types share a single artifact.'''
+
+    def __init__(self, hasher=None):
+        self._hasher = hasher if hasher is not None else StructuralHasher()
+        self._artifacts = {}
+
+    def get(self, kind, node, factory):
+        '''Return the artifact of the given kind for a TypeNode or TypeDef node, calling
+           factory(node) to create it if no artifact exists for a structurally identical
+           node.'''
+        key = (kind, self._hasher.hash(node))
+        artifact = self._artifacts.get(key, None)
+        if artifact is None:
+            artifact = factory(node)
+            self._artifacts[key] = artifact
+        return artifact
+
+    def __len__(self):
+        return len(self._artifacts)
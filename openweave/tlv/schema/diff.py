@@ -0,0 +1,396 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Comparison of Weave TLV Schemas, with classification of changes by their
+#      impact on wire compatibility.
+#
+#      Definitions are matched by fully-qualified name, falling back to their ids
+#      (e.g. for renamed MESSAGE definitions).  Structure fields are matched by tag,
+#      falling back to their names.  Definitions whose canonical hashes are equal are
+#      unchanged and are skipped without further comparison.
+#
+#      A change is wire-compatible if data that is valid under the old schema remains
+#      valid under the new schema, and the new schema does not omit anything that a
+#      receiver using the old schema requires.  Changes to names and documentation do
+#      not affect the encoded form of data, and are reported as compatible.
+#
+
+from .node import *
+from .canonical import CanonicalHasher, StructuralHasher, referenceName
+
+COMPATIBLE = 'compatible'
+BREAKING = 'breaking'
+
+
+class SchemaChange(object):
+    '''Describes a change between two schemas.'''
+
+    def __init__(self, compatibility, path, description, oldNode=None, newNode=None):
+        self.compatibility = compatibility
+        self.path = path
+        self.description = description
+        self.oldNode = oldNode
+        self.newNode = newNode
+
+    @property
+    def isBreaking(self):
+        return self.compatibility == BREAKING
+
+    def __str__(self):
+        return '%s: %s: %s' % (self.compatibility, self.path, self.description)
+
+    def __repr__(self):
+        return 'SchemaChange(%r, %r, %r)' % (self.compatibility, self.path, self.description)
+
+
+def diffSchemas(oldSchema, newSchema):
+    '''Compare two WeaveTLVSchema objects and return a list of SchemaChange objects
+       describing the differences between them.
+       Both schemas are validated, to resolve their references.  The results for
+       schemas that contain errors are not meaningful.'''
+    return _SchemaDiffer(oldSchema, newSchema).diff()
+
+
+def _integerBounds(typeNode):
+    # Return the effective (lowerBound, upperBound) of an integer type.
+    rangeQual = typeNode.getQualifier(Range)
+    if rangeQual is not None and rangeQual.width is None:
+        return (rangeQual.lowerBound, rangeQual.upperBound)
+    width = rangeQual.width if rangeQual is not None else 64
+    if isinstance(typeNode, SignedIntegerType):
+        return (-(2 ** (width - 1)), (2 ** (width - 1)) - 1)
+    return (0, (2 ** width) - 1)
+
+
+def _lengthBounds(node):
+    # Return the effective (lowerBound, upperBound) of a length qualifier, where an
+    # upper bound of None denotes no limit.
+    lengthQual = node.getQualifier(Length)
+    if lengthQual is None:
+        return (0, None)
+    return (lengthQual.lowerBound, lengthQual.upperBound)
+
+
+def _boundsStr(bounds):
+    return '%s..%s' % (bounds[0] if bounds[0] is not None else '', bounds[1] if bounds[1] is not None else '')
+
+
+def _contains(outer, inner):
+    # True if the range outer contains the range inner.  A bound of None is unlimited.
+    if outer[0] is not None and (inner[0] is None or inner[0] < outer[0]):
+        return False
+    if outer[1] is not None and (inner[1] is None or inner[1] > outer[1]):
+        return False
+    return True
+
+
+def _fieldKey(field):
+    # Fields are keyed by the set of their possible tags.
+    return tuple(sorted(set(tag.asTuple() for tag in field.possibleTags if tag is not None), key=repr))
+
+
+def _tagsStr(key):
+    return ', '.join(('%s:%s' % t if t[0] is not None else '%s' % t[1]) for t in key) or 'none'
+
+
+class _SchemaDiffer(object):
+
+    # Definition kinds, the attribute giving their name, and the attribute giving the
+    # id by which unmatched definitions are matched.
+    _definitionKinds = (
+        (Vendor, 'name', 'id'),
+        (Profile, 'fullyQualifiedName', 'id'),
+        (Message, 'fullyQualifiedName', 'qualifiedId'),
+        (StatusCode, 'fullyQualifiedName', 'qualifiedId'),
+        (TypeDef, 'fullyQualifiedName', None),
+    )
+
+    def __init__(self, oldSchema, newSchema):
+        self._oldSchema = oldSchema
+        self._newSchema = newSchema
+        self._hasher = CanonicalHasher()
+        self._structuralHasher = StructuralHasher()
+        self._changes = []
+        self._comparedTypes = set()
+
+    def diff(self):
+        self._oldSchema.validate()
+        self._newSchema.validate()
+        for (cls, nameAttr, idAttr) in self._definitionKinds:
+            oldDefs = self._definitions(self._oldSchema, cls, nameAttr)
+            newDefs = self._definitions(self._newSchema, cls, nameAttr)
+            matches = [ (oldDefs[name], newDefs[name]) for name in oldDefs if name in newDefs ]
+            removed = [ oldDefs[name] for name in oldDefs if name not in newDefs ]
+            added = [ newDefs[name] for name in newDefs if name not in oldDefs ]
+            # Match the remaining definitions by id.
+            if idAttr is not None:
+                addedById = {}
+                for newDef in added:
+                    addedById.setdefault(self._id(newDef, idAttr), newDef)
+                addedById.pop(None, None)
+                for oldDef in list(removed):
+                    newDef = addedById.pop(self._id(oldDef, idAttr), None)
+                    if newDef is not None:
+                        removed.remove(oldDef)
+                        added.remove(newDef)
+                        self._add(COMPATIBLE, self._path(oldDef), 'renamed to %s' % getattr(newDef, nameAttr), oldDef, newDef)
+                        matches.append((oldDef, newDef))
+            for oldDef in removed:
+                self._add(BREAKING, self._path(oldDef), '%s removed' % oldDef.schemaConstruct, oldDef, None)
+            for newDef in added:
+                self._add(COMPATIBLE, self._path(newDef), '%s added' % newDef.schemaConstruct, None, newDef)
+            for (oldDef, newDef) in matches:
+                # Skip unchanged definitions.
+                if self._hasher.hash(oldDef) != self._hasher.hash(newDef):
+                    self._compareDefinitions(oldDef, newDef)
+        return self._changes
+
+    # ----- Definitions
+
+    @staticmethod
+    def _definitions(schema, cls, nameAttr):
+        defs = {}
+        for node in schema.allNodes(cls):
+            if type(node) is cls:
+                defs.setdefault(getattr(node, nameAttr), node)
+        return defs
+
+    @staticmethod
+    def _id(node, idAttr):
+        if idAttr == 'qualifiedId':
+            profile = node.parent if isinstance(node.parent, Profile) else None
+            if profile is None or profile.id is None or node.id is None:
+                return None
+            return (profile.id, node.id)
+        return getattr(node, idAttr)
+
+    @staticmethod
+    def _path(node):
+        if isinstance(node, HasScopedName):
+            return node.fullyQualifiedName
+        return node.name
+
+    def _add(self, compatibility, path, description, oldNode, newNode):
+        self._changes.append(SchemaChange(compatibility, path, description, oldNode, newNode))
+
+    def _compareDefinitions(self, oldDef, newDef):
+        path = self._path(newDef)
+        if isinstance(oldDef, (Vendor, Profile, Message, StatusCode)) and oldDef.id != newDef.id:
+            self._add(BREAKING, path, 'id changed from %s to %s' % (self._idStr(oldDef.id), self._idStr(newDef.id)), oldDef, newDef)
+        if isinstance(oldDef, TypeDef):
+            self._compareTags(path, oldDef.getQualifier(Tag), newDef.getQualifier(Tag), 'default tag', oldDef, newDef)
+            self._compareTypes(path, oldDef.type, newDef.type)
+        elif isinstance(oldDef, Message):
+            if oldDef.emptyPayload != newDef.emptyPayload or (oldDef.payload is None) != (newDef.payload is None):
+                self._add(BREAKING, path, 'payload changed', oldDef, newDef)
+            elif oldDef.payload is not None:
+                self._compareTypes(path, oldDef.payload, newDef.payload)
+
+    @staticmethod
+    def _idStr(id):
+        return '0x%X' % id if isinstance(id, int) else str(id)
+
+    def _compareTags(self, path, oldTag, newTag, desc, oldNode, newNode):
+        oldTuple = oldTag.asTuple() if oldTag is not None else None
+        newTuple = newTag.asTuple() if newTag is not None else None
+        if oldTuple != newTuple:
+            self._add(BREAKING, path, '%s changed from %s to %s' % (desc, oldTag, newTag), oldNode, newNode)
+
+    # ----- Types
+
+    def _compareTypes(self, path, oldType, newType):
+        # References to the same definition are compared where the definition is diffed.
+        if isinstance(oldType, ReferencedType) and isinstance(newType, ReferencedType) and \
+           referenceName(oldType) == referenceName(newType):
+            return
+        if isinstance(oldType, ReferencedType) or isinstance(newType, ReferencedType):
+            # Compare the referenced types structurally, guarding against recursive types.
+            key = (oldType, newType)
+            if key in self._comparedTypes:
+                return
+            self._comparedTypes.add(key)
+            oldType = oldType.targetType if isinstance(oldType, ReferencedType) else oldType
+            newType = newType.targetType if isinstance(newType, ReferencedType) else newType
+            if oldType is None or newType is None:
+                return
+        # Skip structurally identical types.
+        if self._structuralHasher.hash(oldType) == self._structuralHasher.hash(newType):
+            return
+        if type(oldType) is not type(newType):
+            self._add(BREAKING, path, 'type changed from %s to %s' % (oldType.schemaConstruct, newType.schemaConstruct), oldType, newType)
+            return
+        self._compareFlag(path, oldType, newType, Nullable)
+        if isinstance(oldType, IntegerTypeNode):
+            self._compareBounds(path, 'range', _integerBounds(oldType), _integerBounds(newType), oldType, newType)
+            self._compareEnumValues(path, oldType, newType)
+        elif isinstance(oldType, FloatType):
+            self._compareFloatRange(path, oldType, newType)
+        elif isinstance(oldType, (StringType, ByteStringType)):
+            self._compareBounds(path, 'length', _lengthBounds(oldType), _lengthBounds(newType), oldType, newType)
+        elif isinstance(oldType, SequencedTypeNode):
+            self._compareBounds(path, 'length', _lengthBounds(oldType), _lengthBounds(newType), oldType, newType)
+            self._compareSequences(path, oldType, newType)
+        elif isinstance(oldType, StructuredTypeNode):
+            self._compareStructures(path, oldType, newType)
+        elif isinstance(oldType, ChoiceType):
+            self._compareChoices(path, oldType, newType)
+
+    def _compareFlag(self, path, oldNode, newNode, qualClass):
+        oldFlag = oldNode.getQualifier(qualClass) is not None
+        newFlag = newNode.getQualifier(qualClass) is not None
+        if oldFlag and not newFlag:
+            self._add(BREAKING, path, '%s removed' % qualClass._schemaConstruct, oldNode, newNode)
+        elif newFlag and not oldFlag:
+            self._add(COMPATIBLE, path, '%s added' % qualClass._schemaConstruct, oldNode, newNode)
+
+    def _compareBounds(self, path, desc, oldBounds, newBounds, oldNode, newNode):
+        if oldBounds == newBounds:
+            return
+        if _contains(newBounds, oldBounds):
+            (compatibility, change) = (COMPATIBLE, 'widened')
+        elif _contains(oldBounds, newBounds):
+            (compatibility, change) = (BREAKING, 'narrowed')
+        else:
+            (compatibility, change) = (BREAKING, 'changed')
+        self._add(compatibility, path, '%s %s from %s to %s' % (desc, change, _boundsStr(oldBounds), _boundsStr(newBounds)),
+                  oldNode, newNode)
+
+    def _compareFloatRange(self, path, oldType, newType):
+        oldRange = oldType.getQualifier(Range)
+        newRange = newType.getQualifier(Range)
+        oldWidth = oldRange.width if oldRange is not None else 64
+        newWidth = newRange.width if newRange is not None else 64
+        if oldWidth is not None and newWidth is not None:
+            self._compareBounds(path, 'range', (0, oldWidth), (0, newWidth), oldType, newType)
+        elif oldWidth is None and newWidth is None:
+            self._compareBounds(path, 'range', (oldRange.lowerBound, oldRange.upperBound),
+                                (newRange.lowerBound, newRange.upperBound), oldType, newType)
+        elif newWidth is not None:
+            self._add(COMPATIBLE, path, 'range widened to %dbits' % newWidth, oldType, newType)
+        else:
+            self._add(BREAKING, path, 'range narrowed to %s..%s' % (newRange.lowerBound, newRange.upperBound), oldType, newType)
+
+    def _compareEnumValues(self, path, oldType, newType):
+        oldValues = { v.value : v for v in oldType.values }
+        newValues = { v.value : v for v in newType.values }
+        for (value, oldValue) in oldValues.items():
+            newValue = newValues.get(value, None)
+            if newValue is None:
+                self._add(BREAKING, '%s.%s' % (path, oldValue.name), 'enumerated value removed', oldValue, None)
+            elif newValue.name != oldValue.name:
+                self._add(COMPATIBLE, '%s.%s' % (path, oldValue.name), 'renamed to %s' % newValue.name, oldValue, newValue)
+        for (value, newValue) in newValues.items():
+            if value not in oldValues:
+                self._add(COMPATIBLE, '%s.%s' % (path, newValue.name), 'enumerated value added', None, newValue)
+
+    def _compareSequences(self, path, oldType, newType):
+        if (oldType.elemType is None) != (newType.elemType is None):
+            self._add(BREAKING, path, 'element type pattern changed', oldType, newType)
+        elif oldType.elemType is not None:
+            self._compareTypes(path + '[]', oldType.elemType, newType.elemType)
+        elif len(oldType.elemTypePattern) != len(newType.elemTypePattern):
+            self._add(BREAKING, path, 'element type pattern changed', oldType, newType)
+        else:
+            for (i, (oldElem, newElem)) in enumerate(zip(oldType.elemTypePattern, newType.elemTypePattern)):
+                elemPath = '%s[%s]' % (path, newElem.name if newElem.name is not None else i)
+                if oldElem.name != newElem.name:
+                    self._add(COMPATIBLE, elemPath, 'renamed from %s' % oldElem.name, oldElem, newElem)
+                self._compareBounds(elemPath, 'quantifier', (oldElem.lowerBound, oldElem.upperBound),
+                                    (newElem.lowerBound, newElem.upperBound), oldElem, newElem)
+                self._compareTypes(elemPath, oldElem.type, newElem.type)
+
+    def _compareStructures(self, path, oldType, newType):
+        self._compareFlag(path, oldType, newType, Extensible)
+        for qualClass in (Private, Invariant):
+            if (oldType.getQualifier(qualClass) is None) != (newType.getQualifier(qualClass) is None):
+                self._add(BREAKING, path, '%s changed' % qualClass._schemaConstruct, oldType, newType)
+        oldOrder = next((type(q) for q in oldType.quals if isinstance(q, (TagOrder, SchemaOrder, AnyOrder))), None)
+        newOrder = next((type(q) for q in newType.quals if isinstance(q, (TagOrder, SchemaOrder, AnyOrder))), None)
+        if oldOrder is not newOrder:
+            compatibility = COMPATIBLE if newOrder is AnyOrder else BREAKING
+            self._add(compatibility, path, 'field order changed', oldType, newType)
+
+        extensible = newType.getQualifier(Extensible) is not None
+        oldFields = list(oldType.allFields())
+        newFields = list(newType.allFields())
+        newFieldsByKey = {}
+        for field in newFields:
+            newFieldsByKey.setdefault(_fieldKey(field), field)
+        matches = []
+        removed = []
+        for oldField in oldFields:
+            newField = newFieldsByKey.pop(_fieldKey(oldField), None)
+            if newField is not None:
+                matches.append((oldField, newField))
+            else:
+                removed.append(oldField)
+        added = [ f for f in newFields if newFieldsByKey.get(_fieldKey(f), None) is f ]
+
+        # Fields with the same name, but different tags, have changed tags.
+        addedByName = { f.name : f for f in added }
+        for oldField in removed:
+            fieldPath = '%s.%s' % (path, oldField.name)
+            newField = addedByName.pop(oldField.name, None)
+            if newField is not None:
+                added.remove(newField)
+                self._add(BREAKING, fieldPath, 'tag changed from %s to %s' % (_tagsStr(_fieldKey(oldField)), _tagsStr(_fieldKey(newField))),
+                          oldField, newField)
+                self._compareFields(fieldPath, oldField, newField)
+            elif oldField.getQualifier(Optional) is None:
+                self._add(BREAKING, fieldPath, 'required field removed', oldField, None)
+            elif extensible:
+                self._add(COMPATIBLE, fieldPath, 'optional field removed from extensible %s' % newType.schemaConstruct, oldField, None)
+            else:
+                self._add(BREAKING, fieldPath, 'optional field removed', oldField, None)
+        for newField in added:
+            fieldPath = '%s.%s' % (path, newField.name)
+            if newField.getQualifier(Optional) is not None:
+                self._add(COMPATIBLE, fieldPath, 'optional field added', None, newField)
+            else:
+                self._add(BREAKING, fieldPath, 'required field added', None, newField)
+        for (oldField, newField) in matches:
+            fieldPath = '%s.%s' % (path, newField.name)
+            if oldField.name != newField.name:
+                self._add(COMPATIBLE, fieldPath, 'renamed from %s' % oldField.name, oldField, newField)
+            self._compareFields(fieldPath, oldField, newField)
+
+    def _compareFields(self, path, oldField, newField):
+        oldOptional = oldField.getQualifier(Optional) is not None
+        newOptional = newField.getQualifier(Optional) is not None
+        if oldOptional and not newOptional:
+            self._add(BREAKING, path, 'optional field made required', oldField, newField)
+        elif newOptional and not oldOptional:
+            self._add(BREAKING, path, 'required field made optional', oldField, newField)
+        self._compareTypes(path, oldField.type, newField.type)
+
+    def _compareChoices(self, path, oldType, newType):
+        newAlts = { alt.name : alt for alt in newType.alternates }
+        oldNames = set()
+        for oldAlt in oldType.alternates:
+            oldNames.add(oldAlt.name)
+            altPath = '%s.%s' % (path, oldAlt.name)
+            newAlt = newAlts.get(oldAlt.name, None)
+            if newAlt is None:
+                self._add(BREAKING, altPath, 'CHOICE alternate removed', oldAlt, None)
+                continue
+            self._compareTags(altPath, oldAlt.defaultTag, newAlt.defaultTag, 'tag', oldAlt, newAlt)
+            self._compareTypes(altPath, oldAlt.type, newAlt.type)
+        for newAlt in newType.alternates:
+            if newAlt.name not in oldNames:
+                self._add(COMPATIBLE, '%s.%s' % (path, newAlt.name), 'CHOICE alternate added', None, newAlt)
@@ -0,0 +1,186 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Dumping of schema syntax trees in text and JSON formats.
+#
+#      The JSON formats contain one record (a JSON object) per schema node, in
+#      depth-first order.  The 'json' format is a JSON array of records, while the
+#      'ndjson' format has one record per line.  Records are written as nodes are
+#      visited, using memory proportional to the depth of the tree.
+#
+#      Each record contains the following members, where applicable:
+#
+#        id          : sequence number of the record, starting at 0
+#        parent      : id of the record for the parent node (null for files)
+#        node        : node class (e.g. "StructureField")
+#        kind        : schema construct (e.g. "STRUCTURE type")
+#        name        : name of the node
+#        fqName      : fully-qualified name of the node (for members of types, the
+#                      fully-qualified name of the enclosing definition, followed by
+#                      the member name)
+#        file, line, col, endLine, endCol : source position of the node
+#        quals       : list of qualifiers, each an object with a "qualifier" member
+#                      naming the qualifier, plus its arguments
+#        targetName  : name of the target of a reference, as written
+#        target      : fully-qualified name of the definition a reference resolves
+#                      to (null if unresolved)
+#        value       : value of an enumerated integer value
+#        minCount, maxCount : quantifier of a list or array pattern element
+#        emptyPayload : true for messages containing nothing
+#        docs        : documentation text
+#
+#      Qualifiers appear within the records of the nodes they qualify, rather than
+#      as records of their own.  References are reported as resolved by the most
+#      recent call to WeaveTLVSchema.validate().
+#
+
+import json
+from decimal import Decimal
+
+from .node import *
+
+FORMAT_TEXT = 'text'
+FORMAT_JSON = 'json'
+FORMAT_NDJSON = 'ndjson'
+formats = (FORMAT_TEXT, FORMAT_JSON, FORMAT_NDJSON)
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'),
+                            default=lambda value: float(value) if isinstance(value, Decimal) else str(value))
+
+_flagQualifiers = {
+    Extensible : 'extensible',
+    Optional : 'optional',
+    Private : 'private',
+    Invariant : 'invariant',
+    Nullable : 'nullable',
+    TagOrder : 'tag-order',
+    SchemaOrder : 'schema-order',
+    AnyOrder : 'any-order',
+}
+
+
+def dumpSchemaFiles(schemaFiles, output, format=FORMAT_TEXT):
+    '''Write a dump of the syntax trees of the given schema files to a file object, in one
+       of the supported formats.'''
+    if format == FORMAT_TEXT:
+        for schemaFile in schemaFiles:
+            schemaFile.summarize(output)
+    elif format == FORMAT_JSON:
+        sep = '[\n'
+        for record in allNodeRecords(schemaFiles):
+            output.write(sep)
+            output.write(_encoder.encode(record))
+            sep = ',\n'
+        output.write('[]\n' if sep == '[\n' else '\n]\n')
+    elif format == FORMAT_NDJSON:
+        for record in allNodeRecords(schemaFiles):
+            output.write(_encoder.encode(record))
+            output.write('\n')
+    else:
+        raise ValueError('Unknown dump format: %s' % format)
+
+
+def allNodeRecords(schemaFiles):
+    '''Iterate dump records (dicts) for all the nodes in the given schema files, in
+       depth-first order.'''
+    nextId = 0
+    for schemaFile in schemaFiles:
+        stack = [ (schemaFile, None) ]
+        while len(stack) > 0:
+            (node, parentId) = stack.pop()
+            yield nodeRecord(node, nextId, parentId)
+            children = [ child for child in node.allChildNodes() if not isinstance(child, QualifierNode) ]
+            for child in reversed(children):
+                stack.append((child, nextId))
+            nextId += 1
+
+
+def nodeRecord(node, nodeId=None, parentId=None):
+    '''Return the dump record for a node.'''
+    record = {
+        'id' : nodeId,
+        'parent' : parentId,
+        'node' : type(node).__name__,
+        'kind' : node.schemaConstruct,
+    }
+    if isinstance(node, HasName) and node.name is not None:
+        record['name'] = node.name
+        record['fqName'] = _qualifiedName(node)
+    if isinstance(node, SchemaFile):
+        record['file'] = node.fileName
+    if node.sourceRef is not None:
+        sourceRef = node.sourceRef
+        record['file'] = sourceRef.schemaFile.fileName
+        record['line'] = sourceRef.startLine
+        record['col'] = sourceRef.startCol
+        record['endLine'] = sourceRef.endLine
+        record['endCol'] = sourceRef.endCol
+    if isinstance(node, HasQualifiers):
+        record['quals'] = [ _qualifierRecord(qual) for qual in node.quals ]
+    if isinstance(node, (ReferencedType, StructureIncludes)):
+        record['targetName'] = node.targetName
+        record['target'] = node.targetTypeDef.fullyQualifiedName if node.targetTypeDef is not None else None
+    elif isinstance(node, Using):
+        record['targetName'] = node.targetName
+        record['target'] = node.fullyQualifiedTargetName
+    elif isinstance(node, IntegerEnumValue):
+        record['value'] = node.value
+    elif isinstance(node, LinearTypePatternElement):
+        record['minCount'] = node.lowerBound
+        record['maxCount'] = node.upperBound
+    elif isinstance(node, Message) and node.emptyPayload:
+        record['emptyPayload'] = True
+    if isinstance(node, HasDocumentation) and node.docs is not None:
+        record['docs'] = node.docs
+    return record
+
+
+def _qualifierRecord(qual):
+    if type(qual) in _flagQualifiers:
+        return { 'qualifier' : _flagQualifiers[type(qual)] }
+    if isinstance(qual, Tag):
+        if qual.isAnonTag:
+            return { 'qualifier' : 'tag', 'anon' : True }
+        record = { 'qualifier' : 'tag', 'tagNum' : qual.tagNum }
+        if qual.profile is not None:
+            record['profile'] = qual.profile
+            record['profileId'] = qual.profileId if isinstance(qual.profileId, int) else None
+        return record
+    if isinstance(qual, Id):
+        record = { 'qualifier' : 'id', 'idNum' : qual.idNum }
+        if qual.vendor is not None:
+            record['vendor'] = qual.vendor
+            record['vendorId'] = qual.vendorId if isinstance(qual.vendorId, int) else None
+        return record
+    if isinstance(qual, Range):
+        if qual.width is not None:
+            return { 'qualifier' : 'range', 'width' : qual.width }
+        return { 'qualifier' : 'range', 'lowerBound' : qual.lowerBound, 'upperBound' : qual.upperBound }
+    if isinstance(qual, Length):
+        return { 'qualifier' : 'length', 'lowerBound' : qual.lowerBound, 'upperBound' : qual.upperBound }
+    return { 'qualifier' : qual.schemaConstruct }
+
+
+def _qualifiedName(node):
+    if isinstance(node, HasScopedName):
+        return node.fullyQualifiedName
+    parentNode = node.nextParentNode(HasScopedName)
+    if parentNode is not None:
+        return '%s.%s' % (parentNode.fullyQualifiedName, node.name)
+    return node.name
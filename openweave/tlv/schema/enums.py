@@ -0,0 +1,171 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Lookup tables for the enumerated values of INTEGER types, and bulk mapping
+#      of integer codes to enumerated value names.
+#
+#      Each enumerated value of a type is identified by its category index: the
+#      index of its name in the table's list of names, which follow the order in
+#      which the values are defined.  Codes that do not correspond to an enumerated
+#      value have the index -1 (and the name None).  Where a type (erroneously)
+#      defines multiple names for the same value, the first is used.
+#
+#      If NumPy is installed, codes are mapped as NumPy arrays, and the results
+#      returned as such.
+#
+
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .node import *
+from .bounds import _mapElements, _asArray
+
+# Arrays of codes are mapped by indexing a dense table, rather than by searching, if
+# the values span a range of at most this size (or of at most _DENSE_FACTOR times the
+# number of values).
+_DENSE_LIMIT = 256
+_DENSE_FACTOR = 4
+
+
+class EnumTable(object):
+    '''Lookup tables for the enumerated values of an INTEGER type.'''
+
+    def __init__(self, values):
+        '''Create an EnumTable from a list of IntegerEnumValue nodes.'''
+        self.names = []
+        self.nameToValue = {}
+        self.valueToName = {}
+        self._valueToIndex = {}
+        for value in values:
+            if value.name is None or value.value is None or value.name in self.nameToValue:
+                continue
+            self.nameToValue[value.name] = value.value
+            if value.value not in self.valueToName:
+                self.valueToName[value.value] = value.name
+                self._valueToIndex[value.value] = len(self.names)
+            self.names.append(value.name)
+        self.minValue = min(self._valueToIndex) if self._valueToIndex else None
+        self.maxValue = max(self._valueToIndex) if self._valueToIndex else None
+        self.isDense = False
+        if self._valueToIndex:
+            span = self.maxValue - self.minValue + 1
+            self.isDense = span <= max(_DENSE_LIMIT, _DENSE_FACTOR * len(self._valueToIndex))
+        # NumPy lookup arrays, for each type of array of codes.
+        self._lookupArrays = {}
+
+    def nameOf(self, code):
+        '''Return the name of the enumerated value with a given integer code, or None.'''
+        return self.valueToName.get(code, None)
+
+    def valueOf(self, name):
+        '''Return the integer code of the enumerated value with a given name, or None.'''
+        return self.nameToValue.get(name, None)
+
+    def indexOf(self, code):
+        '''Return the category index of the enumerated value with a given integer code,
+           or -1 if there is none.'''
+        return self._valueToIndex.get(code, -1)
+
+    def _arrayIndexes(self, codes):
+        # Return a NumPy array of the category indexes of a NumPy array of codes.
+        if codes.dtype.kind not in 'iu':
+            return _mapElements(codes, lambda values: map(self.indexOf, values), numpy.intp)
+        indexes = numpy.full(codes.shape, -1, dtype=numpy.intp)
+        lookupArrays = self._lookupArrays.get(codes.dtype, None)
+        if lookupArrays is None:
+            lookupArrays = self._lookupArrays[codes.dtype] = self._makeLookupArrays(codes.dtype)
+        if lookupArrays is None:
+            return indexes
+        if self.isDense:
+            # lo and hi are the lowest and highest values, and keyIndexes contains the index
+            # for each value in between.
+            (lo, hi, keyIndexes) = lookupArrays
+            codeType = codes.dtype.type
+            inRange = (codes >= codeType(lo)) & (codes <= codeType(hi))
+            offsets = codes[inRange]
+            if codes.dtype.kind == 'i':
+                # Widen signed codes so that their offsets from lo cannot overflow.
+                offsets = offsets.astype(numpy.int64)
+            indexes[inRange] = keyIndexes[(offsets - offsets.dtype.type(lo)).astype(numpy.intp)]
+        else:
+            # keys contains the values in ascending order, and keyIndexes their indexes.
+            (keys, keyIndexes) = lookupArrays
+            pos = numpy.minimum(numpy.searchsorted(keys, codes), len(keys) - 1)
+            found = keys[pos] == codes
+            indexes[found] = keyIndexes[pos[found]]
+        return indexes
+
+    def _makeLookupArrays(self, dtype):
+        # Only values representable in an array's type can match its codes, and are
+        # compared as values of that type.
+        info = numpy.iinfo(dtype)
+        values = sorted(v for v in self._valueToIndex if info.min <= v <= info.max)
+        if len(values) == 0:
+            return None
+        if self.isDense:
+            (lo, hi) = (values[0], values[-1])
+            keyIndexes = numpy.array([ self._valueToIndex.get(v, -1) for v in range(lo, hi + 1) ], dtype=numpy.intp)
+            return (lo, hi, keyIndexes)
+        keyIndexes = numpy.array([ self._valueToIndex[v] for v in values ], dtype=numpy.intp)
+        return (numpy.array(values, dtype=dtype), keyIndexes)
+
+
+def enumTable(typeNode):
+    '''Return the EnumTable for an INTEGER type.  typeNode may be a TypeDef or
+       ReferencedType, in which case the table for its target type is returned.
+       The table is built when first requested, and shared thereafter.'''
+    typeNode = resolveTypeNode(typeNode)
+    if not isinstance(typeNode, IntegerTypeNode):
+        raise ValueError('Enumerated values are only defined for INTEGER types, not %s' % typeNode.schemaConstruct)
+    table = _tables.get(typeNode, None)
+    if table is None:
+        table = _tables[typeNode] = EnumTable(typeNode.values)
+    return table
+
+def codesToIndexes(typeNode, codes):
+    '''Map a sequence of integer codes (e.g. a list, array.array or NumPy array) to the
+       category indexes of the corresponding enumerated values of an INTEGER type, or
+       -1 for codes with no enumerated value.  The result is a NumPy array of the same
+       shape as codes if NumPy is installed, or otherwise a list.'''
+    table = enumTable(typeNode)
+    if numpy is not None:
+        return table._arrayIndexes(_asArray(codes))
+    return [ table.indexOf(code) for code in codes ]
+
+def codesToNames(typeNode, codes):
+    '''Map a sequence of integer codes to the names of the corresponding enumerated values
+       of an INTEGER type, or None for codes with no enumerated value.  The result is a
+       NumPy array of objects of the same shape as codes if NumPy is installed, or
+       otherwise a list.'''
+    table = enumTable(typeNode)
+    if numpy is not None:
+        # Index -1 selects the None following the names.
+        names = numpy.array(table.names + [ None ], dtype=object)
+        return names[table._arrayIndexes(_asArray(codes))]
+    return [ table.nameOf(code) for code in codes ]
+
+
+# ----- Private Members
+
+# The EnumTable for each INTEGER type node, created when the table is first requested.
+_tables = weakref.WeakKeyDictionary()
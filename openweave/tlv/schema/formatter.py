@@ -0,0 +1,468 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Formatter that writes canonical schema text for a schema file.
+#
+#      The canonical form of a schema file has one definition or member per line,
+#      braces on lines of their own, four space indentation, and a single space
+#      around operators.  Keywords are written in their full, canonical spelling
+#      (e.g. 'optional' rather than 'opt'), qualifiers are written in a fixed order,
+#      and names are quoted only where they collide with a keyword.  Definitions,
+#      members and documentation appear in the order in which they are defined.
+#      Numeric literals are written as they appear in the source (e.g. in hex).
+#
+#      Comments are preserved.  Comments that appear on the same line as the end
+#      of a definition or member remain on that line, while other comments are
+#      written on lines of their own ahead of the construct that follows them.
+#      Single blank lines between definitions, members and comments are preserved.
+#
+
+import io
+import re
+from decimal import Decimal
+
+from .node import *
+
+# Words that must be quoted when they appear as names or name components.
+_keywords = frozenset((
+    'any', 'anon', 'any-order', 'array', 'boolean', 'byte', 'choice', 'code', 'containing',
+    'extensible', 'field', 'float', 'group', 'id', 'includes', 'integer', 'invariant', 'len',
+    'length', 'list', 'message', 'namespace', 'nothing', 'null', 'nullable', 'of', 'opt',
+    'optional', 'private', 'profile', 'range', 'schema-order', 'signed', 'status', 'string',
+    'structure', 'tag', 'tag-order', 'unsigned', 'using', 'vendor',
+))
+
+# The order in which qualifiers are written.
+_qualifierOrder = (Tag, Id, Range, Length, Optional, Nullable, Extensible, Private, Invariant,
+                   TagOrder, SchemaOrder, AnyOrder)
+
+_flagQualifiers = {
+    Extensible : 'extensible',
+    Optional : 'optional',
+    Private : 'private',
+    Invariant : 'invariant',
+    Nullable : 'nullable',
+    TagOrder : 'tag-order',
+    SchemaOrder : 'schema-order',
+    AnyOrder : 'any-order',
+}
+
+_simpleTypeKeywords = {
+    FloatType : 'FLOAT',
+    BooleanType : 'BOOLEAN',
+    StringType : 'STRING',
+    ByteStringType : 'BYTE STRING',
+    NullType : 'NULL',
+    AnyType : 'ANY',
+}
+
+_commentPattern = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+_blankLinePattern = re.compile(r'\n[ \t]*\r?\n')
+
+_numberPattern = re.compile(r'(?<![\w-])[+-]?(?:\d*\.\d+|0[xX][0-9A-Fa-f]+|\d+)(?!\w)')
+
+
+def formatSchemaFile(schemaFile, output=None, indent='    '):
+    '''Write the canonical text of a schema file to a given file object.
+       If output is None, the text is returned as a string.'''
+    genString = (output is None)
+    if genString:
+        output = io.StringIO()
+    SchemaFormatter(output, indent).formatFile(schemaFile)
+    return output.getvalue() if genString else output
+
+
+class _Comment(object):
+    __slots__ = ('text', 'startPos', 'endPos', 'startLine', 'endLine', 'startCol')
+
+    def __init__(self, text, startPos, startLine, startCol):
+        self.text = text
+        self.startPos = startPos
+        self.endPos = startPos + len(text)
+        self.startLine = startLine
+        self.endLine = startLine + text.count('\n')
+        self.startCol = startCol
+
+
+class SchemaFormatter(object):
+    '''Writes the canonical text of schema files to a file object.'''
+
+    def __init__(self, output, indent='    '):
+        self._output = output
+        self._indent = indent
+        self._level = 0
+        self._schemaText = None
+        self._comments = []
+        self._nextComment = 0
+        self._lastPos = None
+
+    def formatFile(self, schemaFile):
+        '''Write the canonical text of a schema file.'''
+        self._schemaText = schemaFile.schemaText
+        self._comments = self._findComments(schemaFile)
+        self._nextComment = 0
+        self._level = 0
+        self._lastPos = None
+        statements = schemaFile.statements
+        for i in range(len(statements)):
+            nextPos = self._startOf(statements[i+1]) if i+1 < len(statements) else len(self._schemaText)
+            self._writeItem(statements[i], self._writeStatement, '', nextPos)
+        self._writeComments(len(self._schemaText))
+
+    # ----- Statements
+
+    def _writeStatement(self, node):
+        write = self._output.write
+        if isinstance(node, Namespace) and not isinstance(node, Profile):
+            # Merge the namespaces created for a dotted namespace name.
+            namespaces = self._dottedNamespaces(node)
+            node = namespaces[-1]
+            write('namespace ')
+            write('.'.join(self._formatName(ns.name) for ns in namespaces))
+            self._writeBlock(node.statements, node.sourceRef.endPos, self._writeStatement, '', emptyBraces=True)
+        elif isinstance(node, Using):
+            write('using ')
+            write(self._formatName(node.targetName))
+        elif isinstance(node, TypeDef):
+            write(self._formatName(node.name))
+            self._writeQualifiers(node.quals)
+            write(' => ')
+            self._writeType(node.type)
+        elif isinstance(node, Vendor):
+            write(self._formatName(node.name))
+            write(' => VENDOR')
+            self._writeQualifiers(node.quals)
+        elif isinstance(node, Profile):
+            write(self._formatName(node.name))
+            write(' => PROFILE')
+            self._writeQualifiers(node.quals)
+            if len(node.statements) > 0 or self._hasCommentsBefore(node.sourceRef.endPos):
+                self._writeBlock(node.statements, node.sourceRef.endPos, self._writeStatement, '', emptyBraces=True)
+        elif isinstance(node, Message):
+            write(self._formatName(node.name))
+            write(' => MESSAGE')
+            self._writeQualifiers(node.quals)
+            if node.emptyPayload:
+                write(' CONTAINING NOTHING')
+            elif node.payload is not None:
+                write(' CONTAINING ')
+                self._writeType(node.payload)
+        elif isinstance(node, StatusCode):
+            write(self._formatName(node.name))
+            write(' => STATUS CODE')
+            self._writeQualifiers(node.quals)
+        else:
+            raise ValueError('Unexpected statement: %s' % node.schemaConstruct)
+
+    # ----- Types
+
+    def _writeType(self, node):
+        write = self._output.write
+        if isinstance(node, ReferencedType):
+            write(self._formatName(node.targetName))
+        elif type(node) in _simpleTypeKeywords:
+            write(_simpleTypeKeywords[type(node)])
+            self._writeQualifiers(node.quals)
+        elif isinstance(node, IntegerTypeNode):
+            write('UNSIGNED INTEGER' if isinstance(node, UnsignedIntegerType) else 'INTEGER')
+            self._writeQualifiers(node.quals)
+            if len(node.values) > 0:
+                self._writeBlock(node.values, node.sourceRef.endPos, self._writeEnumValue, ',')
+        elif isinstance(node, StructuredTypeNode):
+            write('FIELD GROUP' if isinstance(node, FieldGroupType) else 'STRUCTURE')
+            self._writeQualifiers(node.quals)
+            self._writeBlock(node.members, node.sourceRef.endPos, self._writeMember, ',', emptyBraces=True)
+        elif isinstance(node, ChoiceType):
+            write('CHOICE')
+            self._writeQualifiers(node.quals)
+            write(' OF')
+            self._writeBlock(node.alternates, node.sourceRef.endPos, self._writeMember, ',', emptyBraces=True)
+        elif isinstance(node, SequencedTypeNode):
+            write('LIST' if isinstance(node, ListType) else 'ARRAY')
+            self._writeQualifiers(node.quals)
+            if node.elemType is not None:
+                write(' OF ')
+                self._writeType(node.elemType)
+            else:
+                self._writeBlock(node.elemTypePattern, node.sourceRef.endPos, self._writeMember, ',', emptyBraces=True)
+        else:
+            raise ValueError('Unexpected type: %s' % node.schemaConstruct)
+
+    def _writeMember(self, node):
+        write = self._output.write
+        if isinstance(node, StructureIncludes):
+            write('includes ')
+            write(self._formatName(node.targetName))
+            return
+        if node.name is not None:
+            write(self._formatName(node.name))
+            self._writeQualifiers(node.quals)
+            write(' : ')
+        self._writeType(node.type)
+        if isinstance(node, LinearTypePatternElement):
+            write(self._formatQuantifier(node.lowerBound, node.upperBound))
+
+    def _writeEnumValue(self, node):
+        write = self._output.write
+        write(self._formatName(node.name))
+        write(' = ')
+        write(self._formatNumber(node.value, self._literals(node.valueSourceRef)))
+
+    @staticmethod
+    def _formatQuantifier(lowerBound, upperBound):
+        if lowerBound == 1 and upperBound == 1:
+            return ''
+        if lowerBound == 0 and upperBound == 1:
+            return ' ?'
+        if upperBound is None:
+            if lowerBound == 0:
+                return ' *'
+            if lowerBound == 1:
+                return ' +'
+            return ' {%d..}' % lowerBound
+        if lowerBound == upperBound:
+            return ' {%d}' % lowerBound
+        return ' {%d..%d}' % (lowerBound, upperBound)
+
+    # ----- Qualifiers
+
+    def _writeQualifiers(self, quals):
+        if len(quals) == 0:
+            return
+        quals = sorted(quals, key=lambda qual: _qualifierOrder.index(type(qual)))
+        write = self._output.write
+        write(' [')
+        for i in range(len(quals)):
+            if i > 0:
+                write(', ')
+            write(self._formatQualifier(quals[i]))
+        write(']')
+
+    def _formatQualifier(self, qual):
+        if type(qual) in _flagQualifiers:
+            return _flagQualifiers[type(qual)]
+        literals = self._literals(qual.sourceRef)
+        if isinstance(qual, Tag):
+            if qual.tagNum is None:
+                return 'anon'
+            tagNum = self._formatNumber(qual.tagNum, literals)
+            if qual.profile is None:
+                return tagNum
+            if isinstance(qual.profile, int):
+                return '%s:%s' % (self._formatNumber(qual.profile, literals), tagNum)
+            if qual.profile == '*':
+                return '*:%s' % tagNum
+            return '%s:%s' % (self._formatName(qual.profile), tagNum)
+        if isinstance(qual, Id):
+            idNum = self._formatNumber(qual.idNum, literals)
+            if qual.vendor is None:
+                return 'id %s' % idNum
+            if isinstance(qual.vendor, int):
+                return 'id %s:%s' % (self._formatNumber(qual.vendor, literals), idNum)
+            return 'id %s:%s' % (self._formatName(qual.vendor), idNum)
+        if isinstance(qual, Range):
+            if qual.width is not None:
+                return 'range %dbits' % qual.width
+            return 'range %s..%s' % (self._formatNumber(qual.lowerBound, literals),
+                                     self._formatNumber(qual.upperBound, literals))
+        if isinstance(qual, Length):
+            lowerBound = self._formatNumber(qual.lowerBound, literals)
+            if qual.upperBound is None:
+                return 'length %s..' % lowerBound
+            if qual.upperBound == qual.lowerBound:
+                return 'length %s' % lowerBound
+            return 'length %s..%s' % (lowerBound, self._formatNumber(qual.upperBound, literals))
+        raise ValueError('Unexpected qualifier: %s' % qual.schemaConstruct)
+
+    # ----- Names and numbers
+
+    @staticmethod
+    def _formatName(name):
+        components = name.split('.')
+        for i in range(len(components)):
+            if components[i].lower() in _keywords:
+                components[i] = '"%s"' % components[i]
+        return '.'.join(components)
+
+    def _literals(self, sourceRef):
+        # Return the numeric literals within the source text of a node.
+        if sourceRef is None:
+            return []
+        return _numberPattern.findall(self._schemaText, sourceRef.startPos, sourceRef.endPos)
+
+    @staticmethod
+    def _formatNumber(value, literals):
+        # Use the first unused literal with the given value, preserving the radix and
+        # precision with which the value was written.
+        for i in range(len(literals)):
+            literal = literals[i]
+            try:
+                literalValue = int(literal, 0)
+            except ValueError:
+                try:
+                    literalValue = Decimal(literal)
+                except ArithmeticError:
+                    continue
+            if literalValue == value:
+                del literals[i]
+                return literal.lstrip('+')
+        return str(value)
+
+    # ----- Blocks, items and comments
+
+    def _writeBlock(self, items, endPos, writeItem, separator, emptyBraces=False):
+        write = self._output.write
+        if len(items) == 0 and not self._hasCommentsBefore(endPos):
+            if emptyBraces:
+                write(' { }')
+            return
+        write('\n')
+        self._writeIndent()
+        write('{\n')
+        self._level += 1
+        self._lastPos = None
+        for i in range(len(items)):
+            if i+1 < len(items):
+                self._writeItem(items[i], writeItem, separator, self._startOf(items[i+1]))
+            else:
+                self._writeItem(items[i], writeItem, '', endPos)
+        self._writeComments(endPos)
+        self._level -= 1
+        self._writeIndent()
+        write('}')
+
+    def _writeItem(self, node, writeItem, separator, nextPos):
+        write = self._output.write
+        startPos = self._startOf(node)
+        self._writeComments(startPos)
+        self._writeBlankLine(startPos)
+        docsNode = self._docsNode(node)
+        docs = docsNode.docs if docsNode is not None else None
+        postfixDocs = docs is not None and docs.startswith('/**<')
+        if docs is not None and not postfixDocs:
+            self._writeIndent()
+            self._writeCommentText(docs, docsNode.docsSourceRef.startCol)
+            write('\n')
+        self._writeIndent()
+        writeItem(node)
+        write(separator)
+        (endPos, endLine) = (node.sourceRef.endPos, node.sourceRef.endLine)
+        if postfixDocs:
+            write(' ')
+            self._writeCommentText(docs, docsNode.docsSourceRef.startCol)
+            (endPos, endLine) = (docsNode.docsSourceRef.endPos, docsNode.docsSourceRef.endLine)
+        # Keep comments that follow the item on the same line.
+        while self._nextComment < len(self._comments):
+            comment = self._comments[self._nextComment]
+            if comment.startLine != endLine or comment.startPos >= nextPos:
+                break
+            write(' ')
+            self._writeCommentText(comment.text, comment.startCol)
+            (endPos, endLine) = (comment.endPos, comment.endLine)
+            self._nextComment += 1
+        write('\n')
+        self._lastPos = endPos
+
+    def _writeComments(self, limitPos):
+        # Write the comments that precede the given position, each on lines of their own.
+        write = self._output.write
+        while self._nextComment < len(self._comments):
+            comment = self._comments[self._nextComment]
+            if comment.startPos >= limitPos:
+                break
+            self._writeBlankLine(comment.startPos)
+            self._writeIndent()
+            self._writeCommentText(comment.text, comment.startCol)
+            write('\n')
+            self._lastPos = comment.endPos
+            self._nextComment += 1
+
+    def _writeCommentText(self, text, startCol):
+        # Write a comment or documentation, re-indenting continuation lines relative to
+        # the start of the comment.
+        lines = text.split('\n')
+        write = self._output.write
+        write(lines[0].rstrip())
+        for line in lines[1:]:
+            strip = 0
+            while strip < startCol - 1 and strip < len(line) and line[strip] in ' \t':
+                strip += 1
+            line = line[strip:].rstrip()
+            write('\n')
+            if len(line) > 0:
+                self._writeIndent()
+                write(line)
+
+    def _writeBlankLine(self, startPos):
+        # Preserve a blank line between the previous item or comment and the next.
+        if self._lastPos is not None and _blankLinePattern.search(self._schemaText, self._lastPos, startPos):
+            self._output.write('\n')
+
+    def _writeIndent(self):
+        self._output.write(self._indent * self._level)
+
+    def _hasCommentsBefore(self, pos):
+        return self._nextComment < len(self._comments) and self._comments[self._nextComment].startPos < pos
+
+    def _startOf(self, node):
+        # Return the position at which a node, including its documentation, starts.
+        sourceRef = node.sourceRef
+        docsNode = self._docsNode(node)
+        if docsNode is not None and docsNode.docsSourceRef.startPos < sourceRef.startPos:
+            return docsNode.docsSourceRef.startPos
+        return sourceRef.startPos
+
+    def _docsNode(self, node):
+        # Return the node holding the documentation for an item, if any.
+        if isinstance(node, Namespace) and not isinstance(node, Profile):
+            node = self._dottedNamespaces(node)[-1]
+        if isinstance(node, HasDocumentation) and node.docs is not None and node.docsSourceRef is not None:
+            return node
+        return None
+
+    @staticmethod
+    def _dottedNamespaces(node):
+        # Return the chain of nested namespaces created for a dotted namespace name.
+        namespaces = [ node ]
+        while len(node.statements) == 1 and type(node.statements[0]) is Namespace \
+                and node.statements[0].sourceRef is node.sourceRef:
+            node = node.statements[0]
+            namespaces.append(node)
+        return namespaces
+
+    @staticmethod
+    def _findComments(schemaFile):
+        # Find the comments within a schema file, excluding those that are attached to
+        # nodes as documentation.
+        schemaText = schemaFile.schemaText
+        docsPositions = set(node.docsSourceRef.startPos for node in schemaFile.allNodes(HasDocumentation)
+                            if node.docsSourceRef is not None)
+        comments = []
+        line = 1
+        lineStart = 0
+        pos = 0
+        for match in _commentPattern.finditer(schemaText):
+            startPos = match.start()
+            line += schemaText.count('\n', pos, startPos)
+            lineStart = schemaText.rfind('\n', 0, startPos) + 1
+            pos = startPos
+            if startPos not in docsPositions:
+                comments.append(_Comment(match.group(), startPos, line, startPos - lineStart + 1))
+        return comments
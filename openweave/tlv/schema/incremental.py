@@ -0,0 +1,212 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Support for incrementally updating Weave TLV Schema files after edits.
+#
+#      An edit to the text of a schema file is applied by re-parsing only the region
+#      of text containing the statements affected by the edit.  The region is found by
+#      descending through the namespace and PROFILE definitions that fully enclose the
+#      edit, and consists of the statements within the innermost such definition that
+#      overlap the edit, along with the statement that follows them (whose documentation
+#      may precede it).  The SourceRefs of the nodes that follow the region are shifted
+#      to account for the change in the length of the text.
+#
+
+from .node import *
+from .lazy import _scanRE
+from .recovery import _innermostScope
+
+
+class EditRegion(object):
+    '''Describes the region of a schema file that must be re-parsed after an edit.'''
+
+    def __init__(self, container, statements, lo, hi, startPos, endPos):
+        self.container = container      # node containing the statements (None for top-level)
+        self.statements = statements    # list of statements containing the affected statements
+        self.lo = lo                    # index of the first affected statement
+        self.hi = hi                    # index after the last affected statement
+        self.startPos = startPos        # start of the region
+        self.endPos = endPos            # end of the region, prior to the edit
+
+    def contains(self, sourceRef):
+        '''Returns True if the given SourceRef (prior to the edit) starts within the region.'''
+        return sourceRef is not None and self.startPos <= sourceRef.startPos < self.endPos
+
+
+def _bodyRange(schemaText, node):
+    # For a namespace or PROFILE definition with a body, return the positions following
+    # the body's opening brace and of the closing brace.  Otherwise return None.
+    if not isinstance(node, (Namespace, Profile)) or node.nameSourceRef is None:
+        return None
+    endPos = node.sourceRef.endPos
+    if schemaText[endPos-1:endPos] != '}':
+        return None
+    bracketDepth = 0
+    for m in _scanRE.finditer(schemaText, node.nameSourceRef.endPos, endPos):
+        tokenVal = m.group(m.lastgroup) if m.lastgroup is not None else None
+        if tokenVal == '[':
+            bracketDepth += 1
+        elif tokenVal == ']':
+            bracketDepth -= 1
+        elif tokenVal == '{' and bracketDepth == 0:
+            return (m.end(), endPos - 1)
+    return None
+
+
+def findEditRegion(schemaFile, startPos, endPos):
+    '''Find the region of a schema file that must be re-parsed to apply an edit that
+       replaces the text between startPos and endPos.'''
+    schemaText = schemaFile.schemaText
+    container = None
+    statements = schemaFile.statements
+    bodyStart = 0
+    bodyEnd = len(schemaText)
+    while True:
+        # Find the first statement that ends at or after the start of the edit, and the
+        # statement following the last one that starts at or before the end of the edit.
+        lo = 0
+        while lo < len(statements) and statements[lo].sourceRef.endPos < startPos:
+            lo += 1
+        hi = lo
+        while hi < len(statements) and statements[hi].sourceRef.startPos <= endPos:
+            hi += 1
+
+        # If the edit lies within the body of a single namespace or PROFILE definition,
+        # descend into the body.
+        if hi == lo + 1:
+            body = _bodyRange(schemaText, statements[lo])
+            if body is not None and body[0] <= startPos and endPos <= body[1]:
+                container = _innermostScope(statements[lo])
+                statements = container.statements
+                (bodyStart, bodyEnd) = body
+                continue
+        break
+
+    # Include the statement following the edit, as the edit may alter its documentation.
+    if hi < len(statements):
+        hi += 1
+    regionStart = statements[lo-1].sourceRef.endPos if lo > 0 else bodyStart
+    if hi < len(statements) or (hi > lo and statements[hi-1].sourceRef.endPos >= endPos):
+        regionEnd = statements[hi-1].sourceRef.endPos
+    else:
+        regionEnd = bodyEnd
+    return EditRegion(container, statements, lo, hi, regionStart, regionEnd)
+
+
+def _nodeSourceRefs(nodes, errs):
+    # Iterate for the SourceRefs of the given nodes and their descendants, and of the
+    # given errors.
+    for root in nodes:
+        for node in root.allNodes():
+            for val in vars(node).values():
+                if isinstance(val, SourceRef):
+                    yield val
+    for err in errs:
+        if err.sourceRef is not None:
+            yield err.sourceRef
+
+
+class SourceRefIndex(object):
+    '''An index of the SourceRefs of the nodes and syntax errors in a schema file, ordered
+       by start position, used to efficiently shift the positions of the nodes following
+       an edit.'''
+
+    def __init__(self, schemaFile):
+        self._sourceRefs = self._sorted(_nodeSourceRefs(schemaFile.statements, schemaFile.syntaxErrors))
+
+    @staticmethod
+    def _sorted(sourceRefs):
+        uniqueRefs = { id(sourceRef) : sourceRef for sourceRef in sourceRefs }
+        return sorted(uniqueRefs.values(), key=lambda sourceRef: sourceRef.startPos)
+
+    def _bisect(self, pos):
+        # Return the index of the first SourceRef that starts at or after the given position.
+        sourceRefs = self._sourceRefs
+        lo = 0
+        hi = len(sourceRefs)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if sourceRefs[mid].startPos < pos:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def replace(self, region, oldText, newText, newNodes, newErrs):
+        '''Update the index, and the positions of the SourceRefs that follow an edit region,
+           to reflect the replacement of the region's text, nodes and syntax errors.
+           oldText and newText are the full text of the schema file before and after the edit.'''
+        startPos = region.startPos
+        oldEndPos = region.endPos
+        posDelta = len(newText) - len(oldText)
+        newEndPos = oldEndPos + posDelta
+
+        # Compute the change to the line number, and to the column number on the last line
+        # of the region, of the text following the region.
+        oldEndLine = oldText.count('\n', 0, oldEndPos) + 1
+        newEndLine = newText.count('\n', 0, newEndPos) + 1
+        lineDelta = newEndLine - oldEndLine
+        colDelta = ((newEndPos - newText.rfind('\n', 0, newEndPos)) -
+                    (oldEndPos - oldText.rfind('\n', 0, oldEndPos)))
+
+        sourceRefs = self._sourceRefs
+        i0 = self._bisect(startPos)
+        i1 = self._bisect(oldEndPos)
+
+        if posDelta != 0 or lineDelta != 0 or colDelta != 0:
+            # Shift the end positions of the definitions that enclose the region.
+            container = region.container
+            shifted = set()
+            while container is not None:
+                sourceRef = container.sourceRef
+                if sourceRef is not None and id(sourceRef) not in shifted:
+                    shifted.add(id(sourceRef))
+                    if sourceRef.endLine == oldEndLine:
+                        sourceRef.endCol += colDelta
+                    sourceRef.endLine += lineDelta
+                    sourceRef.endPos += posDelta
+                container = container.parent
+
+            # Shift the column numbers of the SourceRefs that follow the region on the same
+            # line.  As the SourceRefs are ordered by start position, these come first.
+            k = i1
+            while k < len(sourceRefs) and sourceRefs[k].startLine == oldEndLine:
+                sourceRef = sourceRefs[k]
+                sourceRef.startCol += colDelta
+                if sourceRef.endLine == oldEndLine:
+                    sourceRef.endCol += colDelta
+                k += 1
+
+            # Shift the positions of all SourceRefs that follow the region.  (This loop
+            # dominates the cost of an edit, hence the specialization for edits that do
+            # not change the number of lines.)
+            tail = sourceRefs[i1:]
+            if lineDelta != 0:
+                for sourceRef in tail:
+                    sourceRef.startLine += lineDelta
+                    sourceRef.endLine += lineDelta
+                    sourceRef.startPos += posDelta
+                    sourceRef.endPos += posDelta
+            elif posDelta != 0:
+                for sourceRef in tail:
+                    sourceRef.startPos += posDelta
+                    sourceRef.endPos += posDelta
+
+        # Replace the SourceRefs of the nodes within the region.
+        sourceRefs[i0:i1] = self._sorted(_nodeSourceRefs(newNodes, newErrs))
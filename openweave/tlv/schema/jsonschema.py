@@ -0,0 +1,256 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Export of TLV schema types as JSON Schema (draft 2020-12) or OpenAPI 3.1.
+#
+#      Each type definition is exported as a named schema (under $defs, or under
+#      components/schemas for OpenAPI), and references to type definitions are
+#      exported as $refs to them, so the size of the output is linear in the size
+#      of the TLV schema.
+#
+#      The exported schemas describe the JSON form of TLV values:
+#
+#        STRUCTURE / FIELD GROUP : an object with a member per field, keyed by field
+#                                  name.  Fields included from a FIELD GROUP are
+#                                  validated by a $ref to the FIELD GROUP.
+#        CHOICE OF               : for a named alternate, an object with a single
+#                                  member, keyed by the alternate name; for an unnamed
+#                                  alternate, the value of the alternate.
+#        ARRAY / LIST            : an array of the element values.
+#        INTEGER                 : a number, or the name of an enumerated value.
+#        BYTE STRING             : a base64 encoded string.
+#        nullable types          : the value, or null.
+#
+
+from .node import *
+
+JSON_SCHEMA_DIALECT = 'https://json-schema.org/draft/2020-12/schema'
+OPENAPI_VERSION = '3.1.0'
+
+
+def exportJSONSchema(schema, rootName=None, openAPI=False, title='Weave TLV Schema'):
+    '''Export the type definitions in a schema as a JSON Schema document (or an OpenAPI
+       document, if openAPI is True), returned as a JSON-serializable dict.
+       If rootName is given, the document validates values of the named type, and only
+       the definitions needed to do so are exported.  Otherwise all type definitions
+       are exported.
+       The schema should have been successfully validated.'''
+    exporter = _JSONSchemaExporter('#/components/schemas/' if openAPI else '#/$defs/')
+    if rootName is not None:
+        rootTypeDef = schema.getTypeDef(rootName)
+        if rootTypeDef is None:
+            raise ValueError('Type not found: %s' % rootName)
+        typeDefs = _reachableTypeDefs(rootTypeDef)
+    else:
+        typeDefs = schema.allNodes(TypeDef)
+    defs = { typeDef.fullyQualifiedName : exporter.typeDefSchema(typeDef) for typeDef in typeDefs }
+    if openAPI:
+        return {
+            'openapi' : OPENAPI_VERSION,
+            'info' : { 'title' : title, 'version' : '1.0' },
+            'components' : { 'schemas' : defs },
+        }
+    doc = { '$schema' : JSON_SCHEMA_DIALECT }
+    if rootName is not None:
+        doc['$ref'] = exporter.ref(rootTypeDef)['$ref']
+    doc['$defs'] = defs
+    return doc
+
+
+def _reachableTypeDefs(rootTypeDef):
+    # Return the type definitions reachable from a given type definition, in the order
+    # in which they are found.
+    typeDefs = { rootTypeDef : True }
+    pending = [ rootTypeDef ]
+    while len(pending) > 0:
+        for node in pending.pop(0).allNodes((ReferencedType, StructureIncludes)):
+            if node.targetTypeDef is not None and node.targetTypeDef not in typeDefs:
+                typeDefs[node.targetTypeDef] = True
+                pending.append(node.targetTypeDef)
+    return list(typeDefs)
+
+
+class _JSONSchemaExporter(object):
+
+    def __init__(self, refPrefix):
+        self._refPrefix = refPrefix
+
+    def ref(self, typeDef):
+        return { '$ref' : self._refPrefix + typeDef.fullyQualifiedName }
+
+    def typeDefSchema(self, typeDef):
+        result = self.typeSchema(typeDef.type)
+        if typeDef.docs is not None:
+            result = dict(result)
+            result['description'] = docsText(typeDef.docs)
+        return result
+
+    def typeSchema(self, node):
+        if isinstance(node, ReferencedType):
+            if node.targetTypeDef is None:
+                return {}
+            return self.ref(node.targetTypeDef)
+        if isinstance(node, IntegerTypeNode):
+            result = self._integerSchema(node)
+        elif isinstance(node, FloatType):
+            result = { 'type' : 'number' }
+            self._addRange(result, node.getQualifier(Range))
+        elif isinstance(node, BooleanType):
+            result = { 'type' : 'boolean' }
+        elif isinstance(node, StringType):
+            result = { 'type' : 'string' }
+            self._addLength(result, node.getQualifier(Length), 'minLength', 'maxLength')
+        elif isinstance(node, ByteStringType):
+            result = { 'type' : 'string', 'contentEncoding' : 'base64' }
+            self._addLength(result, node.getQualifier(Length), 'minLength', 'maxLength',
+                            lambda n: ((n + 2) // 3) * 4)
+        elif isinstance(node, NullType):
+            result = { 'type' : 'null' }
+        elif isinstance(node, AnyType):
+            result = {}
+        elif isinstance(node, StructuredTypeNode):
+            result = self._structureSchema(node)
+        elif isinstance(node, ChoiceType):
+            result = self._choiceSchema(node)
+        elif isinstance(node, SequencedTypeNode):
+            result = self._sequenceSchema(node)
+        else:
+            raise ValueError('Unexpected type: %s' % node.schemaConstruct)
+        if isinstance(node, HasQualifiers) and node.getQualifier(Nullable) is not None:
+            result = { 'anyOf' : [ result, { 'type' : 'null' } ] }
+        return result
+
+    def _integerSchema(self, node):
+        result = { 'type' : 'integer' }
+        rangeQual = node.getQualifier(Range)
+        width = rangeQual.width if rangeQual is not None else 64
+        if width is not None:
+            if isinstance(node, SignedIntegerType):
+                (result['minimum'], result['maximum']) = (-2 ** (width - 1), 2 ** (width - 1) - 1)
+            else:
+                (result['minimum'], result['maximum']) = (0, 2 ** width - 1)
+        else:
+            self._addRange(result, rangeQual)
+        if len(node.values) > 0:
+            result = { 'oneOf' : [ { 'enum' : [ value.name for value in node.values ] }, result ] }
+        return result
+
+    def _structureSchema(self, node):
+        result = { 'type' : 'object' }
+        properties = {}
+        required = []
+        includes = []
+        for member in node.members:
+            if isinstance(member, StructureIncludes):
+                if member.targetTypeDef is not None:
+                    includes.append(self.ref(member.targetTypeDef))
+                continue
+            fieldSchema = self.typeSchema(member.type)
+            if member.docs is not None:
+                fieldSchema = dict(fieldSchema)
+                fieldSchema['description'] = docsText(member.docs)
+            properties[member.name] = fieldSchema
+            if member.getQualifier(Optional) is None:
+                required.append(member.name)
+        if len(includes) > 0:
+            result['allOf'] = includes
+        result['properties'] = properties
+        if len(required) > 0:
+            result['required'] = required
+        # Fields included from FIELD GROUPs are evaluated by the $refs to them, and so
+        # are not treated as unevaluated.
+        if isinstance(node, StructureType) and node.getQualifier(Extensible) is None:
+            result['unevaluatedProperties'] = False
+        return result
+
+    def _choiceSchema(self, node):
+        alternates = []
+        allNamed = True
+        for alt in node.alternates:
+            altSchema = self.typeSchema(alt.type)
+            if alt.name is not None:
+                alternates.append({
+                    'type' : 'object',
+                    'properties' : { alt.name : altSchema },
+                    'required' : [ alt.name ],
+                    'additionalProperties' : False,
+                })
+            else:
+                alternates.append(altSchema)
+                allNamed = False
+        # The forms of named alternates are mutually exclusive, whereas those of unnamed
+        # alternates may not be.
+        return { 'oneOf' if allNamed else 'anyOf' : alternates }
+
+    def _sequenceSchema(self, node):
+        result = { 'type' : 'array' }
+        if node.elemType is not None:
+            result['items'] = self.typeSchema(node.elemType)
+            (minItems, maxItems) = (0, None)
+        else:
+            # Elements that occur exactly once at the start of the pattern are validated
+            # by position.  If the remainder of the pattern consists of a single quantified
+            # element, it is validated exactly; otherwise each remaining item is validated
+            # against the union of the remaining element types.
+            elems = node.elemTypePattern
+            fixedCount = 0
+            while fixedCount < len(elems) and elems[fixedCount].lowerBound == 1 and elems[fixedCount].upperBound == 1:
+                fixedCount += 1
+            if fixedCount > 0:
+                result['prefixItems'] = [ self.typeSchema(elem.type) for elem in elems[:fixedCount] ]
+            rest = elems[fixedCount:]
+            if len(rest) == 0:
+                result['items'] = False
+            elif len(rest) == 1:
+                result['items'] = self.typeSchema(rest[0].type)
+            else:
+                result['items'] = { 'anyOf' : [ self.typeSchema(elem.type) for elem in rest ] }
+            minItems = fixedCount + sum(elem.lowerBound for elem in rest)
+            if any(elem.upperBound is None for elem in rest):
+                maxItems = None
+            else:
+                maxItems = fixedCount + sum(elem.upperBound for elem in rest)
+        lengthQual = node.getQualifier(Length)
+        if lengthQual is not None:
+            minItems = max(minItems, lengthQual.lowerBound)
+            if lengthQual.upperBound is not None:
+                maxItems = lengthQual.upperBound if maxItems is None else min(maxItems, lengthQual.upperBound)
+        if minItems > 0:
+            result['minItems'] = minItems
+        if maxItems is not None:
+            result['maxItems'] = maxItems
+        return result
+
+    @staticmethod
+    def _addRange(result, rangeQual):
+        if rangeQual is not None and rangeQual.width is None:
+            result['minimum'] = _jsonNumber(rangeQual.lowerBound)
+            result['maximum'] = _jsonNumber(rangeQual.upperBound)
+
+    @staticmethod
+    def _addLength(result, lengthQual, minName, maxName, convert=lambda n: n):
+        if lengthQual is not None:
+            if lengthQual.lowerBound > 0:
+                result[minName] = convert(lengthQual.lowerBound)
+            if lengthQual.upperBound is not None:
+                result[maxName] = convert(lengthQual.upperBound)
+
+
+def _jsonNumber(value):
+    return value if isinstance(value, int) else float(value)
@@ -0,0 +1,310 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Support for lazily loading Weave TLV Schema files.
+#
+#      When lazy loading is enabled, schema files are not parsed when loaded.  Instead,
+#      a cheap scan of the schema text is performed which records the byte ranges of
+#      the top-level statements in the file, along with the names and kinds of the
+#      definitions within each statement.  Individual statements are parsed into
+#      SchemaNodes on demand, e.g. when a definition is looked up by name.
+#
+
+import re
+
+from .node import *
+from .error import WeaveTLVSchemaError
+
+# Kinds of definitions recorded by the statement scanner
+KIND_NAMESPACE = 'namespace'
+KIND_VENDOR = 'VENDOR'
+KIND_PROFILE = 'PROFILE'
+KIND_MESSAGE = 'MESSAGE'
+KIND_STATUS_CODE = 'STATUS CODE'
+KIND_TYPE = 'type'
+
+_definitionKeywords = {
+    'VENDOR' : KIND_VENDOR,
+    'PROFILE' : KIND_PROFILE,
+    'MESSAGE' : KIND_MESSAGE,
+    'STATUS' : KIND_STATUS_CODE,
+}
+
+# Regular expression used to scan schema text.  Whitespace and comments (including
+# documentation comments) are matched without a group and skipped.
+_scanRE = re.compile(r'''
+      \s+
+    | //[^\n]*
+    | /\*.*?\*/
+    | (?P<name> "?[A-Za-z_][A-Za-z0-9_-]*"? )
+    | (?P<arrow> => )
+    | (?P<punct> [{}\[\].] )
+    | (?P<other> [0-9][A-Za-z0-9_.]* | . )
+    ''', re.VERBOSE | re.DOTALL)
+
+
+class LazyStatement(object):
+    '''Describes a region of text within a lazily loaded schema file containing one
+       top-level statement (or, in the case of syntax errors, possibly more or less than
+       one statement).'''
+
+    def __init__(self, startPos, endPos, startLine):
+        self.startPos = startPos
+        self.endPos = endPos
+        self.startLine = startLine
+        self.names = []
+        self.nodes = None
+        self.error = None
+
+    @property
+    def isMaterialized(self):
+        return self.nodes is not None
+
+
+def scanStatements(schemaText):
+    '''Perform a cheap scan of the given schema text, returning a list of LazyStatement
+       objects describing the top-level statements within the text.
+       The scan does not check the syntax of the text.  Syntax errors are detected when
+       the individual statements are parsed.'''
+
+    stmtStarts = [ 0 ]
+    stmtNames = [ [] ]
+
+    # Stack of open braces/brackets.  Each entry is either the FQ name of a namespace
+    # or PROFILE scope, '{' for any other brace, or '[' for a bracket.
+    stack = []
+    scopeName = ''
+
+    prevEnd = 0             # end of the previous significant token
+    curName = None          # components of the current (possibly scoped) name
+    curNameBoundary = 0     # end of the significant token preceding the current name
+    expectNamePart = False  # True if the previous token was a '.' within a name
+    nsName = None           # components of the name following a namespace keyword
+    pendingDef = None       # names of a definition awaiting its kind keyword
+    pendingScope = None     # FQ name of a PROFILE scope that may open with the next brace
+    qualName = None         # components of the last name within a qualifier list
+    qualNameBoundary = 0    # end of the significant token preceding that name
+
+    def startStatement(boundary):
+        stmtStarts.append(boundary)
+        stmtNames.append([])
+
+    for m in _scanRE.finditer(schemaText):
+        tokenType = m.lastgroup
+        if tokenType is None:
+            continue
+        tokenVal = m.group(tokenType)
+        tokenEnd = m.end()
+
+        # Ignore everything within a qualifier list.  Note that the current name and
+        # any pending PROFILE scope are preserved across the qualifier list.
+        if stack and stack[-1] == '[':
+            if tokenType == 'arrow' or tokenVal == '}':
+                # Neither can appear within a qualifier list, so the list is unclosed.
+                # End it, and treat the token (and, for a =>, the name preceding it) as
+                # though the list had been closed.
+                while stack and stack[-1] == '[':
+                    stack.pop()
+                if tokenType == 'arrow':
+                    (curName, curNameBoundary) = (qualName, qualNameBoundary)
+            else:
+                if tokenVal == '[':
+                    stack.append('[')
+                elif tokenVal == ']':
+                    stack.pop()
+                if tokenType == 'name':
+                    if qualName is not None and expectNamePart:
+                        qualName.append(tokenVal.strip('"'))
+                    else:
+                        (qualName, qualNameBoundary) = ([ tokenVal.strip('"') ], prevEnd)
+                elif tokenVal != '.':
+                    qualName = None
+                expectNamePart = tokenVal == '.'
+                prevEnd = tokenEnd
+                continue
+
+        atStmtLevel = not stack or stack[-1] != '{'
+
+        # Record the kind of a definition based on the keyword following the =>.
+        if pendingDef is not None:
+            kind = KIND_TYPE
+            if tokenType == 'name':
+                kind = _definitionKeywords.get(tokenVal.upper(), KIND_TYPE)
+            (defName, fqDefName) = pendingDef
+            stmtNames[-1].append((kind, defName if kind == KIND_VENDOR else fqDefName))
+            if kind == KIND_PROFILE:
+                pendingScope = fqDefName
+            pendingDef = None
+            prevEnd = tokenEnd
+            continue
+
+        if tokenType == 'name':
+            namePart = tokenVal.strip('"')
+            if expectNamePart and nsName is not None:
+                nsName.append(namePart)
+            elif expectNamePart and curName is not None:
+                curName.append(namePart)
+            elif nsName == []:
+                nsName.append(namePart)
+            elif atStmtLevel and tokenVal.lower() == 'namespace':
+                if not stack:
+                    startStatement(prevEnd)
+                nsName = []
+                curName = None
+            elif atStmtLevel and tokenVal.lower() == 'using':
+                if not stack:
+                    startStatement(prevEnd)
+                nsName = None
+                curName = None
+            else:
+                curName = [ namePart ]
+                curNameBoundary = prevEnd
+                nsName = None
+                pendingScope = None
+            expectNamePart = False
+            prevEnd = tokenEnd
+            continue
+
+        if tokenVal == '.':
+            expectNamePart = True
+            prevEnd = tokenEnd
+            continue
+
+        if tokenType == 'arrow':
+            if atStmtLevel and curName:
+                if not stack:
+                    startStatement(curNameBoundary)
+                name = '.'.join(curName)
+                pendingDef = (name, scopeName + '.' + name if scopeName else name)
+        elif tokenVal == '{':
+            if nsName:
+                fqName = scopeName
+                for namePart in nsName:
+                    fqName = fqName + '.' + namePart if fqName else namePart
+                    stmtNames[-1].append((KIND_NAMESPACE, fqName))
+                stack.append(fqName)
+                scopeName = fqName
+            elif pendingScope is not None and atStmtLevel:
+                stack.append(pendingScope)
+                scopeName = pendingScope
+            else:
+                stack.append('{')
+        elif tokenVal == '}':
+            if stack:
+                stack.pop()
+                scopeName = next((s for s in reversed(stack) if s != '{'), '')
+        elif tokenVal == '[':
+            stack.append('[')
+            qualName = None
+            expectNamePart = False
+            prevEnd = tokenEnd
+            continue
+
+        curName = None
+        nsName = None
+        pendingScope = None
+        expectNamePart = False
+        prevEnd = tokenEnd
+
+    # Convert the recorded statement boundaries into LazyStatement objects, dropping
+    # any empty regions.  Note that any text preceding the first statement boundary
+    # is retained as a separate region, such that syntax errors within it are reported.
+    stmts = []
+    lineNum = 1
+    prevStart = 0
+    textLen = len(schemaText)
+    for i in range(len(stmtStarts)):
+        startPos = stmtStarts[i]
+        endPos = stmtStarts[i+1] if i + 1 < len(stmtStarts) else textLen
+        if startPos == endPos and i + 1 < len(stmtStarts):
+            continue
+        lineNum += schemaText.count('\n', prevStart, startPos)
+        prevStart = startPos
+        stmt = LazyStatement(startPos, endPos, lineNum)
+        stmt.names = stmtNames[i]
+        stmts.append(stmt)
+    return stmts
+
+
+class LazySchemaFile(SchemaFile):
+    '''A SchemaFile whose top-level statements are parsed on demand.'''
+
+    def __init__(self, fileName, schemaText, lazyStatements, parseRegion):
+        self._statements = None
+        self._sourceRef = None
+        super(LazySchemaFile, self).__init__(fileName, schemaText)
+        self.lazyStatements = lazyStatements
+        self._parseRegion = parseRegion
+
+    @property
+    def statements(self):
+        if self._statements is None and self.lazyStatements is not None:
+            self.materializeAll()
+        return self._statements
+
+    @statements.setter
+    def statements(self, value):
+        self._statements = value
+
+    @property
+    def sourceRef(self):
+        if self._sourceRef is None and self.lazyStatements is not None:
+            self.materializeAll()
+        return self._sourceRef
+
+    @sourceRef.setter
+    def sourceRef(self, value):
+        self._sourceRef = value
+
+    @property
+    def isMaterialized(self):
+        return self._statements is not None
+
+    def materializeStatement(self, stmt):
+        '''Parse the text for a given LazyStatement into SchemaNodes, if not already done.
+           Returns the list of resultant SchemaNodes.  Raises a WeaveTLVSchemaError if the
+           text contains a syntax error.'''
+        if stmt.nodes is None:
+            try:
+                stmt.nodes = self._parseRegion(self, stmt.startPos, stmt.endPos, stmt.startLine)
+            except WeaveTLVSchemaError as err:
+                stmt.nodes = []
+                stmt.error = err
+        if stmt.error is not None:
+            raise stmt.error
+        return stmt.nodes
+
+    def materializeAll(self, errs=None):
+        '''Parse all remaining statements in the file.
+           If errs is given, syntax errors are appended to the list.  Otherwise the first
+           syntax error encountered is raised.'''
+        statements = []
+        for stmt in self.lazyStatements:
+            try:
+                statements += self.materializeStatement(stmt)
+            except WeaveTLVSchemaError as err:
+                if errs is None:
+                    raise
+                errs.append(err)
+        self._statements = statements
+        if len(statements) > 0:
+            self._sourceRef = SourceRef(self, 0, 0, 0)
+            self._sourceRef.setstart(statements[0].sourceRef)
+            self._sourceRef.setEnd(statements[-1].sourceRef)
+        return statements
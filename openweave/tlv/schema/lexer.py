@@ -0,0 +1,150 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Fast lexer for the Weave TLV Schema grammar.
+#
+#      The stock Lark lexer matches each token against an alternation of all terminals
+#      in the grammar, including one alternative per keyword, and then re-matches every
+#      name against a second alternation of keywords to determine if the name is in fact
+#      a keyword.  The fast lexer instead uses a single master regular expression with
+#      one alternative per regular expression terminal, in a fixed order, followed by
+#      an alternation of the literal string terminals and finally INT.  Names are
+#      matched once, and identified as keywords using a lookup table.  It produces
+#      exactly the same tokens, with the same positions, as the stock lexer.
+#
+
+import re
+
+from lark import Token
+from lark.lexer import Lexer, PatternStr
+from lark.exceptions import UnexpectedCharacters
+
+# The regular expression terminals in the grammar, in the order in which they are
+# tried by the fast lexer.  Literal string terminals (punctuation and the keywords
+# that cannot be parsed as names) are tried immediately prior to INT.  Note that the
+# relative order of terminals which can match at the same position (e.g. COMMENT and
+# DOCS, or DECIMAL, '.' and INT) is the same as that used by the stock lexer.
+_regexTerminalOrder = [ 'WS', 'UNQUOTED_NAME', 'QUOTED_NAME', 'COMMENT', 'DOCS', 'POSTFIX_DOCS', 'DECIMAL' ]
+_finalRegexTerminal = 'INT'
+
+# The terminal that matches names.  Literal string terminals that are fully matched by
+# this terminal are keywords.
+_nameTerminal = 'UNQUOTED_NAME'
+
+# Terminals that may contain newlines.
+_multiLineTerminals = frozenset([ 'WS', 'COMMENT', 'DOCS', 'POSTFIX_DOCS' ])
+
+
+class _FastLexer(Lexer):
+    '''A lexer for the Weave TLV Schema grammar, suitable for use with the Lark LALR
+       parser (via the lexer= option).
+       Raises ValueError on construction if the grammar contains terminals that are not
+       supported by the lexer.'''
+
+    def __init__(self, lexerConf):
+        terminalsByName = { t.name : t for t in lexerConf.terminals }
+
+        regexTerminals = [ t.name for t in lexerConf.terminals if not isinstance(t.pattern, PatternStr) ]
+        unsupported = set(regexTerminals) - set(_regexTerminalOrder) - set([ _finalRegexTerminal ])
+        if unsupported or _nameTerminal not in terminalsByName:
+            raise ValueError('Grammar not supported by fast lexer: unknown terminals %s' % ', '.join(sorted(unsupported)))
+
+        # Separate the literal string terminals into keywords (which are matched as names
+        # and then identified by table lookup) and other literals (which are matched by
+        # the master regular expression).
+        nameRE = re.compile(terminalsByName[_nameTerminal].pattern.to_regexp())
+        self._keywords = {}
+        self._caseSensitiveKeywords = {}
+        literals = []
+        for t in lexerConf.terminals:
+            if not isinstance(t.pattern, PatternStr):
+                continue
+            m = nameRE.match(t.pattern.value)
+            if m and m.end() == len(t.pattern.value):
+                if 'i' in t.pattern.flags:
+                    self._keywords[t.pattern.value.lower()] = t.name
+                else:
+                    self._caseSensitiveKeywords[t.pattern.value] = t.name
+            else:
+                literals.append(t)
+
+        # Order literals in the same manner as the stock lexer (longest first).
+        literals.sort(key=lambda t: (-t.priority, -t.pattern.max_width, -len(t.pattern.value), t.name))
+        self._literals = {}
+        for t in literals:
+            key = t.pattern.value.lower() if 'i' in t.pattern.flags else t.pattern.value
+            self._literals.setdefault(key, t.name)
+
+        groups = [ '(?P<%s>%s)' % (name, terminalsByName[name].pattern.to_regexp())
+                   for name in _regexTerminalOrder if name in terminalsByName ]
+        if literals:
+            groups.append('(?P<LITERAL>%s)' % '|'.join(t.pattern.to_regexp() for t in literals))
+        if _finalRegexTerminal in terminalsByName:
+            groups.append('(?P<%s>%s)' % (_finalRegexTerminal, terminalsByName[_finalRegexTerminal].pattern.to_regexp()))
+        self._masterRE = re.compile('|'.join(groups), lexerConf.g_regex_flags)
+
+        self._ignoreTypes = frozenset(lexerConf.ignore)
+        self._terminalsByName = lexerConf.terminals_by_name
+        self._allowedTypes = frozenset(terminalsByName) - self._ignoreTypes
+
+    def lex(self, text):
+        '''Iterate for the tokens in the given text.
+           Raises an UnexpectedCharacters exception if a character is encountered that
+           does not begin a valid token.'''
+        match = self._masterRE.match
+        keywords = self._keywords
+        caseSensitiveKeywords = self._caseSensitiveKeywords
+        literals = self._literals
+        ignoreTypes = self._ignoreTypes
+        textLen = len(text)
+        pos = 0
+        line = 1
+        lineStart = 0
+        lastToken = None
+        while pos < textLen:
+            m = match(text, pos)
+            if m is None:
+                raise UnexpectedCharacters(text, pos, line, pos - lineStart + 1,
+                                           allowed=self._allowedTypes,
+                                           token_history=lastToken and [ lastToken ],
+                                           terminals_by_name=self._terminalsByName)
+            tokenType = m.lastgroup
+            value = m.group()
+            endPos = m.end()
+            if tokenType == _nameTerminal:
+                tokenType = caseSensitiveKeywords.get(value) or keywords.get(value.lower(), tokenType)
+            elif tokenType == 'LITERAL':
+                tokenType = literals.get(value) or literals[value.lower()]
+            if tokenType in _multiLineTerminals:
+                newLineCount = value.count('\n')
+            else:
+                newLineCount = 0
+            if tokenType not in ignoreTypes:
+                if newLineCount == 0:
+                    lastToken = Token(tokenType, value, pos, line, pos - lineStart + 1,
+                                      line, endPos - lineStart + 1, endPos)
+                else:
+                    endLineStart = pos + value.rindex('\n') + 1
+                    lastToken = Token(tokenType, value, pos, line, pos - lineStart + 1,
+                                      line + newLineCount, endPos - endLineStart + 1, endPos)
+                yield lastToken
+            if newLineCount != 0:
+                line += newLineCount
+                lineStart = pos + value.rindex('\n') + 1
+            pos = endPos
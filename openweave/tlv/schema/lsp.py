@@ -0,0 +1,418 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Language Server Protocol (LSP) server for Weave TLV Schema files.
+#
+#      The server communicates with an editor using JSON-RPC over a pair of byte
+#      streams (normally stdin/stdout).  It maintains a single WeaveTLVSchema object
+#      containing all open documents (along with any schema files given at startup),
+#      applies document changes incrementally using SchemaFile.applyEdit(), and
+#      answers go-to-definition, hover and find-references requests from the cached
+#      semantic model.
+#
+#      After each change to a document, diagnostics are published for the document from
+#      the errors found in the statements re-parsed by the change.  The schema as a whole
+#      is only re-validated (updating the diagnostics of all open documents) when a
+#      document is opened or saved, or when a request requiring the resolved semantic
+#      model follows a change, such that the cost of a full validation is not incurred
+#      on every keystroke.
+#
+#      Note that LSP character offsets are interpreted as offsets in code points.
+#
+
+import json
+import os
+import sys
+from urllib.parse import urlparse, unquote
+from urllib.request import pathname2url
+
+from .obj import WeaveTLVSchema
+from .node import *
+from .incremental import findEditRegion
+
+# JSON-RPC error codes
+_PARSE_ERROR = -32700
+_INVALID_REQUEST = -32600
+_METHOD_NOT_FOUND = -32601
+_INTERNAL_ERROR = -32603
+
+# LSP constants
+_TEXT_DOCUMENT_SYNC_INCREMENTAL = 2
+_DIAGNOSTIC_SEVERITY_ERROR = 1
+
+
+def uriToPath(uri):
+    '''Convert a file: URI to a file system path.'''
+    parsedURI = urlparse(uri)
+    if parsedURI.scheme != 'file':
+        return uri
+    return unquote(parsedURI.path)
+
+
+def pathToURI(path):
+    '''Convert a file system path to a file: URI.'''
+    if path.startswith('(') or ':' in os.path.splitdrive(path)[1]:
+        return path
+    return 'file://' + pathname2url(os.path.abspath(path))
+
+
+class _Document(object):
+    '''An open document.'''
+
+    def __init__(self, uri, schemaFile, version):
+        self.uri = uri
+        self.schemaFile = schemaFile
+        self.version = version
+        # Semantic (i.e. non-syntax) errors in the document, as found by the most recent
+        # validation, and updated by subsequent changes.
+        self.errors = []
+
+    def offsetAt(self, position):
+        '''Convert an LSP position (zero-based line and character) to an offset in the text.'''
+        schemaText = self.schemaFile.schemaText
+        offset = 0
+        for i in range(position['line']):
+            offset = schemaText.find('\n', offset) + 1
+            if offset == 0:
+                return len(schemaText)
+        lineEnd = schemaText.find('\n', offset)
+        if lineEnd < 0:
+            lineEnd = len(schemaText)
+        return min(offset + position['character'], lineEnd)
+
+
+class LanguageServer(object):
+    '''A Language Server Protocol server for Weave TLV Schema files.'''
+
+    def __init__(self, inStream, outStream, schemaFileNames=[]):
+        self._inStream = inStream
+        self._outStream = outStream
+        self._schema = WeaveTLVSchema()
+        self._documents = {}
+        self._schemaFiles = {}
+        self._shutdown = False
+        self._exited = False
+        self._publishedDiagnostics = {}
+        self._validationPending = False
+        for fileName in schemaFileNames:
+            self._schemaFiles[pathToURI(fileName)] = self._schema.loadSchemaFromFile(fileName, errs=[])
+        self._handlers = {
+            'initialize' : self._initialize,
+            'initialized' : self._ignore,
+            'shutdown' : self._shutdownRequest,
+            'exit' : self._exit,
+            'textDocument/didOpen' : self._didOpen,
+            'textDocument/didChange' : self._didChange,
+            'textDocument/didSave' : self._didSave,
+            'textDocument/didClose' : self._didClose,
+            'textDocument/definition' : self._validated(self._definition),
+            'textDocument/hover' : self._validated(self._hover),
+            'textDocument/references' : self._validated(self._references),
+            '$/cancelRequest' : self._ignore,
+            '$/setTrace' : self._ignore,
+        }
+
+    def run(self):
+        '''Process messages until an exit notification is received or the input stream
+           is closed.
+           Returns the process exit code: 0 if a shutdown request was received prior to
+           exiting, or 1 otherwise.'''
+        while not self._exited:
+            message = self._readMessage()
+            if message is None:
+                break
+            self._handleMessage(message)
+        return 0 if self._shutdown else 1
+
+    # ----- JSON-RPC transport
+
+    def _readMessage(self):
+        # Read the message headers, followed by the message content.
+        contentLength = None
+        while True:
+            line = self._inStream.readline()
+            if len(line) == 0:
+                return None
+            line = line.decode('ascii').strip()
+            if len(line) == 0:
+                break
+            (name, _, value) = line.partition(':')
+            if name.strip().lower() == 'content-length':
+                contentLength = int(value.strip())
+        if contentLength is None:
+            return None
+        content = self._inStream.read(contentLength)
+        try:
+            return json.loads(content.decode('utf-8'))
+        except ValueError:
+            self._sendError(None, _PARSE_ERROR, 'Invalid JSON message')
+            return {}
+
+    def _writeMessage(self, message):
+        content = json.dumps(message).encode('utf-8')
+        self._outStream.write(b'Content-Length: %d\r\n\r\n' % len(content))
+        self._outStream.write(content)
+        self._outStream.flush()
+
+    def _sendResult(self, id, result):
+        self._writeMessage({ 'jsonrpc' : '2.0', 'id' : id, 'result' : result })
+
+    def _sendError(self, id, code, message):
+        self._writeMessage({ 'jsonrpc' : '2.0', 'id' : id, 'error' : { 'code' : code, 'message' : message } })
+
+    def _sendNotification(self, method, params):
+        self._writeMessage({ 'jsonrpc' : '2.0', 'method' : method, 'params' : params })
+
+    def _handleMessage(self, message):
+        if not isinstance(message, dict) or 'method' not in message:
+            if isinstance(message, dict) and 'id' in message and 'result' not in message and 'error' not in message:
+                self._sendError(message['id'], _INVALID_REQUEST, 'Invalid request')
+            return
+        id = message.get('id', None)
+        handler = self._handlers.get(message['method'], None)
+        if handler is None:
+            if id is not None:
+                self._sendError(id, _METHOD_NOT_FOUND, 'Method not found: %s' % message['method'])
+            return
+        try:
+            result = handler(message.get('params', None) or {})
+        except Exception as ex:
+            if id is not None:
+                self._sendError(id, _INTERNAL_ERROR, '%s: %s' % (type(ex).__name__, ex))
+            return
+        if id is not None:
+            self._sendResult(id, result)
+
+    # ----- Lifecycle messages
+
+    def _initialize(self, params):
+        return {
+            'capabilities' : {
+                'textDocumentSync' : {
+                    'openClose' : True,
+                    'change' : _TEXT_DOCUMENT_SYNC_INCREMENTAL,
+                },
+                'definitionProvider' : True,
+                'hoverProvider' : True,
+                'referencesProvider' : True,
+            },
+            'serverInfo' : { 'name' : 'weave-tlv-schema' },
+        }
+
+    def _ignore(self, params):
+        return None
+
+    def _shutdownRequest(self, params):
+        self._shutdown = True
+        return None
+
+    def _exit(self, params):
+        self._exited = True
+        return None
+
+    # ----- Document synchronization
+
+    def _didOpen(self, params):
+        textDocument = params['textDocument']
+        uri = textDocument['uri']
+        schemaText = textDocument['text']
+        schemaFile = self._schemaFiles.get(uri, None)
+        if schemaFile is None:
+            schemaFile = self._schema.loadSchemaFromString(schemaText, fileName=uriToPath(uri), errs=[])
+            self._schemaFiles[uri] = schemaFile
+        elif schemaFile.schemaText != schemaText:
+            schemaFile.applyEdit(0, len(schemaFile.schemaText), schemaText)
+        self._documents[uri] = _Document(uri, schemaFile, textDocument.get('version', None))
+        self._validate()
+
+    def _didChange(self, params):
+        uri = params['textDocument']['uri']
+        document = self._documents[uri]
+        schemaFile = document.schemaFile
+        for change in params['contentChanges']:
+            if 'range' in change:
+                startPos = document.offsetAt(change['range']['start'])
+                endPos = document.offsetAt(change['range']['end'])
+            else:
+                startPos = 0
+                endPos = len(schemaFile.schemaText)
+            # Replace the errors in the statements re-parsed by the edit with those found
+            # by applying it.  (The positions of the errors that follow the re-parsed
+            # statements are shifted along with the nodes they refer to.)
+            region = findEditRegion(schemaFile, startPos, endPos)
+            errors = [ err for err in document.errors if not region.contains(err.sourceRef) ]
+            editErrs = schemaFile.applyEdit(startPos, endPos, change['text'])
+            syntaxErrs = set(id(err) for err in schemaFile.syntaxErrors)
+            document.errors = errors + [ err for err in editErrs if id(err) not in syntaxErrs ]
+        document.version = params['textDocument'].get('version', None)
+        self._validationPending = True
+        self._publishDiagnostics([ document ])
+
+    def _didSave(self, params):
+        if params['textDocument']['uri'] in self._documents:
+            self._validate()
+
+    def _didClose(self, params):
+        # The document remains part of the schema, as other documents may refer to it.
+        document = self._documents.pop(params['textDocument']['uri'], None)
+        if document is not None and self._publishedDiagnostics.get(document.uri):
+            self._sendDiagnostics(document.uri, [])
+
+    def _validated(self, handler):
+        # Wrap a request handler such that the schema is re-validated before the request
+        # is handled if any document has changed since it was last validated.
+        def validatedHandler(params):
+            if self._validationPending:
+                self._validate()
+            return handler(params)
+        return validatedHandler
+
+    def _validate(self):
+        # Validate the schema as a whole, and publish the resulting diagnostics for all
+        # open documents.
+        errs = self._schema.validate()
+        documents = { document.schemaFile : document for document in self._documents.values() }
+        for document in documents.values():
+            document.errors = []
+        for err in errs:
+            if err.sourceRef is not None and err.sourceRef.schemaFile in documents:
+                documents[err.sourceRef.schemaFile].errors.append(err)
+        self._validationPending = False
+        self._publishDiagnostics(documents.values())
+
+    def _publishDiagnostics(self, documents):
+        # Publish the diagnostics for the given documents, if they have changed since
+        # they were last published.
+        for document in documents:
+            diagnostics = []
+            for err in (document.schemaFile.syntaxErrors or []) + document.errors:
+                if err.sourceRef is None:
+                    continue
+                message = str(err) if err.detail is None else '%s\n%s' % (err, err.detail)
+                diagnostics.append({
+                    'range' : self._range(err.sourceRef),
+                    'severity' : _DIAGNOSTIC_SEVERITY_ERROR,
+                    'source' : 'weave-tlv-schema',
+                    'message' : message,
+                })
+            if self._publishedDiagnostics.get(document.uri, None) != diagnostics:
+                self._sendDiagnostics(document.uri, diagnostics)
+
+    def _sendDiagnostics(self, uri, diagnostics):
+        self._publishedDiagnostics[uri] = diagnostics
+        self._sendNotification('textDocument/publishDiagnostics', { 'uri' : uri, 'diagnostics' : diagnostics })
+
+    # ----- Language features
+
+    def _definition(self, params):
+        target = self._targetAt(params)
+        if target is None:
+            return None
+        return self._location(target)
+
+    def _hover(self, params):
+        (document, node) = self._nodeAt(params)
+        if node is None:
+            return None
+        target = self._targetOf(node, document.offsetAt(params['position'])) or node
+        while target is not None and not isinstance(target, (HasName, HasDocumentation)):
+            target = target.parent
+        if target is None or isinstance(target, SchemaFile):
+            return None
+        title = target.schemaConstruct
+        if isinstance(target, HasScopedName):
+            title += ' ' + target.fullyQualifiedName
+        elif isinstance(target, HasName) and target.name is not None:
+            title += ' ' + target.name
+        contents = '**%s**' % title
+        if isinstance(target, HasDocumentation) and target.docs is not None:
+            contents += '\n\n' + docsText(target.docs)
+        return { 'contents' : { 'kind' : 'markdown', 'value' : contents } }
+
+    def _references(self, params):
+        target = self._targetAt(params)
+        if target is None:
+            return []
+        locations = []
+        includeDeclaration = params.get('context', {}).get('includeDeclaration', False)
+        if includeDeclaration:
+            locations.append(self._location(target))
+        for refNode in self._schema.getReferences(target):
+            locations.append(self._location(refNode))
+        return [ location for location in locations if location is not None ]
+
+    def _nodeAt(self, params):
+        # Return the document and the innermost node containing the given position.
+        document = self._documents.get(params['textDocument']['uri'], None)
+        if document is None:
+            return (None, None)
+        pos = document.offsetAt(params['position'])
+        node = None
+        children = document.schemaFile.statements or []
+        while True:
+            for child in children:
+                if child.sourceRef is not None and child.sourceRef.startPos <= pos <= child.sourceRef.endPos:
+                    node = child
+                    children = list(child.allChildNodes())
+                    break
+            else:
+                return (document, node)
+
+    def _targetAt(self, params):
+        # Return the definition referred to, or defined, at the given position.
+        (document, node) = self._nodeAt(params)
+        if node is None:
+            return None
+        return self._targetOf(node, document.offsetAt(params['position']))
+
+    @staticmethod
+    def _targetOf(node, pos):
+        # Return the definition referred to, or named, by the given node or its parents.
+        while node is not None:
+            if isinstance(node, (ReferencedType, StructureIncludes)):
+                return node.targetTypeDef
+            if isinstance(node, Id) and node.vendorNode is not None:
+                return node.vendorNode
+            if isinstance(node, Tag) and node.profileNode is not None:
+                return node.profileNode
+            if isinstance(node, (TypeDef, Vendor, Profile, Message, StatusCode)):
+                nameSourceRef = node.nameSourceRef
+                if nameSourceRef is not None and nameSourceRef.startPos <= pos <= nameSourceRef.endPos:
+                    return node
+            node = node.parent
+        return None
+
+    @staticmethod
+    def _range(sourceRef):
+        return {
+            'start' : { 'line' : sourceRef.startLine - 1, 'character' : sourceRef.startCol - 1 },
+            'end' : { 'line' : sourceRef.endLine - 1, 'character' : sourceRef.endCol - 1 },
+        }
+
+    def _location(self, node):
+        sourceRef = getattr(node, 'nameSourceRef', None) or node.sourceRef
+        if sourceRef is None:
+            return None
+        return { 'uri' : pathToURI(sourceRef.schemaFile.fileName), 'range' : self._range(sourceRef) }
+
+
+def serve(schemaFileNames=[]):
+    '''Run a language server using stdin and stdout.'''
+    server = LanguageServer(sys.stdin.buffer, sys.stdout.buffer, schemaFileNames)
+    return server.run()
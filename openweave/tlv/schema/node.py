@@ -25,8 +25,10 @@ import io
 import itertools
 import os
 import re
+import sys
 
 from .error import WeaveTLVSchemaError, AmbiguousTagError
+from .rules import ValidationRule, registerRule, checkNode
 
 
 # ----- Utility functions
@@ -34,6 +36,35 @@ from .error import WeaveTLVSchemaError, AmbiguousTagError
 def _addSchemaError(errs, msg, detail=None, sourceRef=None):
     errs.append(WeaveTLVSchemaError(msg=msg, detail=detail, sourceRef=sourceRef))
 
+class DerivedState(object):
+    '''The generation of the state derived from the resolved references of a schema.
+       Nodes that cache values derived from other nodes (e.g. the possible tags of a field)
+       record the generation at which they were computed, and recompute them if the
+       generation of their schema has since changed.'''
+
+    def __init__(self):
+        self.generation = object()
+
+    def invalidate(self):
+        '''Invalidate the values cached by the nodes of the schema that depend on resolved
+           references.  Called whenever the schema's references are (re)resolved.'''
+        self.generation = object()
+
+# Derived state of nodes that do not belong to a schema.
+_defaultDerivedState = DerivedState()
+
+def resolveTypeNode(typeNode):
+    '''Return the type node targeted by a TypeDef or ReferencedType node, or the given node
+       if it is neither.  Raises a ValueError if the target has not been resolved.'''
+    if isinstance(typeNode, (TypeDef, ReferencedType)):
+        targetNode = typeNode.targetType
+        if targetNode is None:
+            if isinstance(typeNode, TypeDef):
+                raise ValueError('Unresolved type: %s' % typeNode.fullyQualifiedName)
+            raise ValueError('Unresolved type reference: %s' % typeNode.targetName)
+        return targetNode
+    return typeNode
+
 # ----- Mixin Classes for SchemaNodes
 
 class HasName(object):
@@ -55,6 +86,7 @@ class HasScopedName(HasName):
     def __init__(self, *args, **kwargs):
         super(HasScopedName, self).__init__(*args, **kwargs)
         self._namespaceName = None
+        self._fullyQualifiedName = None
     
     @property
     def namespaceName(self):
@@ -68,11 +100,15 @@ class HasScopedName(HasName):
 
     @property
     def fullyQualifiedName(self):
-        nsName = self.namespaceName
-        if len(nsName) > 0:
-            return nsName + '.' + self.name
-        else:
-            return self.name
+        # The name is computed once and interned, so that the indexes keyed by it (and
+        # the lookups in them) share a single string whose hash is already computed.
+        if self._fullyQualifiedName is None:
+            nsName = self.namespaceName
+            if len(nsName) > 0:
+                self._fullyQualifiedName = sys.intern(nsName + '.' + self.name)
+            else:
+                self._fullyQualifiedName = self.name
+        return self._fullyQualifiedName
 
     @property
     def _summaryTitle(self):
@@ -91,15 +127,16 @@ class HasQualifiers(object):
                 return qual
         return None
     
-    def validate(self, errs):
-        super(HasQualifiers, self).validate(errs)
-        # Check that all qualifiers are allowed
+    def _checkAllowedQualifiers(self, errs):
+        '''Check that all qualifiers are allowed'''
         allowedQuals = self._allowedQualifiers
         for qual in self.quals:
             if not isinstance(qual, allowedQuals):
                 errMsg = '%s not allowed on %s' % (qual.schemaConstruct, self.schemaConstruct)
                 _addSchemaError(errs, msg=errMsg, sourceRef=qual.sourceRef)
-        # Look for duplicate qualifiers
+
+    def _checkDuplicateQualifiers(self, errs):
+        '''Look for duplicate qualifiers'''
         qualTypesSeen = {}
         for qual in self.quals:
             qualType = qual.schemaConstruct
@@ -133,11 +170,27 @@ class HasDocumentation(object):
         docsSum = docsSum.replace(u'\t', u'\\t')
         return docsSum
 
+def docsText(docs):
+    '''Return the text of a documentation comment, stripped of comment delimiters.'''
+    if docs.startswith('/**<'):
+        docs = docs[4:]
+    elif docs.startswith('/**'):
+        docs = docs[3:]
+    if docs.endswith('*/'):
+        docs = docs[:-2]
+    lines = [ line.strip() for line in docs.split('\n') ]
+    lines = [ line[1:].strip() if line.startswith('*') else line for line in lines ]
+    return '\n'.join(lines).strip()
+
 # ----- SchemaNode Base Classes
 
 class SchemaNode(object):
     '''Base class for all Weave Schema nodes'''
     
+    # The derived state of the schema to which the node belongs.  Set by the schema on
+    # the root nodes of its files (the SchemaFile and its top-level statements).
+    _derivedState = _defaultDerivedState
+
     def __init__(self, sourceRef=None):
         super(SchemaNode, self).__init__()
         self.sourceRef = sourceRef
@@ -148,6 +201,14 @@ class SchemaNode(object):
         '''Returns a descriptive string for the schema construct represented by this node'''
         return type(self)._schemaConstruct
 
+    @property
+    def _derivedStateGeneration(self):
+        '''The current generation of the derived state of the schema to which the node belongs.'''
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node._derivedState.generation
+
     def allParentNodes(self, classinfo=object):
         '''Iterate all parent nodes of this node, in ascending order, if they are instances of classinfo'''
         node = self.parent
@@ -176,8 +237,10 @@ class SchemaNode(object):
 
     def validate(self, errs):
         '''Check the node for syntactical and structural errors and
-           add exceptions describing any errors found to the given list'''
-        pass
+           add exceptions describing any errors found to the given list.
+           The checks are performed by the registered validation rules for the
+           node's class (see rules.py).'''
+        checkNode(self, errs)
 
     def summarize(self, output=None, level=0, indent='  '):
         genString = (output is None)
@@ -189,7 +252,8 @@ class SchemaNode(object):
     def _summarize(self, output, level, indent):
         curIndent = indent*level
         output.write('%s%s\n' % (curIndent, self._summaryTitle))
-        output.write('%s%spos: %s\n' % (curIndent, indent, self.sourceRef.posStr()))
+        if self.sourceRef is not None:
+            output.write('%s%spos: %s\n' % (curIndent, indent, self.sourceRef.posStr()))
         if isinstance(self, HasDocumentation) and self.docs is not None:
             output.write('%s%sdocs: %s\n' % (curIndent, indent, self._summarizeDocs()))
         if isinstance(self, HasQualifiers):
@@ -254,12 +318,14 @@ class IntegerTypeNode(HasQualifiers, TypeNode):
         for node in self.values:
             yield node
 
-    def isInRange(self, val):
+    @property
+    def bounds(self):
+        '''A tuple containing the lowest and highest values allowed by the type, as
+           determined by its range qualifier, or by its default width (64 bits).'''
         if self._upperBound is None:
             range = self.getQualifier(Range)
             width = range.width if range is not None else 64
             if width is not None:
-                width = range.width if range is not None else 64
                 if isinstance(self, SignedIntegerType):
                     self._lowerBound = (2 ** (width - 1)) * -1
                     self._upperBound = (2 ** (width - 1)) - 1
@@ -270,7 +336,27 @@ class IntegerTypeNode(HasQualifiers, TypeNode):
             else:
                 self._lowerBound = range.lowerBound
                 self._upperBound = range.upperBound
-        return (val >= self._lowerBound) and (val <= self._upperBound)
+        return (self._lowerBound, self._upperBound)
+
+    def isInRange(self, val):
+        (lowerBound, upperBound) = self.bounds
+        return (val >= lowerBound) and (val <= upperBound)
+
+    def _checkDuplicateEnumNames(self, errs):
+        '''Confirm all enumerated values of the type have distinct names.'''
+        self._checkUniqueNames(self.values, 'enumerated value', errs)
+
+    def _checkDuplicateEnumValues(self, errs):
+        '''Confirm all enumerated values of the type have distinct integer values.'''
+        valueSeen = {}
+        for node in self.values:
+            if node.value is not None:
+                if not node.value in valueSeen:
+                    valueSeen[node.value] = True
+                else:
+                    _addSchemaError(errs, msg='duplicate enumerated integer value in %s: %s' % (self.schemaConstruct, node.value),
+                                    detail='enumerated values within a %s must have unique integer values' % self.schemaConstruct,
+                                    sourceRef=node.valueSourceRef)
 
     def _summarize(self, output, level, indent):
         super(IntegerTypeNode, self)._summarize(output, level, indent)
@@ -302,18 +388,19 @@ class SequencedTypeNode(HasQualifiers, TypeNode):
     def getElement(self, elemName):
         return next((e for e in self.allTypePatternElements() if e.name == elemName), None)
         
-    def validate(self, errs):
-        super(SequencedTypeNode, self).validate(errs)
+    def _checkFieldGroupUsage(self, errs):
+        '''Confirm element types are not FIELD GROUPs or references to such.'''
         # for uniform array/list...
         if self.elemType is not None:
-            # Confirm element type is not FIELD GROUP or reference to such.
             self._checkIsNotFieldGroup(self.elemType, errs)
         # for pattern array/list...
         else:
-            # Confirm element types are not FIELD GROUPs or references to such.
             for node in self.elemTypePattern:
                 self._checkIsNotFieldGroup(node.type, errs)
-            # Confirm all named items have distinct names.
+
+    def _checkDuplicateItemNames(self, errs):
+        '''Confirm all named items in a pattern array/list have distinct names.'''
+        if self.elemTypePattern is not None:
             self._checkUniqueNames(self.elemTypePattern, 'item', errs)
 
     def _summarize(self, output, level, indent):
@@ -364,13 +451,6 @@ class StructuredTypeNode(HasQualifiers, TypeNode):
     def getField(self, fieldName):
         return next((f for f in self.allFields() if f.name == fieldName), None)
         
-    def validate(self, errs):
-        super(StructuredTypeNode, self).validate(errs)
-        self._checkDuplicateIncludes(errs)
-        self._checkDuplicateFieldNames(errs)
-        self._checkMissingOrInvalidTags(errs)
-        self._checkDuplicateTags(errs)
-
     def _summarize(self, output, level, indent):
         super(StructuredTypeNode, self)._summarize(output, level, indent)
         self._summarizeList(output, self.members, 'members', level=level+1, indent=indent)
@@ -473,6 +553,22 @@ class SchemaFile(SchemaNode):
         self.fileName = fileName
         self.schemaText = schemaText
         self.statements = None
+        self.syntaxErrors = None    # errors for statements omitted due to syntax errors
+        self._editHandler = None
+        self._sourceRefIndex = None
+
+    def applyEdit(self, startPos, endPos, newText):
+        '''Replace the text between startPos and endPos with newText, and update the nodes
+           of the file accordingly.
+           Only the statements affected by the edit are re-parsed; the positions of the
+           nodes that follow them are shifted.  Statements that contain syntax errors are
+           omitted.  Returns a list of errors found in the re-parsed statements, including
+           errors reported by validating them.  Note that the consistency of the re-parsed
+           statements with the rest of the schema (e.g. references to them from other
+           statements) is only checked by a full call to validate().'''
+        if self._editHandler is None:
+            raise ValueError('Schema file does not support edits')
+        return self._editHandler(self, startPos, endPos, newText)
         
     def allChildNodes(self):
         for node in super(SchemaFile, self).allChildNodes():
@@ -537,8 +633,8 @@ class Range(QualifierNode):
             self.lowerBound = lowerBound
             self.upperBound = upperBound
 
-    def validate(self, errs):
-        super(Range, self).validate(errs)
+    def _checkBounds(self, errs):
+        '''Check the bounds of the range, based on the type it qualifies'''
         # Check that upperBound >= lowerBound 
         if self.width is None:
             if self.lowerBound is not None and self.upperBound is not None:
@@ -575,8 +671,8 @@ class Length(QualifierNode):
         self.lowerBound = lowerBound
         self.upperBound = upperBound
 
-    def validate(self, errs):
-        super(Length, self).validate(errs)
+    def _checkBounds(self, errs):
+        '''Check the bounds of the length'''
         # Check that lowerBound and upperBound >= 0 
         if self.lowerBound < 0 or (self.upperBound is not None and self.upperBound < 0):
             _addSchemaError(errs, msg='bounds of length qualifier must be >= 0',
@@ -705,14 +801,15 @@ class Vendor(HasName, HasQualifiers, HasDocumentation, SchemaNode):
                 self._id = idQual.idNum 
         return self._id
 
-    def validate(self, errs):
-        super(Vendor, self).validate(errs)
-        # Confirm that VENDOR is not within a namespace or PROFILE
+    def _checkScope(self, errs):
+        '''Confirm that VENDOR is not within a namespace or PROFILE'''
         if self.nextParentNode(Namespace) is not None:
             _addSchemaError(errs, msg='VENDOR definition not at global scope',
                             detail='VENDOR definitions may not appear within a namespace or PROFILE definition',
                             sourceRef=self.sourceRef)
-        # Confirm that id qualifier is present
+
+    def _checkInvalidOrMissingId(self, errs):
+        '''Verify that the id qualifier is present and valid'''
         idQual = self.getQualifier(Id)
         if idQual is None:
             _addSchemaError(errs, msg='id qualifier missing on VENDOR definition',
@@ -746,13 +843,6 @@ class Profile(HasQualifiers, Namespace):
                     self._id = (vendorId << 16) + idQual.idNum
         return self._id
 
-    def validate(self, errs):
-        super(Profile, self).validate(errs)
-        self._checkNestedProfiles(errs)
-        self._checkInvalidOrMissingId(errs)
-        self._checkDuplicateMessageIds(errs)
-        self._checkDuplicateStatusCodeIds(errs)
-
     def getMessage(self, name):
         for msg in self.allStatements(Message):
             if msg.name == name:
@@ -859,14 +949,15 @@ class Message(HasScopedName, HasQualifiers, HasDocumentation, SchemaNode):
         if self.payload is not None:
             yield self.payload
 
-    def validate(self, errs):
-        super(Message, self).validate(errs)
-        # Confirm that MESSAGE is directly within a PROFILE definition
+    def _checkScope(self, errs):
+        '''Confirm that MESSAGE is directly within a PROFILE definition'''
         if not isinstance(self.parent, Profile):
             _addSchemaError(errs, msg='MESSAGE definition not within PROFILE definition',
                             detail='MESSAGE definitions must appear directly within a PROFILE definition',
                             sourceRef=self.sourceRef)
-        # Confirm that id qualifier is present
+
+    def _checkInvalidOrMissingId(self, errs):
+        '''Verify that the id qualifier is present and valid'''
         idQual = self.getQualifier(Id)
         if idQual is None:
             _addSchemaError(errs, msg='id qualifier missing on MESSAGE definition',
@@ -903,14 +994,15 @@ class StatusCode(HasScopedName, HasQualifiers, HasDocumentation, SchemaNode):
         else:
             return None
         
-    def validate(self, errs):
-        super(StatusCode, self).validate(errs)
-        # Confirm that STATUS CODE is directly within a PROFILE definition
+    def _checkScope(self, errs):
+        '''Confirm that STATUS CODE is directly within a PROFILE definition'''
         if not isinstance(self.parent, Profile):
             _addSchemaError(errs, msg='STATUS CODE definition not within PROFILE definition',
                             detail='STATUS CODE definitions must appear directly within a PROFILE definition',
                             sourceRef=self.sourceRef)
-        # Confirm that id qualifier is present
+
+    def _checkInvalidOrMissingId(self, errs):
+        '''Verify that the id qualifier is present and valid'''
         idQual = self.getQualifier(Id)
         if idQual is None:
             _addSchemaError(errs, msg='id qualifier missing on STATUS CODE definition',
@@ -994,6 +1086,16 @@ class FloatType(HasQualifiers, TypeNode):
     '''Represents a FLOAT type'''
     _schemaConstruct = 'FLOAT type'
     _allowedQualifiers = (Range, Nullable)
+
+    @property
+    def bounds(self):
+        '''A tuple containing the lowest and highest values allowed by the type's range
+           qualifier, or (None, None) if the type has no range qualifier, or one that only
+           specifies a width.'''
+        range = self.getQualifier(Range)
+        if range is None or range.width is not None:
+            return (None, None)
+        return (range.lowerBound, range.upperBound)
     
 class BooleanType(HasQualifiers, TypeNode):
     '''Represents a BOOLEAN type'''
@@ -1036,10 +1138,6 @@ class StructureType(StructuredTypeNode):
     _schemaConstruct = 'STRUCTURE type'
     _allowedQualifiers = (Extensible, TagOrder, SchemaOrder, AnyOrder, Private, Invariant, Nullable)
     
-    def validate(self, errs):
-        super(StructureType, self).validate(errs)
-        self._checkOneOrderQual(errs)
-
     def _checkOneOrderQual(self, errs):
         '''Confirm only one of schema-order, tag-order, any-order applied to STRUCTURE'''
         orderQualSeen = False
@@ -1067,15 +1165,17 @@ class ChoiceType(HasQualifiers, TypeNode):
         super(ChoiceType, self).__init__(sourceRef)
         self.alternates = []
         self._possibleTags = None
+        self._leafAlternates = None
+        self._cacheGeneration = None
 
     @property
     def possibleTags(self):
         '''A list of the tags associated with all possible leaf alternates of the Choice type.
            The list will include a None if one or more of the alternates does not have an
            assigned tag.'''
-        if self._possibleTags is None:
+        if self._possibleTags is None or self._cacheGeneration is not self._derivedStateGeneration:
             tagSet = {}
-            for (altChain, name, tag) in self.allLeafAlternatesWithNamesAndTags():
+            for (altChain, name, tag) in self.leafAlternates:
                 if tag is not None:
                     tagSet[tag.asTuple()] = tag
                 else:
@@ -1087,6 +1187,31 @@ class ChoiceType(HasQualifiers, TypeNode):
                 self._possibleTags = []
         return self._possibleTags
 
+    @property
+    def leafAlternates(self):
+        '''A table describing all leaf ChoiceAlternate nodes of the current ChoiceType node,
+           including any contained within nested ChoiceType nodes.  The table is a tuple
+           with an entry for each leaf alternate, in the order returned by
+           allLeafAlternatesWithNamesAndTags(), consisting of a 3-tuple containing: 1) the
+           chain of ChoiceAlternate nodes leading to the leaf node, as a tuple, 2) the
+           effective name of the node and 3) the effective default tag for the node.
+           The table is computed once, from the tables of any nested ChoiceTypes, and
+           shared by all references to the type until references are next resolved.'''
+        if self._leafAlternates is None or self._cacheGeneration is not self._derivedStateGeneration:
+            self._possibleTags = None
+            leafAlternates = []
+            for alt in self.alternates:
+                altTag = alt.defaultTag
+                if alt.isLeafAlternate:
+                    leafAlternates.append(((alt,), alt.name, altTag))
+                else:
+                    # The tag of the outermost alternate in a chain takes precedence.
+                    for (nestedAltChain, name, tag) in alt.targetType.leafAlternates:
+                        leafAlternates.append((nestedAltChain + (alt,), name, altTag if altTag is not None else tag))
+            self._leafAlternates = tuple(leafAlternates)
+            self._cacheGeneration = self._derivedStateGeneration
+        return self._leafAlternates
+
     def allChildNodes(self):
         for node in super(ChoiceType, self).allChildNodes():
             yield node
@@ -1098,13 +1223,8 @@ class ChoiceType(HasQualifiers, TypeNode):
            any contained within nested ChoiceType nodes.  For each such node it returns 3-tuple
            containing: 1) the chain of ChoiceAlternate nodes leading to the leaf node, 2) the
            effective name of the node and 3) the effective default tag for the node.'''
-        for altChain in self.allLeafAlternateChains():
-            defaultTag = None
-            for alt in reversed(altChain):
-                defaultTag = alt.defaultTag
-                if defaultTag is not None:
-                    break
-            yield (altChain, altChain[0].name, defaultTag)
+        for (altChain, name, tag) in self.leafAlternates:
+            yield (list(altChain), name, tag)
 
     def allLeafAlternateChains(self, superiorAltChain=[]):
         '''Enumerates all leaf ChoiceAlternate nodes of the current ChoiceType node, as well
@@ -1115,22 +1235,12 @@ class ChoiceType(HasQualifiers, TypeNode):
            leading to the leaf alternate, given in ascending order.  As such, the last element
            in each array is always a ChoiceAlternate node that resides immediately within the
            current ChoiceType node.'''
-        for alt in self.alternates:
-            altChain = superiorAltChain.copy()
-            altChain.insert(0, alt)
-            if alt.isLeafAlternate:
-                yield altChain
-            else:
-                for nestedAltChain in alt.targetType.allLeafAlternateChains(superiorAltChain=altChain):
-                    yield nestedAltChain
+        for (altChain, name, tag) in self.leafAlternates:
+            yield list(altChain) + superiorAltChain
 
     def getAlternate(self, altName):
         return next((a for a in self.alternates if a.name == altName), None)
 
-    def validate(self, errs):
-        super(ChoiceType, self).validate(errs)
-        self._checkDuplicateAlternateNames(errs)
-
     def _checkDuplicateAlternateNames(self, errs):
         '''Confirm all alternates immediately within the ChoiceType have distinct names.'''
         nameSeen = {}
@@ -1189,9 +1299,8 @@ class IntegerEnumValue(HasName, HasDocumentation, SchemaNode):
         self.value = None
         self.valueSourceRef = None
 
-    def validate(self, errs):
-        super(IntegerEnumValue, self).validate(errs)
-        # Check value is in range for integer type
+    def _checkValueInRange(self, errs):
+        '''Check value is in range for integer type'''
         if not self.parent.isInRange(self.value):
             _addSchemaError(errs, msg='enumerated integer value out of range: %s' % self.value,
                             sourceRef=self.valueSourceRef)
@@ -1210,6 +1319,7 @@ class StructureField(HasName, HasQualifiers, HasDocumentation, SchemaNode):
         super(StructureField, self).__init__(sourceRef)
         self.type = None
         self._possibleTags = None
+        self._cacheGeneration = None
         
     @property
     def targetType(self):
@@ -1252,7 +1362,7 @@ class StructureField(HasName, HasQualifiers, HasDocumentation, SchemaNode):
            default tag.
            If no tag has been specified, either directly or indirectly, an empty list is
            returned.'''
-        if self._possibleTags is None:
+        if self._possibleTags is None or self._cacheGeneration is not self._derivedStateGeneration:
             tag = self.getQualifier(Tag)
             if tag is None:
                 type = self.type
@@ -1265,6 +1375,7 @@ class StructureField(HasName, HasQualifiers, HasDocumentation, SchemaNode):
                 self._possibleTags = type.possibleTags
             else:
                 self._possibleTags = []
+            self._cacheGeneration = self._derivedStateGeneration
         return self._possibleTags
 
     def allChildNodes(self):
@@ -1273,8 +1384,7 @@ class StructureField(HasName, HasQualifiers, HasDocumentation, SchemaNode):
         if self.type is not None:
             yield self.type
 
-    def validate(self, errs):
-        super(StructureField, self).validate(errs)
+    def _checkFieldGroupUsage(self, errs):
         self._checkIsNotFieldGroup(self.type, errs)
 
     def _summarize(self, output, level, indent):
@@ -1294,9 +1404,8 @@ class StructureIncludes(SchemaNode):
         self.targetTypeDef = None
         self.targetType = None
 
-    def validate(self, errs):
-        super(StructureIncludes, self).validate(errs)
-        # Check that target names a FIELD GROUP
+    def _checkTarget(self, errs):
+        '''Check that target names a FIELD GROUP'''
         if self.targetType is not None and not isinstance(self.targetType, FieldGroupType):
             _addSchemaError(errs, msg='invalid target for includes statement',
                             detail='an includes statement within a STRUCTURE or FIELD GROUP must refer to a FIELD GROUP type',
@@ -1356,8 +1465,7 @@ class ChoiceAlternate(HasName, HasQualifiers, HasDocumentation, SchemaNode):
         if self.type is not None:
             yield self.type
 
-    def validate(self, errs):
-        super(ChoiceAlternate, self).validate(errs)
+    def _checkFieldGroupUsage(self, errs):
         self._checkIsNotFieldGroup(self.type, errs)
 
     def _summarize(self, output, level, indent):
@@ -1378,6 +1486,7 @@ class LinearTypePatternElement(HasName, HasQualifiers, HasDocumentation, SchemaN
         self.lowerBound = None
         self.upperBound = None
         self._possibleTags = None
+        self._cacheGeneration = None
 
     @property
     def targetType(self):
@@ -1420,7 +1529,7 @@ class LinearTypePatternElement(HasName, HasQualifiers, HasDocumentation, SchemaN
            default tag.
            If no tag has been specified, either directly or indirectly, an empty list is
            returned.'''
-        if self._possibleTags is None:
+        if self._possibleTags is None or self._cacheGeneration is not self._derivedStateGeneration:
             tag = self.getQualifier(Tag)
             if tag is None:
                 type = self.type
@@ -1433,6 +1542,7 @@ class LinearTypePatternElement(HasName, HasQualifiers, HasDocumentation, SchemaN
                 self._possibleTags = type.possibleTags
             else:
                 self._possibleTags = []
+            self._cacheGeneration = self._derivedStateGeneration
         return self._possibleTags
 
     def allChildNodes(self):
@@ -1463,6 +1573,8 @@ class LinearTypePatternElement(HasName, HasQualifiers, HasDocumentation, SchemaN
 class SourceRef(object):
     '''Identifies a source of schema (e.g. a file), and start / end text positions within that source.'''
 
+    __slots__ = ('schemaFile', 'startLine', 'startCol', 'startPos', 'endLine', 'endCol', 'endPos')
+
     def __init__(self, schemaFile, startLine, startCol, startPos, endLine=None, endCol=None, endPos=None):
         self.schemaFile = schemaFile
         self.startLine = startLine
@@ -1503,7 +1615,7 @@ class SourceRef(object):
 
     @staticmethod
     def fromMeta(schemaFile, meta):
-        if meta is None:
+        if meta is None or meta.empty:
             return None
         return SourceRef(schemaFile, 
                          startLine=meta.line, startCol=meta.column, startPos=meta.start_pos,
@@ -1518,4 +1630,60 @@ class SourceRef(object):
                          startLine=token.line, startCol=token.column, startPos=token.pos_in_stream,
                          endLine=token.end_line, endCol=token.end_column, endPos=endPos)
 
-        
+
+# ----- Validation Rules
+
+# Node rules, in the order in which they are applied to each node.
+registerRule(ValidationRule('allowed-qualifiers', HasQualifiers._checkAllowedQualifiers, HasQualifiers,
+                            'qualifiers are allowed on the constructs they qualify'))
+registerRule(ValidationRule('duplicate-qualifiers', HasQualifiers._checkDuplicateQualifiers, HasQualifiers,
+                            'qualifiers appear at most once per construct'))
+registerRule(ValidationRule('range-bounds', Range._checkBounds, Range,
+                            'range qualifier bounds are ordered and suit the qualified type'))
+registerRule(ValidationRule('length-bounds', Length._checkBounds, Length,
+                            'length qualifier bounds are non-negative and ordered'))
+registerRule(ValidationRule('vendor-scope', Vendor._checkScope, Vendor,
+                            'VENDOR definitions are at global scope'))
+registerRule(ValidationRule('vendor-id', Vendor._checkInvalidOrMissingId, Vendor,
+                            'VENDOR definitions have valid ids'))
+registerRule(ValidationRule('nested-profiles', Profile._checkNestedProfiles, Profile,
+                            'PROFILE definitions are not nested'))
+registerRule(ValidationRule('profile-id', Profile._checkInvalidOrMissingId, Profile,
+                            'PROFILE definitions have valid ids'))
+registerRule(ValidationRule('duplicate-message-ids', Profile._checkDuplicateMessageIds, Profile,
+                            'MESSAGE ids are unique within a PROFILE'))
+registerRule(ValidationRule('duplicate-status-code-ids', Profile._checkDuplicateStatusCodeIds, Profile,
+                            'STATUS CODE ids are unique within a PROFILE'))
+registerRule(ValidationRule('message-scope', Message._checkScope, Message,
+                            'MESSAGE definitions are directly within a PROFILE'))
+registerRule(ValidationRule('message-id', Message._checkInvalidOrMissingId, Message,
+                            'MESSAGE definitions have valid ids'))
+registerRule(ValidationRule('status-code-scope', StatusCode._checkScope, StatusCode,
+                            'STATUS CODE definitions are directly within a PROFILE'))
+registerRule(ValidationRule('status-code-id', StatusCode._checkInvalidOrMissingId, StatusCode,
+                            'STATUS CODE definitions have valid ids'))
+registerRule(ValidationRule('field-group-usage', lambda node, errs: node._checkFieldGroupUsage(errs),
+                            (SequencedTypeNode, StructureField, ChoiceAlternate),
+                            'FIELD GROUP types are only used in includes statements'))
+registerRule(ValidationRule('duplicate-item-names', SequencedTypeNode._checkDuplicateItemNames, SequencedTypeNode,
+                            'items in ARRAY and LIST patterns have unique names'))
+registerRule(ValidationRule('duplicate-includes', StructuredTypeNode._checkDuplicateIncludes, StructuredTypeNode,
+                            'a FIELD GROUP is included at most once'))
+registerRule(ValidationRule('duplicate-field-names', StructuredTypeNode._checkDuplicateFieldNames, StructuredTypeNode,
+                            'fields have unique names, including included fields'))
+registerRule(ValidationRule('missing-tags', StructuredTypeNode._checkMissingOrInvalidTags, StructuredTypeNode,
+                            'fields declare valid tags'))
+registerRule(ValidationRule('duplicate-tags', StructuredTypeNode._checkDuplicateTags, StructuredTypeNode,
+                            'fields have unique tags, including included fields'))
+registerRule(ValidationRule('order-qualifiers', StructureType._checkOneOrderQual, StructureType,
+                            'a STRUCTURE has at most one order qualifier'))
+registerRule(ValidationRule('duplicate-alternate-names', ChoiceType._checkDuplicateAlternateNames, ChoiceType,
+                            'CHOICE OF alternates have unique names'))
+registerRule(ValidationRule('duplicate-enum-names', IntegerTypeNode._checkDuplicateEnumNames, IntegerTypeNode,
+                            'enumerated values of an INTEGER type have unique names'))
+registerRule(ValidationRule('duplicate-enum-values', IntegerTypeNode._checkDuplicateEnumValues, IntegerTypeNode,
+                            'enumerated values of an INTEGER type have unique integer values'))
+registerRule(ValidationRule('enum-value-range', IntegerEnumValue._checkValueInRange, IntegerEnumValue,
+                            'enumerated values are within the range of their INTEGER type'))
+registerRule(ValidationRule('includes-target', StructureIncludes._checkTarget, StructureIncludes,
+                            'includes statements refer to FIELD GROUP types'))
@@ -23,76 +23,212 @@
 import sys
 import os
 import io
+import asyncio
+import concurrent.futures
+import multiprocessing
 
 from lark import Lark
 from lark.exceptions import LarkError, UnexpectedCharacters, UnexpectedToken, VisitError
 from collections import defaultdict
 
 from .node import *
-from .node import _addSchemaError
-from .transformer import _SchemaTransformer
+from .node import _addSchemaError, DerivedState
+from .transformer import _SchemaTransformer, _StatementsTransformer
+from .builder import _SchemaBuilder
+from .lexer import _FastLexer
+from .recovery import recoverStatements, _recoverRegion
+from .incremental import findEditRegion, SourceRefIndex
+from .query import QueryIndex
+from .diff import diffSchemas
+from .canonical import StructuralHasher, ArtifactCache
+from .lazy import LazySchemaFile, scanStatements, KIND_VENDOR, KIND_PROFILE, KIND_TYPE
+from .bundle import readBundle
+from .rules import ValidationRule, RuleSet, registerRule
+from . import serialization
 
 class WeaveTLVSchema(object):
     EBNFFileName = 'tlv-schema-ebnf.txt'
-    
-    _schemaParser = None
+
+    # Parser front ends.  The 'tree' front end builds a complete Lark parse tree and
+    # then transforms it into an AST.  The 'single-pass' front end builds the AST
+    # directly from within the parser.  Both produce identical ASTs and errors.
+    FRONT_END_TREE = 'tree'
+    FRONT_END_SINGLE_PASS = 'single-pass'
+    frontEnds = (FRONT_END_TREE, FRONT_END_SINGLE_PASS)
+
+    # Front end used by WeaveTLVSchema objects for which one isn't specified.
+    defaultFrontEnd = FRONT_END_TREE
+
+    # Lexers.  The 'standard' lexer is the stock Lark lexer.  The 'fast' lexer is an
+    # optimized lexer specific to the TLV schema grammar, which produces the same tokens.
+    LEXER_STANDARD = 'standard'
+    LEXER_FAST = 'fast'
+    lexers = (LEXER_STANDARD, LEXER_FAST)
+
+    # Lexer used by WeaveTLVSchema objects for which one isn't specified.
+    defaultLexer = LEXER_STANDARD
+
+    _schemaSyntax = None
+    _schemaParsers = {}
+    _schemaBuilders = {}
     
     _defaultSchema = '''
 common => VENDOR [ id 0 ] 
 '''
     
-    def __init__(self):
-        if WeaveTLVSchema._schemaParser is None:
-            scriptDir = os.path.dirname(os.path.realpath(__file__))
-            with open(os.path.join(scriptDir, WeaveTLVSchema.EBNFFileName), "r") as s:
-                schemaSyntax = s.read()
-                WeaveTLVSchema._schemaParser = Lark(schemaSyntax, parser='lalr', lexer='standard', 
-                                                    start='file', propagate_positions=True)
+    def __init__(self, lazy=False, frontEnd=None, lexer=None):
+        '''Create a WeaveTLVSchema object.
+           frontEnd selects the parser front end used to load schema files (one of
+           frontEnds). If not given, defaultFrontEnd is used.
+           lexer selects the lexer used to load schema files (one of lexers). If not
+           given, defaultLexer is used.
+           If lazy is True, schema files are not fully parsed when loaded.  Instead, the
+           top-level statements within each file are parsed on demand, either when a
+           definition within the statement is looked up by name, or when the schema is
+           validated.  In this mode, syntax errors are reported by validate() rather
+           than raised by the load methods.'''
+        if frontEnd is None:
+            frontEnd = WeaveTLVSchema.defaultFrontEnd
+        if frontEnd not in WeaveTLVSchema.frontEnds:
+            raise ValueError('Unknown parser front end: %s' % frontEnd)
+        if lexer is None:
+            lexer = WeaveTLVSchema.defaultLexer
+        if lexer not in WeaveTLVSchema.lexers:
+            raise ValueError('Unknown lexer: %s' % lexer)
+        self._frontEnd = frontEnd
+        self._lexer = lexer
+        if frontEnd == WeaveTLVSchema.FRONT_END_SINGLE_PASS:
+            self._schemaParser = None
+            self._schemaBuilder = WeaveTLVSchema._getSchemaBuilder(lexer)
+        else:
+            self._schemaParser = WeaveTLVSchema._getSchemaParser(lexer)
+            self._schemaBuilder = None
         self._schemaFiles = []
         self._vendors = defaultdict(list)
         self._namespaces = defaultdict(list)
         self._profiles = defaultdict(list)
         self._typeDefs = defaultdict(list)
         self._defaultSchemaLoaded = False
+        self._lazy = lazy
+        self._lazyIndex = defaultdict(list)
+        self._typeReferences = defaultdict(list)
+        self._vendorReferences = defaultdict(list)
+        self._profileReferences = defaultdict(list)
+        self._importTables = {}
+        self._namespaceMembers = {}
+        self._unindexedFiles = []
+        self._queryIndex = None
+        self._structuralHasher = None
+        self._artifactCache = None
+        self._derivedState = DerivedState()
+        self.ruleStats = {}
 
-    def loadSchemaFromStream(self, stream, fileName=None):
+    def loadSchemaFromStream(self, stream, fileName=None, errs=None):
         '''Load a TLV schema from a given input stream.
            If successful, a SchemaFile object is returned.
            If fileName is given, it is used to set the fileName attribute of the returned
-           SchemaFile. This can be useful in error reporting.'''
+           SchemaFile. This can be useful in error reporting.
+           If errs is given, syntax errors do not cause the load to fail.  Instead, an error
+           is appended to errs for each statement that fails to parse, and the returned
+           SchemaFile contains the remaining, valid statements.  (In lazy mode, syntax errors
+           are always reported by validate().)'''
         if fileName is None:
             if hasattr(stream, 'name'):
                 fileName = stream.name
             else:
                 fileName = '(stream)'
         schemaText = stream.read()
-        
-        schemaFile = SchemaFile(fileName, schemaText)
-        
-        try:
-            schemaTree = WeaveTLVSchema._schemaParser.parse(schemaText)
-            _SchemaTransformer(schemaFile).transform(schemaTree)
-        except LarkError as parseErr:
-            raise self._translateParseError(parseErr, schemaFile) from None
-        
-        self._schemaFiles.append(schemaFile)
-        self._indexNodes(schemaFile)
-
+        schemaFile = self._parseSchemaText(fileName, schemaText, recover=(errs is not None))
+        if errs is not None and schemaFile.syntaxErrors is not None:
+            errs += schemaFile.syntaxErrors
+        self._addSchemaFile(schemaFile)
         return schemaFile
     
-    def loadSchemaFromFile(self, fileName):
+    def loadSchemaFromFile(self, fileName, errs=None):
         '''Load a TLV schema from a named text file.
-           If successful, a SchemaFile object is returned.'''
+           If successful, a SchemaFile object is returned.
+           If errs is given, syntax errors are appended to errs, as described for
+           loadSchemaFromStream().'''
         with open(fileName, "r") as f:
-            return self.loadSchemaFromStream(f, fileName)
+            return self.loadSchemaFromStream(f, fileName, errs=errs)
 
-    def loadSchemaFromString(self, s, fileName='(string)'):
+    def loadSchemaFromString(self, s, fileName='(string)', errs=None):
         '''Load a TLV schema from a named text file.
            If successful, a SchemaFile object is returned.
            If fileName is given, it is used to set the fileName attribute of the returned
-           SchemaFile. This can be useful in error reporting.'''
+           SchemaFile. This can be useful in error reporting.
+           If errs is given, syntax errors are appended to errs, as described for
+           loadSchemaFromStream().'''
         with io.StringIO(s) as f:
-            return self.loadSchemaFromStream(f, fileName)
+            return self.loadSchemaFromStream(f, fileName, errs=errs)
+
+    async def aloadSchemaFromFile(self, fileName, errs=None, executor=None):
+        '''Asynchronous form of loadSchemaFromFile().
+           The file is read and parsed using the given concurrent.futures.Executor, or the
+           event loop's default executor if executor is None, and the resulting SchemaFile
+           is added to the schema on the event loop thread.'''
+        return (await self.aloadSchemaFiles([ fileName ], errs=errs, executor=executor))[0]
+
+    async def aloadSchemaFiles(self, fileNames, errs=None, executor=None, concurrency=None):
+        '''Load TLV schemas from a list of named text files, reading and parsing the files
+           concurrently, without blocking the event loop.
+           Files are read and parsed using the given concurrent.futures.Executor, or the
+           event loop's default executor if executor is None.  Parsing in a process pool
+           (e.g. a ProcessPoolExecutor) allows files to be parsed in parallel; in this case
+           the parsed files are transferred in serialized form.  At most concurrency files
+           (by default, the number of CPUs) are submitted to the executor at a time.
+           Once all files have been parsed, they are added to the schema on the event loop
+           thread, in the order given, and a list of the resulting SchemaFile objects is
+           returned in the same order.
+           If errs is given, syntax errors are appended to errs, as described for
+           loadSchemaFromStream().  Otherwise the first file (in the order given) containing
+           a syntax error causes the load to fail, and neither it nor the files following it
+           are added to the schema.
+           In lazy mode, files are scanned for top-level statements rather than parsed.'''
+        loop = asyncio.get_running_loop()
+        serialize = isinstance(executor, concurrent.futures.ProcessPoolExecutor)
+        semaphore = asyncio.Semaphore(concurrency or os.cpu_count() or 1)
+        jobArgs = (self._frontEnd, self._lexer, self._lazy, errs is not None, serialize)
+
+        async def parseFile(fileName):
+            async with semaphore:
+                return await loop.run_in_executor(executor, _parseSchemaFile, fileName, *jobArgs)
+
+        results = await asyncio.gather(*(parseFile(fileName) for fileName in fileNames))
+
+        schemaFiles = []
+        for (fileName, result) in zip(fileNames, results):
+            (schemaFile, fileErrs) = self._unpackParseResult(fileName, result, errs is not None, serialize)
+            if errs is None and len(fileErrs) > 0:
+                raise fileErrs[0]
+            if errs is not None:
+                errs += fileErrs
+            self._addSchemaFile(schemaFile)
+            schemaFiles.append(schemaFile)
+        return schemaFiles
+
+    def loadSerializedSchema(self, stream):
+        '''Load a TLV schema from a binary input stream containing a SchemaFile previously
+           serialized using serialization.dump().
+           If successful, the reconstructed SchemaFile object is returned.'''
+        schemaFile = serialization.load(stream)
+        schemaFile._editHandler = self._applyEdit
+        self._schemaFiles.append(schemaFile)
+        self._indexNodes(schemaFile)
+        return schemaFile
+
+    def loadBundle(self, fileName, verify=False):
+        '''Load the schema files contained in a bundle (see bundle.writeBundle()).
+           Returns a list of the loaded SchemaFile objects.
+           The bundle is memory-mapped, and its files are loaded lazily, using the
+           definition index contained in the bundle, regardless of whether lazy loading
+           is enabled.  Syntax errors are reported by validate().
+           If verify is True, the text of each file is checked against the content hash
+           recorded in the bundle.'''
+        schemaFiles = readBundle(fileName, self._parseRegion, verify=verify)
+        for schemaFile in schemaFiles:
+            self._addSchemaFile(schemaFile)
+        return schemaFiles
 
     def loadDefaultSchema(self):
         '''Load the build-in default schema.
@@ -103,19 +239,32 @@ common => VENDOR [ id 0 ]
             self.loadSchemaFromString(self._defaultSchema, fileName='(default)')
             self._defaultSchemaLoaded = True
 
-    def validate(self, errs=None):
+    def validate(self, errs=None, rules=None, jobs=1):
         '''Check the loaded schema files for syntactical and structural errors and
-           return a list of exceptions describing any errors found.'''
+           return a list of exceptions describing any errors found.
+           If rules is given, only the given validation rules (see rules.selectRules())
+           are applied.  Otherwise all registered rules are.  Statistics for each rule
+           applied are available in the ruleStats attribute after validation.
+           If jobs is greater than 1 (or 0, for one job per CPU), the validation rules are
+           applied to the schema files in parallel, using that many worker processes.  The
+           workers are forked from the current process once references have been resolved,
+           and so share the resolved schema rather than loading it themselves.  Errors are
+           reported in the same order as when validating serially.  Parallel validation is
+           only supported on platforms that support forking processes; elsewhere, jobs is
+           ignored.'''
         errs = errs if errs is not None else []
-        self.loadDefaultSchema()
-        self._resolveTypeReferences(errs)
-        self._resolveVendorReferences(errs)
-        self._resolveProfileReferences(errs)
-        for node in self.allNodes():
-            node.validate(errs)
-        self._checkInconsistentVendorIds(errs)
-        self._checkInconsistentProfileIds(errs)
-        self._checkUniqueProfileIds(errs)
+        for _ in self._validationPhases(errs, rules, jobs):
+            pass
+        return errs
+
+    async def avalidate(self, errs=None, rules=None):
+        '''Asynchronous form of validate(), which yields to the event loop between the
+           phases of validation (including between the validation of each schema file),
+           so that the event loop remains responsive while a large schema is validated.
+           The schema must not be modified until avalidate() completes.'''
+        errs = errs if errs is not None else []
+        for _ in self._validationPhases(errs, rules):
+            await asyncio.sleep(0)
         return errs
     
     def allNodes(self, classinfo=object):
@@ -136,7 +285,7 @@ common => VENDOR [ id 0 ]
         typeDefList = self._typeDefs.get(typeName, None)
         if typeDefList is not None:
             return typeDefList[0]
-        return None
+        return self._lazyLookup(KIND_TYPE, typeName, TypeDef, lambda n: n.fullyQualifiedName)
 
     def getProfile(self, profileName):
         '''Lookup a Profile node by name.
@@ -145,7 +294,7 @@ common => VENDOR [ id 0 ]
         profileList = self._profiles.get(profileName, None)
         if profileList is not None:
             return profileList[0]
-        return None
+        return self._lazyLookup(KIND_PROFILE, profileName, Profile, lambda n: n.fullyQualifiedName)
 
     def getVendor(self, vendorName):
         '''Lookup a Vendor node by name.
@@ -154,20 +303,424 @@ common => VENDOR [ id 0 ]
         vendorList = self._vendors.get(vendorName, None)
         if vendorList is not None:
             return vendorList[0]
-        return None
+        return self._lazyLookup(KIND_VENDOR, vendorName, Vendor, lambda n: n.name)
+
+    def getReferences(self, node):
+        '''Return a list of the nodes that refer to a given TypeDef, Vendor or Profile node.
+           References to a TypeDef are ReferencedType and StructureIncludes nodes, references
+           to a Vendor are Id nodes, and references to a Profile are Tag nodes.
+           The references are determined by the most recent call to validate().'''
+        if isinstance(node, TypeDef):
+            index = self._typeReferences
+        elif isinstance(node, Vendor):
+            index = self._vendorReferences
+        elif isinstance(node, Profile):
+            index = self._profileReferences
+        else:
+            return []
+        return list(index.get(node, ()))
+
+    def getDependentMessages(self, typeDef):
+        '''Return a list of the Message nodes whose payloads depend on a given TypeDef node,
+           either directly or via other type definitions.
+           The dependencies are determined by the most recent call to validate().'''
+        messages = []
+        visited = set([ typeDef ])
+        pending = [ typeDef ]
+        while len(pending) > 0:
+            for refNode in self._typeReferences.get(pending.pop(), ()):
+                node = refNode.nextParentNode((TypeDef, Message))
+                if node is None or node in visited:
+                    continue
+                visited.add(node)
+                if isinstance(node, Message):
+                    messages.append(node)
+                else:
+                    pending.append(node)
+        return messages
     
+    def find(self, name=None, regex=None, kind=None, tag=None, id=None, profile=None):
+        '''Find definitions matching all of the given criteria.
+           name is a glob pattern (e.g. 'a.b.*') matched against the fully-qualified names
+           of VENDOR, namespace, PROFILE, MESSAGE, STATUS CODE and type definitions.
+           regex is a regular expression searched for in the same names.
+           kind is the kind of construct to find, or a list of kinds (see query.kinds).
+           tag is a tag number, combined with profile to find the definitions and fields
+           having a profile-specific tag, or alone for context-specific tags.
+           id is a MESSAGE or STATUS CODE id, optionally restricted to a given profile.
+           profile is a profile name or a numeric profile id.  When given without tag or id,
+           profile restricts the results to the definitions within the given profile.
+           Returns a list of the matching nodes in schema order.
+           Raises ValueError if kind is not a known kind of construct.
+           Note that calling find() automatically loads the default schema.'''
+        if self._queryIndex is None:
+            # Syntax errors in lazily loaded files are reported by validate().
+            self.loadDefaultSchema()
+            self._materializeLazyFiles([])
+            self._queryIndex = QueryIndex(self)
+        return self._queryIndex.find(name=name, regex=regex, kind=kind, tag=tag, id=id, profile=profile)
+
+    def getStructuralHash(self, node):
+        '''Return the structural hash of a TypeNode or TypeDef node, as a hex string.
+           Structurally identical types have the same structural hash, regardless of the
+           names under which they are defined.  The hash takes into account the type's
+           qualifiers, tags, quantifiers and the names of its components, and follows
+           type references to the types they refer to.
+           Type references are as resolved by the most recent call to validate().'''
+        if self._structuralHasher is None:
+            self._structuralHasher = StructuralHasher()
+        return self._structuralHasher.hash(node).hex()
+
+    def getSharedArtifact(self, kind, node, factory):
+        '''Return an artifact of a given kind (e.g. a compiled validator or codec) for a
+           TypeNode or TypeDef node, calling factory(node) to create it if necessary.
+           Structurally identical types share a single artifact of each kind.  Artifacts
+           are discarded when the schema changes.'''
+        if self._artifactCache is None:
+            if self._structuralHasher is None:
+                self._structuralHasher = StructuralHasher()
+            self._artifactCache = ArtifactCache(self._structuralHasher)
+        return self._artifactCache.get(kind, node, factory)
+
+    def diff(self, newSchema):
+        '''Compare this schema with a new version of the schema, and return a list of
+           diff.SchemaChange objects describing the changes, each classified as either
+           wire-compatible or breaking.
+           Both schemas are validated in the process.'''
+        return diffSchemas(self, newSchema)
+
     # ----- Private Members
 
+    def _validationPhases(self, errs, rules=None, jobs=1):
+        '''Validate the schema, yielding after each phase of validation.'''
+        ruleSet = RuleSet(rules)
+        self.ruleStats = ruleSet.stats
+        self.loadDefaultSchema()
+        self._materializeLazyFiles(errs)
+        yield
+        self._resolveUsingStatements()
+        self._resolveTypeReferences(errs)
+        self._resolveVendorReferences(errs)
+        self._resolveProfileReferences(errs)
+        self._resetDerivedState()
+        yield
+        jobs = jobs if jobs != 0 else os.cpu_count() or 1
+        if jobs > 1 and len(self._schemaFiles) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            self._checkFilesInParallel(ruleSet, jobs, errs)
+        else:
+            for schemaFile in self._schemaFiles:
+                for node in schemaFile.allNodes():
+                    ruleSet.checkNode(node, errs)
+                yield
+        # Checks that span the entire schema are always performed in this process.
+        ruleSet.checkSchema(self, errs)
+
+    def _checkFilesInParallel(self, ruleSet, jobs, errs):
+        '''Apply the node rules in a RuleSet to all schema files, using a pool of worker
+           processes forked from this process.  The errors found in each file are returned
+           in serialized form and appended to errs in file order.'''
+        jobs = min(jobs, len(self._schemaFiles))
+        forkContext = multiprocessing.get_context('fork')
+        # Forked workers inherit the resolved schema, rather than receiving a pickled copy.
+        results = _mapJobs(_checkSchemaFile, range(len(self._schemaFiles)), jobs, mp_context=forkContext,
+                           initializer=_initValidationWorker, initargs=(self, ruleSet.rules))
+        for (fileErrs, fileStats) in results:
+            for (msg, detail, pos) in fileErrs:
+                sourceRef = None
+                if pos is not None:
+                    sourceRef = SourceRef(self._schemaFiles[pos[0]], *pos[1:])
+                errs.append(WeaveTLVSchemaError(msg, detail=detail, sourceRef=sourceRef))
+            for (name, (calls, errorCount, time)) in fileStats.items():
+                stats = ruleSet.stats[name]
+                stats.calls += calls
+                stats.errorCount += errorCount
+                stats.time += time
+
+    def _parseSchemaText(self, fileName, schemaText, recover=False):
+        '''Parse the text of a schema file, returning a SchemaFile that has not yet been
+           added to the schema.
+           If recover is True, syntax errors are recorded in the syntaxErrors attribute of
+           the returned SchemaFile, which contains the remaining, valid statements.
+           Otherwise the first syntax error is raised.
+           In lazy mode, the text is scanned for top-level statements, which are parsed
+           on demand.'''
+        if self._lazy:
+            return LazySchemaFile(fileName, schemaText, scanStatements(schemaText), self._parseRegion)
+        schemaFile = SchemaFile(fileName, schemaText)
+        try:
+            self._parse(schemaText, _SchemaTransformer(schemaFile))
+            schemaFile.syntaxErrors = []
+        except (LarkError, WeaveTLVSchemaError) as parseErr:
+            if not recover:
+                if isinstance(parseErr, WeaveTLVSchemaError):
+                    raise
+                raise self._translateParseError(parseErr, schemaFile) from None
+            schemaFile = SchemaFile(fileName, schemaText)
+            schemaFile.syntaxErrors = []
+            recoverStatements(schemaFile, self._parseRegion, schemaFile.syntaxErrors)
+        return schemaFile
+
+    def _unpackParseResult(self, fileName, result, recover, serialized):
+        '''Unpack the result of a call to _parseSchemaFile(), returning the SchemaFile
+           (or None, if parsing failed) and a list of syntax errors.'''
+        (schemaText, parsed, fileErrs) = result
+        if not serialized:
+            return (parsed, fileErrs)
+        if parsed is None and len(fileErrs) == 0:
+            # Lazily loaded files are scanned on the event loop thread.
+            return (self._parseSchemaText(fileName, schemaText, recover), [])
+        schemaFile = serialization.loads(parsed) if parsed is not None else SchemaFile(fileName, schemaText)
+        errs = [ WeaveTLVSchemaError(msg, detail=detail, sourceRef=SourceRef(schemaFile, *pos) if pos is not None else None)
+                 for (msg, detail, pos) in fileErrs ]
+        if parsed is None:
+            return (None, errs)
+        schemaFile.syntaxErrors = errs
+        return (schemaFile, errs)
+
+    def _addSchemaFile(self, schemaFile):
+        '''Add a parsed (or lazily loaded) schema file to the schema.'''
+        schemaFile._editHandler = self._applyEdit
+        self._schemaFiles.append(schemaFile)
+        if isinstance(schemaFile, LazySchemaFile):
+            # The statements of the file are parsed on demand, by this schema.
+            schemaFile._parseRegion = self._parseRegion
+            self._unindexedFiles.append(schemaFile)
+            self._queryIndex = None
+            for stmt in schemaFile.lazyStatements:
+                for name in stmt.names:
+                    self._lazyIndex[name].append((schemaFile, stmt))
+        else:
+            self._indexNodes(schemaFile)
+
     def _indexNodes(self, schemaFile):
-        for node in schemaFile.allNodes(Vendor):
+        self._indexStatements([ schemaFile ])
+
+    def _indexStatements(self, statements):
+        self._queryIndex = None
+        self._resetDerivedState()
+        for node in statements:
+            # Associate the root nodes of the statements with the schema's derived state.
+            while node.parent is not None:
+                node = node.parent
+            node._derivedState = self._derivedState
+            if isinstance(node, SchemaFile):
+                for stmtNode in node.statements:
+                    stmtNode._derivedState = self._derivedState
+        for node in self._allNodesIn(statements, Vendor):
             self._vendors[node.name].append(node)
-        for node in schemaFile.allNodes(Namespace):
+        for node in self._allNodesIn(statements, Namespace):
             self._namespaces[node.fullyQualifiedName].append(node)
-        for node in schemaFile.allNodes(Profile):
+        for node in self._allNodesIn(statements, Profile):
             self._profiles[node.fullyQualifiedName].append(node)
-        for node in schemaFile.allNodes(TypeDef):
+        for node in self._allNodesIn(statements, TypeDef):
             self._typeDefs[node.fullyQualifiedName].append(node)
 
+    def _unindexStatements(self, statements):
+        self._queryIndex = None
+        self._resetDerivedState()
+        for node in self._allNodesIn(statements, (Vendor, Namespace, Profile, TypeDef)):
+            if isinstance(node, Vendor):
+                (index, name) = (self._vendors, node.name)
+            elif isinstance(node, Namespace):
+                (index, name) = (self._namespaces, node.fullyQualifiedName)
+            elif isinstance(node, Profile):
+                (index, name) = (self._profiles, node.fullyQualifiedName)
+            else:
+                (index, name) = (self._typeDefs, node.fullyQualifiedName)
+            nodes = index.get(name, None)
+            if nodes is not None:
+                nodes[:] = [ n for n in nodes if n is not node ]
+                if len(nodes) == 0:
+                    del index[name]
+
+    def _unindexReferences(self, statements):
+        for refNode in self._allNodesIn(statements, (ReferencedType, StructureIncludes, Id, Tag)):
+            if isinstance(refNode, Id):
+                (index, target) = (self._vendorReferences, refNode.vendorNode)
+            elif isinstance(refNode, Tag):
+                (index, target) = (self._profileReferences, refNode.profileNode)
+            else:
+                (index, target) = (self._typeReferences, refNode.targetTypeDef)
+            refNodes = index.get(target, None)
+            if refNodes is not None:
+                refNodes[:] = [ n for n in refNodes if n is not refNode ]
+                if len(refNodes) == 0:
+                    del index[target]
+
+    def _resetDerivedState(self):
+        '''Discard state derived from the resolved schema (structural hashes, cached
+           artifacts and the values cached by nodes, such as CHOICE OF leaf alternates).'''
+        self._structuralHasher = None
+        self._artifactCache = None
+        self._derivedState.invalidate()
+
+    @staticmethod
+    def _allNodesIn(roots, classinfo):
+        '''Iterate for the given nodes and their descendants, if they are instances of classinfo.'''
+        for root in roots:
+            for node in root.allNodes(classinfo):
+                yield node
+
+    def _applyEdit(self, schemaFile, startPos, endPos, newText):
+        '''Apply an edit to the text of a schema file, re-parsing only the affected statements.
+           Returns a list of errors in the re-parsed statements.'''
+        oldText = schemaFile.schemaText
+        if oldText is None:
+            raise ValueError('Schema file has no text')
+        if not (0 <= startPos <= endPos <= len(oldText)):
+            raise ValueError('Invalid edit range: %d-%d' % (startPos, endPos))
+
+        errs = []
+
+        # Make sure the statements of a lazily loaded file have been parsed and indexed.
+        if schemaFile in self._unindexedFiles:
+            self._materializeLazyFiles(errs)
+        if schemaFile.syntaxErrors is None:
+            schemaFile.syntaxErrors = []
+
+        region = findEditRegion(schemaFile, startPos, endPos)
+        schemaText = oldText[:startPos] + newText + oldText[endPos:]
+        schemaFile.schemaText = schemaText
+
+        # Re-parse the region.  If the region contains errors, retain its valid statements.
+        regionStartLine = schemaText.count('\n', 0, region.startPos) + 1
+        regionEndPos = region.endPos + len(schemaText) - len(oldText)
+        syntaxErrs = []
+        try:
+            newNodes = self._parseRegion(schemaFile, region.startPos, regionEndPos, regionStartLine)
+        except WeaveTLVSchemaError:
+            newNodes = _recoverRegion(schemaFile, schemaText, region.startPos, regionEndPos, self._parseRegion, syntaxErrs)
+        for node in newNodes:
+            node.parent = region.container
+        errs += syntaxErrs
+
+        # Update the positions of the nodes (and syntax errors) that follow the region, and
+        # replace the syntax errors within the region.
+        if schemaFile._sourceRefIndex is None:
+            schemaFile._sourceRefIndex = SourceRefIndex(schemaFile)
+        schemaFile.syntaxErrors = [ err for err in schemaFile.syntaxErrors
+                                    if not region.contains(err.sourceRef) ]
+        schemaFile._sourceRefIndex.replace(region, oldText, schemaText, newNodes, syntaxErrs)
+        schemaFile.syntaxErrors += syntaxErrs
+        schemaFile.syntaxErrors.sort(key=lambda err: err.sourceRef.startPos if err.sourceRef is not None else 0)
+
+        # Replace the affected statements and update the name index.
+        oldNodes = region.statements[region.lo:region.hi]
+        region.statements[region.lo:region.hi] = newNodes
+        self._unindexStatements(oldNodes)
+        self._unindexReferences(oldNodes)
+        self._indexStatements(newNodes)
+        statements = schemaFile.statements
+        if len(statements) > 0:
+            schemaFile.sourceRef = SourceRef(schemaFile, 0, 0, 0)
+            schemaFile.sourceRef.setstart(statements[0].sourceRef)
+            schemaFile.sourceRef.setEnd(statements[-1].sourceRef)
+        else:
+            schemaFile.sourceRef = None
+
+        # Validate the new statements.
+        self.loadDefaultSchema()
+        self._resolveUsingStatements(newNodes, region.container or schemaFile)
+        self._resolveTypeReferences(errs, newNodes)
+        self._resolveVendorReferences(errs, newNodes)
+        self._resolveProfileReferences(errs, newNodes)
+        self._resetDerivedState()
+        for node in self._allNodesIn(newNodes, object):
+            node.validate(errs)
+
+        return errs
+
+    def _parse(self, schemaText, transformer):
+        '''Parse schema text using the selected front end, invoking the given transformer
+           to build the AST.'''
+        if self._schemaBuilder is not None:
+            return self._schemaBuilder.parse(schemaText, transformer)
+        schemaTree = self._schemaParser.parse(schemaText)
+        return transformer.transform(schemaTree)
+
+    @staticmethod
+    def _getSchemaParser(lexer):
+        '''Get the shared tree-based parser that uses the given lexer.'''
+        parser = WeaveTLVSchema._schemaParsers.get(lexer, None)
+        if parser is None:
+            if WeaveTLVSchema._schemaSyntax is None:
+                scriptDir = os.path.dirname(os.path.realpath(__file__))
+                with open(os.path.join(scriptDir, WeaveTLVSchema.EBNFFileName), "r") as s:
+                    WeaveTLVSchema._schemaSyntax = s.read()
+            parser = Lark(WeaveTLVSchema._schemaSyntax, parser='lalr', lexer=WeaveTLVSchema._getLarkLexer(lexer),
+                          start='file', propagate_positions=True)
+            WeaveTLVSchema._schemaParsers[lexer] = parser
+        return parser
+
+    @staticmethod
+    def _getSchemaBuilder(lexer):
+        '''Get the shared single-pass AST builder that uses the given lexer.'''
+        builder = WeaveTLVSchema._schemaBuilders.get(lexer, None)
+        if builder is None:
+            treeParser = WeaveTLVSchema._getSchemaParser(WeaveTLVSchema.LEXER_STANDARD)
+            builder = _SchemaBuilder(WeaveTLVSchema._schemaSyntax, treeParser, lexer=WeaveTLVSchema._getLarkLexer(lexer))
+            WeaveTLVSchema._schemaBuilders[lexer] = builder
+        return builder
+
+    @staticmethod
+    def _getLarkLexer(lexer):
+        '''Get the value of the Lark lexer option corresponding to a given lexer.'''
+        if lexer == WeaveTLVSchema.LEXER_FAST:
+            # Fall back to the stock lexer if the fast lexer does not support the grammar.
+            standardParser = WeaveTLVSchema._getSchemaParser(WeaveTLVSchema.LEXER_STANDARD)
+            try:
+                _FastLexer(standardParser.lexer_conf)
+                return _FastLexer
+            except ValueError:
+                pass
+        return 'standard'
+
+    def _parseRegion(self, schemaFile, startPos, endPos, startLine, schemaText=None):
+        '''Parse a region of text within a schema file, returning a list of the statement
+           nodes contained therein.
+           If schemaText is given, the region is taken from it rather than from the text
+           of the schema file.'''
+        # Pad the region text with spaces back to the start of the line, such that the
+        # column numbers computed by the parser match those in the original file.
+        if schemaText is None:
+            schemaText = schemaFile.schemaText
+        lineStart = schemaText.rfind('\n', 0, startPos) + 1
+        regionText = ' ' * (startPos - lineStart) + schemaText[startPos:endPos]
+        lineOffset = startLine - 1
+        try:
+            return self._parse(regionText, _StatementsTransformer(schemaFile, lineOffset=lineOffset, posOffset=lineStart))
+        except LarkError as parseErr:
+            if isinstance(parseErr, (UnexpectedCharacters, UnexpectedToken)):
+                parseErr.line += lineOffset
+                parseErr.pos_in_stream += lineStart
+            raise self._translateParseError(parseErr, schemaFile) from None
+
+    def _lazyLookup(self, kind, name, classinfo, nodeName):
+        '''Search the statements of lazily loaded schema files for a definition with a
+           given kind and name, parsing the statements as necessary.
+           Returns None if not found.'''
+        for (schemaFile, stmt) in self._lazyIndex.get((kind, name), ()):
+            try:
+                nodes = schemaFile.materializeStatement(stmt)
+            except WeaveTLVSchemaError:
+                # Ignore statements containing syntax errors.  These are reported by validate().
+                continue
+            for stmtNode in nodes:
+                for node in stmtNode.allNodes(classinfo):
+                    if nodeName(node) == name:
+                        return node
+        return None
+
+    def _materializeLazyFiles(self, errs):
+        '''Parse all remaining statements in any lazily loaded schema files, appending any
+           syntax errors to the given list, and add the resultant nodes to the index.'''
+        for schemaFile in self._schemaFiles:
+            if isinstance(schemaFile, LazySchemaFile):
+                schemaFile.materializeAll(errs)
+        for schemaFile in self._unindexedFiles:
+            self._indexNodes(schemaFile)
+        self._unindexedFiles = []
+
     def _checkInconsistentVendorIds(self, errs):
         '''Check that all VENDOR definitions with the same name have the same vendor id'''
         for likeNamedVendors in self._vendors.values():
@@ -212,10 +765,14 @@ common => VENDOR [ id 0 ]
             else:
                 profilesById[profile.id] = profile
 
-    def _resolveTypeReferences(self, errs):
+    def _resolveTypeReferences(self, errs, roots=None):
         '''Resolve the type names in all type reference nodes (e.g. ReferencedType and
            StructureIncludes) to the corresponding TypeDef nodes and the associated
-           Type node.'''
+           Type node.
+           If roots is given, only the type references within the given nodes are resolved.'''
+        if roots is None:
+            roots = self._schemaFiles
+            self._typeReferences = defaultdict(list)
 
         # NOTE: this algorithm is designed to always re-evaluate all type references, even
         # if they have been previously resolved.  This allows the function to be called a
@@ -225,52 +782,198 @@ common => VENDOR [ id 0 ]
         # For each node that represents a reference to a type, attempt to resolve the
         # type name to a corresponding TypeDef node and attach the TypeDef node to the
         # referencing node. Generate errors for any names that cannot be resolved.        
-        for refNode in self.allNodes((ReferencedType, StructureIncludes)):
-            refNode.targetTypeDef = self._resolveTypeName(refNode.targetName, refNode)
-            if refNode.targetTypeDef is None:
+        for refNode in self._allNodesIn(roots, (ReferencedType, StructureIncludes)):
+            (refNode.targetTypeDef, candidates) = self._resolveScopedName(refNode.targetName, refNode, self.getTypeDef)
+            if candidates is not None:
+                _addSchemaError(errs, msg='ambiguous type reference: %s' % refNode.targetName,
+                                detail='the given type name is imported by multiple using statements, and could refer to: %s' % ', '.join(candidates),
+                                sourceRef=refNode.sourceRef)
+            elif refNode.targetTypeDef is None:
                 _addSchemaError(errs, msg='invalid type reference: %s' % refNode.targetName,
                                 detail='the given type name could not be resolved',
                                 sourceRef=refNode.sourceRef)
+            else:
+                self._typeReferences[refNode.targetTypeDef].append(refNode)
                 
-        # For each node that represents a reference to a type, follow the chain of TypeDef
-        # nodes to the final one (the one that is not itself a type reference), and attach
-        # the Type node to the referencing node.  Ignore any type references that were
-        # unresolved by the above loop.  Generate an error if a circular type reference
-        # chain is encountered.
-        for refNode in self.allNodes((ReferencedType, StructureIncludes)):
-            visitedRefNodes = [ ]
-            while refNode.targetTypeDef is not None:
-                visitedRefNodes.append(refNode)
-                if isinstance(refNode.targetTypeDef.type, ReferencedType):
-                    if refNode.targetTypeDef.type in visitedRefNodes:
-                        _addSchemaError(errs, msg='circular type reference: %s' % refNode.targetName,
-                                        detail='the given type reference ultimately refers to itself',
-                                        sourceRef=refNode.sourceRef)
-                        break
-                    refNode = refNode.targetTypeDef.type
-                else:
-                    visitedRefNodes[0].targetType = refNode.targetTypeDef.type
-                    break
-                
-    def _resolveTypeName(self, typeName, baseNode):
-        '''Resolve a target type name to corresponding TypeDef node, interpreting relative
-           type names in relation to a given base node.'''
-        # For each namespace node that is a parent of the base node, in ascending order,
-        # compose a fully-qualified type name using the target type name and the FQ name
-        # of the namespace. Add the target type name itself to the end of this list.
-        nsNodes = baseNode.allParentNodes(Namespace)
-        fqTypeNames = [n.fullyQualifiedName + '.' + typeName for n in nsNodes]
-        fqTypeNames.append(typeName)
-        # Search for and return the first type definition whose fully-qualified name
-        # matches one of the possible names, or None if no match found.
-        for fqTypeName in fqTypeNames:
-            typeDef = self.getTypeDef(fqTypeName)
+        # For each node that represents a reference to a type, attach the final Type node
+        # in the chain of TypeDef nodes (the one that is not itself a type reference) to
+        # the referencing node.
+        self._resolveTargetTypes(errs, roots)
+
+    def _resolveTargetTypes(self, errs, roots):
+        '''Resolve the final target type of each type reference node within the given
+           nodes, reporting an error for each circular chain of type definitions.'''
+        # The type definitions form a graph in which each TypeDef whose underlying type
+        # is a ReferencedType has a single edge to the TypeDef it references.  Walk the
+        # chain starting at each TypeDef, stopping at the first TypeDef whose target type
+        # is already known, and memoize the target type for every TypeDef on the chain.
+        # A chain that arrives back at a TypeDef on the current walk has found a cycle,
+        # which is reported once, starting at the first of its members encountered.
+        # TypeDefs in, or leading into, a cycle have no target type.  This visits each
+        # TypeDef once, in O(V+E) time overall.
+        targetTypes = {}
+        rootTypeDefs = list(self._allNodesIn(roots, TypeDef))
+        rootTypeDefSet = set(rootTypeDefs)
+        for typeDef in rootTypeDefs:
+            if typeDef not in targetTypes:
+                self._resolveTypeChain(typeDef, targetTypes, rootTypeDefSet, errs)
+        for refNode in self._allNodesIn(roots, (ReferencedType, StructureIncludes)):
+            typeDef = refNode.targetTypeDef
             if typeDef is not None:
-                return typeDef
-        return None
+                if typeDef not in targetTypes:
+                    self._resolveTypeChain(typeDef, targetTypes, rootTypeDefSet, errs)
+                refNode.targetType = targetTypes[typeDef]
+
+    @staticmethod
+    def _resolveTypeChain(typeDef, targetTypes, rootTypeDefs, errs):
+        '''Follow the chain of type references starting at a given TypeDef, recording the
+           final target type of every TypeDef on the chain in targetTypes.'''
+        path = []
+        onPath = {}
+        node = typeDef
+        while True:
+            if node in targetTypes:
+                targetType = targetTypes[node]
+                break
+            if node in onPath:
+                # Report the cycle if any of its members is being resolved.
+                cycle = path[onPath[node]:]
+                if not rootTypeDefs.isdisjoint(cycle):
+                    cyclePath = ' -> '.join(n.fullyQualifiedName for n in cycle + [ node ])
+                    _addSchemaError(errs, msg='circular type reference: %s' % node.fullyQualifiedName,
+                                    detail='the type reference chain %s refers back to itself' % cyclePath,
+                                    sourceRef=node.type.sourceRef)
+                targetType = None
+                break
+            onPath[node] = len(path)
+            path.append(node)
+            if not isinstance(node.type, ReferencedType):
+                targetType = node.type
+                break
+            if node.type.targetTypeDef is None:
+                targetType = None
+                break
+            node = node.type.targetTypeDef
+        for node in path:
+            targetTypes[node] = targetType
 
-    def _resolveVendorReferences(self, errs):
-        for idNode in self.allNodes(Id):
+    def _resolveScopedName(self, name, baseNode, lookup):
+        '''Resolve a possibly relative name to a definition, interpreting the name in
+           relation to a given base node.  lookup is a function (e.g. getTypeDef) that
+           returns the definition with a given fully-qualified name, or None.
+           Returns a tuple of the definition (or None if not found) and, if the name is
+           ambiguous, a list of the fully-qualified names of the definitions it could
+           refer to.'''
+        # For each scope (namespace or schema file) enclosing the base node, in ascending
+        # order, search for the name amongst the definitions within the scope, and then
+        # amongst the names imported into the scope by using statements.  The import
+        # tables are keyed by the first component of the imported names, such that each
+        # scope is searched in a constant number of lookups, regardless of the number of
+        # using statements.
+        head = name.split('.', 1)[0]
+        tail = name[len(head):]
+        scope = baseNode.nextParentNode(Namespace)
+        fileScope = baseNode.sourceRef.schemaFile if baseNode.sourceRef is not None else None
+        while True:
+            if isinstance(scope, Namespace):
+                node = lookup(scope.fullyQualifiedName + '.' + name)
+            else:
+                # Top-level statements have no parent (other than when re-parsed by an
+                # edit), so the file scope is located via the source reference.
+                scope = fileScope
+                node = lookup(name)
+            if node is not None:
+                return (node, None)
+            imported = self._importTables.get(scope, {}).get(head, None)
+            if isinstance(imported, str):
+                node = lookup(imported + tail)
+                if node is not None:
+                    return (node, None)
+            elif imported is not None:
+                # The name is imported from more than one definition.  This is only an
+                # error if more than one of them resolves.
+                matches = [ fqName + tail for fqName in imported if lookup(fqName + tail) is not None ]
+                if len(matches) == 1:
+                    return (lookup(matches[0]), None)
+                if len(matches) > 1:
+                    return (None, matches)
+            if scope is fileScope:
+                return (None, None)
+            scope = scope.nextParentNode(Namespace)
+
+    def _resolveUsingStatements(self, roots=None, container=None):
+        '''Resolve the target of each using statement, and build the import table for
+           each scope (namespace or schema file) containing using statements.
+           An import table maps the names imported into a scope to the fully-qualified
+           names of the corresponding definitions.  A name imported from more than one
+           definition maps to a tuple of their fully-qualified names, and is reported as
+           ambiguous if referred to.
+           If roots is given, only the import tables of the given container node, and of
+           the namespaces within the given nodes, are rebuilt.'''
+        self._namespaceMembers = {}
+        if roots is None:
+            self._importTables = {}
+            scopes = self._allNodesIn(self._schemaFiles, (SchemaFile, Namespace))
+        else:
+            scopes = [ container ] + list(self._allNodesIn(roots, Namespace))
+        for scope in scopes:
+            table = {}
+            for usingNode in scope.statements:
+                if isinstance(usingNode, Using):
+                    self._importUsingTarget(usingNode, table)
+            if len(table) > 0:
+                self._importTables[scope] = table
+            else:
+                self._importTables.pop(scope, None)
+
+    def _importUsingTarget(self, usingNode, table):
+        '''Resolve the target of a using statement, and add the names it imports to an
+           import table.'''
+        # The target is either a namespace (or PROFILE), in which case all the definitions
+        # within it are imported, or a type definition, which is imported on its own.
+        # Relative target names are interpreted in relation to the enclosing namespaces.
+        targetName = usingNode.targetName
+        fqNames = [ n.fullyQualifiedName + '.' + targetName for n in usingNode.allParentNodes(Namespace) ]
+        fqNames.append(targetName)
+        usingNode.fullyQualifiedTargetName = None
+        for fqName in fqNames:
+            if fqName in self._namespaces:
+                usingNode.fullyQualifiedTargetName = fqName
+                members = self._getNamespaceMembers(fqName)
+                break
+            if self.getTypeDef(fqName) is not None:
+                usingNode.fullyQualifiedTargetName = fqName
+                members = [ (fqName.rsplit('.', 1)[-1], fqName) ]
+                break
+        else:
+            # Using statements that name unknown targets import nothing.
+            return
+        for (name, fqName) in members:
+            existing = table.get(name, None)
+            if existing is None or existing == fqName:
+                table[name] = fqName
+            elif isinstance(existing, str):
+                table[name] = (existing, fqName)
+            elif fqName not in existing:
+                table[name] = existing + (fqName,)
+
+    def _getNamespaceMembers(self, fqName):
+        '''Return a list of the names and fully-qualified names of the definitions within
+           the namespace (or namespaces) with a given fully-qualified name.'''
+        members = self._namespaceMembers.get(fqName, None)
+        if members is None:
+            members = []
+            for nsNode in self._namespaces.get(fqName, ()):
+                for stmt in nsNode.allStatements(HasScopedName):
+                    members.append((stmt.name, stmt.fullyQualifiedName))
+            self._namespaceMembers[fqName] = members
+        return members
+
+    def _resolveVendorReferences(self, errs, roots=None):
+        if roots is None:
+            roots = self._schemaFiles
+            self._vendorReferences = defaultdict(list)
+        for idNode in self._allNodesIn(roots, Id):
             if not isinstance(idNode.parent, Profile):
                 continue
             if isinstance(idNode.vendor, str):
@@ -279,9 +982,14 @@ common => VENDOR [ id 0 ]
                     _addSchemaError(errs, msg='invalid vendor reference: %s' % idNode.vendor,
                                     detail='a VENDOR definition with the specified name could not be found',
                                     sourceRef=idNode.sourceRef)
+                else:
+                    self._vendorReferences[idNode.vendorNode].append(idNode)
 
-    def _resolveProfileReferences(self, errs):
-        for tagNode in self.allNodes(Tag):
+    def _resolveProfileReferences(self, errs, roots=None):
+        if roots is None:
+            roots = self._schemaFiles
+            self._profileReferences = defaultdict(list)
+        for tagNode in self._allNodesIn(roots, Tag):
             if isinstance(tagNode.profile, str):
                 if tagNode.profile == '*':
                     tagNode.profileNode = tagNode.nextParentNode(Profile)
@@ -290,11 +998,17 @@ common => VENDOR [ id 0 ]
                                         detail='a current profile reference (*) must appear within a PROFILE definition',
                                         sourceRef=tagNode.sourceRef)
                 else:
-                    tagNode.profileNode = self.getProfile(tagNode.profile)
-                    if tagNode.profileNode is None:
+                    (tagNode.profileNode, candidates) = self._resolveScopedName(tagNode.profile, tagNode, self.getProfile)
+                    if candidates is not None:
+                        _addSchemaError(errs, msg='ambiguous profile reference: %s' % tagNode.profile,
+                                        detail='the given profile name is imported by multiple using statements, and could refer to: %s' % ', '.join(candidates),
+                                        sourceRef=tagNode.sourceRef)
+                    elif tagNode.profileNode is None:
                         _addSchemaError(errs, msg='invalid profile reference: %s' % tagNode.profile,
                                         detail='a PROFILE definition with the specified name could not be found',
                                         sourceRef=tagNode.sourceRef)
+                if tagNode.profileNode is not None:
+                    self._profileReferences[tagNode.profileNode].append(tagNode)
                     
 
 
@@ -369,3 +1083,83 @@ common => VENDOR [ id 0 ]
         return parseErr
 
 
+# ----- Validation Rules
+
+registerRule(ValidationRule('inconsistent-vendor-ids', WeaveTLVSchema._checkInconsistentVendorIds, None,
+                            'VENDOR definitions with the same name have the same id'))
+registerRule(ValidationRule('inconsistent-profile-ids', WeaveTLVSchema._checkInconsistentProfileIds, None,
+                            'PROFILE definitions with the same name have the same id'))
+registerRule(ValidationRule('unique-profile-ids', WeaveTLVSchema._checkUniqueProfileIds, None,
+                            'PROFILE definitions with different names have different ids'))
+
+
+def _mapJobs(func, jobArgs, jobs, **poolArgs):
+    '''Call func for each of a list of job arguments using a pool of worker processes, and
+       return a list of the results.  Additional keyword arguments are passed to the pool.'''
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, **poolArgs) as executor:
+        # Hand out jobs in chunks, to amortize the cost of communicating with the workers.
+        chunkSize = max(1, len(jobArgs) // (jobs * 4))
+        return list(executor.map(func, jobArgs, chunksize=chunkSize))
+
+# State of a worker process used by WeaveTLVSchema._checkFilesInParallel().
+_workerSchema = None
+_workerRules = None
+_workerFileIndexes = None
+
+def _initValidationWorker(schema, rules):
+    global _workerSchema, _workerRules, _workerFileIndexes
+    _workerSchema = schema
+    _workerRules = rules
+    _workerFileIndexes = { id(schemaFile) : i for (i, schemaFile) in enumerate(schema._schemaFiles) }
+
+def _checkSchemaFile(fileIndex):
+    '''Apply validation rules to the nodes of a schema file within a worker process.
+       Returns a list of (msg, detail, pos) tuples describing the errors found, where
+       pos is None, or a tuple of the index of the referenced file and the position
+       within it, along with a dictionary of the statistics for each rule.'''
+    ruleSet = RuleSet(_workerRules)
+    errs = []
+    for node in _workerSchema._schemaFiles[fileIndex].allNodes():
+        ruleSet.checkNode(node, errs)
+    errRecords = []
+    for err in errs:
+        sourceRef = err.sourceRef
+        pos = None
+        if sourceRef is not None:
+            pos = (_workerFileIndexes[id(sourceRef.schemaFile)],
+                   sourceRef.startLine, sourceRef.startCol, sourceRef.startPos,
+                   sourceRef.endLine, sourceRef.endCol, sourceRef.endPos)
+        errRecords.append((str(err), err.detail, pos))
+    stats = { name : (s.calls, s.errorCount, s.time) for (name, s) in ruleSet.stats.items() if s.calls > 0 }
+    return (errRecords, stats)
+
+
+def _parseSchemaFile(fileName, frontEnd, lexer, lazy, recover, serialize):
+    '''Read and parse a schema file on behalf of WeaveTLVSchema.aloadSchemaFiles(),
+       possibly within a worker process.  Returns a tuple containing the text of the file,
+       the parsed SchemaFile (or None, if parsing failed) and a list of syntax errors.
+       If serialize is True, the SchemaFile is returned in serialized form, and each
+       error as a tuple of its message, detail and source position, such that the result
+       can be transferred between processes.  In this case lazily loaded files are not
+       scanned, and None is returned in place of the SchemaFile.'''
+    with open(fileName, "r") as f:
+        schemaText = f.read()
+    if lazy and serialize:
+        return (schemaText, None, [])
+    schema = WeaveTLVSchema(lazy=lazy, frontEnd=frontEnd, lexer=lexer)
+    try:
+        schemaFile = schema._parseSchemaText(fileName, schemaText, recover)
+        errs = schemaFile.syntaxErrors or []
+    except WeaveTLVSchemaError as err:
+        (schemaFile, errs) = (None, [ err ])
+    if not serialize:
+        return (schemaText, schemaFile, errs)
+    errRecords = []
+    for err in errs:
+        sourceRef = err.sourceRef
+        pos = None
+        if sourceRef is not None:
+            pos = (sourceRef.startLine, sourceRef.startCol, sourceRef.startPos,
+                   sourceRef.endLine, sourceRef.endCol, sourceRef.endPos)
+        errRecords.append((str(err), err.detail, pos))
+    return (schemaText, serialization.dumps(schemaFile) if schemaFile is not None else None, errRecords)
@@ -0,0 +1,198 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Indexes supporting queries over the definitions in a Weave TLV Schema.
+#
+#      A QueryIndex is built with a single walk of the schema's nodes, and answers
+#      queries by name pattern, tag, id and kind of construct without further walks.
+#      Names are held in a sorted list, such that glob patterns with a literal prefix
+#      are answered by a binary search followed by a scan of the matching names.
+#
+
+import re
+import bisect
+import fnmatch
+from collections import defaultdict
+
+from .node import *
+
+# The kinds of schema constructs that can be queried, and the corresponding node classes.
+kinds = {
+    'vendor' : Vendor,
+    'namespace' : Namespace,
+    'profile' : Profile,
+    'message' : Message,
+    'status-code' : StatusCode,
+    'type' : TypeDef,
+    'field' : StructureField,
+    'alternate' : ChoiceAlternate,
+    'element' : LinearTypePatternElement,
+    'enum-value' : IntegerEnumValue,
+}
+
+_kindsByClass = { cls : kind for (kind, cls) in kinds.items() }
+
+# Kinds of constructs that are indexed by name.
+_namedClasses = (Vendor, Namespace, Message, StatusCode, TypeDef)
+
+_globChars = re.compile(r'[*?\[]')
+
+
+def definitionName(node):
+    '''Return the name by which a node is indexed: the fully-qualified name of scoped
+       definitions, or the plain name of other named constructs.'''
+    if isinstance(node, HasScopedName):
+        return node.fullyQualifiedName
+    if isinstance(node, HasName):
+        return node.name
+    return None
+
+
+def kindOf(node):
+    '''Return the kind of a node, or None if the node is not of a queryable kind.'''
+    return _kindsByClass.get(type(node), None)
+
+
+class QueryIndex(object):
+    '''Indexes the definitions in a set of schema files by name, tag, id and kind.'''
+
+    def __init__(self, schema):
+        self._schema = schema
+        self._order = {}
+        self._names = []
+        self._nodesByName = defaultdict(list)
+        self._nodesByKind = defaultdict(list)
+        self._nodesByTag = defaultdict(list)
+        self._nodesById = defaultdict(list)
+        self._nodesByIdNum = defaultdict(list)
+        self._nodesByProfile = defaultdict(list)
+        for schemaFile in schema.allFiles():
+            for node in schemaFile.allNodes():
+                kind = _kindsByClass.get(type(node), None)
+                if kind is not None:
+                    self._order[node] = len(self._order)
+                    self._nodesByKind[kind].append(node)
+                    if isinstance(node, _namedClasses):
+                        self._nodesByName[definitionName(node)].append(node)
+                    # Definitions whose enclosing profile cannot be resolved are not indexed by profile.
+                    profileId = self._profileId(node.nextParentNode(Profile))
+                    if profileId is not None:
+                        self._nodesByProfile[profileId].append(node)
+                    if isinstance(node, (Message, StatusCode)):
+                        profile = node.parent if isinstance(node.parent, Profile) else None
+                        self._nodesById[(self._profileId(profile), node.id)].append(node)
+                        self._nodesByIdNum[node.id].append(node)
+                elif isinstance(node, Tag) and node.tagNum is not None:
+                    # Tags whose profile cannot be resolved are not indexed.
+                    profileId = self._tagProfileId(node)
+                    if profileId is not None or node.profile is None:
+                        self._nodesByTag[(profileId, node.tagNum)].append(node.parent)
+        self._names = sorted(self._nodesByName)
+
+    def find(self, name=None, regex=None, kind=None, tag=None, id=None, profile=None):
+        '''Return a list of the nodes matching all of the given criteria, in schema order.
+           See WeaveTLVSchema.find() for a description of the criteria.'''
+        candidates = None
+
+        if profile is not None and not isinstance(profile, int):
+            profileNode = self._schema.getProfile(profile)
+            profile = self._profileId(profileNode) if profileNode is not None else -1
+
+        if tag is not None:
+            candidates = self._intersect(candidates, self._nodesByTag.get((profile, tag), ()))
+
+        if id is not None:
+            if profile is not None:
+                idNodes = self._nodesById.get((profile, id), ())
+            else:
+                idNodes = self._nodesByIdNum.get(id, ())
+            candidates = self._intersect(candidates, idNodes)
+
+        if profile is not None and tag is None and id is None:
+            candidates = self._intersect(candidates, self._nodesByProfile.get(profile, ()))
+
+        if name is not None:
+            candidates = self._intersect(candidates, self._findByGlob(name))
+
+        if regex is not None:
+            regex = re.compile(regex)
+            candidates = self._intersect(candidates, (node for n in self._names if regex.search(n)
+                                                           for node in self._nodesByName[n]))
+
+        if kind is not None:
+            kindList = [ kind ] if isinstance(kind, str) else list(kind)
+            for k in kindList:
+                if k not in kinds:
+                    raise ValueError('Unknown kind: %s' % k)
+            if candidates is None:
+                candidates = set(node for k in kindList for node in self._nodesByKind[k])
+            else:
+                kindClasses = tuple(kinds[k] for k in kindList)
+                candidates = set(node for node in candidates if type(node) in kindClasses)
+
+        if candidates is None:
+            candidates = self._order.keys()
+
+        return sorted(candidates, key=self._order.__getitem__)
+
+    def _findByGlob(self, pattern):
+        # Scan the names beginning with the literal prefix of the pattern.
+        prefix = _globChars.split(pattern, 1)[0]
+        if len(prefix) == len(pattern):
+            yield from self._nodesByName.get(pattern, ())
+            return
+        names = self._names
+        i = bisect.bisect_left(names, prefix)
+        while i < len(names) and names[i].startswith(prefix):
+            if fnmatch.fnmatchcase(names[i], pattern):
+                yield from self._nodesByName[names[i]]
+            i += 1
+
+    @staticmethod
+    def _intersect(candidates, nodes):
+        if candidates is None:
+            return set(nodes)
+        return candidates.intersection(nodes)
+
+    def _tagProfileId(self, tagNode):
+        # Determine the profile id of a tag, without relying on the tag having been
+        # resolved by validate().
+        if tagNode.profile is None or isinstance(tagNode.profile, int):
+            return tagNode.profile
+        if tagNode.profile == '*':
+            return self._profileId(tagNode.nextParentNode(Profile))
+        # Prefer the resolved profile, which accounts for relative and imported names.
+        if tagNode.profileNode is not None:
+            return self._profileId(tagNode.profileNode)
+        return self._profileId(self._schema.getProfile(tagNode.profile))
+
+    def _profileId(self, profileNode):
+        # Determine the id of a profile, without relying on its vendor having been
+        # resolved by validate().
+        if profileNode is None:
+            return None
+        if profileNode.id is not None:
+            return profileNode.id
+        idQual = profileNode.getQualifier(Id)
+        if idQual is None or not isinstance(idQual.vendor, str):
+            return None
+        vendorNode = self._schema.getVendor(idQual.vendor)
+        if vendorNode is None or vendorNode.id is None:
+            return None
+        return (vendorNode.id << 16) + idQual.idNum
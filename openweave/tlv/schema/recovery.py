@@ -0,0 +1,188 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Recovery from syntax errors in Weave TLV Schema files.
+#
+#      When a schema file fails to parse, the file is split into its top-level
+#      statements (using the same scanner as lazy loading) and each statement is
+#      parsed separately.  Statements that fail to parse are dropped, and the
+#      associated error recorded.  If a failed statement is a namespace or PROFILE
+#      definition with a body, the body is parsed in the same manner, such that the
+#      valid statements within the body are retained.  If a failed statement contains
+#      a later definition (i.e. name =>), e.g. because of a missing closing brace,
+#      parsing resynchronizes at that definition.  An unclosed qualifier list ends at
+#      the next => or closing brace, such that resynchronization happens within the
+#      enclosing namespace or PROFILE body.
+#
+
+from .node import *
+from .error import WeaveTLVSchemaError
+from .lazy import scanStatements, _scanRE
+
+
+def recoverStatements(schemaFile, parseRegion, errs):
+    '''Parse the statements in a schema file, skipping statements that contain errors.
+       The valid statements are stored in the SchemaFile object, and a WeaveTLVSchemaError
+       is appended to errs for each statement that fails to parse.'''
+    schemaText = schemaFile.schemaText
+    statements = _recoverRegion(schemaFile, schemaText, 0, len(schemaText), parseRegion, errs)
+    schemaFile.statements = statements
+    if len(statements) > 0:
+        schemaFile.sourceRef = SourceRef(schemaFile, 0, 0, 0)
+        schemaFile.sourceRef.setstart(statements[0].sourceRef)
+        schemaFile.sourceRef.setEnd(statements[-1].sourceRef)
+    return statements
+
+
+def _lineAt(schemaText, pos):
+    return schemaText.count('\n', 0, pos) + 1
+
+
+def _significantTokens(schemaText, startPos, endPos):
+    # Return a list of (type, value, start, end) tuples for the tokens in a region
+    # of text, omitting whitespace and comments.
+    tokens = []
+    for m in _scanRE.finditer(schemaText, startPos, endPos):
+        tokenType = m.lastgroup
+        if tokenType is not None:
+            tokens.append((tokenType, m.group(tokenType), m.start(), m.end()))
+    return tokens
+
+
+def _findBody(tokens):
+    # If the given tokens form a namespace or PROFILE definition with a body, return
+    # the indexes of the body's opening and closing braces.  Otherwise return None.
+    if len(tokens) == 0 or tokens[0][0] != 'name':
+        return None
+    i = 0
+    if tokens[0][1].lower() != 'namespace':
+        while i + 2 < len(tokens) and tokens[i+1][1] == '.' and tokens[i+2][0] == 'name':
+            i += 2
+        if (i + 2 >= len(tokens) or tokens[i+1][0] != 'arrow' or
+            tokens[i+2][0] != 'name' or tokens[i+2][1].upper() != 'PROFILE'):
+            return None
+    bracketDepth = 0
+    braceDepth = 0
+    openIndex = None
+    for j in range(i, len(tokens)):
+        tokenVal = tokens[j][1]
+        if bracketDepth > 0 and (tokens[j][0] == 'arrow' or tokenVal == '}'):
+            # Neither can appear within a qualifier list, so the list is unclosed.
+            bracketDepth = 0
+        if tokenVal == '[':
+            bracketDepth += 1
+        elif tokenVal == ']':
+            bracketDepth -= 1
+        elif bracketDepth > 0:
+            continue
+        elif tokenVal == '{':
+            if openIndex is None:
+                openIndex = j
+            braceDepth += 1
+        elif tokenVal == '}':
+            braceDepth -= 1
+            if braceDepth == 0 and openIndex is not None:
+                # The body must close the statement.
+                return (openIndex, j) if j == len(tokens) - 1 else None
+    return None
+
+
+def _findResyncPos(tokens, errPos):
+    # Return the start position of the first definition (name =>) within the given
+    # tokens whose => follows the position of an error, or None if there is none.
+    for j in range(1, len(tokens)):
+        if tokens[j][0] != 'arrow' or tokens[j][2] < errPos:
+            continue
+        i = j - 1
+        while i >= 2 and tokens[i-1][1] == '.' and tokens[i-2][0] == 'name':
+            i -= 2
+        if i > 0 and tokens[i][0] == 'name':
+            return tokens[i][2]
+    return None
+
+
+def _innermostScope(node):
+    # Return the node that will contain the statements of a definition's body.  For
+    # scoped namespace names (e.g. namespace a.b), this is the innermost namespace.
+    while isinstance(node, Namespace) and len(node.statements) == 1 and node.statements[0].sourceRef is node.sourceRef:
+        node = node.statements[0]
+    return node
+
+
+def _recoverRegion(schemaFile, schemaText, startPos, endPos, parseRegion, errs):
+    # Parse the statements within a region of a schema file, recovering from errors.
+    statements = []
+    baseLine = _lineAt(schemaText, startPos) - 1
+    stmts = scanStatements(schemaText[startPos:endPos])
+    for (i, stmt) in enumerate(stmts):
+        stmtStart = startPos + stmt.startPos
+        stmtEnd = startPos + stmt.endPos
+        stmtLine = baseLine + stmt.startLine
+        try:
+            statements += parseRegion(schemaFile, stmtStart, stmtEnd, stmtLine)
+            continue
+        except WeaveTLVSchemaError as err:
+            stmtErr = err
+
+        tokens = _significantTokens(schemaText, stmtStart, stmtEnd)
+
+        # A statement cut short by the scan (e.g. at the definition following an unclosed
+        # qualifier list) fails at its last token.  Report the error found when the
+        # statement is parsed along with the next, such that it refers to the unexpected
+        # token.
+        if (i + 1 < len(stmts) and len(tokens) > 0 and stmtErr.sourceRef is not None and
+            stmtErr.sourceRef.startPos >= tokens[-1][2]):
+            try:
+                parseRegion(schemaFile, stmtStart, startPos + stmts[i+1].endPos, stmtLine)
+            except WeaveTLVSchemaError as err:
+                stmtErr = err
+
+        # If the statement is a namespace or PROFILE definition, parse the definition
+        # with an empty body, and then recover the statements within the body.
+        body = _findBody(tokens)
+        if body is not None:
+            bodyStart = tokens[body[0]][3]
+            bodyEnd = tokens[body[1]][2]
+            blankedText = (schemaText[:bodyStart] +
+                           ''.join(c if c == '\n' else ' ' for c in schemaText[bodyStart:bodyEnd]) +
+                           schemaText[bodyEnd:stmtEnd])
+            try:
+                nodes = parseRegion(schemaFile, stmtStart, stmtEnd, stmtLine, schemaText=blankedText)
+            except WeaveTLVSchemaError as err:
+                # The error lies in the definition itself.  Report any errors within the
+                # body, but discard its statements.
+                errs.append(err)
+                _recoverRegion(schemaFile, schemaText, bodyStart, bodyEnd, parseRegion, errs)
+                continue
+            scope = _innermostScope(nodes[-1])
+            scope.statements = _recoverRegion(schemaFile, schemaText, bodyStart, bodyEnd, parseRegion, errs)
+            for node in scope.statements:
+                node.parent = scope
+            statements += nodes
+            continue
+
+        errs.append(stmtErr)
+
+        # Otherwise, if the statement contains a later definition, resume parsing there.
+        errPos = stmtErr.sourceRef.startPos if stmtErr.sourceRef is not None else stmtStart
+        resyncPos = _findResyncPos(tokens, errPos)
+        if resyncPos is not None and resyncPos > stmtStart:
+            statements += _recoverRegion(schemaFile, schemaText, resyncPos, stmtEnd, parseRegion, errs)
+
+    return statements
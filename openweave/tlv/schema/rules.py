@@ -0,0 +1,156 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Registry of the named rules that implement the semantic checks performed by
+#      WeaveTLVSchema.validate().
+#
+#      A node rule declares the node classes it checks, and is invoked once for each
+#      node of those classes.  During validation the schema is traversed once, and
+#      each node is dispatched to all the selected rules that check its class.  A
+#      schema rule is invoked once per validation, after the traversal, to perform
+#      checks that span the entire schema.
+#
+#      Rules are registered in the order in which their checks are applied, which
+#      determines the order of the errors reported for a node.
+#
+
+import fnmatch
+import time
+
+
+class ValidationRule(object):
+    '''A named validation rule.
+       check is a function called with a node (or, for a schema rule, a WeaveTLVSchema
+       object) and a list to which to append errors.  nodeClasses is a class, or tuple
+       of classes, of the nodes checked by the rule, or None for a schema rule.'''
+
+    def __init__(self, name, check, nodeClasses=None, summary=None):
+        self.name = name
+        self.check = check
+        self.nodeClasses = nodeClasses
+        self.summary = summary
+
+    @property
+    def isSchemaRule(self):
+        return self.nodeClasses is None
+
+    def __repr__(self):
+        return 'ValidationRule(%r)' % self.name
+
+
+class RuleStats(object):
+    '''Statistics for a validation rule, accumulated over a validation.'''
+
+    def __init__(self):
+        self.calls = 0
+        self.errorCount = 0
+        self.time = 0.0
+
+
+_rules = []
+_rulesByName = {}
+
+
+def registerRule(rule):
+    '''Register a validation rule, which is selected by default.'''
+    if rule.name in _rulesByName:
+        raise ValueError('Validation rule already registered: %s' % rule.name)
+    _rules.append(rule)
+    _rulesByName[rule.name] = rule
+    _defaultRuleSet._reset()
+    return rule
+
+def getRule(name):
+    '''Return the registered validation rule with a given name, or None.'''
+    return _rulesByName.get(name, None)
+
+def allRules():
+    '''Return a list of all registered validation rules, in the order they are applied.'''
+    return list(_rules)
+
+def selectRules(enable=None, disable=None):
+    '''Return a list of the registered validation rules selected by the given lists of
+       rule names.  Names may contain shell-style wildcards (e.g. "duplicate-*").
+       If enable is given, only the rules matching one of its names are selected;
+       otherwise all rules are.  Rules matching one of the names in disable are then
+       deselected.  Raises a ValueError if a name does not match any rule.'''
+    def matchRules(names):
+        matched = set()
+        for name in names:
+            rules = [ rule for rule in _rules if fnmatch.fnmatchcase(rule.name, name) ]
+            if len(rules) == 0:
+                raise ValueError('Unknown validation rule: %s' % name)
+            matched.update(rules)
+        return matched
+    selected = matchRules(enable) if enable is not None else set(_rules)
+    if disable is not None:
+        selected -= matchRules(disable)
+    return [ rule for rule in _rules if rule in selected ]
+
+
+class RuleSet(object):
+    '''A selection of validation rules to be applied to a schema, along with statistics
+       for each rule.'''
+
+    def __init__(self, rules=None, profile=True):
+        '''Create a RuleSet for the given rules (all registered rules by default).
+           If profile is True, the time taken by each rule is recorded.'''
+        self.profile = profile
+        self._reset(rules)
+
+    def _reset(self, rules=None):
+        self.rules = list(rules) if rules is not None else allRules()
+        self.stats = { rule.name : RuleStats() for rule in self.rules }
+        self._nodeRules = {}
+
+    def checkNode(self, node, errs):
+        '''Apply the selected node rules that check the class of a given node.'''
+        cls = type(node)
+        rules = self._nodeRules.get(cls, None)
+        if rules is None:
+            rules = self._nodeRules[cls] = [ rule for rule in self.rules
+                                             if not rule.isSchemaRule and issubclass(cls, rule.nodeClasses) ]
+        for rule in rules:
+            self._apply(rule, node, errs)
+
+    def checkSchema(self, schema, errs):
+        '''Apply the selected schema rules to a given schema.'''
+        for rule in self.rules:
+            if rule.isSchemaRule:
+                self._apply(rule, schema, errs)
+
+    def _apply(self, rule, target, errs):
+        stats = self.stats[rule.name]
+        errCount = len(errs)
+        if self.profile:
+            startTime = time.perf_counter()
+            rule.check(target, errs)
+            stats.time += time.perf_counter() - startTime
+        else:
+            rule.check(target, errs)
+        stats.calls += 1
+        stats.errorCount += len(errs) - errCount
+
+
+# RuleSet used to validate individual nodes outside of WeaveTLVSchema.validate().
+_defaultRuleSet = RuleSet(profile=False)
+
+def checkNode(node, errs):
+    '''Apply all registered node rules that check the class of a given node.'''
+    _defaultRuleSet.checkNode(node, errs)
@@ -0,0 +1,438 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Compact binary serialization format for Weave TLV Schema ASTs.
+#
+#      A serialized SchemaFile has the following layout:
+#
+#        header        : magic ("WTSA"), format version (1 byte), flags (1 byte)
+#        string table  : varint count, followed by count x (varint length, UTF-8 bytes)
+#        root node     : a node record for the SchemaFile node
+#
+#      Each node record consists of a varint class code (0 denotes a missing node),
+#      followed by the node's source reference (if the SOURCE_REFS flag is set),
+#      followed by the node's fields, in the order given by the class's field spec
+#      (see _fieldSpecs below).  All strings are encoded as varint indexes into the
+#      string table (0 denotes None).  Documentation strings and their source
+#      references are only present if the DOCS flag is set.  The original schema
+#      text is only present if the TEXT flag is set.
+#
+#      Semantic information computed during validation (e.g. resolved type references)
+#      is not serialized.  Calling validate() on a WeaveTLVSchema object containing
+#      deserialized SchemaFiles recomputes this information.
+#
+
+from decimal import Decimal, InvalidOperation
+import io
+import sys
+
+from .node import *
+from .error import WeaveTLVSchemaError
+
+MAGIC = b'WTSA'
+VERSION = 1
+
+FLAG_SOURCE_REFS = 0x01
+FLAG_DOCS = 0x02
+FLAG_TEXT = 0x04
+
+# ----- Field kinds
+
+_STR = 0        # optional string
+_INT = 1        # optional integer
+_NUM = 2        # optional integer or Decimal
+_SCOPE = 3      # optional integer or string (e.g. profile in a Tag qualifier)
+_BOOL = 4       # boolean
+_NODE = 5       # optional child node
+_NODES = 6      # optional list of child nodes
+_SREF = 7       # optional SourceRef (present only if FLAG_SOURCE_REFS)
+_DOCS = 8       # optional documentation string (present only if FLAG_DOCS)
+_DOCSREF = 9    # optional documentation SourceRef (present only if FLAG_DOCS and FLAG_SOURCE_REFS)
+
+# The list of serializable node classes.  The index of each class in this list
+# is its class code (plus one).  New classes must only ever be appended to this
+# list to maintain compatibility with previously serialized data.
+_nodeClasses = [
+    SchemaFile,
+    Namespace,
+    Vendor,
+    Profile,
+    Message,
+    StatusCode,
+    TypeDef,
+    Using,
+    Extensible,
+    Optional,
+    Private,
+    Invariant,
+    Nullable,
+    TagOrder,
+    SchemaOrder,
+    AnyOrder,
+    Range,
+    Length,
+    Tag,
+    Id,
+    FloatType,
+    BooleanType,
+    StringType,
+    ByteStringType,
+    NullType,
+    AnyType,
+    SignedIntegerType,
+    UnsignedIntegerType,
+    StructureType,
+    FieldGroupType,
+    ChoiceType,
+    ArrayType,
+    ListType,
+    ReferencedType,
+    IntegerEnumValue,
+    StructureField,
+    StructureIncludes,
+    ChoiceAlternate,
+    LinearTypePatternElement,
+]
+
+_classCodes = { cls : code + 1 for (code, cls) in enumerate(_nodeClasses) }
+
+def _makeFieldSpec(cls):
+    '''Construct the list of (attribute name, field kind) tuples describing the
+       serialized form of a given node class.'''
+    spec = []
+    if issubclass(cls, HasName):
+        spec += [ ('name', _STR), ('nameSourceRef', _SREF) ]
+    if issubclass(cls, HasQualifiers):
+        spec += [ ('quals', _NODES) ]
+    if issubclass(cls, HasDocumentation):
+        spec += [ ('docs', _DOCS), ('docsSourceRef', _DOCSREF) ]
+    if issubclass(cls, SchemaFile):
+        spec += [ ('fileName', _STR), ('statements', _NODES) ]
+    elif issubclass(cls, Namespace):
+        spec += [ ('statements', _NODES) ]
+    elif issubclass(cls, Message):
+        spec += [ ('payload', _NODE), ('emptyPayload', _BOOL) ]
+    elif issubclass(cls, (TypeDef, StructureField, ChoiceAlternate)):
+        spec += [ ('type', _NODE) ]
+    elif issubclass(cls, Using):
+        spec += [ ('targetName', _STR), ('targetNameSourceRef', _SREF), ('fullyQualifiedTargetName', _STR) ]
+    elif issubclass(cls, Range):
+        spec += [ ('width', _INT), ('lowerBound', _NUM), ('upperBound', _NUM) ]
+    elif issubclass(cls, Length):
+        spec += [ ('lowerBound', _INT), ('upperBound', _INT) ]
+    elif issubclass(cls, Tag):
+        spec += [ ('tagNum', _INT), ('profile', _SCOPE) ]
+    elif issubclass(cls, Id):
+        spec += [ ('idNum', _INT), ('vendor', _SCOPE) ]
+    elif issubclass(cls, IntegerTypeNode):
+        spec += [ ('values', _NODES) ]
+    elif issubclass(cls, StructuredTypeNode):
+        spec += [ ('members', _NODES) ]
+    elif issubclass(cls, ChoiceType):
+        spec += [ ('alternates', _NODES) ]
+    elif issubclass(cls, SequencedTypeNode):
+        spec += [ ('elemType', _NODE), ('elemTypePattern', _NODES) ]
+    elif issubclass(cls, (ReferencedType, StructureIncludes)):
+        spec += [ ('targetName', _STR) ]
+    elif issubclass(cls, IntegerEnumValue):
+        spec += [ ('value', _INT), ('valueSourceRef', _SREF) ]
+    if issubclass(cls, LinearTypePatternElement):
+        spec += [ ('type', _NODE), ('lowerBound', _INT), ('upperBound', _INT) ]
+    return spec
+
+_fieldSpecs = { cls : _makeFieldSpec(cls) for cls in _nodeClasses }
+
+def _makeDefaultAttrs(cls):
+    '''Capture the attributes of a freshly constructed instance of a given node class,
+       excluding those that are restored from the serialized form.'''
+    if cls is SchemaFile:
+        node = SchemaFile(None, None)
+    else:
+        node = cls()
+    attrs = dict(node.__dict__)
+    for (attrName, kind) in _fieldSpecs[cls]:
+        attrs.pop(attrName, None)
+    attrs.pop('sourceRef', None)
+    attrs.pop('parent', None)
+    # Any mutable attributes must be restored from the serialized form, rather than
+    # shared between instances.
+    assert not any(isinstance(v, (list, dict)) for v in attrs.values())
+    return attrs
+
+_defaultAttrs = { cls : _makeDefaultAttrs(cls) for cls in _nodeClasses }
+
+
+def dumps(schemaFile, withSourceRefs=True, withDocs=True, withText=True):
+    '''Serialize a SchemaFile node and all its descendants into a bytes object.'''
+    return _Encoder(withSourceRefs, withDocs, withText).encode(schemaFile)
+
+def dump(schemaFile, stream, withSourceRefs=True, withDocs=True, withText=True):
+    '''Serialize a SchemaFile node and all its descendants to a binary output stream.'''
+    stream.write(dumps(schemaFile, withSourceRefs=withSourceRefs, withDocs=withDocs, withText=withText))
+
+def loads(data, schemaFile=None):
+    '''Reconstruct a SchemaFile node from serialized data in a bytes-like object.
+       If schemaFile is given, the serialized statements are attached to it, rather than
+       to a new SchemaFile node, and it is returned.'''
+    return _Decoder(data, schemaFile).decode()
+
+def load(stream):
+    '''Reconstruct a SchemaFile node from serialized data read from a binary input stream.'''
+    return loads(stream.read())
+
+
+# ----- Private Members
+
+def _writeVarint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def _zigzag(n):
+    return (n << 1) if n >= 0 else ((-n << 1) - 1)
+
+def _unzigzag(z):
+    return (z >> 1) if not (z & 1) else -((z + 1) >> 1)
+
+class _Encoder(object):
+
+    def __init__(self, withSourceRefs, withDocs, withText):
+        self.flags = ((FLAG_SOURCE_REFS if withSourceRefs else 0) |
+                      (FLAG_DOCS if withDocs else 0) |
+                      (FLAG_TEXT if withText else 0))
+        self.strings = {}
+        self.body = bytearray()
+
+    def encode(self, schemaFile):
+        if not isinstance(schemaFile, SchemaFile):
+            raise TypeError('expected a SchemaFile node')
+        if self.flags & FLAG_TEXT:
+            self._writeStr(schemaFile.schemaText)
+        self._writeNode(schemaFile)
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+        out.append(self.flags)
+        _writeVarint(out, len(self.strings))
+        for s in self.strings:
+            b = s.encode('utf-8')
+            _writeVarint(out, len(b))
+            out += b
+        out += self.body
+        return bytes(out)
+
+    def _writeStr(self, s):
+        if s is None:
+            self.body.append(0)
+        else:
+            index = self.strings.get(s)
+            if index is None:
+                index = self.strings[s] = len(self.strings)
+            _writeVarint(self.body, index + 1)
+
+    def _writeSourceRef(self, sourceRef):
+        body = self.body
+        if sourceRef is None:
+            body.append(0)
+        else:
+            body.append(1)
+            _writeVarint(body, sourceRef.startLine)
+            _writeVarint(body, sourceRef.startCol)
+            _writeVarint(body, sourceRef.startPos)
+            _writeVarint(body, sourceRef.endLine - sourceRef.startLine)
+            _writeVarint(body, sourceRef.endCol)
+            _writeVarint(body, sourceRef.endPos - sourceRef.startPos)
+
+    def _writeNode(self, node):
+        body = self.body
+        if node is None:
+            body.append(0)
+            return
+        cls = type(node)
+        code = _classCodes.get(cls)
+        if code is None:
+            raise TypeError('cannot serialize node of type %s' % cls.__name__)
+        _writeVarint(body, code)
+        withSourceRefs = self.flags & FLAG_SOURCE_REFS
+        withDocs = self.flags & FLAG_DOCS
+        if withSourceRefs:
+            self._writeSourceRef(node.sourceRef)
+        for (attrName, kind) in _fieldSpecs[cls]:
+            val = getattr(node, attrName)
+            if kind == _STR:
+                self._writeStr(val)
+            elif kind == _NODES:
+                if val is None:
+                    body.append(0)
+                else:
+                    _writeVarint(body, len(val) + 1)
+                    for childNode in val:
+                        self._writeNode(childNode)
+            elif kind == _NODE:
+                self._writeNode(val)
+            elif kind == _SREF:
+                if withSourceRefs:
+                    self._writeSourceRef(val)
+            elif kind == _DOCS:
+                if withDocs:
+                    self._writeStr(val)
+            elif kind == _DOCSREF:
+                if withDocs and withSourceRefs:
+                    self._writeSourceRef(val)
+            elif kind == _INT:
+                if val is None:
+                    body.append(0)
+                else:
+                    _writeVarint(body, _zigzag(val) + 1)
+            elif kind == _BOOL:
+                body.append(1 if val else 0)
+            elif kind in (_NUM, _SCOPE):
+                if val is None:
+                    body.append(0)
+                elif isinstance(val, int):
+                    body.append(1)
+                    _writeVarint(body, _zigzag(val))
+                else:
+                    body.append(2)
+                    self._writeStr(str(val))
+
+class _Decoder(object):
+
+    def __init__(self, data, schemaFile=None):
+        self.data = data
+        self.pos = 0
+        self.strings = None
+        self.schemaFile = schemaFile
+
+    def decode(self):
+        data = self.data
+        if len(data) < 6 or bytes(data[0:4]) != MAGIC:
+            raise WeaveTLVSchemaError('invalid serialized schema: bad header')
+        if data[4] != VERSION:
+            raise WeaveTLVSchemaError('unsupported serialized schema version: %d' % data[4])
+        self.flags = data[5]
+        self.pos = 6
+        try:
+            count = self._readVarint()
+            strings = [ None ] * (count + 1)
+            for i in range(1, count + 1):
+                n = self._readVarint()
+                strings[i] = bytes(data[self.pos:self.pos + n]).decode('utf-8')
+                self.pos += n
+            self.strings = strings
+            schemaText = self.strings[self._readVarint()] if self.flags & FLAG_TEXT else None
+            if self.schemaFile is None:
+                self.schemaFile = SchemaFile(None, schemaText)
+            schemaFile = self._readNode(None)
+        except (IndexError, KeyError, UnicodeDecodeError, InvalidOperation):
+            raise WeaveTLVSchemaError('invalid serialized schema: truncated or corrupt data') from None
+        if not isinstance(schemaFile, SchemaFile):
+            raise WeaveTLVSchemaError('invalid serialized schema: root node is not a schema file')
+        return schemaFile
+
+    def _readVarint(self):
+        data = self.data
+        pos = self.pos
+        b = data[pos]
+        pos += 1
+        n = b & 0x7F
+        shift = 7
+        while b & 0x80:
+            b = data[pos]
+            pos += 1
+            n |= (b & 0x7F) << shift
+            shift += 7
+        self.pos = pos
+        return n
+
+    def _readSourceRef(self):
+        if self.data[self.pos] == 0:
+            self.pos += 1
+            return None
+        self.pos += 1
+        readVarint = self._readVarint
+        startLine = readVarint()
+        startCol = readVarint()
+        startPos = readVarint()
+        endLine = startLine + readVarint()
+        endCol = readVarint()
+        endPos = startPos + readVarint()
+        return SourceRef(self.schemaFile, startLine, startCol, startPos, endLine, endCol, endPos)
+
+    def _readNode(self, parent):
+        readVarint = self._readVarint
+        code = readVarint()
+        if code == 0:
+            return None
+        cls = _nodeClasses[code - 1]
+        if cls is SchemaFile:
+            if parent is not None:
+                raise WeaveTLVSchemaError('invalid serialized schema: nested schema file')
+            node = self.schemaFile
+        else:
+            node = cls.__new__(cls)
+            node.__dict__.update(_defaultAttrs[cls])
+        node.parent = parent
+        flags = self.flags
+        withSourceRefs = flags & FLAG_SOURCE_REFS
+        withDocs = flags & FLAG_DOCS
+        node.sourceRef = self._readSourceRef() if withSourceRefs else None
+        strings = self.strings
+        data = self.data
+        # As when parsed, top-level statements have no parent.
+        childParent = node if cls is not SchemaFile else None
+        for (attrName, kind) in _fieldSpecs[cls]:
+            if kind == _STR:
+                # Names are interned, as they are when parsed.
+                val = strings[readVarint()]
+                if val is not None:
+                    val = sys.intern(val)
+            elif kind == _NODES:
+                count = readVarint()
+                if count == 0:
+                    val = None
+                else:
+                    val = [ self._readNode(childParent) for i in range(count - 1) ]
+            elif kind == _NODE:
+                val = self._readNode(childParent)
+            elif kind == _SREF:
+                val = self._readSourceRef() if withSourceRefs else None
+            elif kind == _DOCS:
+                val = strings[readVarint()] if withDocs else None
+            elif kind == _DOCSREF:
+                val = self._readSourceRef() if withDocs and withSourceRefs else None
+            elif kind == _INT:
+                z = readVarint()
+                val = _unzigzag(z - 1) if z != 0 else None
+            elif kind == _BOOL:
+                val = data[self.pos] != 0
+                self.pos += 1
+            else:
+                tag = data[self.pos]
+                self.pos += 1
+                if tag == 0:
+                    val = None
+                elif tag == 1:
+                    val = _unzigzag(readVarint())
+                elif kind == _NUM:
+                    val = Decimal(strings[readVarint()])
+                else:
+                    val = strings[readVarint()]
+            setattr(node, attrName, val)
+        return node
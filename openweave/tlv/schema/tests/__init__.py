@@ -27,15 +27,36 @@
 
 
 from .test_ARRAY import Test_ARRAY
+from .test_async import Test_Async
+from .test_bounds import Test_Bounds
+from .test_bundle import Test_Bundle
+from .test_canonical import Test_Canonical
 from .test_CHOICE import Test_CHOICE
+from .test_diff import Test_Diff
+from .test_dump import Test_Dump
+from .test_frontends import *
+from .test_enums import Test_Enums
+from .test_formatter import Test_Formatter
+from .test_incremental import Test_Incremental
 from .test_INTEGER import Test_INTEGER
+from .test_jsonschema import Test_JSONSchema
+from .test_lazy import Test_Lazy
+from .test_lexer import Test_Lexer
 from .test_LIST import Test_LIST
+from .test_lsp import Test_LSP
 from .test_MESSAGE import Test_MESSAGE
+from .test_parallel import Test_Parallel
 from .test_PROFILE import Test_PROFILE
 from .test_qualifiers import Test_Qualifiers
+from .test_query import Test_Query
+from .test_recovery import Test_Recovery
 from .test_refs import Test_Refs
+from .test_rules import Test_Rules
+from .test_serialization import Test_Serialization
 from .test_STATUS_CODE import Test_STATUS_CODE
 from .test_STRUCTURE import Test_STRUCTURE
 from .test_syntax import Test_Syntax
 from .test_tags import Test_Tags
+from .test_transcode import Test_Transcode
+from .test_using import Test_Using
 from .test_VENDOR import Test_VENDOR
@@ -139,5 +139,60 @@ class Test_CHOICE(TLVSchemaTestCase):
         self.assertIn((None, 4), possibleTags)  # tag for alt4
         self.assertIn((0x1234, 5), possibleTags)# tag for alt5
 
+    def test_CHOICE_leafAlternates(self):
+        schemaText = '''
+                     c1 => CHOICE OF
+                     {
+                         alt1 [1] : STRING,
+                         c2
+                     }
+                     c2 => CHOICE OF
+                     {
+                         alt2 [2] : BOOLEAN,
+                         alt3 [3] : INTEGER
+                     }
+                     s => STRUCTURE
+                     {
+                         f : c1
+                     }
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertErrorCount(errs, 0)
+        c1 = tlvSchema.getTypeDef('c1').targetType
+        c2 = tlvSchema.getTypeDef('c2').targetType
+        field = tlvSchema.getTypeDef('s').targetType.getField('f')
+
+        # The table is computed once, and agrees with the enumeration methods.
+        leafAlts = c1.leafAlternates
+        self.assertIs(c1.leafAlternates, leafAlts)
+        self.assertEqual([ (list(chain), name, tag) for (chain, name, tag) in leafAlts ],
+                         list(c1.allLeafAlternatesWithNamesAndTags()))
+        self.assertEqual([ list(chain) for (chain, name, tag) in leafAlts ], list(c1.allLeafAlternateChains()))
+        self.assertEqual([ name for (chain, name, tag) in leafAlts ], [ 'alt1', 'alt2', 'alt3' ])
+        self.assertEqual(leafAlts[2][0], (c2.alternates[1], c1.alternates[1]))
+        self.assertEqual(sorted(tag.tagNum for tag in field.possibleTags), [ 1, 2, 3 ])
+
+        # Cached tables and tags are recomputed when the schema is edited and re-validated.
+        schemaFile = next(tlvSchema.allFiles())
+        pos = schemaFile.schemaText.index('alt3 [3] : INTEGER')
+        errs = schemaFile.applyEdit(pos, pos + len('alt3 [3] : INTEGER'), 'alt3 [3] : INTEGER, alt4 [4] : FLOAT')
+        self.assertErrorCount(errs, 0)
+        self.assertErrorCount(tlvSchema.validate(), 0)
+        c2 = tlvSchema.getTypeDef('c2').targetType
+        self.assertEqual([ name for (chain, name, tag) in c1.leafAlternates ], [ 'alt1', 'alt2', 'alt3', 'alt4' ])
+        self.assertEqual(c1.leafAlternates[3][0], (c2.alternates[2], c1.alternates[1]))
+        self.assertEqual(sorted(tag.tagNum for tag in field.possibleTags), [ 1, 2, 3, 4 ])
+
+        # Re-validating another schema does not discard the tables cached by this one.
+        leafAlts = c1.leafAlternates
+        possibleTags = field.possibleTags
+        (otherSchema, errs) = self.loadValidate(schemaText)
+        self.assertErrorCount(errs, 0)
+        self.assertErrorCount(otherSchema.validate(), 0)
+        self.assertIs(c1.leafAlternates, leafAlts)
+        self.assertIs(field.possibleTags, possibleTags)
+        self.assertErrorCount(tlvSchema.validate(), 0)
+        self.assertIsNot(c1.leafAlternates, leafAlts)
+
 if __name__ == '__main__':
     unittest.main()
@@ -35,7 +35,7 @@ class Test_INTEGER(TLVSchemaTestCase):
                          v0 = 0,
                          v1 = 1,
                          v2 = 2,
-                         v3 = 9223372036854775807,
+                         v3 = 9223372036854775806,
                          v4 = -9223372036854775808,
                          v5 = 0x7FFFFFFFFFFFFFFF,
                          v6 = -0x7FFFFFFFFFFFFFFF,
@@ -43,6 +43,9 @@ class Test_INTEGER(TLVSchemaTestCase):
                      '''
         (tlvSchema, errs) = self.loadValidate(schemaText)
         self.assertNoErrors(errs)
+        values = { v.name : v.value for v in tlvSchema.getTypeDef('int').targetType.values }
+        self.assertEqual(values['v5'], 9223372036854775807)
+        self.assertEqual(values['v6'], -9223372036854775807)
 
         schemaText = '''
                      int => UNSIGNED INTEGER
@@ -299,7 +302,7 @@ class Test_INTEGER(TLVSchemaTestCase):
                      {
                          too-small-1 = -1,
                          too-small-2 = 0,
-                         too-small-2 = 41,
+                         too-small-3 = 41,
                          too-big-1 = 87265838913,
                          too-big-2 = 18446744073709551616,
                          too-big-3 = 184467440737095516160,
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for the asynchronous load and validate methods.
+#
+
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..error import WeaveTLVSchemaError
+from ..node import TypeDef
+
+class Test_Async(TLVSchemaTestCase):
+
+    _schemaTexts = [
+        'namespace a { t1 => STRUCTURE { f [1] : b.t2 } }',
+        'namespace b { t2 => ARRAY OF STRING }',
+        'namespace c { t3 => INTEGER { x = 1 } }',
+    ]
+
+    def setUp(self):
+        super(Test_Async, self).setUp()
+        self.tempDir = tempfile.mkdtemp()
+        self.fileNames = [ self._writeFile('s%d.txt' % i, text) for (i, text) in enumerate(self._schemaTexts) ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+        super(Test_Async, self).tearDown()
+
+    def _writeFile(self, name, text):
+        fileName = os.path.join(self.tempDir, name)
+        with open(fileName, 'w') as f:
+            f.write(text)
+        return fileName
+
+    def _summary(self, schema):
+        return [ (n.fullyQualifiedName, type(n.type).__name__, n.sourceRef.posStr()) for n in schema.allNodes(TypeDef) ]
+
+    def test_Async_LoadFiles(self):
+        for kwargs in ({}, { 'concurrency' : 1 }, { 'lazy' : True }):
+            lazy = kwargs.pop('lazy', False)
+            schema = WeaveTLVSchema(lazy=lazy)
+            schemaFiles = asyncio.run(schema.aloadSchemaFiles(self.fileNames, **kwargs))
+            self.assertEqual([ f.fileName for f in schemaFiles ], self.fileNames)
+            self.assertEqual([ f.fileName for f in schema.allFiles() ], self.fileNames)
+            self.assertIsNotNone(schema.getTypeDef('b.t2'))
+            self.assertNoErrors(schema.validate())
+            self.assertIs(schema.getTypeDef('a.t1').type.members[0].type.targetTypeDef, schema.getTypeDef('b.t2'))
+
+        schema = WeaveTLVSchema()
+        schemaFile = asyncio.run(schema.aloadSchemaFromFile(self.fileNames[2]))
+        self.assertEqual(schemaFile.fileName, self.fileNames[2])
+        self.assertIsNotNone(schema.getTypeDef('c.t3'))
+
+    def test_Async_ProcessPool(self):
+        syncSchema = WeaveTLVSchema()
+        for fileName in self.fileNames:
+            syncSchema.loadSchemaFromFile(fileName)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+            schema = WeaveTLVSchema()
+            asyncio.run(schema.aloadSchemaFiles(self.fileNames, executor=executor))
+            self.assertNoErrors(schema.validate())
+            self.assertEqual(self._summary(schema), self._summary(syncSchema))
+
+            badFileName = self._writeFile('bad.txt', 'namespace d { t4 => STRUCTURE { f [1] : } }\nt5 => STRING')
+            schema = WeaveTLVSchema()
+            errs = []
+            asyncio.run(schema.aloadSchemaFiles([ badFileName ], errs=errs, executor=executor))
+            self.assertErrorCount(errs, 1)
+            self.assertEqual(errs[0].sourceRef.filePosStr(), '%s:1:41' % badFileName)
+            self.assertIsNotNone(schema.getTypeDef('t5'))
+
+    def test_Async_SyntaxErrors(self):
+        badFileName = self._writeFile('bad.txt', 'namespace d { t4 => STRUCTURE { f [1] : } }\nt5 => STRING')
+        fileNames = [ self.fileNames[0], badFileName, self.fileNames[1] ]
+
+        schema = WeaveTLVSchema()
+        errs = []
+        asyncio.run(schema.aloadSchemaFiles(fileNames, errs=errs))
+        self.assertErrorCount(errs, 1)
+        self.assertEqual(errs[0].sourceRef.filePosStr(), '%s:1:41' % badFileName)
+        self.assertEqual(len(list(schema.allFiles())), 3)
+        self.assertIsNotNone(schema.getTypeDef('t5'))
+
+        # Without errs, the first file containing an error fails the load, and neither it
+        # nor the files that follow it are added.
+        schema = WeaveTLVSchema()
+        with self.assertRaises(WeaveTLVSchemaError):
+            asyncio.run(schema.aloadSchemaFiles(fileNames))
+        self.assertEqual([ f.fileName for f in schema.allFiles() ], fileNames[:1])
+
+    def test_Async_Validate(self):
+        text = 'namespace e { t6 => STRUCTURE { f [1] : undefined } }'
+        syncSchema = WeaveTLVSchema()
+        syncSchema.loadSchemaFromString(text)
+        expectedErrs = [ str(err) for err in syncSchema.validate() ]
+        self.assertEqual(len(expectedErrs), 1)
+
+        schema = WeaveTLVSchema()
+        schema.loadSchemaFromString(text)
+        for fileName in self.fileNames:
+            schema.loadSchemaFromFile(fileName)
+
+        # Other tasks run while the schema is validated.
+        async def run():
+            ticks = 0
+            done = False
+            async def ticker():
+                nonlocal ticks
+                while not done:
+                    ticks += 1
+                    await asyncio.sleep(0)
+            tickerTask = asyncio.ensure_future(ticker())
+            await asyncio.sleep(0)
+            errs = await schema.avalidate()
+            done = True
+            await tickerTask
+            return (errs, ticks)
+        (errs, ticks) = asyncio.run(run())
+        self.assertEqual([ str(err) for err in errs ], expectedErrs)
+        self.assertGreater(ticks, len(self.fileNames))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for bulk bounds checking.
+#
+
+import array
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import bounds
+from ..bounds import typeBounds, boundsMask, firstOutOfBounds
+
+class Test_Bounds(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  u8 => UNSIGNED INTEGER [ range 8bits ]
+                  i64 => SIGNED INTEGER
+                  u64 => UNSIGNED INTEGER
+                  r => INTEGER [ range -5..5 ]
+                  big => UNSIGNED INTEGER [ range 2..100000000000000000000 ]
+                  f => FLOAT [ range 0.1..2.5 ]
+                  f32 => FLOAT [ range 32bits ]
+                  s => STRING [ length 2..4 ]
+                  b => BYTE STRING [ length 1.. ]
+                  str => STRING
+                  t => STRUCTURE { x [1] : r }
+                  '''
+
+    def setUp(self):
+        super(Test_Bounds, self).setUp()
+        (self.tlvSchema, errs) = self.loadValidate(self._schemaText)
+        self.assertNoErrors(errs)
+
+    def _mask(self, typeName, values):
+        return [ bool(inBounds) for inBounds in boundsMask(self.tlvSchema.getTypeDef(typeName), values) ]
+
+    def _first(self, typeName, values):
+        return firstOutOfBounds(self.tlvSchema.getTypeDef(typeName), values)
+
+    def test_Bounds_Integer(self):
+        self.assertEqual(typeBounds(self.tlvSchema.getTypeDef('u8')), (0, 255))
+        self.assertEqual(typeBounds(self.tlvSchema.getTypeDef('i64')), (-2 ** 63, 2 ** 63 - 1))
+        self.assertEqual(typeBounds(self.tlvSchema.getTypeDef('r')), (-5, 5))
+        def check():
+            self.assertEqual(self._mask('u8', [ 0, 255, 256, -1 ]), [ True, True, False, False ])
+            self.assertEqual(self._mask('r', array.array('b', [ -6, -5, 0, 5, 6 ])), [ False, True, True, True, False ])
+            self.assertEqual(self._mask('r', memoryview(array.array('q', [ 3, 7 ]))), [ True, False ])
+            self.assertEqual(self._mask('u8', b'\x00\xff'), [ True, True ])
+            self.assertEqual(self._mask('r', bytearray([ 5, 6 ])), [ True, False ])
+            self.assertEqual(self._first('r', b'\x01\x02\x09'), 2)
+            self.assertEqual(self._first('r', array.array('q', [ 1, 2, 3, -9, 10 ])), 3)
+            self.assertIsNone(self._first('r', [ 1, 2, 3 ]))
+            self.assertIsNone(self._first('r', []))
+            # Referenced types are checked against the bounds of their target.
+            fieldType = self.tlvSchema.getTypeDef('t').targetType.getField('x').type
+            self.assertEqual(list(map(bool, boundsMask(fieldType, [ 5, 6 ]))), [ True, False ])
+        self.checkNumPyModes(bounds, check)
+
+    def test_Bounds_64Bit(self):
+        # Values and bounds at and beyond the limits of 64-bit integers are compared exactly.
+        def check():
+            self.assertEqual(self._mask('i64', [ -2 ** 63, 2 ** 63 - 1, 2 ** 63, -2 ** 63 - 1 ]),
+                             [ True, True, False, False ])
+            self.assertEqual(self._mask('u64', array.array('Q', [ 0, 2 ** 64 - 1 ])), [ True, True ])
+            self.assertEqual(self._mask('u64', [ -1, 2 ** 64 ]), [ False, False ])
+            self.assertEqual(self._mask('i64', array.array('Q', [ 2 ** 63 - 1, 2 ** 63 ])), [ True, False ])
+            self.assertEqual(self._mask('u64', array.array('q', [ -1, 0 ])), [ False, True ])
+            self.assertEqual(self._mask('big', array.array('Q', [ 1, 2, 2 ** 64 - 1 ])), [ False, True, True ])
+            self.assertEqual(self._mask('big', [ 10 ** 20, 10 ** 20 + 1 ]), [ True, False ])
+            self.assertEqual(self._mask('u8', array.array('q', [ 2 ** 62 ])), [ False ])
+        self.checkNumPyModes(bounds, check)
+
+    def test_Bounds_Float(self):
+        self.assertEqual(typeBounds(self.tlvSchema.getTypeDef('f32')), (None, None))
+        def check():
+            self.assertEqual(self._mask('f', [ 0.1, 0.09999999999999999, 2.5, 2.5000000000000004, float('nan') ]),
+                             [ True, False, True, False, False ])
+            self.assertEqual(self._mask('f', array.array('d', [ 1, 3 ])), [ True, False ])
+            # Single precision values are compared at their exact values.  (0.1 rounds up.)
+            self.assertEqual(self._mask('f', array.array('f', [ 0.1, 2.75 ])), [ True, False ])
+            self.assertEqual(self._mask('f', [ 1, 3, 10 ** 400 ]), [ True, False, False ])
+            self.assertEqual(self._mask('f32', [ 1e300, float('nan') ]), [ True, True ])
+            # Floating point values are compared exactly with integer bounds.
+            self.assertEqual(self._mask('r', array.array('d', [ -5.0, 5.000000000000001 ])), [ True, False ])
+            self.assertEqual(self._mask('i64', [ 9223372036854775807.0 ]), [ False ])
+        self.checkNumPyModes(bounds, check)
+
+    def test_Bounds_Length(self):
+        self.assertEqual(typeBounds(self.tlvSchema.getTypeDef('b')), (1, None))
+        def check():
+            self.assertEqual(self._mask('s', [ 'a', 'ab', 'abcd', 'abcde' ]), [ False, True, True, False ])
+            self.assertEqual(self._mask('s', array.array('H', [ 1, 2, 5 ])), [ False, True, False ])
+            self.assertEqual(self._mask('b', [ b'', b'x' * 1000 ]), [ False, True ])
+            self.assertEqual(self._mask('str', [ '', 'x' * 1000 ]), [ True, True ])
+            self.assertEqual(self._first('s', [ 'ab', 'abc', '' ]), 2)
+        self.checkNumPyModes(bounds, check)
+
+    def test_Bounds_Errors(self):
+        with self.assertRaises(ValueError):
+            boundsMask(self.tlvSchema.getTypeDef('t'), [ 1 ])
+
+    @unittest.skipIf(bounds.numpy is None, 'requires NumPy')
+    def test_Bounds_NumPy(self):
+        numpy = bounds.numpy
+        r = self.tlvSchema.getTypeDef('r')
+        values = numpy.array([ [ -6, 0 ], [ 5, 6 ] ], dtype=numpy.int16)
+        mask = boundsMask(r, values)
+        self.assertEqual(mask.dtype, numpy.bool_)
+        self.assertEqual(mask.tolist(), [ [ False, True ], [ True, False ] ])
+        self.assertEqual(firstOutOfBounds(r, values), 0)
+        self.assertEqual(firstOutOfBounds(r, values[:, 1]), 1)
+        u64 = self.tlvSchema.getTypeDef('u64')
+        self.assertEqual(boundsMask(u64, numpy.array([ 2 ** 64 - 1 ], dtype=numpy.uint64)).tolist(), [ True ])
+        self.assertEqual(boundsMask(u64, numpy.array([ 2 ** 70, 5 ], dtype=object)).tolist(), [ False, True ])
+        s = self.tlvSchema.getTypeDef('s')
+        self.assertEqual(boundsMask(s, numpy.array([ 'a', 'abc' ])).tolist(), [ False, True ])
+        self.assertEqual(boundsMask(s, numpy.array([ b'a', b'abc' ])).tolist(), [ False, True ])
+
+if __name__ == '__main__':
+    unittest.main()
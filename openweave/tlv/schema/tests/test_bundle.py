@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for schema bundles.
+#
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..error import WeaveTLVSchemaError
+from ..bundle import writeBundle, MANIFEST_NAME
+from ..dump import dumpSchemaFiles, FORMAT_NDJSON
+
+class Test_Bundle(TLVSchemaTestCase):
+
+    _schemaTexts = [
+        '''
+        acme => VENDOR [ id 0x235A ]
+        namespace a
+        {
+            /** A structure */
+            t1 => STRUCTURE { f [1] : b.t2, g [2, optional] : STRING }
+            p => PROFILE [ id acme:1 ] { m => MESSAGE [ id 1 ] CONTAINING t1 }
+        }
+        ''',
+        'namespace b { t2 => ARRAY OF STRING }\nt3 => INTEGER { x = 1, y = 2 }\n',
+    ]
+
+    def setUp(self):
+        super(Test_Bundle, self).setUp()
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+        super(Test_Bundle, self).tearDown()
+
+    def _writeBundle(self, schemaTexts, withASTs=True):
+        schema = WeaveTLVSchema()
+        schemaFiles = [ schema.loadSchemaFromString(text, fileName='s%d.txt' % i, errs=[])
+                        for (i, text) in enumerate(schemaTexts) ]
+        schema.validate()
+        fileName = os.path.join(self.tempDir, 'bundle.zip')
+        writeBundle(schemaFiles, fileName, withASTs=withASTs)
+        return (fileName, schemaFiles)
+
+    @staticmethod
+    def _dump(schemaFiles):
+        output = io.StringIO()
+        dumpSchemaFiles(schemaFiles, output, FORMAT_NDJSON)
+        return [ json.loads(line) for line in output.getvalue().splitlines() ]
+
+    def _assertSameTrees(self, schemaFiles, expectedSchemaFiles):
+        records = self._dump(schemaFiles)
+        expectedRecords = self._dump(expectedSchemaFiles)
+        for record in records + expectedRecords:
+            del record['node']
+        self.assertEqual(records, expectedRecords)
+
+    def test_Bundle_Load(self):
+        for withASTs in (True, False):
+            (fileName, expectedSchemaFiles) = self._writeBundle(self._schemaTexts, withASTs)
+            schema = WeaveTLVSchema()
+            schemaFiles = schema.loadBundle(fileName, verify=True)
+            self.assertEqual([ f.fileName for f in schemaFiles ], [ 's0.txt', 's1.txt' ])
+            # The text of each file is only decoded when needed.
+            self.assertEqual([ f._schemaText for f in schemaFiles ], [ None, None ])
+            self.assertEqual([ f.schemaText for f in schemaFiles ], self._schemaTexts)
+
+            # Definitions are found via the index, without parsing the entire bundle.
+            self.assertEqual(schema.getTypeDef('b.t2').fullyQualifiedName, 'b.t2')
+            self.assertEqual(schema.getVendor('acme').id, 0x235A)
+            self.assertEqual([ s.isMaterialized for s in schemaFiles[1].lazyStatements ], [ True, False ])
+            self.assertFalse(schemaFiles[0].isMaterialized)
+
+            self.assertNoErrors(schema.validate())
+            self.assertEqual(schema.getProfile('a.p').id, 0x235A0001)
+            self.assertEqual(schema.getTypeDef('a.t1').targetType.getField('f').type.targetTypeDef,
+                             schema.getTypeDef('b.t2'))
+            self._assertSameTrees(schemaFiles, expectedSchemaFiles)
+
+    def test_Bundle_Errors(self):
+        # Syntax errors in bundled files are reported by validate().
+        (fileName, _) = self._writeBundle([ 'a => STRING\nb => STRUCTURE {\nc => INTEGER\n' ])
+        schema = WeaveTLVSchema()
+        schema.loadBundle(fileName)
+        errs = schema.validate()
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'unexpected input')
+        self.assertIsNotNone(schema.getTypeDef('a'))
+
+        # Files whose text does not match the manifest are rejected if verified.
+        (fileName, _) = self._writeBundle(self._schemaTexts)
+        with zipfile.ZipFile(fileName) as zf:
+            members = { name : zf.read(name) for name in zf.namelist() }
+        manifest = json.loads(members[MANIFEST_NAME])
+        def rewriteManifest():
+            members[MANIFEST_NAME] = json.dumps(manifest)
+            with zipfile.ZipFile(fileName, 'w') as zf:
+                for (name, data) in members.items():
+                    zf.writestr(name, data)
+        manifest['files'][1]['sha256'] = '0' * 64
+        rewriteManifest()
+        WeaveTLVSchema().loadBundle(fileName)
+        with self.assertRaises(WeaveTLVSchemaError) as cm:
+            WeaveTLVSchema().loadBundle(fileName, verify=True)
+        self.assertIn('hash mismatch: s1.txt', str(cm.exception))
+
+        # Manifests without a list of files are rejected.
+        del manifest['files']
+        rewriteManifest()
+        with self.assertRaises(WeaveTLVSchemaError) as cm:
+            WeaveTLVSchema().loadBundle(fileName)
+        self.assertIn('invalid schema bundle', str(cm.exception))
+
+        # Files that are not bundles are rejected.
+        fileName = os.path.join(self.tempDir, 'not-a-bundle.zip')
+        with open(fileName, 'w') as f:
+            f.write('t => STRING\n')
+        with self.assertRaises(WeaveTLVSchemaError) as cm:
+            WeaveTLVSchema().loadBundle(fileName)
+        self.assertIn('invalid schema bundle', str(cm.exception))
+
+if __name__ == '__main__':
+    unittest.main()
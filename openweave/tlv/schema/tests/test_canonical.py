@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for structural hashing of types.
+#
+
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from ..canonical import StructuralHasher
+
+class Test_Canonical(TLVSchemaTestCase):
+
+    def _hashes(self, schemaText, *typeNames):
+        (schema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+        return [ schema.getStructuralHash(schema.getTypeDef(name)) for name in typeNames ]
+
+    def test_Canonical_IdenticalTypes(self):
+        schemaText = '''
+                     t1 => STRUCTURE
+                     {
+                         a [1] : INTEGER [ range 8bits ],
+                         b [2, optional] : STRING [ len 1..10 ],
+                         c [3] : u1,
+                     }
+                     t2 => STRUCTURE
+                     {
+                         b [2, optional] : STRING [ len 1..10 ],
+                         a [1] : SIGNED INTEGER [ range 8bits ],
+                         c [3] : u2,
+                     }
+                     u1 => ARRAY OF BOOLEAN
+                     u2 => ARRAY OF BOOLEAN
+                     '''
+        (h1, h2, h3, h4) = self._hashes(schemaText, 't1', 't2', 'u1', 'u2')
+        self.assertEqual(h3, h4)
+        # Field order is significant.
+        self.assertNotEqual(h1, h2)
+
+        schemaText = '''
+                     t1 => STRUCTURE [ extensible ] { a [1] : INTEGER [ range 8bits, nullable ], c [3] : u1 }
+                     t2 => STRUCTURE [ extensible ] { a [1] : INTEGER [ nullable, range 8bits ], c [3] : u2 }
+                     u1 => ARRAY OF BOOLEAN
+                     u2 => ARRAY OF BOOLEAN
+                     r => t1
+                     '''
+        (h1, h2, h3) = self._hashes(schemaText, 't1', 't2', 'r')
+        self.assertEqual(h1, h2)
+        self.assertEqual(h1, h3)
+
+    def test_Canonical_DifferentTypes(self):
+        base = '''
+               t => STRUCTURE
+               {
+                   a [1] : INTEGER [ range 8bits ],
+                   b [2, optional] : STRING,
+               }
+               '''
+        variants = [
+            ('8bits', '16bits'),
+            ('[1]', '[3]'),
+            ('[1]', '[1:1]'),
+            (', optional', ''),
+            ('INTEGER', 'UNSIGNED INTEGER'),
+            ('b [', 'c ['),
+            ('STRUCTURE', 'STRUCTURE [ extensible ]'),
+            ('STRUCTURE', 'FIELD GROUP'),
+        ]
+        (baseHash,) = self._hashes(base, 't')
+        for (target, replacement) in variants:
+            (h,) = self._hashes(base.replace(target, replacement, 1), 't')
+            self.assertNotEqual(baseHash, h, msg='%s -> %s' % (target, replacement))
+
+        (h1, h2, h3) = self._hashes('''
+                                    e1 => INTEGER { one = 1, two = 2 }
+                                    e2 => INTEGER { one = 1, two = 3 }
+                                    e3 => INTEGER { one = 1, deux = 2 }
+                                    ''', 'e1', 'e2', 'e3')
+        self.assertEqual(len(set((h1, h2, h3))), 3)
+
+        (h1, h2) = self._hashes('''
+                                l1 => LIST { a : INTEGER, b : STRING * }
+                                l2 => LIST { a : INTEGER, b : STRING + }
+                                ''', 'l1', 'l2')
+        self.assertNotEqual(h1, h2)
+
+    def test_Canonical_DuplicateQualifiers(self):
+        # Types with duplicate qualifiers, though invalid, can still be hashed and diffed.
+        schemaText = '''
+                     t1 => INTEGER [ range 0..1, range 8bits ]
+                     t2 => INTEGER [ range 8bits, range 0..1 ]
+                     '''
+        (schema, errs) = self.loadValidate(schemaText)
+        self.assertError(errs, 'duplicate qualifier')
+        (h1, h2) = [ schema.getStructuralHash(schema.getTypeDef(name)) for name in ('t1', 't2') ]
+        self.assertEqual(h1, h2)
+        self.assertEqual(list(schema.diff(schema)), [])
+
+    def test_Canonical_RecursiveTypes(self):
+        schemaText = '''
+                     n1 => STRUCTURE { value [1] : INTEGER, next [2, optional] : n1 }
+                     n2 => STRUCTURE { value [1] : INTEGER, next [2, optional] : n2 }
+                     n3 => STRUCTURE { value [1] : INTEGER, next [2, optional] : n4 }
+                     n4 => STRUCTURE { value [1] : INTEGER, next [2, optional] : n3 }
+                     n5 => STRUCTURE { value [1] : STRING, next [2, optional] : n5 }
+                     tree => STRUCTURE { children [1] : ARRAY OF tree }
+                     '''
+        (schema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+        names = [ 'n1', 'n2', 'n3', 'n4', 'n5', 'tree' ]
+
+        # Hashes do not depend on the order in which they are computed.
+        forward = [ StructuralHasher().hash(schema.getTypeDef(name)) for name in names ]
+        hasher = StructuralHasher()
+        backward = [ hasher.hash(schema.getTypeDef(name)) for name in reversed(names) ]
+        self.assertEqual(forward, list(reversed(backward)))
+        hasher = StructuralHasher()
+        for name in names:
+            hasher.hash(list(schema.getTypeDef(name).type.allFields())[-1].type)
+        self.assertEqual(forward, [ hasher.hash(schema.getTypeDef(name)) for name in names ])
+
+        self.assertEqual(forward[0], forward[1])
+        self.assertEqual(forward[2], forward[3])
+        self.assertNotEqual(forward[0], forward[4])
+
+    def test_Canonical_SharedArtifacts(self):
+        schemaText = '''
+                     t1 => STRUCTURE { a [1] : INTEGER, b [2] : ARRAY OF STRING }
+                     t2 => STRUCTURE { a [1] : INTEGER, b [2] : ARRAY OF STRING }
+                     t3 => STRUCTURE { a [1] : INTEGER, b [2] : ARRAY OF BYTE STRING }
+                     '''
+        (schema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+        built = []
+        def factory(node):
+            built.append(node)
+            return object()
+        a1 = schema.getSharedArtifact('test', schema.getTypeDef('t1'), factory)
+        a2 = schema.getSharedArtifact('test', schema.getTypeDef('t2'), factory)
+        a3 = schema.getSharedArtifact('test', schema.getTypeDef('t3'), factory)
+        self.assertIs(a1, a2)
+        self.assertIsNot(a1, a3)
+        self.assertEqual(len(built), 2)
+        self.assertIsNot(schema.getSharedArtifact('other', schema.getTypeDef('t1'), factory), a1)
+
+        # Artifacts are discarded when the schema changes.
+        schema.loadSchemaFromString('t4 => STRUCTURE { a [1] : INTEGER, b [2] : ARRAY OF STRING }')
+        schema.validate()
+        a4 = schema.getSharedArtifact('test', schema.getTypeDef('t4'), factory)
+        self.assertIsNot(a4, a1)
+        self.assertIs(schema.getSharedArtifact('test', schema.getTypeDef('t1'), factory), a4)
+
+if __name__ == '__main__':
+    unittest.main()
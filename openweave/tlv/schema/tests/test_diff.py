@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for schema comparison.
+#
+
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..diff import COMPATIBLE, BREAKING
+
+class Test_Diff(TLVSchemaTestCase):
+
+    _baseSchemaText = '''
+                      acme => VENDOR [ id 0x235A ]
+                      p => PROFILE [ id acme:1 ]
+                      {
+                          m1 => MESSAGE [ id 1 ] CONTAINING s
+                          m2 => MESSAGE [ id 2 ] CONTAINING NOTHING
+                          s => STRUCTURE [ extensible ]
+                          {
+                              a [1] : INTEGER [ range 8bits ],
+                              b [2, optional] : STRING [ len 1..10 ],
+                              c [3] : BOOLEAN,
+                              d [4] : e,
+                          }
+                          e => UNSIGNED INTEGER [ range 8bits ] { one = 1, two = 2 }
+                          f => STRUCTURE { x [1, optional] : NULL }
+                          ch => CHOICE OF { alt1 [1] : STRING, alt2 [2] : BOOLEAN }
+                      }
+                      '''
+
+    def _diff(self, edits, oldText=None):
+        oldText = oldText or self._baseSchemaText
+        newText = oldText
+        for (target, replacement) in edits:
+            self.assertIn(target, newText)
+            newText = newText.replace(target, replacement, 1)
+        oldSchema = WeaveTLVSchema()
+        oldSchema.loadSchemaFromString(oldText)
+        newSchema = WeaveTLVSchema()
+        newSchema.loadSchemaFromString(newText)
+        self.assertNoErrors(oldSchema.validate() + newSchema.validate())
+        return [ (c.compatibility, c.path, c.description) for c in oldSchema.diff(newSchema) ]
+
+    def assertChange(self, edits, compatibility, path, description):
+        self.assertEqual(self._diff(edits), [ (compatibility, path, description) ])
+
+    def test_Diff_Unchanged(self):
+        self.assertEqual(self._diff([ ]), [ ])
+        # Documentation, comments, formatting and qualifier order do not matter.
+        self.assertEqual(self._diff([ ('s => STRUCTURE', '/** docs */\ns => STRUCTURE'),
+                                      ('b [2, optional]', 'b [optional, 2]'),
+                                      ('c [3] : BOOLEAN,', 'c [3] : BOOLEAN, // comment') ]), [ ])
+
+    def test_Diff_Compatible(self):
+        self.assertChange([ ('d [4] : e,', 'd [4] : e,\nz [5, optional] : STRING,') ],
+                          COMPATIBLE, 'p.s.z', 'optional field added')
+        self.assertChange([ ('x [1, optional] : NULL', 'x [1, optional] : NULL, y [2, optional] : NULL') ],
+                          COMPATIBLE, 'p.f.y', 'optional field added')
+        self.assertChange([ ('b [2, optional] : STRING [ len 1..10 ],', '') ],
+                          COMPATIBLE, 'p.s.b', 'optional field removed from extensible STRUCTURE type')
+        self.assertChange([ ('INTEGER [ range 8bits ]', 'INTEGER [ range 16bits ]') ],
+                          COMPATIBLE, 'p.s.a', 'range widened from -128..127 to -32768..32767')
+        self.assertChange([ ('len 1..10', 'len 0..') ],
+                          COMPATIBLE, 'p.s.b', 'length widened from 1..10 to 0..')
+        self.assertChange([ ('two = 2', 'two = 2, three = 3') ],
+                          COMPATIBLE, 'p.e.three', 'enumerated value added')
+        self.assertChange([ ('m2 =>', 'm3 =>') ],
+                          COMPATIBLE, 'p.m2', 'renamed to p.m3')
+        self.assertChange([ ('c [3]', 'c2 [3]') ],
+                          COMPATIBLE, 'p.s.c2', 'renamed from c')
+        self.assertChange([ ('CHOICE OF {', 'CHOICE OF { alt0 [0] : NULL,') ],
+                          COMPATIBLE, 'p.ch.alt0', 'CHOICE alternate added')
+        self.assertChange([ ('f => STRUCTURE', 'f => STRUCTURE [ extensible ]') ],
+                          COMPATIBLE, 'p.f', 'extensible qualifier added')
+        self.assertChange([ ('m2 =>', 'm1a => MESSAGE [ id 3 ] CONTAINING NOTHING\nm2 =>') ],
+                          COMPATIBLE, 'p.m1a', 'MESSAGE definition added')
+
+    def test_Diff_Breaking(self):
+        self.assertChange([ ('c [3]', 'c [7]') ],
+                          BREAKING, 'p.s.c', 'tag changed from 3 to 7')
+        self.assertChange([ ('c [3] : BOOLEAN,', '') ],
+                          BREAKING, 'p.s.c', 'required field removed')
+        self.assertChange([ ('d [4] : e,', 'd [4] : e,\nz [5] : STRING,') ],
+                          BREAKING, 'p.s.z', 'required field added')
+        self.assertChange([ ('len 1..10', 'len 1..5') ],
+                          BREAKING, 'p.s.b', 'length narrowed from 1..10 to 1..5')
+        self.assertChange([ ('INTEGER [ range 8bits ]', 'UNSIGNED INTEGER [ range 8bits ]') ],
+                          BREAKING, 'p.s.a', 'type changed from SIGNED INTEGER type to UNSIGNED INTEGER type')
+        self.assertChange([ ('x [1, optional] : NULL', '') ],
+                          BREAKING, 'p.f.x', 'optional field removed')
+        self.assertChange([ ('b [2, optional]', 'b [2]') ],
+                          BREAKING, 'p.s.b', 'optional field made required')
+        self.assertChange([ ('[ id 2 ]', '[ id 5 ]') ],
+                          BREAKING, 'p.m2', 'id changed from 0x2 to 0x5')
+        self.assertChange([ (', two = 2', '') ],
+                          BREAKING, 'p.e.two', 'enumerated value removed')
+        self.assertChange([ ('alt2 [2] : BOOLEAN', 'alt2 [2] : STRING') ],
+                          BREAKING, 'p.ch.alt2', 'type changed from BOOLEAN type to STRING type')
+        self.assertChange([ ('m2 => MESSAGE [ id 2 ] CONTAINING NOTHING', '') ],
+                          BREAKING, 'p.m2', 'MESSAGE definition removed')
+
+    def test_Diff_References(self):
+        # Changes to a referenced type are reported once, against the type definition.
+        self.assertChange([ ('range 8bits ] { one', 'range 16bits ] { one') ],
+                          COMPATIBLE, 'p.e', 'range widened from 0..255 to 0..65535')
+        # Replacing a reference with an equivalent inline type is not a change.
+        self.assertEqual(self._diff([ ('d [4] : e,', 'd [4] : UNSIGNED INTEGER [ range 8bits ] { one = 1, two = 2 },') ]), [ ])
+        # Recursive types terminate.
+        oldText = '''
+                  r1 => STRUCTURE { next [1, optional] : r1 }
+                  t => LIST OF r1
+                  '''
+        self.assertEqual(self._diff([ ('LIST OF r1', 'LIST OF r2\nr2 => STRUCTURE { next [1, optional] : r2 }') ], oldText=oldText),
+                         [ (COMPATIBLE, 'r2', 'type definition added') ])
+
+if __name__ == '__main__':
+    unittest.main()
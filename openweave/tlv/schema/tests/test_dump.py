@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for dumping schemas in JSON formats.
+#
+
+import io
+import json
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..dump import dumpSchemaFiles, FORMAT_TEXT, FORMAT_JSON, FORMAT_NDJSON
+
+class Test_Dump(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  acme => VENDOR [ id 0x235A ]
+                  namespace a
+                  {
+                      p => PROFILE [ id acme:1 ]
+                      {
+                          /** A structure. */
+                          s [*:1] => STRUCTURE [ extensible ]
+                          {
+                              f1 [1, optional] : INTEGER [ range 0..1.5 ],
+                              f2 [2] : e,
+                              f3 [3] : undefined,
+                          }
+                          e => UNSIGNED INTEGER { one = 1, two = 2 }
+                          l => LIST { STRING *, BOOLEAN {2} }
+                          m => MESSAGE [ id 1 ] CONTAINING NOTHING
+                      }
+                  }
+                  '''
+
+    def _dump(self, format):
+        schema = WeaveTLVSchema()
+        schemaFile = schema.loadSchemaFromString(self._schemaText, fileName='test.txt')
+        schema.validate()
+        output = io.StringIO()
+        dumpSchemaFiles([ schemaFile ], output, format)
+        return output.getvalue()
+
+    def test_Dump_NDJSON(self):
+        lines = self._dump(FORMAT_NDJSON).splitlines()
+        records = [ json.loads(line) for line in lines ]
+        self.assertEqual([ r['id'] for r in records ], list(range(len(records))))
+        self.assertIsNone(records[0]['parent'])
+        self.assertEqual(records[0]['node'], 'SchemaFile')
+        self.assertEqual(records[0]['file'], 'test.txt')
+        # Parents precede their children.
+        for r in records[1:]:
+            self.assertLess(r['parent'], r['id'])
+        # Qualifiers are not dumped as records of their own.
+        self.assertFalse(any(r['node'] in ('Tag', 'Id', 'Range') for r in records))
+
+        byName = { r['fqName'] : r for r in records if 'fqName' in r }
+        s = byName['a.p.s']
+        self.assertEqual(s['kind'], 'type definition')
+        self.assertEqual(s['quals'], [ { 'qualifier' : 'tag', 'tagNum' : 1, 'profile' : '*', 'profileId' : 0x235A0001 } ])
+        self.assertEqual(s['docs'], '/** A structure. */')
+        self.assertEqual((s['file'], s['line']), ('test.txt', 7))
+        f1 = byName['a.p.s.f1']
+        self.assertEqual(f1['quals'], [ { 'qualifier' : 'tag', 'tagNum' : 1 }, { 'qualifier' : 'optional' } ])
+        self.assertEqual(records[f1['id'] + 1]['quals'], [ { 'qualifier' : 'range', 'lowerBound' : 0, 'upperBound' : 1.5 } ])
+        self.assertEqual(records[f1['id'] + 1]['parent'], f1['id'])
+        self.assertEqual(byName['a.p.e.two']['value'], 2)
+        self.assertEqual(byName['a.p.m']['emptyPayload'], True)
+        self.assertEqual(byName['acme']['quals'], [ { 'qualifier' : 'id', 'idNum' : 0x235A } ])
+        self.assertEqual(byName['a.p']['quals'], [ { 'qualifier' : 'id', 'idNum' : 1, 'vendor' : 'acme', 'vendorId' : 0x235A } ])
+
+        # References are resolved.
+        refs = [ r for r in records if r['node'] == 'ReferencedType' ]
+        self.assertEqual([ (r['targetName'], r['target']) for r in refs ], [ ('e', 'a.p.e'), ('undefined', None) ])
+
+        elems = [ r for r in records if r['node'] == 'LinearTypePatternElement' ]
+        self.assertEqual([ (r['minCount'], r['maxCount']) for r in elems ], [ (0, None), (2, 2) ])
+
+    def test_Dump_JSON(self):
+        records = json.loads(self._dump(FORMAT_JSON))
+        self.assertEqual(records, [ json.loads(line) for line in self._dump(FORMAT_NDJSON).splitlines() ])
+        output = io.StringIO()
+        dumpSchemaFiles([], output, FORMAT_JSON)
+        self.assertEqual(json.loads(output.getvalue()), [])
+
+    def test_Dump_Text(self):
+        self.assertTrue(self._dump(FORMAT_TEXT).startswith('SchemaFile: test.txt\n'))
+        with self.assertRaises(ValueError):
+            dumpSchemaFiles([], io.StringIO(), 'xml')
+
+if __name__ == '__main__':
+    unittest.main()
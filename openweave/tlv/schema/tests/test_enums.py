@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for enumerated value lookup tables.
+#
+
+import array
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import enums
+from ..enums import enumTable, codesToIndexes, codesToNames
+
+class Test_Enums(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  mode => UNSIGNED INTEGER [ range 8bits ] { off = 0, on = 1, auto = 3 }
+                  state => SIGNED INTEGER { low = -100, mid = 0, high = 100 }
+                  sparse => INTEGER { a = -9223372036854775808, b = 7, c = 9223372036854775807 }
+                  wide => UNSIGNED INTEGER { x = 18446744073709551615, y = 1 }
+                  none => INTEGER
+                  t => STRUCTURE { m [1] : mode }
+                  '''
+
+    def setUp(self):
+        super(Test_Enums, self).setUp()
+        (self.tlvSchema, errs) = self.loadValidate(self._schemaText)
+        self.assertNoErrors(errs)
+
+    def _indexes(self, typeName, codes):
+        return [ int(index) for index in codesToIndexes(self.tlvSchema.getTypeDef(typeName), codes) ]
+
+    def _names(self, typeName, codes):
+        return list(codesToNames(self.tlvSchema.getTypeDef(typeName), codes))
+
+    def test_Enums_Table(self):
+        table = enumTable(self.tlvSchema.getTypeDef('mode'))
+        self.assertIs(enumTable(self.tlvSchema.getTypeDef('mode').targetType), table)
+        self.assertEqual(table.names, [ 'off', 'on', 'auto' ])
+        self.assertEqual(table.nameToValue, { 'off' : 0, 'on' : 1, 'auto' : 3 })
+        self.assertEqual(table.valueToName, { 0 : 'off', 1 : 'on', 3 : 'auto' })
+        self.assertEqual(table.nameOf(3), 'auto')
+        self.assertIsNone(table.nameOf(2))
+        self.assertEqual(table.valueOf('on'), 1)
+        self.assertIsNone(table.valueOf('dim'))
+        self.assertEqual(table.indexOf(3), 2)
+        self.assertEqual(table.indexOf(2), -1)
+        self.assertTrue(table.isDense)
+        self.assertFalse(enumTable(self.tlvSchema.getTypeDef('sparse')).isDense)
+        self.assertEqual(enumTable(self.tlvSchema.getTypeDef('none')).names, [])
+        fieldType = self.tlvSchema.getTypeDef('t').targetType.getField('m').type
+        self.assertIs(enumTable(fieldType), table)
+        with self.assertRaises(ValueError):
+            enumTable(self.tlvSchema.getTypeDef('t'))
+
+    def test_Enums_Bulk(self):
+        def check():
+            self.assertEqual(self._indexes('mode', [ 0, 1, 2, 3, 4, 255, -1 ]), [ 0, 1, -1, 2, -1, -1, -1 ])
+            self.assertEqual(self._names('mode', array.array('B', [ 3, 0, 7 ])), [ 'auto', 'off', None ])
+            self.assertEqual(self._names('mode', b'\x03\x00\x07'), [ 'auto', 'off', None ])
+            self.assertEqual(self._indexes('mode', bytearray([ 1, 2 ])), [ 1, -1 ])
+            self.assertEqual(self._indexes('state', array.array('b', [ -100, 0, 100, 127, -128 ])), [ 0, 1, 2, -1, -1 ])
+            self.assertEqual(self._indexes('state', array.array('q', [ 100, -101 ])), [ 2, -1 ])
+            self.assertEqual(self._indexes('sparse', array.array('q', [ -2 ** 63, 7, 2 ** 63 - 1, 8, 0 ])),
+                             [ 0, 1, 2, -1, -1 ])
+            self.assertEqual(self._names('sparse', [ 7, 2 ** 63 - 1, 2 ** 64 ]), [ 'b', 'c', None ])
+            self.assertEqual(self._indexes('wide', array.array('Q', [ 2 ** 64 - 1, 1, 2 ])), [ 0, 1, -1 ])
+            self.assertEqual(self._indexes('wide', array.array('q', [ -1, 1 ])), [ -1, 1 ])
+            self.assertEqual(self._indexes('none', [ 0, 1 ]), [ -1, -1 ])
+            self.assertEqual(self._indexes('mode', []), [])
+        self.checkNumPyModes(enums, check)
+
+    def test_Enums_Duplicates(self):
+        schemaText = '''
+                     e => INTEGER { a = 1, b = 2, a = 3, c = 2 }
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertErrorCount(errs, 2)
+        self.assertError(errs, 'duplicate enumerated value in SIGNED INTEGER type: a')
+        self.assertError(errs, 'duplicate enumerated integer value in SIGNED INTEGER type: 2')
+
+        # The first definition of each name and value is used.
+        table = enumTable(tlvSchema.getTypeDef('e'))
+        self.assertEqual(table.names, [ 'a', 'b', 'c' ])
+        self.assertEqual(table.valueOf('a'), 1)
+        self.assertEqual(table.nameOf(2), 'b')
+        self.assertEqual(table.valueOf('c'), 2)
+
+    @unittest.skipIf(enums.numpy is None, 'requires NumPy')
+    def test_Enums_NumPy(self):
+        numpy = enums.numpy
+        mode = self.tlvSchema.getTypeDef('mode')
+        codes = numpy.array([ [ 0, 3 ], [ 2, 1 ] ], dtype=numpy.uint8)
+        indexes = codesToIndexes(mode, codes)
+        self.assertEqual(indexes.shape, (2, 2))
+        self.assertEqual(indexes.tolist(), [ [ 0, 2 ], [ -1, 1 ] ])
+        self.assertEqual(codesToNames(mode, codes).tolist(), [ [ 'off', 'auto' ], [ None, 'on' ] ])
+        state = self.tlvSchema.getTypeDef('state')
+        self.assertEqual(codesToIndexes(state, numpy.array([ -100, 100, 50 ], dtype=numpy.int8)).tolist(), [ 0, 2, -1 ])
+        self.assertEqual(codesToIndexes(state, numpy.array([ 100, 2 ** 64 - 1 ], dtype=numpy.uint64)).tolist(), [ 2, -1 ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for the schema formatter.
+#
+
+import io
+import os
+import tempfile
+import textwrap
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..formatter import formatSchemaFile
+from ..canonical import CanonicalHasher
+from ..tool import _formatFile
+
+class Test_Formatter(TLVSchemaTestCase):
+
+    def _format(self, schemaText):
+        schema = WeaveTLVSchema()
+        schemaFile = schema.loadSchemaFromString(textwrap.dedent(schemaText))
+        return formatSchemaFile(schemaFile)
+
+    def _assertFormat(self, schemaText, expectedText):
+        expectedText = textwrap.dedent(expectedText).lstrip('\n')
+        self.assertEqual(self._format(schemaText), expectedText)
+        # Canonical text is unchanged by formatting.
+        self.assertEqual(self._format(expectedText), expectedText)
+
+    def test_Formatter_Layout(self):
+        self._assertFormat('''
+            acme=>vendor[id 0x235A]
+            namespace a.b { p => profile [ id acme:1 ] {
+              m1 => message [id 1] containing s
+              m2 => Message [id 2] Containing Nothing
+              e => status code [ id 0x10 ]
+              s => structure [tag-order,extensible] { a [opt, 1] : signed integer [range 8bit],
+                  b [ tag 2 ] : string [ len 1..10 ], c [3]:u, includes g }
+              u => unsigned integer [ range 0..0xFF ] { one = 1, two = 0x2 }
+              g => field group { d [p:4, nullable] : float [range 1.0..2.50] }
+              ch => choice of { alt1 [1] : string, null }
+              arr => array [length 1..] of list { x : boolean ?, y : any*, z : null {2..3} }
+              l [anon] => list [ len 2 ] { byte string + }
+            } }
+            using a.b.p
+            ''', '''
+            acme => VENDOR [id 0x235A]
+            namespace a.b
+            {
+                p => PROFILE [id acme:1]
+                {
+                    m1 => MESSAGE [id 1] CONTAINING s
+                    m2 => MESSAGE [id 2] CONTAINING NOTHING
+                    e => STATUS CODE [id 0x10]
+                    s => STRUCTURE [extensible, tag-order]
+                    {
+                        a [1, optional] : INTEGER [range 8bits],
+                        b [2] : STRING [length 1..10],
+                        c [3] : u,
+                        includes g
+                    }
+                    u => UNSIGNED INTEGER [range 0..0xFF]
+                    {
+                        one = 1,
+                        two = 0x2
+                    }
+                    g => FIELD GROUP
+                    {
+                        d [p:4, nullable] : FLOAT [range 1.0..2.50]
+                    }
+                    ch => CHOICE OF
+                    {
+                        alt1 [1] : STRING,
+                        NULL
+                    }
+                    arr => ARRAY [length 1..] OF LIST
+                    {
+                        x : BOOLEAN ?,
+                        y : ANY *,
+                        z : NULL {2..3}
+                    }
+                    l [anon] => LIST [length 2]
+                    {
+                        BYTE STRING +
+                    }
+                }
+            }
+            using a.b.p
+            ''')
+
+    def test_Formatter_Comments(self):
+        self._assertFormat('''
+            // Leading comment.
+
+            /** Docs for s. */
+            s => STRUCTURE    // Trailing comment, moved into the structure.
+            {
+              /* Comment before a. */
+              /** Docs for a. */
+              a [1] : INTEGER,  // Trailing comment for a.
+
+
+              b [2] : STRING, /**< Postfix docs for b. */
+              /** Docs for c,
+                  over two lines. */
+              c [3] : BOOLEAN
+              // Comment at end of structure.
+            }
+            e => STRUCTURE { }  /* Trailing comment for e. */
+
+            /* Multi-line
+               comment at end of file. */
+            ''', '''
+            // Leading comment.
+
+            /** Docs for s. */
+            s => STRUCTURE
+            {
+                // Trailing comment, moved into the structure.
+                /* Comment before a. */
+                /** Docs for a. */
+                a [1] : INTEGER, // Trailing comment for a.
+
+                b [2] : STRING, /**< Postfix docs for b. */
+                /** Docs for c,
+                    over two lines. */
+                c [3] : BOOLEAN
+                // Comment at end of structure.
+            }
+            e => STRUCTURE { } /* Trailing comment for e. */
+
+            /* Multi-line
+               comment at end of file. */
+            ''')
+
+    def test_Formatter_Names(self):
+        self._assertFormat('''
+            "id" => STRUCTURE { "tag" [1] : "Integer".x, n-1 [2] : STRING }
+            ''', '''
+            "id" => STRUCTURE
+            {
+                "tag" [1] : "Integer".x,
+                n-1 [2] : STRING
+            }
+            ''')
+
+    def test_Formatter_Examples(self):
+        # Formatting the example schemas does not change their meaning.
+        examplesDir = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'examples')
+        if not os.path.isdir(examplesDir):
+            self.skipTest('examples not found')
+        for fileName in sorted(os.listdir(examplesDir)):
+            if fileName == 'syntax-error.txt':
+                continue
+            with self.subTest(fileName=fileName):
+                with open(os.path.join(examplesDir, fileName)) as f:
+                    schemaText = f.read()
+                schemaFile = WeaveTLVSchema().loadSchemaFromString(schemaText)
+                output = io.StringIO()
+                formatSchemaFile(schemaFile, output)
+                formattedFile = WeaveTLVSchema().loadSchemaFromString(output.getvalue())
+                self.assertEqual(formatSchemaFile(formattedFile), output.getvalue())
+                hasher = CanonicalHasher()
+                self.assertEqual([ hasher.hash(node) for node in schemaFile.statements ],
+                                 [ hasher.hash(node) for node in formattedFile.statements ])
+                self.assertEqual(self._docs(schemaFile), self._docs(formattedFile))
+
+    @staticmethod
+    def _docs(schemaFile):
+        # Return the documentation within a file, ignoring indentation.
+        return [ [ line.strip() for line in node.docs.split('\n') ]
+                 for node in schemaFile.allNodes() if getattr(node, 'docs', None) is not None ]
+
+    def test_Formatter_Check(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            fileName = os.path.join(tempDir, 'test.txt')
+            with open(fileName, 'w') as f:
+                f.write('t => STRUCTURE { a [1,opt] : INTEGER }\n')
+            (unused, changed, text, err) = _formatFile((fileName, 'check'))
+            self.assertTrue(changed)
+            self.assertIsNone(text)
+            self.assertIsNone(err)
+            (unused, changed, text, err) = _formatFile((fileName, 'write'))
+            self.assertTrue(changed)
+            (unused, changed, text, err) = _formatFile((fileName, 'check'))
+            self.assertFalse(changed)
+            (unused, changed, text, err) = _formatFile((fileName, 'print'))
+            self.assertEqual(text, 't => STRUCTURE\n{\n    a [1, optional] : INTEGER\n}\n')
+
+            with open(fileName, 'w') as f:
+                f.write('t => STRUCTURE {\n')
+            (unused, changed, text, err) = _formatFile((fileName, 'check'))
+            self.assertIsNotNone(err)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for the parser front ends.
+#
+#         In addition to the tests below, this module re-runs all other unit tests
+#         in the package using the single-pass front end.
+#
+
+import unittest
+import importlib
+import pkgutil
+import os
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..error import WeaveTLVSchemaError
+
+class Test_FrontEnds(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  /** Vendor docs */
+                  acme => VENDOR [ id 0x235A ]
+                  namespace a.b
+                  {
+                      p => PROFILE [ id acme:1 ]
+                      {
+                          m => MESSAGE [ id 1 ] CONTAINING s
+                          e => MESSAGE [ id 2 ] CONTAINING NOTHING
+                          s [*:1] => STRUCTURE [ extensible ]
+                          {
+                              f1 [1, optional] : INTEGER [ range 8bits ] { a = 1 },  /**< postfix docs */
+                              /** docs */
+                              f2 [2] : CHOICE OF { alt1 : BOOLEAN, BYTE STRING },
+                              includes fg,
+                          }
+                          fg => FIELD GROUP { g [5] : FLOAT [ range -1.5..2.5 ] }
+                          arr => ARRAY [ len 2.. ] { elem : NULL ?, ANY {1..3}, STRING * }
+                          lst => LIST OF UNSIGNED INTEGER
+                      }
+                  }
+                  empty => STRUCTURE { }
+                  '''
+
+    def _load(self, frontEnd, schemaText):
+        tlvSchema = WeaveTLVSchema(frontEnd=frontEnd)
+        try:
+            schemaFile = tlvSchema.loadSchemaFromString(schemaText)
+        except WeaveTLVSchemaError as err:
+            return (str(err), err.detail, err.sourceRef.posStr())
+        nodes = []
+        for node in schemaFile.allNodes():
+            nodeInfo = [ type(node).__name__, node.sourceRef and node.sourceRef.posStr(), node.parent and type(node.parent).__name__ ]
+            for attrName in ('docs', 'docsSourceRef', 'nameSourceRef', 'valueSourceRef'):
+                attr = getattr(node, attrName, None)
+                nodeInfo.append(attr.posStr() if hasattr(attr, 'posStr') else attr)
+            nodes.append(nodeInfo)
+        return (schemaFile.summarize(), nodes)
+
+    def assertSameResult(self, schemaText):
+        self.assertEqual(self._load(WeaveTLVSchema.FRONT_END_SINGLE_PASS, schemaText),
+                         self._load(WeaveTLVSchema.FRONT_END_TREE, schemaText))
+
+    def test_FrontEnds_IdenticalASTs(self):
+        self.assertSameResult(self._schemaText)
+        self.assertSameResult('')
+        self.assertSameResult('// comment only')
+        self.assertSameResult('x => INTEGER { a = 1 }')
+
+    def test_FrontEnds_IdenticalErrors(self):
+        self.assertSameResult('x => STRUCTURE { a [1] INTEGER }')
+        self.assertSameResult('x => INTEGER [ range 0..1 ')
+        self.assertSameResult('x => "unterminated')
+        self.assertSameResult('a.b => INTEGER')
+        # A syntax error takes precedence over an earlier error detected while building the AST.
+        self.assertSameResult('a.b => INTEGER\ny => $')
+
+    def test_FrontEnds_Invalid(self):
+        with self.assertRaises(ValueError):
+            WeaveTLVSchema(frontEnd='invalid')
+
+
+def _makeSinglePassTestCase(testCase):
+    '''Create a subclass of a given TestCase that runs its tests using the single-pass front end.'''
+
+    class SinglePassTestCase(testCase):
+
+        @classmethod
+        def setUpClass(cls):
+            cls._savedFrontEnd = WeaveTLVSchema.defaultFrontEnd
+            WeaveTLVSchema.defaultFrontEnd = WeaveTLVSchema.FRONT_END_SINGLE_PASS
+            super(SinglePassTestCase, cls).setUpClass()
+
+        @classmethod
+        def tearDownClass(cls):
+            super(SinglePassTestCase, cls).tearDownClass()
+            WeaveTLVSchema.defaultFrontEnd = cls._savedFrontEnd
+
+    SinglePassTestCase.__name__ = SinglePassTestCase.__qualname__ = testCase.__name__ + '_SinglePass'
+    return SinglePassTestCase
+
+__all__ = [ 'Test_FrontEnds' ]
+
+# Re-run the tests in all other test modules using the single-pass front end.
+for moduleInfo in pkgutil.iter_modules([ os.path.dirname(__file__) ]):
+    if not moduleInfo.name.startswith('test_') or moduleInfo.name == __name__.rsplit('.', 1)[-1]:
+        continue
+    module = importlib.import_module('.' + moduleInfo.name, __package__)
+    for testCase in list(vars(module).values()):
+        if isinstance(testCase, type) and issubclass(testCase, unittest.TestCase) and testCase.__module__ == module.__name__:
+            singlePassTestCase = _makeSinglePassTestCase(testCase)
+            globals()[singlePassTestCase.__name__] = singlePassTestCase
+            __all__.append(singlePassTestCase.__name__)
+del moduleInfo, module, testCase, singlePassTestCase
+
+if __name__ == '__main__':
+    unittest.main()
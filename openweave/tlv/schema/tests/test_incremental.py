@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for incremental updates of schema files.
+#
+
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+
+class Test_Incremental(TLVSchemaTestCase):
+
+    _schemaText = '''acme => VENDOR [ id 0x235A ]
+a => INTEGER
+namespace n.m
+{
+    /** Docs for b */
+    b => STRUCTURE { f [1] : a }
+    p => PROFILE [ id acme:1 ]
+    {
+        s [*:1] => STRUCTURE
+        {
+            f1 [1] : INTEGER,
+            f2 [2] : LIST { x : STRING },
+        }
+        t => BOOLEAN
+    }
+}
+c [ tag 42 ] => ARRAY OF n.m.p.s
+'''
+
+    def _load(self, schemaText=None):
+        tlvSchema = WeaveTLVSchema()
+        schemaFile = tlvSchema.loadSchemaFromString(schemaText or self._schemaText)
+        return (tlvSchema, schemaFile)
+
+    def _edit(self, schemaFile, target, newText, occurrence=0):
+        startPos = -1
+        for i in range(occurrence + 1):
+            startPos = schemaFile.schemaText.index(target, startPos + 1)
+        return schemaFile.applyEdit(startPos, startPos + len(target), newText)
+
+    def assertMatchesFullParse(self, schemaFile):
+        (tlvSchema, expectedFile) = self._load(schemaFile.schemaText)
+        self.assertEqual(schemaFile.summarize(), expectedFile.summarize())
+
+    def test_Incremental_Edits(self):
+        (tlvSchema, schemaFile) = self._load()
+        edits = [
+            ('f1 [1] : INTEGER', 'f1 [1] : UNSIGNED INTEGER [ range 16bits ]'),
+            ('t => BOOLEAN', 't => BOOLEAN\n        u => FLOAT\n'),
+            ('Docs for b', 'Longer\n       docs for b'),
+            ('a => INTEGER', 'a => INTEGER [ range 32bits ]'),
+            ('c [ tag 42 ] => ARRAY OF n.m.p.s\n', ''),
+            ('namespace n.m', 'namespace n.q'),
+            ('\n', '\n\n\n'),
+            ('acme', 'acme2'),
+        ]
+        for (target, newText) in edits:
+            self.assertNoErrors(self._edit(schemaFile, target, newText))
+            self.assertMatchesFullParse(schemaFile)
+        self.assertNoErrors(schemaFile.applyEdit(len(schemaFile.schemaText), len(schemaFile.schemaText), 'd => STRING\n'))
+        self.assertMatchesFullParse(schemaFile)
+
+    def test_Incremental_Reparse(self):
+        (tlvSchema, schemaFile) = self._load()
+        nsNode = schemaFile.statements[2].statements[0]
+        vendorNode = schemaFile.statements[0]
+        sNode = tlvSchema.getTypeDef('n.m.p.s')
+        tNode = tlvSchema.getTypeDef('n.m.p.t')
+        self.assertNoErrors(self._edit(schemaFile, 'f2 [2]', 'f3 [3]'))
+        self.assertIs(schemaFile.statements[0], vendorNode)
+        self.assertIs(schemaFile.statements[2].statements[0], nsNode)
+        self.assertIsNot(tlvSchema.getTypeDef('n.m.p.s'), sNode)
+        self.assertIsNot(tlvSchema.getTypeDef('n.m.p.t'), tNode)
+        self.assertIs(tlvSchema.getTypeDef('n.m.p.s').parent, tlvSchema.getProfile('n.m.p'))
+
+    def test_Incremental_Index(self):
+        (tlvSchema, schemaFile) = self._load()
+        self.assertNoErrors(self._edit(schemaFile, 't =>', 'tt =>'))
+        self.assertIsNone(tlvSchema.getTypeDef('n.m.p.t'))
+        self.assertIsNotNone(tlvSchema.getTypeDef('n.m.p.tt'))
+        self.assertNoErrors(tlvSchema.validate())
+
+    def test_Incremental_Errors(self):
+        (tlvSchema, schemaFile) = self._load()
+        errs = self._edit(schemaFile, 'x : STRING', 'x STRING')
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'unexpected keyword: STRING')
+        self.assertEqual(errs[0].sourceRef.startLine, 12)
+        self.assertIsNone(tlvSchema.getTypeDef('n.m.p.s'))
+        self.assertIsNotNone(tlvSchema.getTypeDef('n.m.p.t'))
+        self.assertNoErrors(self._edit(schemaFile, 'x STRING', 'x : STRING'))
+        self.assertMatchesFullParse(schemaFile)
+
+        errs = self._edit(schemaFile, 'f [1] : a', 'f [1] : nonexistent')
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'invalid type reference: nonexistent')
+
+    def test_Incremental_InvalidRange(self):
+        (tlvSchema, schemaFile) = self._load()
+        with self.assertRaises(ValueError):
+            schemaFile.applyEdit(10, 5, '')
+        with self.assertRaises(ValueError):
+            schemaFile.applyEdit(0, len(self._schemaText) + 1, '')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for exporting schemas as JSON Schema.
+#
+
+import json
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..jsonschema import exportJSONSchema, JSON_SCHEMA_DIALECT, OPENAPI_VERSION
+
+class Test_JSONSchema(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  namespace a
+                  {
+                      /** A structure. */
+                      s => STRUCTURE
+                      {
+                          f1 [1] : UNSIGNED INTEGER [ range 8bits ],
+                          f2 [2, optional] : STRING [ length 1..10 ],
+                          f3 [3] : e,
+                          f4 [4] : BYTE STRING [ length 0..4 ],
+                          f5 [5, optional] : s,
+                          includes g
+                      }
+                      g => FIELD GROUP
+                      {
+                          f6 [6] : FLOAT [ range -1.5..1.5 ],
+                      }
+                      e => INTEGER [ range -10..10 ] { one = 1, two = 2 }
+                      c => CHOICE OF { i : INTEGER [ range 0..3 ], b : BOOLEAN }
+                      u => CHOICE OF { NULL, BOOLEAN }
+                      p => ARRAY { STRING, INTEGER [ range 0..1 ] ?, BOOLEAN * }
+                      t => ARRAY { STRING, BOOLEAN }
+                      l => LIST [ length 1..5 ] OF ANY
+                      unused => STRUCTURE [ extensible ] { }
+                  }
+                  '''
+
+    def _export(self, **kwargs):
+        schema = WeaveTLVSchema()
+        schema.loadSchemaFromString(self._schemaText)
+        errs = schema.validate()
+        self.assertNoErrors(errs)
+        doc = exportJSONSchema(schema, **kwargs)
+        # The result must be serializable as JSON.
+        json.dumps(doc)
+        return doc
+
+    def test_JSONSchema_Types(self):
+        doc = self._export()
+        self.assertEqual(doc['$schema'], JSON_SCHEMA_DIALECT)
+        self.assertNotIn('$ref', doc)
+        defs = doc['$defs']
+        self.assertEqual(set(defs), { 'a.s', 'a.g', 'a.e', 'a.c', 'a.u', 'a.p', 'a.t', 'a.l', 'a.unused' })
+
+        s = defs['a.s']
+        self.assertEqual(s['type'], 'object')
+        self.assertEqual(s['description'], 'A structure.')
+        self.assertEqual(s['allOf'], [ { '$ref' : '#/$defs/a.g' } ])
+        self.assertEqual(s['required'], [ 'f1', 'f3', 'f4' ])
+        self.assertEqual(s['unevaluatedProperties'], False)
+        props = s['properties']
+        self.assertEqual(props['f1'], { 'type' : 'integer', 'minimum' : 0, 'maximum' : 255 })
+        self.assertEqual(props['f2'], { 'type' : 'string', 'minLength' : 1, 'maxLength' : 10 })
+        self.assertEqual(props['f3'], { '$ref' : '#/$defs/a.e' })
+        self.assertEqual(props['f4'], { 'type' : 'string', 'contentEncoding' : 'base64', 'maxLength' : 8 })
+        self.assertEqual(props['f5'], { '$ref' : '#/$defs/a.s' })
+        self.assertNotIn('f6', props)
+
+        g = defs['a.g']
+        self.assertEqual(g['properties']['f6'], { 'type' : 'number', 'minimum' : -1.5, 'maximum' : 1.5 })
+        self.assertNotIn('unevaluatedProperties', g)
+        self.assertNotIn('unevaluatedProperties', defs['a.unused'])
+
+        self.assertEqual(defs['a.e'], { 'oneOf' : [
+            { 'enum' : [ 'one', 'two' ] },
+            { 'type' : 'integer', 'minimum' : -10, 'maximum' : 10 } ] })
+
+        self.assertEqual(defs['a.c'], { 'oneOf' : [
+            { 'type' : 'object', 'properties' : { 'i' : { 'type' : 'integer', 'minimum' : 0, 'maximum' : 3 } },
+              'required' : [ 'i' ], 'additionalProperties' : False },
+            { 'type' : 'object', 'properties' : { 'b' : { 'type' : 'boolean' } },
+              'required' : [ 'b' ], 'additionalProperties' : False } ] })
+        self.assertEqual(defs['a.u'], { 'anyOf' : [ { 'type' : 'null' }, { 'type' : 'boolean' } ] })
+
+        self.assertEqual(defs['a.p'], {
+            'type' : 'array',
+            'prefixItems' : [ { 'type' : 'string' } ],
+            'items' : { 'anyOf' : [ { 'type' : 'integer', 'minimum' : 0, 'maximum' : 1 }, { 'type' : 'boolean' } ] },
+            'minItems' : 1 })
+        self.assertEqual(defs['a.t'], {
+            'type' : 'array',
+            'prefixItems' : [ { 'type' : 'string' }, { 'type' : 'boolean' } ],
+            'items' : False,
+            'minItems' : 2, 'maxItems' : 2 })
+        self.assertEqual(defs['a.l'], { 'type' : 'array', 'items' : {}, 'minItems' : 1, 'maxItems' : 5 })
+
+    def test_JSONSchema_Nullable(self):
+        self._schemaText = '''
+                           n => STRUCTURE { f [1] : STRING [ nullable ] }
+                           '''
+        doc = self._export()
+        self.assertEqual(doc['$defs']['n']['properties']['f'], { 'anyOf' : [ { 'type' : 'string' }, { 'type' : 'null' } ] })
+
+    def test_JSONSchema_Root(self):
+        doc = self._export(rootName='a.s')
+        self.assertEqual(doc['$ref'], '#/$defs/a.s')
+        # Only the definitions reachable from the root are exported.
+        self.assertEqual(set(doc['$defs']), { 'a.s', 'a.g', 'a.e' })
+        with self.assertRaises(ValueError):
+            self._export(rootName='a.missing')
+
+    def test_JSONSchema_OpenAPI(self):
+        doc = self._export(rootName='a.s', openAPI=True)
+        self.assertEqual(doc['openapi'], OPENAPI_VERSION)
+        schemas = doc['components']['schemas']
+        self.assertEqual(set(schemas), { 'a.s', 'a.g', 'a.e' })
+        self.assertEqual(schemas['a.s']['properties']['f3'], { '$ref' : '#/components/schemas/a.e' })
+
+    def test_JSONSchema_LinearSize(self):
+        # Each type definition is exported once, regardless of the number of references to it.
+        self._schemaText = '\n'.join(
+            [ 't0 => STRUCTURE { a [1] : STRING, b [2] : STRING }' ] +
+            [ 't%d => STRUCTURE { a [1] : t%d, b [2] : t%d }' % (i, i - 1, i - 1) for i in range(1, 20) ])
+        doc = self._export(rootName='t19')
+        self.assertEqual(len(doc['$defs']), 20)
+        self.assertLess(len(json.dumps(doc)), 20 * 300)
+
+if __name__ == '__main__':
+    unittest.main()
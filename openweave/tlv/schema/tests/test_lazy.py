@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for lazy loading of schema files.
+#
+
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..error import WeaveTLVSchemaError
+from ..lazy import scanStatements, KIND_NAMESPACE, KIND_VENDOR, KIND_PROFILE, KIND_MESSAGE, KIND_STATUS_CODE, KIND_TYPE
+
+class Test_Lazy(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  acme => VENDOR [ id 0x235A ]
+                  /** Docs for a */
+                  a => INTEGER
+                  namespace n.m
+                  {
+                      using x
+                      p => PROFILE [ id acme:1 ]
+                      {
+                          msg => MESSAGE [ id 1 ] CONTAINING s
+                          sc => STATUS CODE [ id 2 ]
+                          s [*:1] => STRUCTURE
+                          {
+                              f1 [1] : a,
+                              f2 [2] : LIST { x : STRING },
+                          }
+                      }
+                      "quoted-name" => BOOLEAN
+                  }
+                  b [ tag 42 ] => ARRAY OF n.m.p.s
+                  '''
+
+    def _sourceRefs(self, schemaFile):
+        return [ n.sourceRef.posStr() for n in schemaFile.allNodes() if n.sourceRef is not None ]
+
+    def test_Lazy_Scan(self):
+        stmts = scanStatements(self._schemaText)
+        self.assertEqual(len(stmts), 4)
+        self.assertEqual(stmts[0].names, [ (KIND_VENDOR, 'acme') ])
+        self.assertEqual(stmts[1].names, [ (KIND_TYPE, 'a') ])
+        self.assertEqual(stmts[2].names, [ (KIND_NAMESPACE, 'n'), (KIND_NAMESPACE, 'n.m'),
+                                           (KIND_PROFILE, 'n.m.p'), (KIND_MESSAGE, 'n.m.p.msg'),
+                                           (KIND_STATUS_CODE, 'n.m.p.sc'), (KIND_TYPE, 'n.m.p.s'),
+                                           (KIND_TYPE, 'n.m.quoted-name') ])
+        self.assertEqual(stmts[3].names, [ (KIND_TYPE, 'b') ])
+        self.assertTrue(self._schemaText[stmts[1].startPos:].lstrip().startswith('/** Docs for a */'))
+        self.assertEqual(stmts[1].startLine, 2)
+
+    def test_Lazy_MatchesEager(self):
+        eagerSchema = WeaveTLVSchema()
+        eagerFile = eagerSchema.loadSchemaFromString(self._schemaText)
+        self.assertNoErrors(eagerSchema.validate())
+        lazySchema = WeaveTLVSchema(lazy=True)
+        lazyFile = lazySchema.loadSchemaFromString(self._schemaText)
+        self.assertNoErrors(lazySchema.validate())
+        self.assertEqual(self._sourceRefs(lazyFile), self._sourceRefs(eagerFile))
+        self.assertEqual([ n.summarize() for n in lazyFile.statements ],
+                         [ n.summarize() for n in eagerFile.statements ])
+        self.assertEqual(lazySchema.getTypeDef('a').docs, '/** Docs for a */')
+
+    def test_Lazy_OnDemand(self):
+        tlvSchema = WeaveTLVSchema(lazy=True)
+        schemaFile = tlvSchema.loadSchemaFromString(self._schemaText)
+        self.assertFalse(schemaFile.isMaterialized)
+        typeDef = tlvSchema.getTypeDef('n.m.p.s')
+        self.assertEqual(typeDef.fullyQualifiedName, 'n.m.p.s')
+        self.assertEqual(typeDef.sourceRef.startLine, 12)
+        self.assertEqual([ s.isMaterialized for s in schemaFile.lazyStatements ], [ False, False, True, False ])
+        self.assertIs(tlvSchema.getProfile('n.m.p'), typeDef.parent)
+        self.assertIsNone(tlvSchema.getTypeDef('n.m.p.msg'))
+        self.assertIsNone(tlvSchema.getTypeDef('c'))
+        self.assertEqual(tlvSchema.getVendor('acme').id, 0x235A)
+        self.assertEqual([ s.isMaterialized for s in schemaFile.lazyStatements ], [ True, False, True, False ])
+        self.assertFalse(schemaFile.isMaterialized)
+        self.assertNoErrors(tlvSchema.validate())
+        self.assertTrue(schemaFile.isMaterialized)
+        self.assertIs(tlvSchema.getTypeDef('n.m.p.s'), typeDef)
+
+    def test_Lazy_SyntaxErrors(self):
+        schemaText = '''
+                     a => INTEGER
+                     b => STRUCTURE { x [1] INTEGER }
+                     c => STRING
+                     d => $
+                     '''
+        tlvSchema = WeaveTLVSchema(lazy=True)
+        tlvSchema.loadSchemaFromString(schemaText)
+        self.assertIsNotNone(tlvSchema.getTypeDef('c'))
+        self.assertIsNone(tlvSchema.getTypeDef('b'))
+        errs = tlvSchema.validate()
+        self.assertErrorCount(errs, 2)
+        self.assertError(errs, 'unexpected keyword: INTEGER')
+        self.assertError(errs, 'unexpected input: $')
+        # Verify error positions are the same as when the file is loaded eagerly
+        with self.assertRaises(WeaveTLVSchemaError) as cm:
+            WeaveTLVSchema().loadSchemaFromString(schemaText)
+        self.assertEqual(errs[0].sourceRef.posStr(), cm.exception.sourceRef.posStr())
+        self.assertEqual(errs[0].sourceRef.lineSummaryStr(), cm.exception.sourceRef.lineSummaryStr())
+        with self.assertRaises(WeaveTLVSchemaError) as cm:
+            WeaveTLVSchema().loadSchemaFromString(schemaText.replace('{ x [1] INTEGER }', '{ x [1]:INTEGER }'))
+        self.assertEqual(errs[1].sourceRef.posStr(), cm.exception.sourceRef.posStr())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for the fast lexer.
+#
+
+import unittest
+import random
+import glob
+import os
+
+from lark.exceptions import UnexpectedCharacters
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..error import WeaveTLVSchemaError
+from ..lexer import _FastLexer
+
+class Test_Lexer(TLVSchemaTestCase):
+
+    _tokenSoup = [ 'x', 'Abc', 'a-b', '_q', '"quoted name"', 'STRUCTURE', 'structure', 'Integer', 'BYTE',
+                   'STRING', 'namespace', 'using', 'FIELD', 'GROUP', 'OF', 'id', 'range', 'len', 'tag',
+                   '8bits', '16bit', '32bits', '64bit', '8bitsx', '0', '42', '0x1F', '-7', '1.5', '.5',
+                   '1e10', '..', '.', '=>', '=', ':', ',', '*', '?', '+', '{', '}', '[', ']', '(', ')',
+                   ' ', '  ', '\n', '\t', '// comment\n', '/* comment */', '/** docs */', '/**< post */',
+                   '/*\n multi\n line */', '/**\n docs\n */' ]
+
+    _invalidChars = [ '$', '@', '#', '%', '!', '~' ]
+
+    @classmethod
+    def setUpClass(cls):
+        parser = WeaveTLVSchema._getSchemaParser(WeaveTLVSchema.LEXER_STANDARD)
+        cls._standardParser = parser
+        cls._fastLexer = _FastLexer(parser.lexer_conf)
+
+    def _lex(self, lex, text):
+        tokens = []
+        try:
+            for token in lex(text):
+                tokens.append((token.type, str(token), token.start_pos, token.line, token.column,
+                               token.end_line, token.end_column, token.end_pos))
+        except UnexpectedCharacters as err:
+            tokens.append(('error', err.pos_in_stream, err.line, err.column))
+        return tokens
+
+    def assertSameTokens(self, text):
+        self.assertEqual(self._lex(self._fastLexer.lex, text), self._lex(self._standardParser.lex, text), text)
+
+    def _loadSummary(self, lexer, frontEnd, schemaText):
+        tlvSchema = WeaveTLVSchema(frontEnd=frontEnd, lexer=lexer)
+        try:
+            return tlvSchema.loadSchemaFromString(schemaText).summarize()
+        except WeaveTLVSchemaError as err:
+            return (str(err), err.detail, err.sourceRef.posStr())
+
+    def test_Lexer_Examples(self):
+        examplesDir = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'examples')
+        fileNames = sorted(glob.glob(os.path.join(examplesDir, '*.txt')))
+        self.assertTrue(len(fileNames) > 0)
+        for fileName in fileNames:
+            with open(fileName, 'r') as f:
+                self.assertSameTokens(f.read())
+
+    def test_Lexer_TokenSoup(self):
+        rand = random.Random(29)
+        for i in range(500):
+            tokens = [ rand.choice(self._tokenSoup) for j in range(rand.randint(1, 30)) ]
+            if rand.random() < 0.2:
+                tokens.insert(rand.randint(0, len(tokens)), rand.choice(self._invalidChars))
+            self.assertSameTokens(''.join(tokens))
+
+    def test_Lexer_SameResult(self):
+        schemaTexts = [
+            '''
+            /** Vendor docs */
+            acme => VENDOR [ id 0x235A ]
+            namespace a.b
+            {
+                p => PROFILE [ id acme:1 ]
+                {
+                    s [*:1] => STRUCTURE [ extensible ]
+                    {
+                        f1 [1, optional] : INTEGER [ range 8bits ] { a = 1 },  /**< postfix docs */
+                        f2 [2] : FLOAT [ range -1.5..2.5 ],
+                    }
+                }
+            }
+            ''',
+            '',
+            'x => STRUCTURE { a [1] INTEGER }',
+            'x => "unterminated',
+            'x => INTEGER\ny => $',
+        ]
+        for frontEnd in WeaveTLVSchema.frontEnds:
+            for schemaText in schemaTexts:
+                self.assertEqual(self._loadSummary(WeaveTLVSchema.LEXER_FAST, frontEnd, schemaText),
+                                 self._loadSummary(WeaveTLVSchema.LEXER_STANDARD, frontEnd, schemaText))
+
+    def test_Lexer_Invalid(self):
+        with self.assertRaises(ValueError):
+            WeaveTLVSchema(lexer='invalid')
+
+if __name__ == '__main__':
+    unittest.main()
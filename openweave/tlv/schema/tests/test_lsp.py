@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for the language server.
+#
+
+import unittest
+import io
+import json
+
+from .testutils import TLVSchemaTestCase
+from ..lsp import LanguageServer
+
+class Test_LSP(TLVSchemaTestCase):
+
+    _uri = 'file:///test/schema.txt'
+
+    _schemaText = '''acme => VENDOR [ id 0x235A ]
+/** Docs for a */
+a => INTEGER
+namespace n
+{
+    b => STRUCTURE { f [1] : a }
+    p => PROFILE [ id acme:1 ]
+    {
+        c => LIST OF a
+    }
+}
+'''
+
+    def _run(self, *messages):
+        # Run the server over the given sequence of messages, returning the exit code
+        # and a list of the messages sent by the server.
+        inData = b''
+        for (id, method, params) in messages:
+            message = { 'jsonrpc' : '2.0', 'method' : method, 'params' : params }
+            if id is not None:
+                message['id'] = id
+            content = json.dumps(message).encode('utf-8')
+            inData += b'Content-Length: %d\r\n\r\n' % len(content) + content
+        outStream = io.BytesIO()
+        exitCode = LanguageServer(io.BytesIO(inData), outStream).run()
+        outStream.seek(0)
+        outMessages = []
+        while True:
+            header = outStream.readline()
+            if len(header) == 0:
+                break
+            contentLength = int(header.split(b':')[1])
+            outStream.readline()
+            outMessages.append(json.loads(outStream.read(contentLength).decode('utf-8')))
+        return (exitCode, outMessages)
+
+    def _runWithDocument(self, *messages, schemaText=None):
+        openMessage = (None, 'textDocument/didOpen',
+                       { 'textDocument' : { 'uri' : self._uri, 'version' : 1,
+                                            'text' : schemaText or self._schemaText } })
+        return self._run((1, 'initialize', {}), openMessage, *messages)
+
+    def _result(self, outMessages, id):
+        return next(m for m in outMessages if m.get('id', None) == id)['result']
+
+    def _diagnostics(self, outMessages):
+        return [ m['params']['diagnostics'] for m in outMessages
+                 if m.get('method', None) == 'textDocument/publishDiagnostics' ]
+
+    def _position(self, target, offset=0, schemaText=None):
+        schemaText = schemaText or self._schemaText
+        pos = schemaText.index(target) + offset
+        line = schemaText.count('\n', 0, pos)
+        return { 'line' : line, 'character' : pos - (schemaText.rfind('\n', 0, pos) + 1) }
+
+    def _request(self, id, method, target, offset=0, **params):
+        params.update({ 'textDocument' : { 'uri' : self._uri }, 'position' : self._position(target, offset) })
+        return (id, method, params)
+
+    def test_LSP_Lifecycle(self):
+        (exitCode, outMessages) = self._run((1, 'initialize', {}),
+                                            (None, 'initialized', {}),
+                                            (2, 'shutdown', None),
+                                            (None, 'exit', None))
+        self.assertEqual(exitCode, 0)
+        capabilities = self._result(outMessages, 1)['capabilities']
+        self.assertEqual(capabilities['textDocumentSync']['change'], 2)
+        self.assertTrue(capabilities['definitionProvider'])
+        self.assertTrue(capabilities['hoverProvider'])
+        self.assertTrue(capabilities['referencesProvider'])
+        self.assertIsNone(self._result(outMessages, 2))
+
+        # Exit without shutdown
+        (exitCode, outMessages) = self._run((None, 'exit', None))
+        self.assertEqual(exitCode, 1)
+
+        # Unknown request
+        (exitCode, outMessages) = self._run((1, 'unknown/method', {}))
+        self.assertEqual(outMessages[0]['error']['code'], -32601)
+
+    def test_LSP_Diagnostics(self):
+        (exitCode, outMessages) = self._runWithDocument()
+        self.assertEqual(self._diagnostics(outMessages), [ [] ])
+
+        schemaText = 'x => STRUCTURE { f [1] : y }\nz => INTEGER [ range 8bits\nw => STRING\n'
+        (exitCode, outMessages) = self._runWithDocument(schemaText=schemaText)
+        diagnostics = self._diagnostics(outMessages)[0]
+        self.assertEqual(len(diagnostics), 2)
+        messages = sorted(d['message'] for d in diagnostics)
+        self.assertTrue(messages[0].startswith('invalid type reference'))
+        self.assertTrue(messages[1].startswith('unexpected name: w'))
+        refDiagnostic = next(d for d in diagnostics if d['message'].startswith('invalid type reference'))
+        self.assertEqual(refDiagnostic['range']['start'], { 'line' : 0, 'character' : 25 })
+
+    def test_LSP_Definition(self):
+        (exitCode, outMessages) = self._runWithDocument(self._request(2, 'textDocument/definition', ': a', 2),
+                                                        self._request(3, 'textDocument/definition', 'acme:1'),
+                                                        self._request(4, 'textDocument/definition', 'LIST OF a', 8),
+                                                        self._request(5, 'textDocument/definition', 'STRUCTURE'))
+        location = self._result(outMessages, 2)
+        self.assertEqual(location['uri'], self._uri)
+        self.assertEqual(location['range']['start'], self._position('a => INTEGER'))
+        location = self._result(outMessages, 3)
+        self.assertEqual(location['range']['start'], self._position('acme'))
+        location = self._result(outMessages, 4)
+        self.assertEqual(location['range']['start'], self._position('a => INTEGER'))
+        self.assertIsNone(self._result(outMessages, 5))
+
+    def test_LSP_Hover(self):
+        (exitCode, outMessages) = self._runWithDocument(self._request(2, 'textDocument/hover', ': a', 2),
+                                                        self._request(3, 'textDocument/hover', 'c => LIST'))
+        contents = self._result(outMessages, 2)['contents']['value']
+        self.assertEqual(contents, '**type definition a**\n\nDocs for a')
+        contents = self._result(outMessages, 3)['contents']['value']
+        self.assertEqual(contents, '**type definition n.p.c**')
+
+    def test_LSP_References(self):
+        (exitCode, outMessages) = self._runWithDocument(self._request(2, 'textDocument/references', 'a => INTEGER',
+                                                                      context={ 'includeDeclaration' : True }),
+                                                        self._request(3, 'textDocument/references', 'a => INTEGER',
+                                                                      context={ 'includeDeclaration' : False }),
+                                                        self._request(4, 'textDocument/references', 'acme =>'))
+        locations = self._result(outMessages, 2)
+        self.assertEqual([ l['range']['start'] for l in locations ],
+                         [ self._position('a => INTEGER'), self._position(': a', 2), self._position('LIST OF a', 8) ])
+        self.assertEqual(len(self._result(outMessages, 3)), 2)
+        locations = self._result(outMessages, 4)
+        self.assertEqual([ l['range']['start'] for l in locations ], [ self._position('id acme:1', 3) ])
+
+    def test_LSP_Changes(self):
+        # Incremental change introducing an invalid reference, followed by a change that fixes it.
+        change1 = { 'textDocument' : { 'uri' : self._uri, 'version' : 2 },
+                    'contentChanges' : [ { 'range' : { 'start' : self._position(': a', 2), 'end' : self._position(': a', 3) },
+                                           'text' : 'zz' } ] }
+        change2 = { 'textDocument' : { 'uri' : self._uri, 'version' : 3 },
+                    'contentChanges' : [ { 'text' : self._schemaText.replace('b => STRUCTURE', 'zz => UNSIGNED INTEGER\n    b => STRUCTURE') } ] }
+        (exitCode, outMessages) = self._runWithDocument((None, 'textDocument/didChange', change1),
+                                                        (None, 'textDocument/didChange', change2),
+                                                        self._request(2, 'textDocument/references', 'a => INTEGER'))
+        diagnostics = self._diagnostics(outMessages)
+        self.assertEqual(len(diagnostics), 3)
+        self.assertEqual(diagnostics[0], [])
+        self.assertEqual(len(diagnostics[1]), 1)
+        self.assertTrue(diagnostics[1][0]['message'].startswith('invalid type reference'))
+        self.assertEqual(diagnostics[2], [])
+        self.assertEqual(len(self._result(outMessages, 2)), 2)
+
+    def test_LSP_DeferredValidation(self):
+        # Renaming a definition only re-checks the statements affected by the change, so the
+        # reference to it from a preceding statement is reported by the full validation
+        # performed when the document is saved, or before a subsequent request.
+        schemaText = 'x => STRUCTURE { f [1] : a }\nq => STRING\na => INTEGER\n'
+        pos = self._position('a => INTEGER', schemaText=schemaText)
+        change = { 'textDocument' : { 'uri' : self._uri, 'version' : 2 },
+                   'contentChanges' : [ { 'range' : { 'start' : pos, 'end' : pos }, 'text' : 'a' } ] }
+        save = { 'textDocument' : { 'uri' : self._uri } }
+        (exitCode, outMessages) = self._runWithDocument((None, 'textDocument/didChange', change),
+                                                        schemaText=schemaText)
+        self.assertEqual(self._diagnostics(outMessages), [ [] ])
+        for (method, params) in (('textDocument/didSave', save),
+                                 ('textDocument/hover', dict(save, position=pos))):
+            (exitCode, outMessages) = self._runWithDocument((None, 'textDocument/didChange', change),
+                                                            (2, method, params),
+                                                            schemaText=schemaText)
+            diagnostics = self._diagnostics(outMessages)
+            self.assertEqual(len(diagnostics), 2)
+            self.assertEqual(diagnostics[0], [])
+            self.assertEqual(len(diagnostics[1]), 1)
+            self.assertTrue(diagnostics[1][0]['message'].startswith('invalid type reference'))
+
+if __name__ == '__main__':
+    unittest.main()
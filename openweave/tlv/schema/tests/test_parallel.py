@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for parallel validation.
+#
+
+import multiprocessing
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..rules import selectRules
+
+@unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'requires fork')
+class Test_Parallel(TLVSchemaTestCase):
+
+    # Errors in each file depend on definitions in other files.
+    _schemaTexts = [
+        '''
+        acme => VENDOR [ id 0x235A ]
+        g => FIELD GROUP { a [1] : STRING }
+        p => PROFILE [ id acme:1 ] { m => MESSAGE [ id 1 ] CONTAINING STRING }
+        ''',
+        '''
+        s1 => STRUCTURE { includes g, b [1] : INTEGER }
+        s2 => STRUCTURE { f [p:1] : g }
+        ''',
+        'e => INTEGER [ range 0..10 ] { x = 11 }\ns3 => STRUCTURE { c [2] : STRING, c [3] : STRING }\n',
+        'q => PROFILE [ id acme:1 ] { }\nr => PROFILE [ id acme:2 ] { m => MESSAGE [ id 1 ] CONTAINING STRING n => MESSAGE [ id 1 ] CONTAINING STRING }\n',
+    ]
+
+    def _validate(self, **kwargs):
+        schema = WeaveTLVSchema()
+        for (i, text) in enumerate(self._schemaTexts):
+            schema.loadSchemaFromString(text, fileName='s%d.txt' % i)
+        return (schema, schema.validate(**kwargs))
+
+    @staticmethod
+    def _errorRecords(errs):
+        return [ (str(err), err.detail, err.sourceRef.schemaFile.fileName, err.sourceRef.posStr()) for err in errs ]
+
+    def test_Parallel_Validate(self):
+        (_, expectedErrs) = self._validate()
+        self.assertErrorCount(expectedErrs, 6)
+        for jobs in (2, 3, 0):
+            (schema, errs) = self._validate(jobs=jobs)
+            self.assertEqual(self._errorRecords(errs), self._errorRecords(expectedErrs))
+            # Errors refer to the files of the schema.
+            self.assertTrue(all(err.sourceRef.schemaFile in list(schema.allFiles()) for err in errs))
+            self.assertEqual(schema.ruleStats['duplicate-tags'].calls, 4)
+            self.assertEqual(schema.ruleStats['duplicate-tags'].errorCount, 1)
+            self.assertEqual(schema.ruleStats['unique-profile-ids'].errorCount, 1)
+
+    def test_Parallel_Rules(self):
+        rules = selectRules(enable=[ 'duplicate-*' ])
+        (_, expectedErrs) = self._validate(rules=rules)
+        (schema, errs) = self._validate(rules=rules, jobs=2)
+        self.assertEqual(self._errorRecords(errs), self._errorRecords(expectedErrs))
+        self.assertEqual(set(schema.ruleStats.keys()), set(rule.name for rule in rules))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for schema queries.
+#
+
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..node import HasScopedName
+
+class Test_Query(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  acme => VENDOR [ id 0x235A ]
+                  namespace a.b
+                  {
+                      p1 => PROFILE [ id acme:1 ]
+                      {
+                          m1 => MESSAGE [ id 1 ] CONTAINING s1
+                          m2 => MESSAGE [ id 2 ] CONTAINING NOTHING
+                          sc1 => STATUS CODE [ id 1 ]
+                          s1 [*:1] => STRUCTURE
+                          {
+                              f1 [1] : INTEGER,
+                              f2 [a.b.p1:2] : STRING,
+                          }
+                      }
+                      p2 => PROFILE [ id 0x00000002 ]
+                      {
+                          m1 => MESSAGE [ id 1 ] CONTAINING NOTHING
+                          s2 [a.b.p1:3] => BOOLEAN
+                      }
+                  }
+                  s3 [ 0x235A0001:4 ] => LIST OF INTEGER
+                  e => INTEGER { one = 1 }
+                  '''
+
+    def _names(self, nodes):
+        return [ node.fullyQualifiedName if isinstance(node, HasScopedName) else node.name for node in nodes ]
+
+    def _find(self, tlvSchema, **criteria):
+        return self._names(tlvSchema.find(**criteria))
+
+    def test_Query_Name(self):
+        (tlvSchema, errs) = self.loadValidate(self._schemaText)
+        self.assertNoErrors(errs)
+        self.assertEqual(self._find(tlvSchema, name='a.b.p1.*'),
+                         [ 'a.b.p1.m1', 'a.b.p1.m2', 'a.b.p1.sc1', 'a.b.p1.s1' ])
+        self.assertEqual(self._find(tlvSchema, name='a.b.p?.m1'), [ 'a.b.p1.m1', 'a.b.p2.m1' ])
+        self.assertEqual(self._find(tlvSchema, name='*.s[12]'), [ 'a.b.p1.s1', 'a.b.p2.s2' ])
+        self.assertEqual(self._find(tlvSchema, name='acme'), [ 'acme' ])
+        self.assertEqual(self._find(tlvSchema, name='a.b'), [ 'a.b' ])
+        self.assertEqual(self._find(tlvSchema, name='nope*'), [ ])
+        self.assertEqual(self._find(tlvSchema, regex=r'\.m\d$'), [ 'a.b.p1.m1', 'a.b.p1.m2', 'a.b.p2.m1' ])
+        self.assertEqual(self._find(tlvSchema, regex=r'^s3'), [ 's3' ])
+
+    def test_Query_Kind(self):
+        (tlvSchema, errs) = self.loadValidate(self._schemaText)
+        self.assertEqual(self._find(tlvSchema, kind='profile'), [ 'a.b.p1', 'a.b.p2' ])
+        self.assertEqual(self._find(tlvSchema, kind=[ 'status-code', 'vendor' ], name='a*'), [ 'acme', 'a.b.p1.sc1' ])
+        self.assertEqual(self._find(tlvSchema, kind='field'), [ 'f1', 'f2' ])
+        self.assertEqual(self._find(tlvSchema, kind='enum-value'), [ 'one' ])
+        self.assertEqual(self._find(tlvSchema, name='a.b.*', kind='namespace'), [ ])
+        with self.assertRaises(ValueError):
+            tlvSchema.find(kind='bogus')
+
+    def test_Query_Tag(self):
+        (tlvSchema, errs) = self.loadValidate(self._schemaText)
+        self.assertEqual(self._find(tlvSchema, profile='a.b.p1', tag=1), [ 'a.b.p1.s1' ])
+        self.assertEqual(self._find(tlvSchema, profile=0x235A0001, tag=2), [ 'f2' ])
+        self.assertEqual(self._find(tlvSchema, profile='a.b.p1', tag=3), [ 'a.b.p2.s2' ])
+        self.assertEqual(self._find(tlvSchema, profile='a.b.p1', tag=4), [ 's3' ])
+        self.assertEqual(self._find(tlvSchema, tag=1), [ 'f1' ])
+        self.assertEqual(self._find(tlvSchema, profile='unknown', tag=1), [ ])
+
+    def test_Query_Id(self):
+        (tlvSchema, errs) = self.loadValidate(self._schemaText)
+        self.assertEqual(self._find(tlvSchema, id=1), [ 'a.b.p1.m1', 'a.b.p1.sc1', 'a.b.p2.m1' ])
+        self.assertEqual(self._find(tlvSchema, id=1, profile='a.b.p2'), [ 'a.b.p2.m1' ])
+        self.assertEqual(self._find(tlvSchema, id=1, profile=0x235A0001, kind='message'), [ 'a.b.p1.m1' ])
+        self.assertEqual(self._find(tlvSchema, id=2, name='*.m2'), [ 'a.b.p1.m2' ])
+
+    def test_Query_Profile(self):
+        (tlvSchema, errs) = self.loadValidate(self._schemaText)
+        self.assertEqual(self._find(tlvSchema, profile='a.b.p1'),
+                         [ 'a.b.p1.m1', 'a.b.p1.m2', 'a.b.p1.sc1', 'a.b.p1.s1', 'f1', 'f2' ])
+        self.assertEqual(self._find(tlvSchema, profile=2, kind='message'), [ 'a.b.p2.m1' ])
+        self.assertEqual(self._find(tlvSchema, profile=0x235A0001, name='*.s?'), [ 'a.b.p1.s1' ])
+        self.assertEqual(self._find(tlvSchema, profile='unknown'), [ ])
+
+    def test_Query_WithoutValidate(self):
+        # Queries do not depend on references having been resolved by validate().
+        tlvSchema = WeaveTLVSchema()
+        tlvSchema.loadSchemaFromString(self._schemaText)
+        self.assertEqual(self._find(tlvSchema, profile=0x235A0001, tag=2), [ 'f2' ])
+        self.assertEqual(self._find(tlvSchema, profile=0x235A0001, id=1), [ 'a.b.p1.m1', 'a.b.p1.sc1' ])
+
+        # The index reflects schema changes.
+        tlvSchema.loadSchemaFromString('x => MESSAGE [ id 1 ] CONTAINING NOTHING')
+        self.assertEqual(self._find(tlvSchema, id=1, kind='message'), [ 'a.b.p1.m1', 'a.b.p2.m1', 'x' ])
+        schemaFile = tlvSchema.loadSchemaFromString('y => INTEGER')
+        schemaFile.applyEdit(0, 1, 'z')
+        self.assertEqual(self._find(tlvSchema, name='[xyz]'), [ 'x', 'z' ])
+
+        # Lazy mode
+        tlvSchema = WeaveTLVSchema(lazy=True)
+        tlvSchema.loadSchemaFromString(self._schemaText)
+        self.assertEqual(self._find(tlvSchema, name='a.b.p2.*'), [ 'a.b.p2.m1', 'a.b.p2.s2' ])
+
+if __name__ == '__main__':
+    unittest.main()
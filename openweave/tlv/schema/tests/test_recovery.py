@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for recovery from syntax errors.
+#
+
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..error import WeaveTLVSchemaError
+from ..node import Namespace, Profile, TypeDef
+
+class Test_Recovery(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  a => INTEGER
+                  b => STRUCTURE { f [1] INTEGER }
+                  namespace n.m
+                  {
+                      c => BOOLEAN
+                      d => STRUCTURE { x [1] : FOO BAR }
+                      p => PROFILE [ id 1 ]
+                      {
+                          e => INTEGER $
+                          f => FLOAT
+                      }
+                  }
+                  s => STRUCTURE
+                  {
+                      g [1] : INTEGER,
+                  t => LIST OF n.m.c
+                  u => "unterminated
+                  '''
+
+    def _loadRecover(self, schemaText):
+        tlvSchema = WeaveTLVSchema()
+        errs = []
+        schemaFile = tlvSchema.loadSchemaFromString(schemaText, errs=errs)
+        return (tlvSchema, schemaFile, errs)
+
+    def _errorSummary(self, errs):
+        return [ (str(err), err.sourceRef.startLine, err.sourceRef.startCol) for err in errs ]
+
+    def test_Recovery_AllErrors(self):
+        (tlvSchema, schemaFile, errs) = self._loadRecover(self._schemaText)
+        self.assertEqual(self._errorSummary(errs), [
+            ('unexpected keyword: INTEGER', 3, 42),
+            ('unexpected name: BAR', 7, 52),
+            ('unexpected input: $', 10, 40),
+            ('unexpected input: =>', 17, 21),
+            ('unterminated string', 18, 24),
+        ])
+
+    def test_Recovery_PartialAST(self):
+        (tlvSchema, schemaFile, errs) = self._loadRecover(self._schemaText)
+        names = [ node.fullyQualifiedName for node in schemaFile.allNodes((TypeDef, Profile)) ]
+        self.assertEqual(names, [ 'a', 'n.m.c', 'n.m.p', 'n.m.p.f', 't' ])
+        profile = tlvSchema.getProfile('n.m.p')
+        self.assertEqual(profile.statements[0].parent, profile)
+        self.assertIsInstance(profile.parent, Namespace)
+        self.assertEqual(profile.parent.statements[0].name, 'c')
+        self.assertEqual(schemaFile.statements[0].sourceRef.posStr(), '2:19-2:31 19-31')
+
+        # Semantic validation of the valid statements still runs.
+        self.assertNoErrors(tlvSchema.validate())
+        (tlvSchema, schemaFile, errs) = self._loadRecover('a => STRUCTURE { b [1] : INTEGER\nc => LIST OF d')
+        self.assertErrorCount(errs, 1)
+        errs = tlvSchema.validate()
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'invalid type reference: d')
+
+    def test_Recovery_DefinitionErrors(self):
+        (tlvSchema, schemaFile, errs) = self._loadRecover('p => PROFILE [ id ] { a => INTEGER $ }\nb => BOOLEAN')
+        self.assertEqual(self._errorSummary(errs), [
+            ('unexpected input: ]', 1, 19),
+            ('unexpected input: $', 1, 36),
+        ])
+        self.assertEqual([ node.name for node in schemaFile.statements ], [ 'b' ])
+
+    def test_Recovery_UnclosedQualifiers(self):
+        # An unclosed qualifier list ends at the next definition, within the enclosing namespace.
+        schemaText = 'namespace ns { b => INTEGER [ range 0..1 \n c => STRING \n f => BOOLEAN } g => BOOLEAN'
+        (tlvSchema, schemaFile, errs) = self._loadRecover(schemaText)
+        self.assertEqual(self._errorSummary(errs), [
+            ('unexpected name: c', 2, 2),
+        ])
+        names = [ node.fullyQualifiedName for node in schemaFile.allNodes(TypeDef) ]
+        self.assertEqual(names, [ 'ns.c', 'ns.f', 'g' ])
+        self.assertNoErrors(tlvSchema.validate())
+
+        # Likewise at the closing brace of the body.
+        (tlvSchema, schemaFile, errs) = self._loadRecover('namespace ns { b => INTEGER [ range 0..1 } g => BOOLEAN')
+        self.assertEqual(self._errorSummary(errs), [
+            ('unexpected end of input', 1, 40),
+        ])
+        names = [ node.fullyQualifiedName for node in schemaFile.allNodes((Namespace, TypeDef)) ]
+        self.assertEqual(names, [ 'ns', 'g' ])
+
+    def test_Recovery_NoErrors(self):
+        schemaText = 'namespace a { /** docs */ b => STRUCTURE { c [1] : INTEGER, /**< postfix */ } }'
+        (tlvSchema, schemaFile, errs) = self._loadRecover(schemaText)
+        self.assertNoErrors(errs)
+        self.assertEqual(schemaFile.summarize(), WeaveTLVSchema().loadSchemaFromString(schemaText).summarize())
+
+    def test_Recovery_Disabled(self):
+        with self.assertRaises(WeaveTLVSchemaError):
+            WeaveTLVSchema().loadSchemaFromString(self._schemaText)
+
+if __name__ == '__main__':
+    unittest.main()
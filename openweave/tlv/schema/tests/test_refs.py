@@ -25,7 +25,7 @@
 import unittest
 
 from .testutils import TLVSchemaTestCase
-from ..node import ReferencedType, TypeDef, SignedIntegerType
+from ..node import ReferencedType, StructureIncludes, TypeDef, SignedIntegerType, BooleanType, Id, Tag
 
 class Test_Refs(TLVSchemaTestCase):
     
@@ -188,13 +188,95 @@ class Test_Refs(TLVSchemaTestCase):
                      f => a
                      '''
         (tlvSchema, errs) = self.loadValidate(schemaText)
-        self.assertErrorCount(errs, 6)
+        self.assertErrorCount(errs, 1)
         self.assertError(errs, 'circular type reference: a')
-        self.assertError(errs, 'circular type reference: b')
-        self.assertError(errs, 'circular type reference: c')
-        self.assertError(errs, 'circular type reference: d')
-        self.assertError(errs, 'circular type reference: e')
-        self.assertError(errs, 'circular type reference: f')
+        self.assertEqual(errs[0].detail, 'the type reference chain a -> b -> c -> d -> e -> f -> a refers back to itself')
+
+        # Each cycle is reported once, and types that lead into a cycle are unresolved.
+        schemaText = '''
+                     s => STRUCTURE { f [1] : x }
+                     x => y
+                     namespace n
+                     {
+                         y => z
+                         z => y
+                     }
+                     y => n.y
+                     p => q
+                     q => p
+                     r => INTEGER
+                     t => r
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertErrorCount(errs, 2)
+        self.assertError(errs, 'circular type reference: n.y')
+        self.assertError(errs, 'circular type reference: p')
+        self.assertIsNone(tlvSchema.getTypeDef('x').targetType)
+        self.assertIsNone(tlvSchema.getTypeDef('s').targetType.getField('f').targetType)
+        self.assertIsInstance(tlvSchema.getTypeDef('t').targetType, SignedIntegerType)
+
+        # Long chains
+        schemaText = '\n'.join('t%d => t%d' % (i, i + 1) for i in range(2000)) + '\nt2000 => BOOLEAN\n'
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+        self.assertIsInstance(tlvSchema.getTypeDef('t0').targetType, BooleanType)
+
+    def test_Refs_ReverseIndex(self):
+        schemaText = '''
+                     acme => VENDOR [ id 0x235A ]
+                     p1 => PROFILE [ id acme:1 ]
+                     {
+                         m1 => MESSAGE [ id 1 ] CONTAINING s
+                         m2 => MESSAGE [ id 2 ] CONTAINING LIST OF i
+                         m3 => MESSAGE [ id 3 ] CONTAINING u
+                         s [*:1] => STRUCTURE
+                         {
+                             f1 [p1:2] : l,
+                             includes fg,
+                         }
+                         fg => FIELD GROUP { f2 [3] : i }
+                     }
+                     p2 => PROFILE [ id acme:2 ] { }
+                     l => LIST OF a
+                     a => i
+                     i => INTEGER
+                     u => UNSIGNED INTEGER
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+
+        def refNodes(node):
+            return [ (type(refNode), refNode.parent) for refNode in tlvSchema.getReferences(node) ]
+
+        i = tlvSchema.getTypeDef('i')
+        refs = tlvSchema.getReferences(i)
+        self.assertEqual(len(refs), 3)
+        self.assertTrue(all(isinstance(refNode, ReferencedType) for refNode in refs))
+        fg = tlvSchema.getTypeDef('p1.fg')
+        self.assertEqual(refNodes(fg), [ (StructureIncludes, tlvSchema.getTypeDef('p1.s').type) ])
+        acme = tlvSchema.getVendor('acme')
+        self.assertEqual(refNodes(acme), [ (Id, tlvSchema.getProfile('p1')), (Id, tlvSchema.getProfile('p2')) ])
+        p1 = tlvSchema.getProfile('p1')
+        self.assertEqual([ type(refNode) for refNode in tlvSchema.getReferences(p1) ], [ Tag, Tag ])
+        self.assertEqual(tlvSchema.getReferences(tlvSchema.getProfile('p2')), [])
+
+        def messageNames(typeName):
+            return sorted(m.name for m in tlvSchema.getDependentMessages(tlvSchema.getTypeDef(typeName)))
+
+        self.assertEqual(messageNames('i'), [ 'm1', 'm2' ])
+        self.assertEqual(messageNames('a'), [ 'm1' ])
+        self.assertEqual(messageNames('p1.fg'), [ 'm1' ])
+        self.assertEqual(messageNames('u'), [ 'm3' ])
+        self.assertEqual(messageNames('p1.s'), [ 'm1' ])
+
+        # Circular references terminate.
+        (tlvSchema, errs) = self.loadValidate('''
+                                              p => PROFILE [ id 1 ] { m => MESSAGE [ id 1 ] CONTAINING x }
+                                              x => y
+                                              y => x
+                                              ''')
+        self.assertEqual([ m.name for m in tlvSchema.getDependentMessages(tlvSchema.getTypeDef('y')) ], [ 'm' ])
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for validation rules.
+#
+
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..node import StructureType, Vendor
+from ..rules import ValidationRule, RuleSet, allRules, getRule, selectRules
+
+class Test_Rules(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  a => VENDOR [ id 1 ]
+                  a => VENDOR [ id 2 ]
+                  s => STRUCTURE
+                  {
+                      f [1] : STRING,
+                      f [1] : INTEGER,
+                  }
+                  '''
+
+    def _validate(self, rules=None):
+        schema = WeaveTLVSchema()
+        schema.loadSchemaFromString(self._schemaText)
+        return (schema, schema.validate(rules=rules))
+
+    def test_Rules_Select(self):
+        names = [ rule.name for rule in allRules() ]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn('duplicate-tags', names)
+        self.assertIn('unique-profile-ids', names)
+        self.assertTrue(getRule('unique-profile-ids').isSchemaRule)
+        self.assertFalse(getRule('duplicate-tags').isSchemaRule)
+        self.assertIsNone(getRule('nonexistent'))
+
+        # Rules are selected by name or pattern, and returned in registration order.
+        self.assertEqual(selectRules(), allRules())
+        self.assertEqual([ rule.name for rule in selectRules(enable=[ 'duplicate-tags', 'duplicate-field-names' ]) ],
+                         [ 'duplicate-field-names', 'duplicate-tags' ])
+        selected = selectRules(enable=[ 'duplicate-*' ], disable=[ '*-ids' ])
+        self.assertTrue(all(rule.name.startswith('duplicate-') and not rule.name.endswith('-ids') for rule in selected))
+        self.assertIn(getRule('duplicate-tags'), selected)
+        self.assertNotIn(getRule('duplicate-tags'), selectRules(disable=[ 'duplicate-tags' ]))
+        with self.assertRaises(ValueError):
+            selectRules(enable=[ 'nonexistent' ])
+        with self.assertRaises(ValueError):
+            selectRules(disable=[ 'nonexistent-*' ])
+
+    def test_Rules_Validate(self):
+        (schema, errs) = self._validate()
+        self.assertErrorCount(errs, 3)
+        self.assertError(errs, 'duplicate field in STRUCTURE type: f')
+        self.assertError(errs, 'duplicate tag in STRUCTURE type')
+        self.assertError(errs, 'inconsistent vendor id')
+
+        # Only the selected rules are applied.
+        (schema, errs) = self._validate(selectRules(disable=[ 'duplicate-tags', 'inconsistent-vendor-ids' ]))
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'duplicate field in STRUCTURE type: f')
+        (schema, errs) = self._validate(selectRules(enable=[ 'inconsistent-*' ]))
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'inconsistent vendor id')
+
+        # Name resolution errors are reported regardless of the rules selected.
+        schema = WeaveTLVSchema()
+        schema.loadSchemaFromString('t => u')
+        errs = schema.validate(rules=[])
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'invalid type reference: u')
+
+    def test_Rules_Stats(self):
+        (schema, errs) = self._validate()
+        stats = schema.ruleStats
+        self.assertEqual(set(stats.keys()), set(rule.name for rule in allRules()))
+        self.assertEqual(stats['duplicate-tags'].calls, 1)
+        self.assertEqual(stats['duplicate-tags'].errorCount, 1)
+        self.assertEqual(stats['vendor-id'].calls, 3)
+        self.assertEqual(stats['inconsistent-vendor-ids'].calls, 1)
+        self.assertEqual(stats['inconsistent-vendor-ids'].errorCount, 1)
+        self.assertEqual(stats['enum-value-range'].calls, 0)
+        self.assertEqual(sum(s.errorCount for s in stats.values()), len(errs))
+        self.assertTrue(all(s.time >= 0 for s in stats.values()))
+
+        (schema, errs) = self._validate(selectRules(enable=[ 'duplicate-tags' ]))
+        self.assertEqual(list(schema.ruleStats.keys()), [ 'duplicate-tags' ])
+
+    def test_Rules_RuleSet(self):
+        # Rules not in the registry can be applied via a RuleSet.
+        checked = []
+        def checkStructure(node, errs):
+            checked.append(node)
+        rule = ValidationRule('test-rule', checkStructure, (StructureType, Vendor))
+        (schema, errs) = self._validate(allRules() + [ rule ])
+        self.assertErrorCount(errs, 3)
+        self.assertEqual(len(checked), 4)
+        self.assertEqual(schema.ruleStats['test-rule'].calls, 4)
+
+        ruleSet = RuleSet([ rule ], profile=False)
+        ruleSet.checkNode(schema.getTypeDef('s').type, [])
+        ruleSet.checkNode(schema.getTypeDef('s'), [])
+        self.assertEqual(ruleSet.stats['test-rule'].calls, 1)
+        self.assertEqual(ruleSet.stats['test-rule'].time, 0)
+
+if __name__ == '__main__':
+    unittest.main()
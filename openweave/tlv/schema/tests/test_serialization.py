@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for binary serialization of schema ASTs.
+#
+
+import unittest
+import io
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from .. import serialization
+from ..error import WeaveTLVSchemaError
+from ..node import Range, TypeDef
+
+class Test_Serialization(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  /** Vendor docs */
+                  acme => VENDOR [ id 0x235A ]
+                  namespace a.b
+                  {
+                      using c
+                      p => PROFILE [ id acme:1 ]
+                      {
+                          m => MESSAGE [ id 1 ] CONTAINING s
+                          e => MESSAGE [ id 2 ] CONTAINING NOTHING
+                          sc => STATUS CODE [ id 3 ]
+                          s [*:1] => STRUCTURE [ extensible ]
+                          {
+                              /** field docs */
+                              f1 [1, optional] : INTEGER [ range -2..0xFFFFFFFFFFFFFFFFFF ] { a = 1, b = -2 },
+                              f2 [2] : STRING [ length 0..10 ],  /**< postfix docs */
+                              includes fg,
+                              f3 [0x1234:3] : CHOICE OF { alt1 : BOOLEAN, alt2 [4] : BYTE STRING },
+                          }
+                          fg => FIELD GROUP { g [5] : FLOAT [ range -1.5..2.5 ] }
+                          arr => ARRAY [ len 2 ] { elem : NULL ?, ANY {1..3} }
+                          lst => LIST OF UNSIGNED INTEGER
+                      }
+                  }
+                  '''
+
+    def test_Serialization_RoundTrip(self):
+        tlvSchema = WeaveTLVSchema()
+        schemaFile = tlvSchema.loadSchemaFromString(self._schemaText, fileName='test.txt')
+        data = serialization.dumps(schemaFile)
+        loadedFile = serialization.loads(data)
+        self.assertEqual(loadedFile.fileName, 'test.txt')
+        self.assertEqual(loadedFile.schemaText, schemaFile.schemaText)
+        self.assertEqual(loadedFile.summarize(), schemaFile.summarize())
+        # Verify parent links.  As when parsed, top-level statements have no parent.
+        for node in loadedFile.statements:
+            self.assertIsNone(node.parent)
+        for node in loadedFile.allNodes():
+            for childNode in node.allChildNodes():
+                if node is not loadedFile:
+                    self.assertIs(childNode.parent, node)
+                if childNode.sourceRef is not None:
+                    self.assertIs(childNode.sourceRef.schemaFile, loadedFile)
+        # Verify large and non-integer qualifier values
+        (intRange, floatRange) = loadedFile.allNodes(Range)
+        self.assertEqual(intRange.lowerBound, -2)
+        self.assertEqual(intRange.upperBound, 0xFFFFFFFFFFFFFFFFFF)
+        self.assertEqual(str(floatRange.lowerBound), '-1.5')
+        # Verify names are interned, and so shared with the parsed schema
+        for (node, loadedNode) in zip(schemaFile.allNodes(TypeDef), loadedFile.allNodes(TypeDef)):
+            self.assertIs(loadedNode.name, node.name)
+            self.assertIs(loadedNode.fullyQualifiedName, node.fullyQualifiedName)
+
+    def test_Serialization_Validate(self):
+        tlvSchema = WeaveTLVSchema()
+        schemaFile = tlvSchema.loadSchemaFromString(self._schemaText)
+        stream = io.BytesIO()
+        serialization.dump(schemaFile, stream)
+        stream.seek(0)
+        tlvSchema = WeaveTLVSchema()
+        tlvSchema.loadSerializedSchema(stream)
+        errs = tlvSchema.validate()
+        self.assertNoErrors(errs)
+        s = tlvSchema.getTypeDef('a.b.p.s')
+        self.assertIsInstance(s, TypeDef)
+        self.assertEqual(s.fullyQualifiedName, 'a.b.p.s')
+        self.assertEqual(s.targetType.getField('f2').docs, '/**< postfix docs */')
+        self.assertEqual(s.targetType.getField('f3').tag.asTuple(), (0x1234, 3))
+        self.assertEqual(tlvSchema.getProfile('a.b.p').id, 0x235A0001)
+
+    def test_Serialization_OptionalSections(self):
+        tlvSchema = WeaveTLVSchema()
+        schemaFile = tlvSchema.loadSchemaFromString(self._schemaText)
+        fullData = serialization.dumps(schemaFile)
+        data = serialization.dumps(schemaFile, withSourceRefs=False, withDocs=False, withText=False)
+        self.assertLess(len(data), len(fullData))
+        loadedFile = serialization.loads(data)
+        self.assertIsNone(loadedFile.schemaText)
+        for node in loadedFile.allNodes():
+            self.assertIsNone(node.sourceRef)
+            self.assertIsNone(getattr(node, 'docs', None))
+        self.assertEqual(len(list(loadedFile.allNodes())), len(list(schemaFile.allNodes())))
+
+    def test_Serialization_BadData(self):
+        tlvSchema = WeaveTLVSchema()
+        schemaFile = tlvSchema.loadSchemaFromString(self._schemaText)
+        data = serialization.dumps(schemaFile)
+        with self.assertRaises(WeaveTLVSchemaError):
+            serialization.loads(b'XXXX' + data[4:])
+        with self.assertRaises(WeaveTLVSchemaError):
+            serialization.loads(data[:4] + bytes([ serialization.VERSION + 1 ]) + data[5:])
+        with self.assertRaises(WeaveTLVSchemaError):
+            serialization.loads(data[:len(data) // 2])
+        # Corrupt FLOAT qualifier value
+        self.assertIn(b'-1.5', data)
+        with self.assertRaises(WeaveTLVSchemaError):
+            serialization.loads(data.replace(b'-1.5', b'-1x5'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for transcoding TLV payloads to and from JSON.
+#
+
+import io
+import json
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from .. import WeaveTLVSchema
+from ..transcode import Transcoder, TranscodeError
+
+class _SlowReader(object):
+    '''A file object that returns one character per read.'''
+
+    def __init__(self, text):
+        self._text = text
+        self._pos = 0
+
+    def read(self, size):
+        data = self._text[self._pos:self._pos+1]
+        self._pos += len(data)
+        return data
+
+class Test_Transcode(TLVSchemaTestCase):
+
+    _schemaText = '''
+                  acme => VENDOR [ id 0x235A ]
+                  p => PROFILE [ id acme:1 ]
+                  {
+                      s => STRUCTURE [ extensible ]
+                      {
+                          a [1] : UNSIGNED INTEGER [ range 16bits ] { one = 1, two = 2 },
+                          b [2, optional] : STRING,
+                          c [3] : CHOICE OF { x : INTEGER, y : STRING },
+                          d [4, optional] : ARRAY { STRING, INTEGER * },
+                          e [5, optional] : BYTE STRING,
+                          f [6, optional] : FLOAT [ nullable ],
+                          g [*:7, optional] : LIST OF BOOLEAN,
+                          h [8, optional] : u,
+                          i [9, optional] : ANY,
+                          j [10, optional] : CHOICE OF { j1 [11] : INTEGER, j2 [12] : STRING },
+                          k [13, optional] : FLOAT [ range 32bits ],
+                      }
+                      u => CHOICE OF { NULL, BOOLEAN, n : INTEGER }
+                      t => STRUCTURE { a [1] : INTEGER }
+                      v => CHOICE OF { y [2] : INTEGER, z [3] : INTEGER }
+                      vl => LIST OF v
+                      va => ARRAY OF v
+                  }
+                  '''
+
+    def setUp(self):
+        super(Test_Transcode, self).setUp()
+        self.schema = WeaveTLVSchema()
+        self.schema.loadSchemaFromString(self._schemaText)
+        self.assertNoErrors(self.schema.validate())
+
+    def _toTLV(self, text, typeName='p.s', batch=False):
+        output = io.BytesIO()
+        Transcoder(self.schema, typeName).jsonToTLV(io.StringIO(text), output, batch=batch)
+        return output.getvalue()
+
+    def _toJSON(self, data, typeName='p.s', batch=False):
+        output = io.StringIO()
+        Transcoder(self.schema, typeName).tlvToJSON(io.BytesIO(data), output, batch=batch)
+        return output.getvalue()
+
+    def _assertRoundTrip(self, value, typeName='p.s'):
+        data = self._toTLV(json.dumps(value), typeName)
+        self.assertEqual(json.loads(self._toJSON(data, typeName)), value)
+
+    def test_Transcode_Encoding(self):
+        data = self._toTLV('{ "a" : "two", "c" : { "y" : "hi" }, "g" : [ true ] }')
+        self.assertEqual(data, bytes.fromhex(
+            '15'                        # anonymous structure
+            '240102'                    # a: context tag 1, unsigned int 2
+            '2c03026869'                # c: context tag 3, UTF-8 string "hi"
+            'd75a2301000700' '09' '18'  # g: fully-qualified tag 0x235A0001:7, list [ true ]
+            '18'))
+        self.assertEqual(self._toJSON(data), '{"a":"two","c":{"y":"hi"},"g":[true]}\n')
+
+    def test_Transcode_RoundTrip(self):
+        self._assertRoundTrip({ 'a' : 3, 'c' : { 'x' : -300 } })
+        self._assertRoundTrip({ 'a' : 7, 'c' : { 'x' : 70000 }, 'b' : 'café', 'e' : 'AAEC', 'f' : 1.5 })
+        self._assertRoundTrip({ 'a' : 'one', 'c' : { 'y' : '' }, 'f' : None, 'd' : [ 'q' ] })
+        self._assertRoundTrip({ 'a' : 'one', 'c' : { 'y' : '' }, 'd' : [ 'q', 1, -2, 2 ** 40 ] })
+        # Unnamed CHOICE OF alternates are identified by the form of the value.
+        self._assertRoundTrip({ 'a' : 'one', 'c' : { 'x' : 1 }, 'h' : None })
+        self._assertRoundTrip({ 'a' : 'one', 'c' : { 'x' : 1 }, 'h' : False })
+        self._assertRoundTrip({ 'a' : 'one', 'c' : { 'x' : 1 }, 'h' : { 'n' : 3 } })
+        # Alternates with distinct tags are identified by tag.
+        self._assertRoundTrip({ 'a' : 'one', 'c' : { 'x' : 1 }, 'j' : { 'j2' : 'z' } })
+        self._assertRoundTrip([ { 'z' : 5 }, { 'y' : 6 } ], typeName='p.vl')
+        self._assertRoundTrip([ { 'z' : 5 }, { 'y' : 6 } ], typeName='p.va')
+        # ANY values, and unknown fields of extensible structures, are keyed by tag.
+        self._assertRoundTrip({ 'a' : 'one', 'c' : { 'x' : 1 }, 'i' : { '1' : [ 1, 'x', 2.5, None ], '0x235A0001:2' : True } })
+        self._assertRoundTrip({ 'a' : 'one', 'c' : { 'x' : 1 }, '99' : 'extra' })
+
+    def test_Transcode_ImplicitTags(self):
+        # Field g, encoded with an implicit profile tag.
+        data = bytes.fromhex('15' '240101' '200301' '97070018' '18')
+        self.assertEqual(json.loads(self._toJSON(data)), { 'a' : 'one', 'c' : { 'x' : 1 }, 'g' : [] })
+
+    def test_Transcode_Batch(self):
+        text = '{"a":1,"c":{"x":1}}\n{"a":2,"c":{"y":"z"}}\n'
+        data = self._toTLV(text, batch=True)
+        self.assertEqual(self._toJSON(data, batch=True), '{"a":"one","c":{"x":1}}\n{"a":"two","c":{"y":"z"}}\n')
+        self.assertEqual(self._toJSON(b'', batch=True), '')
+        with self.assertRaises(TranscodeError):
+            self._toJSON(data)
+        with self.assertRaises(TranscodeError):
+            self._toTLV(text)
+
+    def test_Transcode_Streaming(self):
+        # Tokens split across reads.
+        text = '{ "a" : 65535, "c" : { "y" : "a \\"quoted\\" \\u00e9 string" }, "f" : -1.25e-3 }'
+        output = io.BytesIO()
+        Transcoder(self.schema, 'p.s').jsonToTLV(_SlowReader(text), output)
+        self.assertEqual(json.loads(self._toJSON(output.getvalue())), json.loads(text))
+
+    def test_Transcode_Errors(self):
+        def assertError(text, msg, path=None):
+            with self.assertRaises(TranscodeError) as cm:
+                self._toTLV(text)
+            self.assertIn(msg, str(cm.exception))
+            if path is not None:
+                self.assertEqual(cm.exception.path, path)
+        assertError('{"c":{"x":1}}', 'missing field in STRUCTURE type: a')
+        assertError('{"a":1,"c":{"x":1},"zz":1}', 'unexpected field', [ 'zz' ])
+        assertError('{"a":"three","c":{"x":1}}', 'unknown enumerated value: three', [ 'a' ])
+        assertError('{"a":1,"c":{"z":1}}', 'does not match any alternate', [ 'c' ])
+        assertError('{"a":1,"c":{"x":1},"d":[1]}', 'missing item', [ 'd', 0 ])
+        assertError('{"a":1,"c":{"x":1},"d":["q","r"]}', 'unexpected item in ARRAY type', [ 'd', 1 ])
+        assertError('{"a":1,"c":{"x":1},"d":[]}', 'missing item', [ 'd' ])
+        assertError('{"a":1,"c":{"x":1},"e":"!"}', 'invalid base64', [ 'e' ])
+        assertError('{"a":-1,"c":{"x":1}}', 'cannot be encoded', [ 'a' ])
+        assertError('{"a":1,"c":{"x":1},"b":2}', 'expected STRING type, found JSON number', [ 'b' ])
+        assertError('{"a":1 "c":{"x":1}}', "unexpected JSON string")
+        assertError('{"a":1, @}', 'invalid JSON text')
+        assertError('{"a":1,', 'unexpected JSON end of text')
+        assertError('{"a":1,"c":{"x":1},"k":1e300}', 'FLOAT value cannot be encoded in 32 bits', [ 'k' ])
+        assertError('{"a":1,"c":{"x":1},"f":%s}' % ('9' * 400), 'FLOAT value cannot be encoded in 64 bits', [ 'f' ])
+        assertError('{"a":1,"c":{"x":1},"b":"\\q"}', 'invalid escape sequence in JSON string', [ 'b' ])
+        assertError('{"a":1,"c":{"x":1},"b":"\\ud800"}', 'cannot be encoded as UTF-8', [ 'b' ])
+        assertError('{"a":1,"c":{"x":1},"i":["\\ud800"]}', 'cannot be encoded as UTF-8', [ 'i', 0 ])
+
+        with self.assertRaises(TranscodeError) as cm:
+            self._toJSON(bytes.fromhex('15' '240101' '2c0302' '68'))
+        self.assertIn('truncated TLV data', str(cm.exception))
+        with self.assertRaises(TranscodeError) as cm:
+            # Field a encoded as a string.
+            self._toJSON(bytes.fromhex('15' '2c010161' '18'))
+        self.assertIn('expected UNSIGNED INTEGER type, found UTF-8 string', str(cm.exception))
+        self.assertEqual(cm.exception.path, [ 'a' ])
+        with self.assertRaises(TranscodeError) as cm:
+            # Non-extensible structure containing an unknown field.
+            self._toJSON(bytes.fromhex('15' '240101' '240201' '18'), typeName='p.t')
+        self.assertIn('unexpected field in STRUCTURE type: 2', str(cm.exception))
+
+if __name__ == '__main__':
+    unittest.main()
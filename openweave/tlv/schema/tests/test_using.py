@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+#
+#   Copyright (c) 2020 Google LLC.
+#   All rights reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+
+#
+#   @file
+#         Unit tests for using statements.
+#
+
+import unittest
+
+from .testutils import TLVSchemaTestCase
+from ..node import Using, Tag
+
+class Test_Using(TLVSchemaTestCase):
+
+    _definitions = '''
+                   namespace a.b
+                   {
+                       t => STRING
+                       namespace c
+                       {
+                           u => INTEGER
+                       }
+                   }
+                   namespace x
+                   {
+                       t => BOOLEAN
+                       p => PROFILE [ id 7 ] { }
+                   }
+                   '''
+
+    def test_Using_Namespace(self):
+        schemaText = self._definitions + '''
+                     namespace n
+                     {
+                         using a.b
+                         s => STRUCTURE
+                         {
+                             f1 [0] : t,
+                             f2 [1] : c.u,
+                         }
+                     }
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+        s = tlvSchema.getTypeDef('n.s').targetType
+        self.assertEqual(s.getField('f1').type.targetTypeDef.fullyQualifiedName, 'a.b.t')
+        self.assertEqual(s.getField('f2').type.targetTypeDef.fullyQualifiedName, 'a.b.c.u')
+        usingNode = next(tlvSchema.allNodes(Using))
+        self.assertEqual(usingNode.fullyQualifiedTargetName, 'a.b')
+
+    def test_Using_Definition(self):
+        schemaText = self._definitions + '''
+                     using a.b.c.u
+                     v => u
+                     namespace a
+                     {
+                         using b.t
+                         w => t
+                     }
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+        self.assertEqual(tlvSchema.getTypeDef('v').type.targetTypeDef.fullyQualifiedName, 'a.b.c.u')
+        self.assertEqual(tlvSchema.getTypeDef('a.w').type.targetTypeDef.fullyQualifiedName, 'a.b.t')
+        targets = sorted(n.fullyQualifiedTargetName for n in tlvSchema.allNodes(Using))
+        self.assertEqual(targets, [ 'a.b.c.u', 'a.b.t' ])
+
+        # Using statements that name unknown targets import nothing.
+        (tlvSchema, errs) = self.loadValidate('using nonexistent\nv => t')
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'invalid type reference: t')
+        self.assertIsNone(next(tlvSchema.allNodes(Using)).fullyQualifiedTargetName)
+
+    def test_Using_Scope(self):
+        # Local definitions take precedence over imported ones, and imports only apply
+        # within the scope containing the using statement.
+        schemaText = self._definitions + '''
+                     namespace n
+                     {
+                         using x
+                         t => INTEGER
+                         v => t
+                     }
+                     namespace n
+                     {
+                         w => p
+                     }
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'invalid type reference: p')
+        self.assertEqual(tlvSchema.getTypeDef('n.v').type.targetTypeDef.fullyQualifiedName, 'n.t')
+
+    def test_Using_Profile(self):
+        schemaText = self._definitions + '''
+                     namespace n
+                     {
+                         using x
+                         s => STRUCTURE
+                         {
+                             f [p:1] : STRING,
+                         }
+                     }
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+        tag = next(n for n in tlvSchema.allNodes(Tag) if n.profile is not None)
+        self.assertEqual(tag.profileNode.fullyQualifiedName, 'x.p')
+        self.assertEqual(tag.profileId, 7)
+
+    def test_Using_Errors(self):
+        schemaText = self._definitions + '''
+                     namespace n
+                     {
+                         using a.b
+                         using x
+                         v => t
+                     }
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertErrorCount(errs, 1)
+        self.assertError(errs, 'ambiguous type reference: t')
+
+        # A name imported from multiple definitions is not ambiguous if only one of
+        # them is of the kind being referred to.
+        schemaText = self._definitions + '''
+                     namespace y
+                     {
+                         p => INTEGER
+                     }
+                     namespace n
+                     {
+                         using x
+                         using y
+                         v => p
+                     }
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+        self.assertEqual(tlvSchema.getTypeDef('n.v').type.targetTypeDef.fullyQualifiedName, 'y.p')
+
+    def test_Using_Edit(self):
+        schemaText = self._definitions + '''
+                     namespace n
+                     {
+                         v => STRING
+                     }
+                     '''
+        (tlvSchema, errs) = self.loadValidate(schemaText)
+        self.assertNoErrors(errs)
+        schemaFile = next(tlvSchema.allFiles())
+        pos = schemaFile.schemaText.index('v => STRING')
+        errs = schemaFile.applyEdit(pos, pos + len('v => STRING'), 'using a.b\nv => c.u')
+        self.assertNoErrors(errs)
+        self.assertEqual(tlvSchema.getTypeDef('n.v').type.targetTypeDef.fullyQualifiedName, 'a.b.c.u')
+
+if __name__ == '__main__':
+    unittest.main()
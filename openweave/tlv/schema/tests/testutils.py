@@ -61,3 +61,15 @@ class TLVSchemaTestCase(unittest.TestCase):
         errMsg = 'Expected error with text "%s" not found in:%s' % (errText, errSum) 
         self.fail(errMsg);
 
+    def checkNumPyModes(self, module, check):
+        '''Run a check with a module's use of NumPy disabled and, if NumPy is installed,
+           enabled.'''
+        savedNumpy = module.numpy
+        try:
+            for mode in ([ None, savedNumpy ] if savedNumpy is not None else [ None ]):
+                module.numpy = mode
+                with self.subTest(numpy=mode is not None):
+                    check()
+        finally:
+            module.numpy = savedNumpy
+
@@ -26,8 +26,18 @@
 import sys
 import os
 import argparse
-from .obj import WeaveTLVSchema
+import re
+import json
+from .obj import WeaveTLVSchema, _mapJobs
 from .error import WeaveTLVSchemaError
+from .formatter import formatSchemaFile
+from .dump import dumpSchemaFiles, formats as dumpFormats, FORMAT_TEXT
+from .jsonschema import exportJSONSchema
+from .node import HasScopedName
+from .transcode import Transcoder, TranscodeError
+from .bundle import writeBundle
+from .rules import allRules, selectRules
+from .query import kinds as queryKinds
 
 scriptName = os.path.basename(sys.argv[0])
 
@@ -49,17 +59,55 @@ class _ValidateCommand(object):
             '\n'
             '  -s|--silent\n'
             '    Do not display results (exit code indicates the number of errors).\n'
+            '\n'
+            '  -r|--rules <rule-names>\n'
+            '    Apply only the given validation rules.  Rule names are separated by\n'
+            '    commas and may contain shell-style wildcards (e.g. "duplicate-*").\n'
+            '\n'
+            '  -d|--disable-rules <rule-names>\n'
+            '    Do not apply the given validation rules.\n'
+            '\n'
+            '  --list-rules\n'
+            '    List the available validation rules and exit.\n'
+            '\n'
+            '  -p|--profile-rules\n'
+            '    Display the number of nodes checked, errors found and time taken by\n'
+            '    each validation rule.\n'
+            '\n'
+            '  -j|--jobs <num>\n'
+            '    Validate files in parallel, using the given number of processes (0 to\n'
+            '    use one process per CPU).\n'
         ).format(scriptName, summary)
 
     def run(self, args):
         argParser = _ArgumentParser(prog='{0} {1}'.format(scriptName, self.name),
                                     add_help=False)
         argParser.add_argument('-s', '--silent', action='store_true')
+        argParser.add_argument('-r', '--rules')
+        argParser.add_argument('-d', '--disable-rules')
+        argParser.add_argument('--list-rules', action='store_true')
+        argParser.add_argument('-p', '--profile-rules', action='store_true')
+        argParser.add_argument('-j', '--jobs', type=int, default=1)
         argParser.add_argument('files', nargs='*')
         args = argParser.parse_args(args)
         
+        if args.list_rules:
+            nameWidth = max(len(rule.name) for rule in allRules())
+            for rule in allRules():
+                print('%-*s  %s' % (nameWidth, rule.name, rule.summary or ''))
+            return 0
+
+        def splitRuleNames(names):
+            return [ name.strip() for name in names.split(',') if name.strip() ] if names is not None else None
+        try:
+            rules = selectRules(enable=splitRuleNames(args.rules), disable=splitRuleNames(args.disable_rules))
+        except ValueError as err:
+            raise _UsageError('{0} {1}: {2}'.format(scriptName, self.name, err))
+
         if len(args.files) == 0:
             raise _UsageError('{0} {1}: Please specify one or more schema files'.format(scriptName, self.name))
+        if args.jobs < 0:
+            raise _UsageError('{0} {1}: Invalid number of jobs: {2}'.format(scriptName, self.name, args.jobs))
         
         schema = WeaveTLVSchema()
         
@@ -68,13 +116,19 @@ class _ValidateCommand(object):
         for schemaFileName in args.files:
             if not os.path.exists(schemaFileName):
                 raise _UsageError('{0} {1}: Schema file not found: {0}\n'.format(scriptName, self.name, schemaFileName))
-            try:
-                schema.loadSchemaFromFile(schemaFileName)
-            except WeaveTLVSchemaError as err:
-                errs.append(err)
+            # Report all syntax errors in the file, and validate the remaining statements.
+            schema.loadSchemaFromFile(schemaFileName, errs=errs)
 
-        errs += schema.validate()
+        errs += schema.validate(rules=rules, jobs=args.jobs)
         
+        if args.profile_rules:
+            nameWidth = max([ len('Rule') ] + [ len(rule.name) for rule in rules ])
+            print('%-*s  %8s  %6s  %10s' % (nameWidth, 'Rule', 'Calls', 'Errors', 'Time (ms)'), file=sys.stderr)
+            for rule in rules:
+                stats = schema.ruleStats[rule.name]
+                print('%-*s  %8d  %6d  %10.3f' % (nameWidth, rule.name, stats.calls, stats.errorCount, stats.time * 1000),
+                      file=sys.stderr)
+
         if not args.silent:
             if len(errs) == 0:
                 print('Validation completed successfully')
@@ -97,12 +151,18 @@ class _DumpCommand(object):
     help = ('{0} dump : {1}\n'
             '\n'
             'Usage:\n'
-            '  {0} dump {{schema-files...}}\n'
+            '  {0} dump [options...] {{schema-files...}}\n'
+            '\n'
+            '  -f|--format <format>\n'
+            '    Output format: text (default), json or ndjson.  The JSON formats\n'
+            '    contain one record per node, with its kind, name, source position,\n'
+            '    qualifiers and resolved references.\n'
         ).format(scriptName, summary)
 
     def run(self, args):
         argParser = _ArgumentParser(prog='{0} {1}'.format(scriptName, self.name),
                                          add_help=False)
+        argParser.add_argument('-f', '--format', choices=dumpFormats, default=FORMAT_TEXT)
         argParser.add_argument('files', nargs='*')
         args = argParser.parse_args(args)
         
@@ -110,17 +170,520 @@ class _DumpCommand(object):
             raise _UsageError('{0} {1}: Please specify one or more schema files'.format(scriptName, self.name))
         
         schema = WeaveTLVSchema()
+        schemaFiles = []
         
         for schemaFileName in args.files:
             if not os.path.exists(schemaFileName):
                 raise _UsageError('{0} {1}: Schema file not found: {0}\n'.format(scriptName, self.name, schemaFileName))
-            schema.loadSchemaFromFile(schemaFileName)
-            
-        for schemaFile in schema.allFiles():
-            schemaFile.summarize(sys.stdout)
+            schemaFiles.append(schema.loadSchemaFromFile(schemaFileName))
+
+        if args.format != FORMAT_TEXT:
+            # Resolve references, such that their targets are included in the output.
+            schema.validate()
+
+        dumpSchemaFiles(schemaFiles, sys.stdout, args.format)
             
         return 0
 
+class _FormatCommand(object):
+    
+    name = 'format'
+    summary = 'Rewrite TLV schema files in canonical form'
+    help = ('{0} format : {1}\n'
+            '\n'
+            'Usage:\n'
+            '  {0} format [options...] {{schema-files...}}\n'
+            '\n'
+            '  By default, the canonical form of each file is written to stdout.\n'
+            '\n'
+            '  -c|--check\n'
+            '    Check that files are in canonical form, without changing them, and\n'
+            '    list the files that are not (exit code indicates the number of files).\n'
+            '\n'
+            '  -w|--write\n'
+            '    Rewrite files that are not in canonical form in place.\n'
+            '\n'
+            '  -j|--jobs <num>\n'
+            '    Format files in parallel, using the given number of processes (0 to\n'
+            '    use one process per CPU).\n'
+        ).format(scriptName, summary)
+
+    def run(self, args):
+        argParser = _ArgumentParser(prog='{0} {1}'.format(scriptName, self.name), add_help=False)
+        argParser.add_argument('-c', '--check', action='store_true')
+        argParser.add_argument('-w', '--write', action='store_true')
+        argParser.add_argument('-j', '--jobs', type=int, default=1)
+        argParser.add_argument('files', nargs='*')
+        args = argParser.parse_args(args)
+
+        if len(args.files) == 0:
+            raise _UsageError('{0} {1}: Please specify one or more schema files'.format(scriptName, self.name))
+        if args.check and args.write:
+            raise _UsageError('{0} {1}: --check and --write cannot be combined'.format(scriptName, self.name))
+        if args.jobs < 0:
+            raise _UsageError('{0} {1}: Invalid number of jobs: {2}'.format(scriptName, self.name, args.jobs))
+
+        for schemaFileName in args.files:
+            if not os.path.exists(schemaFileName):
+                raise _UsageError('{0} {1}: Schema file not found: {2}'.format(scriptName, self.name, schemaFileName))
+
+        mode = 'check' if args.check else 'write' if args.write else 'print'
+        jobArgs = [ (schemaFileName, mode) for schemaFileName in args.files ]
+
+        jobs = args.jobs or os.cpu_count() or 1
+        if jobs == 1 or len(args.files) == 1:
+            failCount = self._report(map(_formatFile, jobArgs), mode)
+        else:
+            failCount = self._report(_mapJobs(_formatFile, jobArgs, jobs), mode)
+
+        return failCount
+
+    @staticmethod
+    def _report(results, mode):
+        failCount = 0
+        for (schemaFileName, changed, text, err) in results:
+            if err is not None:
+                print("%s\n" % err, file=sys.stderr)
+                failCount += 1
+            elif mode == 'print':
+                sys.stdout.write(text)
+            elif changed:
+                if mode == 'check':
+                    print('%s: not in canonical form' % schemaFileName)
+                    failCount += 1
+                else:
+                    print('%s: reformatted' % schemaFileName)
+        return failCount
+
+def _formatFile(jobArgs):
+    '''Format a schema file, as directed by the format command.  Returns a tuple containing
+       the file name, whether the file is not in canonical form, the canonical text of the
+       file (when printing) and an error string (if the file could not be loaded).'''
+    (schemaFileName, mode) = jobArgs
+    schema = WeaveTLVSchema(frontEnd=WeaveTLVSchema.FRONT_END_SINGLE_PASS, lexer=WeaveTLVSchema.LEXER_FAST)
+    try:
+        schemaFile = schema.loadSchemaFromFile(schemaFileName)
+    except WeaveTLVSchemaError as err:
+        return (schemaFileName, False, None, err.format())
+    text = formatSchemaFile(schemaFile)
+    changed = (text != schemaFile.schemaText)
+    if mode == 'write' and changed:
+        with open(schemaFileName, 'w') as f:
+            f.write(text)
+    return (schemaFileName, changed, text if mode == 'print' else None, None)
+
+class _DiffCommand(object):
+    
+    name = 'diff'
+    summary = 'Compare two versions of a TLV schema for wire compatibility'
+    help = ('{0} diff : {1}\n'
+            '\n'
+            'Usage:\n'
+            '  {0} diff [options...] {{old-schema-file}} {{new-schema-file}}\n'
+            '  {0} diff [options...] --old {{schema-file}}... --new {{schema-file}}...\n'
+            '\n'
+            '  -b|--breaking\n'
+            '    Display breaking changes only.\n'
+            '\n'
+            '  -s|--silent\n'
+            '    Do not display results (exit code indicates the number of breaking changes).\n'
+        ).format(scriptName, summary)
+
+    def run(self, args):
+        argParser = _ArgumentParser(prog='{0} {1}'.format(scriptName, self.name), add_help=False)
+        argParser.add_argument('-b', '--breaking', action='store_true')
+        argParser.add_argument('-s', '--silent', action='store_true')
+        argParser.add_argument('--old', action='append', default=[])
+        argParser.add_argument('--new', action='append', default=[])
+        argParser.add_argument('files', nargs='*')
+        args = argParser.parse_args(args)
+
+        if len(args.old) == 0 and len(args.new) == 0 and len(args.files) == 2:
+            (args.old, args.new) = ([ args.files[0] ], [ args.files[1] ])
+        elif len(args.files) != 0 or len(args.old) == 0 or len(args.new) == 0:
+            raise _UsageError('{0} {1}: Please specify the old and new schema files'.format(scriptName, self.name))
+
+        oldSchema = self._loadSchema(args.old)
+        newSchema = self._loadSchema(args.new)
+        errs = oldSchema.validate() + newSchema.validate()
+        if len(errs) > 0:
+            for err in errs:
+                print("%s\n" % err.format(), file=sys.stderr)
+            raise _UsageError('{0} {1}: Schemas must be free of errors to be compared'.format(scriptName, self.name))
+
+        changes = oldSchema.diff(newSchema)
+        breakingCount = len([ c for c in changes if c.isBreaking ])
+
+        if not args.silent:
+            for change in changes:
+                if change.isBreaking or not args.breaking:
+                    print(str(change))
+            print('%d change(s), %d breaking' % (len(changes), breakingCount))
+
+        return breakingCount
+
+    def _loadSchema(self, fileNames):
+        schema = WeaveTLVSchema()
+        for schemaFileName in fileNames:
+            if not os.path.exists(schemaFileName):
+                raise _UsageError('{0} {1}: Schema file not found: {2}'.format(scriptName, self.name, schemaFileName))
+            schema.loadSchemaFromFile(schemaFileName)
+        return schema
+
+class _QueryCommand(object):
+    
+    name = 'query'
+    summary = 'Find definitions in a TLV schema by name, tag, id or kind'
+    help = ('{0} query : {1}\n'
+            '\n'
+            'Usage:\n'
+            '  {0} query [options...] {{schema-files...}}\n'
+            '\n'
+            '  -n|--name <glob-pattern>\n'
+            '    Find definitions whose fully-qualified name matches a glob pattern.\n'
+            '\n'
+            '  -r|--regex <regex>\n'
+            '    Find definitions whose fully-qualified name contains a match for a\n'
+            '    regular expression.\n'
+            '\n'
+            '  -k|--kind <kind>\n'
+            '    Find constructs of the given kind. May be given multiple times.\n'
+            '    Kinds: {2}\n'
+            '\n'
+            '  -t|--tag [<profile>:]<tag-num>\n'
+            '    Find definitions and fields with the given tag.  If no profile is\n'
+            '    given, context-specific tags are matched.\n'
+            '\n'
+            '  -i|--id [<profile>:]<id>\n'
+            '    Find MESSAGE and STATUS CODE definitions with the given id.\n'
+            '\n'
+            '  Profiles may be given by name or by numeric id.  All given criteria\n'
+            '  must match.\n'
+        ).format(scriptName, summary, ', '.join(queryKinds))
+
+    def run(self, args):
+        argParser = _ArgumentParser(prog='{0} {1}'.format(scriptName, self.name), add_help=False)
+        argParser.add_argument('-n', '--name')
+        argParser.add_argument('-r', '--regex')
+        argParser.add_argument('-k', '--kind', action='append', choices=sorted(queryKinds))
+        argParser.add_argument('-t', '--tag')
+        argParser.add_argument('-i', '--id')
+        argParser.add_argument('files', nargs='*')
+        args = argParser.parse_args(args)
+
+        if len(args.files) == 0:
+            raise _UsageError('{0} {1}: Please specify one or more schema files'.format(scriptName, self.name))
+
+        (tagProfile, tag) = self._parseProfileNum(args.tag, '--tag')
+        (idProfile, id) = self._parseProfileNum(args.id, '--id')
+        if tagProfile is not None and idProfile is not None and tagProfile != idProfile:
+            raise _UsageError('{0} {1}: Conflicting profiles given for --tag and --id'.format(scriptName, self.name))
+
+        schema = WeaveTLVSchema()
+
+        for schemaFileName in args.files:
+            if not os.path.exists(schemaFileName):
+                raise _UsageError('{0} {1}: Schema file not found: {2}'.format(scriptName, self.name, schemaFileName))
+            # Report syntax errors, and query the remaining statements.
+            errs = []
+            schema.loadSchemaFromFile(schemaFileName, errs=errs)
+            for err in errs:
+                print("%s\n" % err.format(), file=sys.stderr)
+
+        try:
+            results = schema.find(name=args.name, regex=args.regex, kind=args.kind, tag=tag, id=id,
+                                  profile=tagProfile if tagProfile is not None else idProfile)
+        except re.error as ex:
+            raise _UsageError('{0} {1}: Invalid regular expression: {2}'.format(scriptName, self.name, ex))
+
+        for node in results:
+            print('%s: %s %s' % (node.sourceRef.filePosStr(), node.schemaConstruct, self._displayName(node)))
+
+        return 0
+
+    def _parseProfileNum(self, arg, optionName):
+        if arg is None:
+            return (None, None)
+        (profile, sep, num) = arg.rpartition(':')
+        try:
+            num = int(num, 0)
+        except ValueError:
+            raise _UsageError('{0} {1}: Invalid value for {2}: {3}'.format(scriptName, self.name, optionName, arg))
+        if not sep:
+            return (None, num)
+        try:
+            return (int(profile, 0), num)
+        except ValueError:
+            return (profile, num)
+
+    @staticmethod
+    def _displayName(node):
+        if isinstance(node, HasScopedName):
+            return node.fullyQualifiedName
+        parentNode = node.nextParentNode(HasScopedName)
+        if parentNode is not None:
+            return '%s.%s' % (parentNode.fullyQualifiedName, node.name)
+        return node.name
+
+class _JSONSchemaCommand(object):
+    
+    name = 'jsonschema'
+    summary = 'Export TLV schema types as JSON Schema or OpenAPI'
+    help = ('{0} jsonschema : {1}\n'
+            '\n'
+            'Usage:\n'
+            '  {0} jsonschema [options...] {{schema-file}}...\n'
+            '\n'
+            '  -r|--root {{type-name}}\n'
+            '    Export a schema for values of the named type, along with the types\n'
+            '    it refers to.  By default, all types are exported.\n'
+            '\n'
+            '  --openapi\n'
+            '    Export the types as the schema components of an OpenAPI 3.1 document.\n'
+        ).format(scriptName, summary)
+
+    def run(self, args):
+        argParser = _ArgumentParser(prog='{0} {1}'.format(scriptName, self.name), add_help=False)
+        argParser.add_argument('-r', '--root')
+        argParser.add_argument('--openapi', action='store_true')
+        argParser.add_argument('files', nargs='*')
+        args = argParser.parse_args(args)
+
+        if len(args.files) == 0:
+            raise _UsageError('{0} {1}: Please specify one or more schema files'.format(scriptName, self.name))
+
+        schema = WeaveTLVSchema()
+        errs = []
+        for schemaFileName in args.files:
+            if not os.path.exists(schemaFileName):
+                raise _UsageError('{0} {1}: Schema file not found: {2}'.format(scriptName, self.name, schemaFileName))
+            schema.loadSchemaFromFile(schemaFileName, errs=errs)
+        errs += schema.validate()
+        if len(errs) > 0:
+            for err in errs:
+                print("%s\n" % err.format(), file=sys.stderr)
+            raise _UsageError('{0} {1}: Schema must be free of errors to be exported'.format(scriptName, self.name))
+        if args.root is not None and schema.getTypeDef(args.root) is None:
+            raise _UsageError('{0} {1}: Type not found: {2}'.format(scriptName, self.name, args.root))
+
+        doc = exportJSONSchema(schema, rootName=args.root, openAPI=args.openapi)
+        json.dump(doc, sys.stdout, indent=2)
+        print()
+        return 0
+
+class _TranscodeCommand(object):
+    
+    name = 'transcode'
+    summary = 'Convert TLV payloads to and from JSON'
+    help = ('{0} transcode : {1}\n'
+            '\n'
+            'Usage:\n'
+            '  {0} transcode [options...] -s {{schema-file}}... -t {{type-name}} [{{input-file}}...]\n'
+            '\n'
+            '  Converts payloads of the named type from TLV to JSON (or vice versa).  With a\n'
+            '  single input file (or none, to read stdin), the output is written to stdout.\n'
+            '  With multiple input files, the output for each is written to a file of the\n'
+            '  same name, with the extension .json, .ndjson (in batch mode) or .tlv.\n'
+            '\n'
+            '  -s|--schema {{schema-file}}\n'
+            '    Schema file defining the payload type.  May be given multiple times.\n'
+            '\n'
+            '  -t|--type {{type-name}}\n'
+            '    Name of the payload type.\n'
+            '\n'
+            '  --to json|tlv\n'
+            '    Convert payloads to JSON (the default) or to TLV.\n'
+            '\n'
+            '  -b|--batch\n'
+            '    Convert multiple payloads per input: a sequence of TLV payloads, or NDJSON\n'
+            '    with one JSON payload per line.\n'
+            '\n'
+            '  -o|--output {{file}}\n'
+            '    Write the output to the given file, rather than stdout (single input only).\n'
+            '\n'
+            '  -j|--jobs <num>\n'
+            '    Convert input files in parallel, using the given number of processes (0 to\n'
+            '    use one process per CPU).\n'
+        ).format(scriptName, summary)
+
+    def run(self, args):
+        argParser = _ArgumentParser(prog='{0} {1}'.format(scriptName, self.name), add_help=False)
+        argParser.add_argument('-s', '--schema', action='append', default=[])
+        argParser.add_argument('-t', '--type')
+        argParser.add_argument('--to', choices=('json', 'tlv'), default='json')
+        argParser.add_argument('-b', '--batch', action='store_true')
+        argParser.add_argument('-o', '--output')
+        argParser.add_argument('-j', '--jobs', type=int, default=1)
+        argParser.add_argument('files', nargs='*')
+        args = argParser.parse_args(args)
+
+        if len(args.schema) == 0:
+            raise _UsageError('{0} {1}: Please specify one or more schema files'.format(scriptName, self.name))
+        if args.type is None:
+            raise _UsageError('{0} {1}: Please specify the payload type'.format(scriptName, self.name))
+        if args.jobs < 0:
+            raise _UsageError('{0} {1}: Invalid number of jobs: {2}'.format(scriptName, self.name, args.jobs))
+        if args.output is not None and len(args.files) > 1:
+            raise _UsageError('{0} {1}: --output cannot be used with multiple input files'.format(scriptName, self.name))
+
+        schema = WeaveTLVSchema()
+        errs = []
+        for schemaFileName in args.schema:
+            if not os.path.exists(schemaFileName):
+                raise _UsageError('{0} {1}: Schema file not found: {2}'.format(scriptName, self.name, schemaFileName))
+            schema.loadSchemaFromFile(schemaFileName, errs=errs)
+        errs += schema.validate()
+        if len(errs) > 0:
+            for err in errs:
+                print("%s\n" % err.format(), file=sys.stderr)
+            raise _UsageError('{0} {1}: Schema must be free of errors to be used'.format(scriptName, self.name))
+        if schema.getTypeDef(args.type) is None:
+            raise _UsageError('{0} {1}: Type not found: {2}'.format(scriptName, self.name, args.type))
+
+        if len(args.files) <= 1:
+            inputName = args.files[0] if len(args.files) == 1 else '-'
+            jobArgs = [ (inputName, args.output or '-', args.to, args.batch) ]
+        else:
+            ext = '.tlv' if args.to == 'tlv' else '.ndjson' if args.batch else '.json'
+            jobArgs = []
+            for inputName in args.files:
+                outputName = os.path.splitext(inputName)[0] + ext
+                if outputName == inputName:
+                    raise _UsageError('{0} {1}: Input file would be overwritten: {2}'.format(scriptName, self.name, inputName))
+                jobArgs.append((inputName, outputName, args.to, args.batch))
+        for (inputName, outputName, toFormat, batch) in jobArgs:
+            if inputName != '-' and not os.path.exists(inputName):
+                raise _UsageError('{0} {1}: Input file not found: {2}'.format(scriptName, self.name, inputName))
+
+        jobs = args.jobs or os.cpu_count() or 1
+        if jobs == 1 or len(jobArgs) == 1:
+            transcoder = Transcoder(schema, args.type)
+            results = [ _transcodeFile(a, transcoder) for a in jobArgs ]
+        else:
+            results = _mapJobs(_transcodeFile, jobArgs, jobs, initializer=_initTranscoder,
+                               initargs=(args.schema, args.type))
+
+        failCount = 0
+        for (inputName, err) in results:
+            if err is not None:
+                print('%s: %s' % (inputName if inputName != '-' else '(stdin)', err), file=sys.stderr)
+                failCount += 1
+        return failCount
+
+# The Transcoder used by _transcodeFile() within worker processes.
+_transcoder = None
+
+def _initTranscoder(schemaFileNames, typeName):
+    '''Initialize a worker process for the transcode command.'''
+    global _transcoder
+    schema = WeaveTLVSchema()
+    for schemaFileName in schemaFileNames:
+        schema.loadSchemaFromFile(schemaFileName)
+    schema.validate()
+    _transcoder = Transcoder(schema, typeName)
+
+def _transcodeFile(jobArgs, transcoder=None):
+    '''Transcode a file, as directed by the transcode command.  Returns a tuple containing
+       the input file name and an error string (if the file could not be transcoded).'''
+    (inputName, outputName, toFormat, batch) = jobArgs
+    transcoder = transcoder or _transcoder
+    (input, output) = (None, None)
+    try:
+        if toFormat == 'json':
+            input = open(inputName, 'rb') if inputName != '-' else sys.stdin.buffer
+            output = open(outputName, 'w', encoding='utf-8') if outputName != '-' else sys.stdout
+            transcoder.tlvToJSON(input, output, batch=batch)
+        else:
+            input = open(inputName, 'r', encoding='utf-8') if inputName != '-' else sys.stdin
+            output = open(outputName, 'wb') if outputName != '-' else sys.stdout.buffer
+            transcoder.jsonToTLV(input, output, batch=batch)
+    except (TranscodeError, OSError, UnicodeDecodeError) as err:
+        return (inputName, str(err))
+    finally:
+        if input is not None and inputName != '-':
+            input.close()
+        if output is not None:
+            if outputName != '-':
+                output.close()
+            else:
+                output.flush()
+    return (inputName, None)
+
+class _BundleCommand(object):
+
+    name = 'bundle'
+    summary = 'Build a schema bundle from TLV schema files'
+    help = ('{0} bundle : {1}\n'
+            '\n'
+            'Usage:\n'
+            '  {0} bundle [options...] -o {{bundle-file}} {{schema-file}}...\n'
+            '\n'
+            '  Writes a zip archive containing the given schema files, along with an\n'
+            '  index of their definitions, which can be loaded with\n'
+            '  WeaveTLVSchema.loadBundle().  The schema files must be free of errors.\n'
+            '\n'
+            '  -o|--output {{bundle-file}}\n'
+            '    Name of the bundle file to write.\n'
+            '\n'
+            '  --no-ast\n'
+            '    Omit the serialized syntax trees of the files from the bundle.  The\n'
+            '    bundle is smaller, but the files must be parsed when loaded.\n'
+        ).format(scriptName, summary)
+
+    def run(self, args):
+        argParser = _ArgumentParser(prog='{0} {1}'.format(scriptName, self.name), add_help=False)
+        argParser.add_argument('-o', '--output')
+        argParser.add_argument('--no-ast', action='store_true')
+        argParser.add_argument('files', nargs='*')
+        args = argParser.parse_args(args)
+
+        if len(args.files) == 0:
+            raise _UsageError('{0} {1}: Please specify one or more schema files'.format(scriptName, self.name))
+        if args.output is None:
+            raise _UsageError('{0} {1}: Please specify an output file'.format(scriptName, self.name))
+
+        schema = WeaveTLVSchema()
+        errs = []
+        schemaFiles = []
+        for schemaFileName in args.files:
+            if not os.path.exists(schemaFileName):
+                raise _UsageError('{0} {1}: Schema file not found: {2}'.format(scriptName, self.name, schemaFileName))
+            schemaFiles.append(schema.loadSchemaFromFile(schemaFileName, errs=errs))
+        errs += schema.validate()
+        if len(errs) > 0:
+            for err in errs:
+                print("%s\n" % err.format(), file=sys.stderr)
+            raise _UsageError('{0} {1}: Schema must be free of errors to be bundled'.format(scriptName, self.name))
+
+        writeBundle(schemaFiles, args.output, withASTs=not args.no_ast)
+        return 0
+
+class _LSPCommand(object):
+    
+    name = 'lsp'
+    summary = 'Run a Language Server Protocol server for TLV schema files'
+    help = ('{0} lsp : {1}\n'
+            '\n'
+            'Usage:\n'
+            '  {0} lsp [schema-files...]\n'
+            '\n'
+            '  The server communicates with the editor over stdin and stdout. Any\n'
+            '  schema files given are loaded at startup, such that references to\n'
+            '  the definitions within them can be resolved from open documents.\n'
+        ).format(scriptName, summary)
+
+    def run(self, args):
+        argParser = _ArgumentParser(prog='{0} {1}'.format(scriptName, self.name), add_help=False)
+        argParser.add_argument('files', nargs='*')
+        args = argParser.parse_args(args)
+
+        for schemaFileName in args.files:
+            if not os.path.exists(schemaFileName):
+                raise _UsageError('{0} {1}: Schema file not found: {2}'.format(scriptName, self.name, schemaFileName))
+
+        from .lsp import serve
+        return serve(args.files)
+
 class _UnitTestCommand(object):
     
     name = 'unittest'
@@ -195,6 +758,13 @@ def main():
         commands = [
             _ValidateCommand(),
             _DumpCommand(),
+            _FormatCommand(),
+            _QueryCommand(),
+            _DiffCommand(),
+            _JSONSchemaCommand(),
+            _TranscodeCommand(),
+            _BundleCommand(),
+            _LSPCommand(),
             _UnitTestCommand()
         ]
         commands.append(_HelpCommand(availCommands=commands))
@@ -219,8 +789,8 @@ def main():
         commandNameLC = args.commandName.lower()
         for command in commands:
             if commandNameLC == command.name:
-                command.run(args.commandArgs)
-                break
+                # Exit codes are limited to 8 bits; avoid wrapping a non-zero count to zero.
+                return min(command.run(args.commandArgs), 255)
         else:
             raise _UsageError('Unrecognized command: {1}\nRun "{0} help" for a list of available commands.'.format(scriptName, args.commandName))
 
@@ -0,0 +1,888 @@
+#
+#    Copyright (c) 2020 Google LLC.
+#    All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#
+
+#
+#    @file
+#      Schema-directed transcoding of Weave TLV payloads to and from JSON.
+#
+#      The JSON form of a TLV value is the one described by the schemas exported by
+#      the jsonschema module:
+#
+#        STRUCTURE   : an object with a member per field, keyed by field name.  Fields
+#                      of extensible structures that are not described by the schema
+#                      are keyed by tag ("<tag-num>" for context-specific tags, and
+#                      "<profile-id>:<tag-num>" for profile-specific tags).
+#        CHOICE OF   : for a named alternate, an object with a single member, keyed
+#                      by the alternate name; for an unnamed alternate, the value of
+#                      the alternate.
+#        ARRAY, LIST : an array of the element values.
+#        INTEGER     : the name of the enumerated value, if any, otherwise a number.
+#        BYTE STRING : a base64 encoded string.
+#        ANY         : the form of the encoded TLV value, with structure members keyed
+#                      by tag and byte strings encoded in base64.
+#
+#      Both directions are streaming: TLV is read element by element and the JSON text
+#      is written as each element is read, and JSON is read a token at a time and the
+#      TLV encoding is written as each value is read.  Neither direction builds an
+#      intermediate representation of the payload.
+#
+#      Payloads are checked for conformance to the types of the schema (including the
+#      presence of required fields), but not to range or length qualifiers.  Pattern
+#      ARRAYs and LISTs are matched greedily, element by element.
+#
+
+import base64
+import binascii
+import json
+import math
+import re
+import struct
+
+from .node import *
+from .enums import enumTable
+
+# TLV element types
+_TYPE_SIGNED_INT = 0x00
+_TYPE_UNSIGNED_INT = 0x04
+_TYPE_FALSE = 0x08
+_TYPE_TRUE = 0x09
+_TYPE_FLOAT32 = 0x0A
+_TYPE_FLOAT64 = 0x0B
+_TYPE_UTF8_STRING = 0x0C
+_TYPE_BYTE_STRING = 0x10
+_TYPE_NULL = 0x14
+_TYPE_STRUCTURE = 0x15
+_TYPE_ARRAY = 0x16
+_TYPE_LIST = 0x17
+_TYPE_END_OF_CONTAINER = 0x18
+
+# TLV tag controls
+_TAG_ANONYMOUS = 0x00
+_TAG_CONTEXT = 0x20
+_TAG_COMMON_2 = 0x40
+_TAG_COMMON_4 = 0x60
+_TAG_IMPLICIT_2 = 0x80
+_TAG_IMPLICIT_4 = 0xA0
+_TAG_FULLY_QUALIFIED_6 = 0xC0
+_TAG_FULLY_QUALIFIED_8 = 0xE0
+
+# Stand-in for the profile id of tags encoded in implicit form, when the implicit
+# profile is not known.
+IMPLICIT_PROFILE = '*'
+
+# The kind of value encoded by each TLV element type.
+_elemKinds = ([ 'int' ] * 8 + [ 'bool' ] * 2 + [ 'float' ] * 2 + [ 'string' ] * 4 + [ 'bytes' ] * 4 +
+              [ 'null', 'struct', 'array', 'list', 'end' ])
+
+_allKinds = frozenset(_elemKinds) - { 'end' }
+
+# The kinds of TLV values that conform to each type.
+_typeKinds = {
+    SignedIntegerType : frozenset([ 'int' ]),
+    UnsignedIntegerType : frozenset([ 'int' ]),
+    FloatType : frozenset([ 'float' ]),
+    BooleanType : frozenset([ 'bool' ]),
+    StringType : frozenset([ 'string' ]),
+    ByteStringType : frozenset([ 'bytes' ]),
+    NullType : frozenset([ 'null' ]),
+    AnyType : _allKinds,
+    StructureType : frozenset([ 'struct' ]),
+    FieldGroupType : frozenset(),
+    ArrayType : frozenset([ 'array' ]),
+    ListType : frozenset([ 'list' ]),
+}
+
+_intStructs = [ struct.Struct(f) for f in ('<b', '<h', '<i', '<q', '<B', '<H', '<I', '<Q') ]
+_lenStructs = [ struct.Struct(f) for f in ('<B', '<H', '<I', '<Q') ]
+_float32Struct = struct.Struct('<f')
+_float64Struct = struct.Struct('<d')
+
+_encodeJSONString = json.JSONEncoder(ensure_ascii=False).encode
+
+_tagKeyPattern = re.compile(r'(?:(0[xX][0-9A-Fa-f]+|[0-9]+):)?([0-9]+)$')
+
+
+class TranscodeError(Exception):
+    '''Raised when a payload cannot be transcoded, either because it is malformed or
+       because it does not conform to the schema.'''
+
+    def __init__(self, msg, path=None):
+        super(TranscodeError, self).__init__(msg)
+        self.path = path
+
+    def __str__(self):
+        msg = super(TranscodeError, self).__str__()
+        if self.path:
+            msg = '%s (at /%s)' % (msg, '/'.join(str(p) for p in self.path))
+        return msg
+
+
+class Transcoder(object):
+    '''Transcodes TLV payloads to and from JSON, using the type definition with a given
+       name as the type of each payload.
+       The schema must have been successfully validated.  Tag numbers encoded in implicit
+       form are interpreted as belonging to the profile given by implicitProfileId or, if
+       that is None, to any profile.
+       A Transcoder caches information about the types it has encountered, and may be
+       used to transcode any number of payloads, but only one at a time.'''
+
+    def __init__(self, schema, typeName, implicitProfileId=None):
+        self.typeDef = schema.getTypeDef(typeName)
+        if self.typeDef is None:
+            raise ValueError('Type not found: %s' % typeName)
+        defaultTag = self.typeDef.defaultTag
+        self._rootTag = defaultTag.asTuple() if defaultTag is not None else None
+        self._implicitProfileId = implicitProfileId if implicitProfileId is not None else IMPLICIT_PROFILE
+        self._kinds = {}
+        self._structTables = {}
+        self._choiceTables = {}
+        self._path = []
+
+    def tlvToJSON(self, input, output, batch=False):
+        '''Read a TLV payload from a binary file object, and write its JSON form to a text
+           file object, followed by a newline.  In batch mode, read any number of
+           consecutive payloads, writing each on a line of its own (i.e. as NDJSON).
+           Returns the number of payloads transcoded.'''
+        self._input = input
+        self._write = output.write
+        self._path = []
+        count = 0
+        while True:
+            header = self._readHeader(allowEOF=True)
+            if header is None:
+                break
+            if count > 0 and not batch:
+                raise TranscodeError('unexpected data following TLV payload')
+            self._decodeValue(self.typeDef.type, header[0], header[1])
+            self._write('\n')
+            count += 1
+        if count == 0 and not batch:
+            raise TranscodeError('missing TLV payload')
+        return count
+
+    def jsonToTLV(self, input, output, batch=False):
+        '''Read the JSON form of a payload from a text file object, and write its TLV
+           encoding to a binary file object.  In batch mode, read any number of consecutive
+           JSON values (e.g. NDJSON), writing their TLV encodings one after the other.
+           Returns the number of payloads transcoded.'''
+        self._tokens = _JSONTokenizer(input)
+        self._write = output.write
+        self._path = []
+        count = 0
+        try:
+            while self._tokens.peek()[0] != 'eof':
+                if count > 0 and not batch:
+                    raise TranscodeError('unexpected data following JSON value')
+                self._encodeValue(self.typeDef.type, self._rootTag)
+                count += 1
+        except TranscodeError as err:
+            # Errors in the JSON text are raised by the tokenizer, which does not know
+            # the path of the value being encoded.
+            if err.path is None:
+                err.path = list(self._path)
+            raise
+        if count == 0 and not batch:
+            raise TranscodeError('missing JSON value')
+        return count
+
+    # ----- TLV to JSON
+
+    def _decodeValue(self, node, elemType, tag):
+        target = self._resolve(node)
+        if isinstance(target, ChoiceType) and not _isNullable(target):
+            self._decodeChoice(target, elemType, tag)
+            return
+        kind = _elemKinds[elemType]
+        if kind not in self._tlvKinds(target):
+            self._error('expected %s, found %s' % (target.schemaConstruct, _kindName(kind)))
+        if elemType == _TYPE_NULL:
+            self._write('null')
+        elif isinstance(target, AnyType):
+            self._decodeAny(elemType)
+        elif isinstance(target, ChoiceType):
+            self._decodeChoice(target, elemType, tag)
+        elif isinstance(target, IntegerTypeNode):
+            value = self._readInt(elemType)
+            name = enumTable(target).nameOf(value)
+            self._write(_encodeJSONString(name) if name is not None else str(value))
+        elif isinstance(target, StructureType):
+            self._decodeStructure(target)
+        elif isinstance(target, SequencedTypeNode):
+            self._decodeSequence(target)
+        else:
+            self._decodeScalar(elemType)
+
+    def _decodeScalar(self, elemType):
+        kind = _elemKinds[elemType]
+        if kind == 'int':
+            self._write(str(self._readInt(elemType)))
+        elif kind == 'bool':
+            self._write('true' if elemType == _TYPE_TRUE else 'false')
+        elif kind == 'float':
+            floatStruct = _float32Struct if elemType == _TYPE_FLOAT32 else _float64Struct
+            value = floatStruct.unpack(self._read(floatStruct.size))[0]
+            if not math.isfinite(value):
+                self._error('non-finite FLOAT value cannot be represented in JSON')
+            self._write(repr(value))
+        elif kind == 'string':
+            try:
+                value = self._readString(elemType).decode('utf-8')
+            except UnicodeDecodeError:
+                self._error('invalid UTF-8 string')
+            self._write(_encodeJSONString(value))
+        elif kind == 'bytes':
+            self._write('"%s"' % base64.b64encode(self._readString(elemType)).decode('ascii'))
+        elif kind == 'null':
+            self._write('null')
+        else:
+            self._error('unexpected end of container')
+
+    def _decodeStructure(self, node):
+        (byTag, byName, required, extensible) = self._structTable(node)
+        self._write('{')
+        sep = ''
+        seen = set()
+        while True:
+            (elemType, tag) = self._readHeader()
+            if elemType == _TYPE_END_OF_CONTAINER:
+                break
+            field = byTag.get(tag, None)
+            self._write(sep)
+            sep = ','
+            if field is None:
+                if not extensible or tag is None:
+                    self._error('unexpected field in %s: %s' % (node.schemaConstruct, _tagKey(tag)))
+                key = _tagKey(tag)
+                self._write('%s:' % _encodeJSONString(key))
+                self._path.append(key)
+                self._decodeAny(elemType)
+            else:
+                if field.name in seen:
+                    self._error('duplicate field in %s: %s' % (node.schemaConstruct, field.name))
+                seen.add(field.name)
+                self._write('%s:' % _encodeJSONString(field.name))
+                self._path.append(field.name)
+                # The tag identifies the CHOICE OF alternate only if the alternates have
+                # distinct tags.
+                self._decodeValue(field.type, elemType, tag if len(field.possibleTags) > 1 else None)
+            self._path.pop()
+        self._write('}')
+        if not required.issubset(seen):
+            self._error('missing field in %s: %s' % (node.schemaConstruct, ', '.join(sorted(required - seen))))
+
+    def _decodeSequence(self, node):
+        self._write('[')
+        index = 0
+        if node.elemType is not None:
+            while True:
+                (elemType, tag) = self._readHeader()
+                if elemType == _TYPE_END_OF_CONTAINER:
+                    break
+                if index > 0:
+                    self._write(',')
+                self._path.append(index)
+                self._decodeValue(node.elemType, elemType, tag)
+                self._path.pop()
+                index += 1
+        else:
+            pattern = node.elemTypePattern
+            (patternIndex, count) = (0, 0)
+            while True:
+                (elemType, tag) = self._readHeader()
+                if elemType == _TYPE_END_OF_CONTAINER:
+                    break
+                # Advance to the first pattern element that can match the item.
+                kind = _elemKinds[elemType]
+                while patternIndex < len(pattern):
+                    patternElem = pattern[patternIndex]
+                    if ((patternElem.upperBound is None or count < patternElem.upperBound)
+                        and kind in self._tlvKinds(patternElem.type)
+                        and _tagInTags(tag, patternElem.possibleTags)):
+                        break
+                    self._checkPatternCount(patternElem, count)
+                    (patternIndex, count) = (patternIndex + 1, 0)
+                else:
+                    self._error('unexpected item in %s' % node.schemaConstruct)
+                if index > 0:
+                    self._write(',')
+                self._path.append(index)
+                self._decodeValue(patternElem.type, elemType, tag if len(patternElem.possibleTags) > 1 else None)
+                self._path.pop()
+                (index, count) = (index + 1, count + 1)
+            for patternElem in pattern[patternIndex:]:
+                self._checkPatternCount(patternElem, count)
+                count = 0
+        self._write(']')
+
+    def _decodeChoice(self, node, elemType, tag):
+        kind = _elemKinds[elemType]
+        for (altChain, altTag, altKinds) in self._choiceTable(node):
+            if kind in altKinds and (tag is None or altTag is None or _tagMatches(tag, altTag)):
+                names = [ alt.name for alt in reversed(altChain) if alt.name is not None ]
+                for name in names:
+                    self._write('{%s:' % _encodeJSONString(name))
+                self._decodeValue(altChain[0].type, elemType, None)
+                self._write('}' * len(names))
+                return
+        self._error('value does not match any alternate of %s' % node.schemaConstruct)
+
+    def _decodeAny(self, elemType):
+        kind = _elemKinds[elemType]
+        if kind == 'struct':
+            self._write('{')
+            sep = ''
+            while True:
+                (elemType, tag) = self._readHeader()
+                if elemType == _TYPE_END_OF_CONTAINER:
+                    break
+                if tag is None:
+                    self._error('anonymous element in structure')
+                key = _tagKey(tag)
+                self._write('%s%s:' % (sep, _encodeJSONString(key)))
+                sep = ','
+                self._path.append(key)
+                self._decodeAny(elemType)
+                self._path.pop()
+            self._write('}')
+        elif kind in ('array', 'list'):
+            self._write('[')
+            index = 0
+            while True:
+                (elemType, tag) = self._readHeader()
+                if elemType == _TYPE_END_OF_CONTAINER:
+                    break
+                if index > 0:
+                    self._write(',')
+                self._path.append(index)
+                self._decodeAny(elemType)
+                self._path.pop()
+                index += 1
+            self._write(']')
+        else:
+            self._decodeScalar(elemType)
+
+    def _readHeader(self, allowEOF=False):
+        data = self._input.read(1)
+        if len(data) == 0:
+            if allowEOF and len(self._path) == 0:
+                return None
+            self._error('truncated TLV data')
+        control = data[0]
+        elemType = control & 0x1F
+        if elemType > _TYPE_END_OF_CONTAINER:
+            self._error('invalid TLV element type: 0x%02X' % elemType)
+        tagControl = control & 0xE0
+        if tagControl == _TAG_ANONYMOUS:
+            tag = None
+        elif tagControl == _TAG_CONTEXT:
+            tag = (None, self._read(1)[0])
+        elif tagControl == _TAG_COMMON_2:
+            tag = (0, _lenStructs[1].unpack(self._read(2))[0])
+        elif tagControl == _TAG_COMMON_4:
+            tag = (0, _lenStructs[2].unpack(self._read(4))[0])
+        elif tagControl == _TAG_IMPLICIT_2:
+            tag = (self._implicitProfileId, _lenStructs[1].unpack(self._read(2))[0])
+        elif tagControl == _TAG_IMPLICIT_4:
+            tag = (self._implicitProfileId, _lenStructs[2].unpack(self._read(4))[0])
+        else:
+            tagSize = 2 if tagControl == _TAG_FULLY_QUALIFIED_6 else 4
+            (vendorId, profileNum) = struct.unpack('<HH', self._read(4))
+            tag = ((vendorId << 16) | profileNum, _lenStructs[tagSize >> 1].unpack(self._read(tagSize))[0])
+        return (elemType, tag)
+
+    def _readInt(self, elemType):
+        intStruct = _intStructs[elemType]
+        return intStruct.unpack(self._read(intStruct.size))[0]
+
+    def _readString(self, elemType):
+        lenStruct = _lenStructs[elemType & 0x03]
+        return self._read(lenStruct.unpack(self._read(lenStruct.size))[0])
+
+    def _read(self, size):
+        data = self._input.read(size)
+        if len(data) < size:
+            self._error('truncated TLV data')
+        return data
+
+    # ----- JSON to TLV
+
+    def _encodeValue(self, node, tag):
+        target = self._resolve(node)
+        (tokKind, tokValue) = self._tokens.next()
+        if isinstance(target, ChoiceType):
+            self._tokens.pushBack((tokKind, tokValue))
+            self._encodeChoice(target, tag)
+        elif tokKind == 'null' and 'null' in self._tlvKinds(target):
+            self._writeHeader(_TYPE_NULL, tag)
+        elif isinstance(target, AnyType):
+            self._encodeAny(tokKind, tokValue, tag)
+        elif isinstance(target, IntegerTypeNode):
+            if tokKind == 'string':
+                value = enumTable(target).valueOf(tokValue)
+                if value is None:
+                    self._error('unknown enumerated value: %s' % tokValue)
+            elif tokKind == 'int':
+                value = tokValue
+            else:
+                self._expected(target, tokKind)
+            self._writeInt(value, isinstance(target, SignedIntegerType), tag)
+        elif isinstance(target, FloatType):
+            if tokKind not in ('int', 'float'):
+                self._expected(target, tokKind)
+            rangeQual = target.getQualifier(Range)
+            self._writeFloat(tokValue, rangeQual is not None and rangeQual.width == 32, tag)
+        elif isinstance(target, BooleanType):
+            if tokKind not in ('true', 'false'):
+                self._expected(target, tokKind)
+            self._writeHeader(_TYPE_TRUE if tokKind == 'true' else _TYPE_FALSE, tag)
+        elif isinstance(target, StringType):
+            if tokKind != 'string':
+                self._expected(target, tokKind)
+            self._writeString(_TYPE_UTF8_STRING, self._encodeUTF8(tokValue), tag)
+        elif isinstance(target, ByteStringType):
+            if tokKind != 'string':
+                self._expected(target, tokKind)
+            try:
+                value = base64.b64decode(tokValue, validate=True)
+            except (binascii.Error, ValueError):
+                self._error('invalid base64 encoding of BYTE STRING')
+            self._writeString(_TYPE_BYTE_STRING, value, tag)
+        elif isinstance(target, StructureType):
+            if tokKind != '{':
+                self._expected(target, tokKind)
+            self._encodeStructure(target, tag)
+        elif isinstance(target, SequencedTypeNode):
+            if tokKind != '[':
+                self._expected(target, tokKind)
+            self._encodeSequence(target, tag)
+        else:
+            self._expected(target, tokKind)
+
+    def _encodeStructure(self, node, tag):
+        (byTag, byName, required, extensible) = self._structTable(node)
+        self._writeHeader(_TYPE_STRUCTURE, tag)
+        seen = set()
+        if self._tokens.peek()[0] == '}':
+            self._tokens.next()
+        else:
+            while True:
+                key = self._expect('string')
+                self._expect(':')
+                self._path.append(key)
+                field = byName.get(key, None)
+                if field is None:
+                    fieldTag = _parseTagKey(key) if extensible else None
+                    if fieldTag is None or fieldTag in byTag:
+                        self._error('unexpected field in %s: %s' % (node.schemaConstruct, key))
+                    self._encodeAny(*self._tokens.next(), fieldTag)
+                else:
+                    if key in seen:
+                        self._error('duplicate field in %s: %s' % (node.schemaConstruct, key))
+                    seen.add(key)
+                    possibleTags = field.possibleTags
+                    # If the field is a CHOICE OF with distinct tags, the tag is given by the
+                    # alternate.
+                    self._encodeValue(field.type, possibleTags[0].asTuple() if len(possibleTags) == 1 else None)
+                self._path.pop()
+                if self._expect(',', '}') == '}':
+                    break
+        if not required.issubset(seen):
+            self._error('missing field in %s: %s' % (node.schemaConstruct, ', '.join(sorted(required - seen))))
+        self._write(bytes([ _TYPE_END_OF_CONTAINER ]))
+
+    def _encodeSequence(self, node, tag):
+        self._writeHeader(_TYPE_ARRAY if isinstance(node, ArrayType) else _TYPE_LIST, tag)
+        index = 0
+        pattern = node.elemTypePattern
+        (patternIndex, count) = (0, 0)
+        if self._tokens.peek()[0] == ']':
+            self._tokens.next()
+        else:
+            while True:
+                self._path.append(index)
+                if node.elemType is not None:
+                    self._encodeValue(node.elemType, None)
+                else:
+                    # Advance to the first pattern element that can match the item.
+                    token = self._tokens.peek()
+                    while patternIndex < len(pattern):
+                        patternElem = pattern[patternIndex]
+                        if ((patternElem.upperBound is None or count < patternElem.upperBound)
+                            and self._jsonAccepts(patternElem.type, token)):
+                            break
+                        self._checkPatternCount(patternElem, count)
+                        (patternIndex, count) = (patternIndex + 1, 0)
+                    else:
+                        self._error('unexpected item in %s' % node.schemaConstruct)
+                    # Items of an ARRAY are anonymous, while items of a LIST may be tagged.
+                    possibleTags = patternElem.possibleTags if isinstance(node, ListType) else ()
+                    self._encodeValue(patternElem.type, possibleTags[0].asTuple() if len(possibleTags) == 1 else None)
+                    count += 1
+                self._path.pop()
+                index += 1
+                if self._expect(',', ']') == ']':
+                    break
+        if pattern is not None:
+            for patternElem in pattern[patternIndex:]:
+                self._checkPatternCount(patternElem, count)
+                count = 0
+        self._write(bytes([ _TYPE_END_OF_CONTAINER ]))
+
+    def _encodeChoice(self, node, tag):
+        token = self._tokens.peek()
+        if token[0] == 'null' and _isNullable(node):
+            self._tokens.next()
+            self._writeHeader(_TYPE_NULL, tag)
+            return
+        # An object with a single member named after an alternate selects that alternate.
+        if token[0] == '{' and self._tokens.peek(1)[0] == 'string':
+            alt = node.getAlternate(self._tokens.peek(1)[1])
+            if alt is not None:
+                self._tokens.next()
+                self._tokens.next()
+                self._expect(':')
+                self._encodeAlternate(alt, tag)
+                self._expect('}')
+                return
+        for alt in node.alternates:
+            if alt.name is None and self._jsonAccepts(alt.type, token):
+                self._encodeAlternate(alt, tag)
+                return
+        self._error('value does not match any alternate of %s' % node.schemaConstruct)
+
+    def _encodeAlternate(self, alt, tag):
+        if tag is None:
+            defaultTag = alt.defaultTag
+            tag = defaultTag.asTuple() if defaultTag is not None else None
+        self._encodeValue(alt.type, tag)
+
+    def _encodeAny(self, tokKind, tokValue, tag):
+        if tokKind == '{':
+            self._writeHeader(_TYPE_STRUCTURE, tag)
+            if self._tokens.peek()[0] == '}':
+                self._tokens.next()
+            else:
+                while True:
+                    key = self._expect('string')
+                    self._expect(':')
+                    memberTag = _parseTagKey(key)
+                    if memberTag is None:
+                        self._error('invalid tag: %s' % key)
+                    self._path.append(key)
+                    self._encodeAny(*self._tokens.next(), memberTag)
+                    self._path.pop()
+                    if self._expect(',', '}') == '}':
+                        break
+            self._write(bytes([ _TYPE_END_OF_CONTAINER ]))
+        elif tokKind == '[':
+            self._writeHeader(_TYPE_ARRAY, tag)
+            if self._tokens.peek()[0] == ']':
+                self._tokens.next()
+            else:
+                index = 0
+                while True:
+                    self._path.append(index)
+                    self._encodeAny(*self._tokens.next(), None)
+                    self._path.pop()
+                    index += 1
+                    if self._expect(',', ']') == ']':
+                        break
+            self._write(bytes([ _TYPE_END_OF_CONTAINER ]))
+        elif tokKind == 'int':
+            self._writeInt(tokValue, tokValue < 0, tag)
+        elif tokKind == 'float':
+            self._writeFloat(tokValue, False, tag)
+        elif tokKind == 'string':
+            self._writeString(_TYPE_UTF8_STRING, self._encodeUTF8(tokValue), tag)
+        elif tokKind in ('true', 'false'):
+            self._writeHeader(_TYPE_TRUE if tokKind == 'true' else _TYPE_FALSE, tag)
+        elif tokKind == 'null':
+            self._writeHeader(_TYPE_NULL, tag)
+        else:
+            self._unexpectedToken(tokKind)
+
+    def _jsonAccepts(self, node, token):
+        # Determine whether a JSON value beginning with the given token could be the
+        # JSON form of a value of the given type.
+        target = self._resolve(node)
+        (tokKind, tokValue) = token
+        if isinstance(target, AnyType):
+            return True
+        if tokKind == 'null' and _isNullable(target):
+            return True
+        if isinstance(target, ChoiceType):
+            if tokKind == '{' and any(alt.name is not None for alt in target.alternates):
+                return True
+            return any(alt.name is None and self._jsonAccepts(alt.type, token) for alt in target.alternates)
+        if isinstance(target, IntegerTypeNode):
+            return tokKind == 'int' or (tokKind == 'string' and tokValue in enumTable(target).nameToValue)
+        if isinstance(target, FloatType):
+            return tokKind in ('int', 'float')
+        if isinstance(target, BooleanType):
+            return tokKind in ('true', 'false')
+        if isinstance(target, (StringType, ByteStringType)):
+            return tokKind == 'string'
+        if isinstance(target, NullType):
+            return tokKind == 'null'
+        if isinstance(target, StructureType):
+            return tokKind == '{'
+        if isinstance(target, SequencedTypeNode):
+            return tokKind == '['
+        return False
+
+    def _writeHeader(self, elemType, tag):
+        if tag is None:
+            self._write(bytes([ elemType ]))
+            return
+        (profileId, tagNum) = tag
+        if profileId is None:
+            self._write(bytes([ _TAG_CONTEXT | elemType, tagNum ]))
+        elif profileId == 0:
+            if tagNum <= 0xFFFF:
+                self._write(struct.pack('<BH', _TAG_COMMON_2 | elemType, tagNum))
+            else:
+                self._write(struct.pack('<BI', _TAG_COMMON_4 | elemType, tagNum))
+        elif not isinstance(profileId, int):
+            self._error('cannot encode tag: %s' % _tagKey(tag))
+        elif tagNum <= 0xFFFF:
+            self._write(struct.pack('<BHHH', _TAG_FULLY_QUALIFIED_6 | elemType, profileId >> 16, profileId & 0xFFFF, tagNum))
+        else:
+            self._write(struct.pack('<BHHI', _TAG_FULLY_QUALIFIED_8 | elemType, profileId >> 16, profileId & 0xFFFF, tagNum))
+
+    def _writeInt(self, value, signed, tag):
+        if signed:
+            sizeIndex = next((i for i in range(4) if -(1 << (8 << i) - 1) <= value < (1 << (8 << i) - 1)), None)
+            elemType = _TYPE_SIGNED_INT
+        else:
+            sizeIndex = next((i for i in range(4) if 0 <= value < (1 << (8 << i))), None)
+            elemType = _TYPE_UNSIGNED_INT
+        if sizeIndex is None:
+            self._error('integer value cannot be encoded: %d' % value)
+        self._writeHeader(elemType + sizeIndex, tag)
+        self._write(_intStructs[elemType + sizeIndex].pack(value))
+
+    def _writeFloat(self, value, is32Bit, tag):
+        floatStruct = _float32Struct if is32Bit else _float64Struct
+        try:
+            data = floatStruct.pack(value)
+        except (OverflowError, struct.error):
+            self._error('FLOAT value cannot be encoded in %d bits' % (floatStruct.size * 8))
+        self._writeHeader(_TYPE_FLOAT32 if is32Bit else _TYPE_FLOAT64, tag)
+        self._write(data)
+
+    def _encodeUTF8(self, value):
+        try:
+            return value.encode('utf-8')
+        except UnicodeEncodeError:
+            self._error('string cannot be encoded as UTF-8 (unpaired surrogate)')
+
+    def _writeString(self, elemType, value, tag):
+        sizeIndex = 0 if len(value) <= 0xFF else 1 if len(value) <= 0xFFFF else 2 if len(value) <= 0xFFFFFFFF else 3
+        self._writeHeader(elemType + sizeIndex, tag)
+        self._write(_lenStructs[sizeIndex].pack(len(value)))
+        self._write(value)
+
+    def _expect(self, *kinds):
+        (tokKind, tokValue) = self._tokens.next()
+        if tokKind not in kinds:
+            self._unexpectedToken(tokKind)
+        return tokValue if tokKind == 'string' else tokKind
+
+    def _expected(self, target, tokKind):
+        self._error('expected %s, found JSON %s' % (target.schemaConstruct, _tokenName(tokKind)))
+
+    def _unexpectedToken(self, tokKind):
+        self._error('unexpected JSON %s' % _tokenName(tokKind))
+
+    # ----- Type Information
+
+    def _resolve(self, node):
+        if isinstance(node, ReferencedType):
+            if node.targetType is None:
+                self._error('unresolved type reference: %s' % node.targetName)
+            return node.targetType
+        return node
+
+    def _tlvKinds(self, node):
+        # Return the kinds of TLV values that conform to a type.
+        kinds = self._kinds.get(node, None)
+        if kinds is None:
+            target = self._resolve(node)
+            if isinstance(target, ChoiceType):
+                # Guard against cycles of CHOICE OF types, which are reported by validation.
+                self._kinds[node] = frozenset()
+                kinds = frozenset().union(*(self._tlvKinds(alt.type) for alt in target.alternates))
+            else:
+                kinds = _typeKinds[type(target)]
+            if _isNullable(target):
+                kinds = kinds | { 'null' }
+            self._kinds[node] = kinds
+        return kinds
+
+    def _structTable(self, node):
+        # Return the fields of a structure indexed by tag and by name, along with the names
+        # of the required fields and whether the structure is extensible.
+        table = self._structTables.get(node, None)
+        if table is None:
+            byTag = {}
+            byName = {}
+            required = set()
+            for field in node.allFields():
+                byName[field.name] = field
+                for tag in field.possibleTags:
+                    if tag is not None:
+                        byTag[tag.asTuple()] = field
+                        if tag.isProfileSpecificTag:
+                            byTag[(IMPLICIT_PROFILE, tag.tagNum)] = field
+                if field.getQualifier(Optional) is None:
+                    required.add(field.name)
+            table = (byTag, byName, required, node.getQualifier(Extensible) is not None)
+            self._structTables[node] = table
+        return table
+
+    def _choiceTable(self, node):
+        # Return the leaf alternates of a CHOICE OF, each with its alternate chain, its
+        # tag and the kinds of TLV values that conform to it.
+        table = self._choiceTables.get(node, None)
+        if table is None:
+            table = [ (altChain, tag.asTuple() if tag is not None else None, self._tlvKinds(altChain[0].type))
+                      for (altChain, name, tag) in node.allLeafAlternatesWithNamesAndTags() ]
+            self._choiceTables[node] = table
+        return table
+
+    def _checkPatternCount(self, patternElem, count):
+        if count < patternElem.lowerBound:
+            self._error('missing item%s' % (': ' + patternElem.name if patternElem.name is not None else ''))
+
+    def _error(self, msg):
+        raise TranscodeError(msg, list(self._path))
+
+
+class _JSONTokenizer(object):
+    '''Splits JSON text read from a text file object into tokens, reading the text a chunk
+       at a time.  Each token is a tuple of the token kind ('{', '}', '[', ']', ':', ',',
+       'string', 'int', 'float', 'true', 'false', 'null' or 'eof') and its value.'''
+
+    _chunkSize = 65536
+
+    _tokenPattern = re.compile(r'[ \t\r\n]*(?:([{}\[\]:,])|"((?:[^"\\\x00-\x1f]|\\.)*)"|'
+                               r'(-?(?:0|[1-9][0-9]*)((?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?))|(true|false|null))')
+
+    _numberTailPattern = re.compile(r'[0-9.eE+-]*')
+
+    def __init__(self, input):
+        self._input = input
+        self._text = ''
+        self._pos = 0
+        self._eof = False
+        self._lookahead = []
+
+    def next(self):
+        if len(self._lookahead) > 0:
+            return self._lookahead.pop()
+        return self._scan()
+
+    def peek(self, index=0):
+        while len(self._lookahead) <= index:
+            self._lookahead.insert(0, self._scan())
+        return self._lookahead[-1 - index]
+
+    def pushBack(self, token):
+        self._lookahead.append(token)
+
+    def _scan(self):
+        while True:
+            m = self._tokenPattern.match(self._text, self._pos)
+            # A token that extends to the end of the text read so far may continue in the
+            # next chunk.  (A number may also be followed by an incomplete fraction or
+            # exponent.)
+            if (m is None or self._numberTailPattern.match(self._text, m.end()).end() == len(self._text)) and not self._eof:
+                self._readChunk()
+                continue
+            break
+        if m is None:
+            if self._text[self._pos:].strip(' \t\r\n') == '':
+                return ('eof', None)
+            raise TranscodeError('invalid JSON text: %s' % self._text[self._pos:self._pos+20].strip())
+        self._pos = m.end()
+        (punct, string, number, fraction, literal) = m.groups()
+        if punct is not None:
+            return (punct, None)
+        if string is not None:
+            if '\\' in string:
+                try:
+                    string = json.loads('"%s"' % string)
+                except ValueError:
+                    raise TranscodeError('invalid escape sequence in JSON string: "%s"' % string) from None
+            return ('string', string)
+        if number is not None:
+            return ('float', float(number)) if fraction else ('int', int(number))
+        return (literal, None)
+
+    def _readChunk(self):
+        chunk = self._input.read(self._chunkSize)
+        if len(chunk) == 0:
+            self._eof = True
+        else:
+            self._text = self._text[self._pos:] + chunk
+            self._pos = 0
+
+
+def _isNullable(node):
+    return isinstance(node, HasQualifiers) and node.getQualifier(Nullable) is not None
+
+def _tagMatches(tag, schemaTag):
+    if tag[0] == IMPLICIT_PROFILE:
+        return schemaTag[0] is not None and tag[1] == schemaTag[1]
+    return tag == schemaTag
+
+def _tagInTags(tag, schemaTags):
+    # Tags are only significant for pattern elements that declare them.
+    if tag is None or len(schemaTags) == 0:
+        return True
+    return any(schemaTag is None or _tagMatches(tag, schemaTag.asTuple()) for schemaTag in schemaTags)
+
+def _tagKey(tag):
+    if tag is None:
+        return 'anon'
+    (profileId, tagNum) = tag
+    if profileId is None:
+        return str(tagNum)
+    if isinstance(profileId, int):
+        return '0x%08X:%d' % (profileId, tagNum)
+    return '%s:%d' % (profileId, tagNum)
+
+def _parseTagKey(key):
+    m = _tagKeyPattern.match(key)
+    if m is None:
+        return None
+    (profileId, tagNum) = (m.group(1), int(m.group(2)))
+    if profileId is None:
+        return (None, tagNum) if tagNum <= 0xFF else None
+    profileId = int(profileId, 0)
+    if profileId > 0xFFFFFFFF or tagNum > 0xFFFFFFFF:
+        return None
+    return (profileId, tagNum)
+
+def _kindName(kind):
+    return { 'int' : 'integer', 'bool' : 'boolean', 'float' : 'floating point number', 'string' : 'UTF-8 string',
+             'bytes' : 'byte string', 'null' : 'null', 'struct' : 'structure', 'array' : 'array', 'list' : 'list',
+             'end' : 'end of container' }[kind]
+
+def _tokenName(tokKind):
+    return { '{' : 'object', '[' : 'array', 'int' : 'number', 'float' : 'number', 'true' : 'boolean',
+             'false' : 'boolean', 'eof' : 'end of text' }.get(tokKind, tokKind if tokKind.isalpha() else "'%s'" % tokKind)
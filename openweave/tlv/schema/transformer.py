@@ -21,6 +21,7 @@
 #
 
 import copy
+import sys
 from decimal import Decimal
 
 from lark import Tree, Token, v_args 
@@ -30,15 +31,19 @@ from .node import *
 from .error import *
 
 class _SchemaTransformer(Transformer):
-    def __init__(self, schemaFile):
+    def __init__(self, schemaFile, lineOffset=0, posOffset=0):
         Transformer.__init__(self)
         self.schemaFile = schemaFile
+        # Offsets applied to all source positions.  These are used when transforming
+        # the parse tree for a region of text extracted from a larger schema file.
+        self.lineOffset = lineOffset
+        self.posOffset = posOffset
 
     # ----- general rule handlers
     
     @v_args(meta=True)
     def file(self, children, meta):
-        self.schemaFile.sourceRef = SourceRef.fromMeta(self.schemaFile, meta)
+        self.schemaFile.sourceRef = self._sourceRefFromMeta(meta)
         self.schemaFile.statements = self._popTree(children, expectedName='statements').children
         assert len(children) == 0
         self._attachDocsToNodes(self.schemaFile.statements)
@@ -46,7 +51,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def namespace_def(self, children, meta):
-        node = Namespace(SourceRef.fromMeta(self.schemaFile, meta))
+        node = Namespace(self._sourceRefFromMeta(meta))
         (node.docs, node.docsSourceRef) = self._popOptionalDocs(children)
         (node.name, node.nameSourceRef) = self._popName(children, allowScopedName=True)
         node.statements = self._popTree(children, expectedName='statements').children
@@ -57,9 +62,9 @@ class _SchemaTransformer(Transformer):
             names = node.name.rsplit('.', maxsplit=1)
             if len(names) == 1:
                 break
-            node.name = names[1]
+            node.name = sys.intern(names[1])
             node.parent = Namespace(node.sourceRef)
-            node.parent.name = names[0]
+            node.parent.name = sys.intern(names[0])
             node.parent.nameSourceRef = node.nameSourceRef
             node.parent.statements = [ node ]
             node = node.parent
@@ -67,14 +72,14 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def using_stmt(self, children, meta):
-        node = Using(SourceRef.fromMeta(self.schemaFile, meta))
+        node = Using(self._sourceRefFromMeta(meta))
         (node.targetName, node.targetNameSourceRef) = self._popName(children, allowScopedName=True)
         assert len(children) == 0
         return node
 
     @v_args(meta=True)
     def vendor_def(self, children, meta):
-        node = Vendor(SourceRef.fromMeta(self.schemaFile, meta))
+        node = Vendor(self._sourceRefFromMeta(meta))
         (node.docs, node.docsSourceRef) = self._popOptionalDocs(children)
         (node.name, node.nameSourceRef) = self._popName(children)
         node.quals = self._popOptionalQualList(children)
@@ -84,7 +89,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def profile_def(self, children, meta):
-        node = Profile(SourceRef.fromMeta(self.schemaFile, meta))
+        node = Profile(self._sourceRefFromMeta(meta))
         (node.docs, node.docsSourceRef) = self._popOptionalDocs(children)
         (node.name, node.nameSourceRef) = self._popName(children)
         node.quals = self._popOptionalQualList(children)
@@ -100,7 +105,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def message_def(self, children, meta):
-        node = Message(SourceRef.fromMeta(self.schemaFile, meta))
+        node = Message(self._sourceRefFromMeta(meta))
         (node.docs, node.docsSourceRef) = self._popOptionalDocs(children)
         (node.name, node.nameSourceRef) = self._popName(children)
         node.quals = self._popOptionalQualList(children)
@@ -119,7 +124,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def status_code_def(self, children, meta):
-        node = StatusCode(SourceRef.fromMeta(self.schemaFile, meta))
+        node = StatusCode(self._sourceRefFromMeta(meta))
         (node.docs, node.docsSourceRef) = self._popOptionalDocs(children)
         (node.name, node.nameSourceRef) = self._popName(children)
         node.quals = self._popOptionalQualList(children)
@@ -129,7 +134,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def type_def(self, children, meta):
-        node = TypeDef(SourceRef.fromMeta(self.schemaFile, meta))
+        node = TypeDef(self._sourceRefFromMeta(meta))
         (node.docs, node.docsSourceRef) = self._popOptionalDocs(children)
         (node.name, node.nameSourceRef) = self._popName(children)
         node.quals = self._popOptionalQualList(children, 0)
@@ -143,64 +148,64 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def extensible(self, children, meta):
-        return Extensible(SourceRef.fromMeta(self.schemaFile, meta))
+        return Extensible(self._sourceRefFromMeta(meta))
 
     @v_args(meta=True)
     def optional(self, children, meta):
-        return Optional(SourceRef.fromMeta(self.schemaFile, meta))
+        return Optional(self._sourceRefFromMeta(meta))
 
     @v_args(meta=True)
     def private(self, children, meta):
-        return Private(SourceRef.fromMeta(self.schemaFile, meta))
+        return Private(self._sourceRefFromMeta(meta))
 
     @v_args(meta=True)
     def invariant(self, children, meta):
-        return Invariant(SourceRef.fromMeta(self.schemaFile, meta))
+        return Invariant(self._sourceRefFromMeta(meta))
 
     @v_args(meta=True)
     def nullable(self, children, meta):
-        return Nullable(SourceRef.fromMeta(self.schemaFile, meta))
+        return Nullable(self._sourceRefFromMeta(meta))
 
     @v_args(meta=True)
     def tag_order(self, children, meta):
-        return TagOrder(SourceRef.fromMeta(self.schemaFile, meta))
+        return TagOrder(self._sourceRefFromMeta(meta))
 
     @v_args(meta=True)
     def schema_order(self, children, meta):
-        return SchemaOrder(SourceRef.fromMeta(self.schemaFile, meta))
+        return SchemaOrder(self._sourceRefFromMeta(meta))
 
     @v_args(meta=True)
     def any_order(self, children, meta):
-        return AnyOrder(SourceRef.fromMeta(self.schemaFile, meta))
+        return AnyOrder(self._sourceRefFromMeta(meta))
 
     @v_args(meta=True)
     def range_8bits(self, children, meta):
-        return Range(SourceRef.fromMeta(self.schemaFile, meta), width=8)
+        return Range(self._sourceRefFromMeta(meta), width=8)
 
     @v_args(meta=True)
     def range_16bits(self, children, meta):
-        return Range(SourceRef.fromMeta(self.schemaFile, meta), width=16)
+        return Range(self._sourceRefFromMeta(meta), width=16)
 
     @v_args(meta=True)
     def range_32bits(self, children, meta):
-        return Range(SourceRef.fromMeta(self.schemaFile, meta), width=32)
+        return Range(self._sourceRefFromMeta(meta), width=32)
 
     @v_args(meta=True)
     def range_64bits(self, children, meta):
-        return Range(SourceRef.fromMeta(self.schemaFile, meta), width=64)
+        return Range(self._sourceRefFromMeta(meta), width=64)
 
     @v_args(meta=True)
     def range_from_to(self, children, meta):
         (lowerBound, unused) = self._popIntOrDecimal(children, 'range lower bound')
         (upperBound, unused) = self._popIntOrDecimal(children, 'range upper bound')
         assert len(children) == 0
-        return Range(SourceRef.fromMeta(self.schemaFile, meta), lowerBound=lowerBound, upperBound=upperBound)
+        return Range(self._sourceRefFromMeta(meta), lowerBound=lowerBound, upperBound=upperBound)
 
     @v_args(meta=True)
     def length_exact(self, children, meta):
         (n, unused) = self._popInt(children)
         assert len(children) == 0
-        return Length(SourceRef.fromMeta(self.schemaFile, meta), lowerBound=n, upperBound=n)
+        return Length(self._sourceRefFromMeta(meta), lowerBound=n, upperBound=n)
 
     @v_args(meta=True)
     def length_from_to(self, children, meta):
@@ -210,20 +215,20 @@ class _SchemaTransformer(Transformer):
         else:
             upperBound = None
         assert len(children) == 0
-        return Length(SourceRef.fromMeta(self.schemaFile, meta), lowerBound=lowerBound, upperBound=upperBound)
+        return Length(self._sourceRefFromMeta(meta), lowerBound=lowerBound, upperBound=upperBound)
 
     @v_args(meta=True)
     def context_tag(self, children, meta):
         (tagNum, unused) = self._popInt(children, desc='context tag')
         assert len(children) == 0
-        return Tag(SourceRef.fromMeta(self.schemaFile, meta), tagNum=tagNum)
+        return Tag(self._sourceRefFromMeta(meta), tagNum=tagNum)
 
     @v_args(meta=True)
     def profile_tag_int(self, children, meta):
         (profileId, unused) = self._popInt(children, desc='profile id')
         (tagNum, unused) = self._popInt(children, desc='profile tag')
         assert len(children) == 0
-        return Tag(SourceRef.fromMeta(self.schemaFile, meta), tagNum=tagNum, profile=profileId)
+        return Tag(self._sourceRefFromMeta(meta), tagNum=tagNum, profile=profileId)
 
     @v_args(meta=True)
     def profile_tag_name(self, children, meta):
@@ -235,31 +240,31 @@ class _SchemaTransformer(Transformer):
             (profile, unused) = self._popName(children, allowScopedName=True)
         (tagNum, unused) = self._popInt(children, desc='profile tag')
         assert len(children) == 0
-        return Tag(SourceRef.fromMeta(self.schemaFile, meta), tagNum=tagNum, profile=profile)
+        return Tag(self._sourceRefFromMeta(meta), tagNum=tagNum, profile=profile)
 
     @v_args(meta=True)
     def anon_tag(self, children, meta):
-        return Tag(SourceRef.fromMeta(self.schemaFile, meta))
+        return Tag(self._sourceRefFromMeta(meta))
 
     @v_args(meta=True)
     def id(self, children, meta):
         (idNum, unused) = self._popInt(children, desc='id')
         assert len(children) == 0
-        return Id(SourceRef.fromMeta(self.schemaFile, meta), idNum=idNum)
+        return Id(self._sourceRefFromMeta(meta), idNum=idNum)
 
     @v_args(meta=True)
     def id_int_scope(self, children, meta):
         (vendorNum, unused) = self._popInt(children, desc='id')
         (idNum, unused) = self._popInt(children, desc='id')
         assert len(children) == 0
-        return Id(SourceRef.fromMeta(self.schemaFile, meta), idNum=idNum, vendor=vendorNum)
+        return Id(self._sourceRefFromMeta(meta), idNum=idNum, vendor=vendorNum)
 
     @v_args(meta=True)
     def id_name_scope(self, children, meta):
         (vendor, unused) = self._popName(children, allowScopedName=True)
         (idNum, unused) = self._popInt(children, desc='id')
         assert len(children) == 0
-        return Id(SourceRef.fromMeta(self.schemaFile, meta), idNum=idNum, vendor=vendor)
+        return Id(self._sourceRefFromMeta(meta), idNum=idNum, vendor=vendor)
 
     # ----- type handlers
 
@@ -273,7 +278,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def enum_value(self, children, meta):
-        node = IntegerEnumValue(SourceRef.fromMeta(self.schemaFile, meta))
+        node = IntegerEnumValue(self._sourceRefFromMeta(meta))
         (node.name, node.nameSourceRef) = self._popName(children)
         (node.value, node.valueSourceRef) = self._popInt(children)
         assert len(children) == 0
@@ -305,7 +310,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def structure_type(self, children, meta):
-        node = StructureType(SourceRef.fromMeta(self.schemaFile, meta))
+        node = StructureType(self._sourceRefFromMeta(meta))
         node.quals = self._popOptionalQualList(children, 0)
         if len(children) != 0:
             node.members = self._popTree(children, expectedName='structure_members').children
@@ -317,7 +322,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def structure_field_def(self, children, meta):
-        node = StructureField(SourceRef.fromMeta(self.schemaFile, meta))
+        node = StructureField(self._sourceRefFromMeta(meta))
         (node.name, node.nameSourceRef) = self._popName(children)
         node.quals = self._popOptionalQualList(children, 0)
         node.type = self._popTypeNode(children)
@@ -328,13 +333,13 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def structure_includes(self, children, meta):
-        node = StructureIncludes(SourceRef.fromMeta(self.schemaFile, meta))
+        node = StructureIncludes(self._sourceRefFromMeta(meta))
         (node.targetName, unused) = self._popName(children, allowScopedName=True)
         return node
 
     @v_args(meta=True)
     def field_group_type(self, children, meta):
-        node = FieldGroupType(SourceRef.fromMeta(self.schemaFile, meta))
+        node = FieldGroupType(self._sourceRefFromMeta(meta))
         node.quals = self._popOptionalQualList(children, 0)
         if len(children) != 0:
             node.members = self._popTree(children, expectedName='structure_members').children
@@ -346,7 +351,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def choice_type(self, children, meta):
-        node = ChoiceType(SourceRef.fromMeta(self.schemaFile, meta))
+        node = ChoiceType(self._sourceRefFromMeta(meta))
         node.quals = self._popOptionalQualList(children, 0)
         if len(children) != 0:
             node.alternates = self._popTree(children, expectedName='choice_alternates').children
@@ -357,7 +362,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def named_choice_alt(self, children, meta):
-        node = ChoiceAlternate(SourceRef.fromMeta(self.schemaFile, meta))
+        node = ChoiceAlternate(self._sourceRefFromMeta(meta))
         (node.name, node.nameSourceRef) = self._popName(children)
         node.quals = self._popOptionalQualList(children)
         node.type = self._popTypeNode(children)
@@ -377,7 +382,7 @@ class _SchemaTransformer(Transformer):
     
     @v_args(meta=True)
     def uniform_array_type(self, children, meta):
-        node = ArrayType(SourceRef.fromMeta(self.schemaFile, meta))
+        node = ArrayType(self._sourceRefFromMeta(meta))
         node.quals = self._popOptionalQualList(children, 0)
         node.elemType = self._popTypeNode(children)
         assert len(children) == 0
@@ -387,7 +392,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def pattern_array_type(self, children, meta):
-        node = ArrayType(SourceRef.fromMeta(self.schemaFile, meta))
+        node = ArrayType(self._sourceRefFromMeta(meta))
         node.quals = self._popOptionalQualList(children, 0)
         if len(children) != 0:
             node.elemTypePattern = self._popTree(children, expectedName='linear_type_pattern').children
@@ -402,7 +407,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def uniform_list_type(self, children, meta):
-        node = ListType(SourceRef.fromMeta(self.schemaFile, meta))
+        node = ListType(self._sourceRefFromMeta(meta))
         node.quals = self._popOptionalQualList(children, 0)
         node.elemType = self._popTypeNode(children)
         assert len(children) == 0
@@ -412,7 +417,7 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def pattern_list_type(self, children, meta):
-        node = ListType(SourceRef.fromMeta(self.schemaFile, meta))
+        node = ListType(self._sourceRefFromMeta(meta))
         node.quals = self._popOptionalQualList(children, 0)
         if len(children) != 0:
             node.elemTypePattern = self._popTree(children, expectedName='linear_type_pattern').children
@@ -453,12 +458,26 @@ class _SchemaTransformer(Transformer):
 
     @v_args(meta=True)
     def referenced_type(self, children, meta):
-        node = ReferencedType(SourceRef.fromMeta(self.schemaFile, meta))
+        node = ReferencedType(self._sourceRefFromMeta(meta))
         (node.targetName, unused) = self._popName(children, allowScopedName=True)
         assert len(children) == 0
         return node
 
     # ----- private methods
+
+    def _sourceRefFromMeta(self, meta):
+        return self._offsetSourceRef(SourceRef.fromMeta(self.schemaFile, meta))
+
+    def _sourceRefFromToken(self, token):
+        return self._offsetSourceRef(SourceRef.fromToken(self.schemaFile, token))
+
+    def _offsetSourceRef(self, sourceRef):
+        if sourceRef is not None:
+            sourceRef.startLine += self.lineOffset
+            sourceRef.endLine += self.lineOffset
+            sourceRef.startPos += self.posOffset
+            sourceRef.endPos += self.posOffset
+        return sourceRef
     
     def _parseInt(self, valStr, desc='integer', sourceRef=None):
         try:
@@ -479,7 +498,7 @@ class _SchemaTransformer(Transformer):
 
     def _popName(self, children, allowScopedName=False):
         nameTree = self._popTree(children, 'name')
-        nameSourceRef = SourceRef.fromMeta(self.schemaFile, nameTree.meta)
+        nameSourceRef = self._sourceRefFromMeta(nameTree.meta)
         nameComponents = []
         for nameToken in nameTree.children:
             assert isinstance(nameToken, Token)
@@ -494,7 +513,9 @@ class _SchemaTransformer(Transformer):
             raise WeaveTLVSchemaError(msg='Invalid name: %s' % (nameVal),
                                       detail='Scoped name not allowed in this context',
                                       sourceRef=nameSourceRef)
-        return (nameVal, nameSourceRef)
+        # Names are interned, such that each distinct name is stored once, however many
+        # nodes it appears in.
+        return (sys.intern(nameVal), nameSourceRef)
 
     def _popOptionalQualList(self, children, pos=0):
         if len(children) > pos and isinstance(children[pos], Tree) and children[pos].data == 'qualifier_list':
@@ -505,7 +526,7 @@ class _SchemaTransformer(Transformer):
     def _popQuantifier(self, children):
         assert len(children) > 0 and isinstance(children[0], Tree)
         quantNode = children.pop(0)
-        sourceRef = SourceRef.fromMeta(self.schemaFile, quantNode.meta)
+        sourceRef = self._sourceRefFromMeta(quantNode.meta)
         name = quantNode.data
         if name == 'quant_0_or_1':
             return (0, 1, sourceRef)
@@ -526,7 +547,7 @@ class _SchemaTransformer(Transformer):
     def _popOptionalDocs(self, children, pos=0):
         if len(children) > pos and isinstance(children[pos], Token) and (children[pos].type == 'DOCS' or children[pos].type == 'POSTFIX_DOCS'):
             docsToken = children.pop(pos)
-            docsSourceRef = SourceRef.fromToken(self.schemaFile, docsToken)
+            docsSourceRef = self._sourceRefFromToken(docsToken)
             return (docsToken.value, docsSourceRef)
         else:
             return (None, None)
@@ -545,14 +566,14 @@ class _SchemaTransformer(Transformer):
 
     def _popInt(self, children, desc='integer'):
         valToken = self._popToken(children, 'INT')
-        sourceRef = SourceRef.fromToken(self.schemaFile, valToken)
+        sourceRef = self._sourceRefFromToken(valToken)
         val = self._parseInt(valToken, desc=desc, sourceRef=sourceRef)
         return (val, sourceRef)
 
     def _popIntOrDecimal(self, children, desc='numeric'):
         assert len(children) > 0 and isinstance(children[0], Token)
         valToken = children.pop(0)
-        sourceRef = SourceRef.fromToken(self.schemaFile, valToken)
+        sourceRef = self._sourceRefFromToken(valToken)
         if valToken.type == 'INT':
             val = self._parseInt(valToken, desc=desc, sourceRef=sourceRef)
         else:
@@ -562,7 +583,7 @@ class _SchemaTransformer(Transformer):
         
     def _newSimpleTypeNode(self, nodeType, children, meta):
         node = nodeType()
-        node.sourceRef = SourceRef.fromMeta(self.schemaFile, meta)
+        node.sourceRef = self._sourceRefFromMeta(meta)
         node.quals = self._popOptionalQualList(children, 0)
         assert len(children) == 0
         self._setParent(node.quals, node)
@@ -570,7 +591,7 @@ class _SchemaTransformer(Transformer):
 
     def _newIntTypeNode(self, nodeType, children, meta):
         node = nodeType()
-        node.sourceRef = SourceRef.fromMeta(self.schemaFile, meta)
+        node.sourceRef = self._sourceRefFromMeta(meta)
         node.quals = self._popOptionalQualList(children, 0)
         if len(children) == 1:
             node.values = self._popTree(children, expectedName='enum_def').children
@@ -600,23 +621,38 @@ class _SchemaTransformer(Transformer):
         # the HasDocumentation mixin.  If the node does not allow documentation, or if there
         # is no next/previous node, simply ignore the documentation token (which is fitting,
         # as it is styled as a comment).
+        #
+        # The list is rebuilt in place, rather than removing the documentation tokens
+        # individually, to avoid quadratic behavior for long lists.
         # 
-        i = 0;
-        while i < len(nodes):
-            if isinstance(nodes[i], Token):
-                tokenName = nodes[i].type
-                if tokenName == 'DOCS':
-                    (docs, docsSourceRef) = self._popOptionalDocs(nodes, pos=i)
-                    if len(nodes) > i and isinstance(nodes[i], HasDocumentation):
-                        nodes[i].docs = docs
-                        nodes[i].docsSourceRef = docsSourceRef
+        remaining = []
+        docsToken = None
+        for item in nodes:
+            if isinstance(item, Token):
+                if item.type == 'DOCS':
+                    docsToken = item
                     continue
-                if tokenName == 'POSTFIX_DOCS':
-                    (docs, docsSourceRef) = self._popOptionalDocs(nodes, pos=i)
-                    if len(nodes) > 0 and isinstance(nodes[i-1], HasDocumentation):
+                if item.type == 'POSTFIX_DOCS':
+                    if len(remaining) > 0 and isinstance(remaining[-1], HasDocumentation):
                         # TODO: maybe throw error if both docs and postfix_docs present?
-                        nodes[i-1].docs = docs
-                        nodes[i-1].docsSourceRef = docsSourceRef
+                        remaining[-1].docs = item.value
+                        remaining[-1].docsSourceRef = self._sourceRefFromToken(item)
+                    docsToken = None
                     continue
-            i += 1
+            if docsToken is not None and isinstance(item, HasDocumentation):
+                item.docs = docsToken.value
+                item.docsSourceRef = self._sourceRefFromToken(docsToken)
+            docsToken = None
+            remaining.append(item)
+        nodes[:] = remaining
+
+class _StatementsTransformer(_SchemaTransformer):
+    '''Transforms the parse tree for a region of text within a schema file into a list
+       of statement nodes, without altering the associated SchemaFile.'''
 
+    @v_args(meta=True)
+    def file(self, children, meta):
+        statements = self._popTree(children, expectedName='statements').children
+        assert len(children) == 0
+        self._attachDocsToNodes(statements)
+        return statements
@@ -87,4 +87,7 @@ setup(
     install_requires=[
         'lark-parser'
     ],
+    extras_require={
+        'numpy': [ 'numpy' ]           # Vectorized bounds checking (see bounds.py).
+    },
 )